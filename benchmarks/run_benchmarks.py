@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Benchmarks reproductibles des chemins critiques du cœur métier (sans affichage).
+
+Exemples :
+    python benchmarks/run_benchmarks.py --scale 1k --scale 100k
+    python benchmarks/run_benchmarks.py --orders 2000000 --clients 50000 --output run.json
+    python benchmarks/run_benchmarks.py --scale 10k --compare bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from company_core import SNAPSHOT_EXTENSION, CompanyCore, CompanyError
+from company_core.synthetic import generate_dataset
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Nombre de commandes par échelle ; les autres collections en sont déduites
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo), ou None si indisponible."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux renvoie des Ko, macOS des octets
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(name, records, func, repeat):
+    """Exécute func `repeat` fois et retourne le meilleur temps, le débit et le pic RSS."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    result = {
+        "name": name,
+        "records": records,
+        "wall_time_s": round(best, 6),
+        "mean_time_s": round(sum(timings) / len(timings), 6),
+        "throughput_per_s": round(records / best, 1) if best > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"  {name:<28} {best * 1000:>10.1f} ms  {result['throughput_per_s'] or 0:>14,.0f} rec/s")
+    return result
+
+
+def run_scale(label, sizes, repeat, workdir):
+    print(f"Échelle {label} : {sizes}")
+    start = time.perf_counter()
+    data = generate_dataset(**sizes)
+    generation_s = time.perf_counter() - start
+    core = CompanyCore(data=data, data_file=os.path.join(workdir, f"company_data_{label}.json"))
+    order_count = len(data.orders)
+    total_records = order_count + len(data.clients_list) + len(data.login_events) + core.inventory.count()
+
+    results = [measure("save_data", total_records, core.save, repeat)]
+    loaded = CompanyCore(data_file=core.data_file)
+    results.append(measure("load_data", total_records, loaded.load, repeat))
+    snapshot_path = os.path.join(workdir, f"company_data_{label}{SNAPSHOT_EXTENSION}")
+    results.append(measure("save_snapshot", total_records, lambda: core.save(snapshot_path), repeat))
+    results.append(measure("load_snapshot", total_records, lambda: loaded.load(snapshot_path), repeat))
+    for fmt, ext in (("JSON", ".json"), ("CSV", ".csv"), ("Excel", ".xlsx"), ("PDF", ".pdf")):
+        path = os.path.join(workdir, f"orders_{label}{ext}")
+        try:
+            results.append(measure(f"export_data[{fmt}]", order_count,
+                                   lambda fmt=fmt, path=path: core.exports.export("Commandes", fmt, path), repeat))
+        except CompanyError as e:
+            results.append({"name": f"export_data[{fmt}]", "skipped": str(e)})
+            print(f"  export_data[{fmt}] ignoré : {e}")
+    csv_path = os.path.join(workdir, f"orders_{label}.csv")
+
+    def import_orders():
+        CompanyCore(data_file=core.data_file).imports.import_file("Commandes", csv_path)
+    results.append(measure("bulk_import[CSV]", order_count, import_orders, repeat))
+    results.append(measure("dashboard_stats", total_records, core.dashboard_stats, repeat))
+    results.append(measure("financial_summary", order_count + len(data.expenses), core.finance.summary, repeat))
+    results.append(measure("employee_summary", len(data.login_events), core.logins.summary, repeat))
+    results.append(measure("reports_averages", len(data.clients_list),
+                           lambda: (core.clients.average_purchase(), core.inventory.count_by_category()), repeat))
+
+    excel_path = os.path.join(workdir, f"orders_{label}.xlsx")
+    if os.path.exists(excel_path):
+        try:
+            results.append(measure("show_analysis", order_count,
+                                   lambda: core.analysis.analyse_excel(excel_path), repeat))
+        except CompanyError as e:
+            results.append({"name": "show_analysis", "skipped": str(e)})
+            print(f"  show_analysis ignoré : {e}")
+    else:
+        results.append({"name": "show_analysis", "skipped": "classeur Excel non généré (openpyxl absent)"})
+
+    return {"scale": label, "sizes": sizes, "generation_s": round(generation_s, 3),
+            "file_size_bytes": os.path.getsize(core.data_file), "snapshot_size_bytes": os.path.getsize(snapshot_path),
+            "results": results}
+
+
+def compare(current, previous_path):
+    """Affiche le ratio de temps par rapport à un fichier de résultats précédent."""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    before = {(run["scale"], r["name"]): r for run in previous.get("runs", []) for r in run["results"]
+              if "wall_time_s" in r}
+    print(f"\nComparaison avec {previous_path} ({previous.get('git_revision')}) :")
+    for run in current["runs"]:
+        for r in run["results"]:
+            old = before.get((run["scale"], r["name"]))
+            if old and "wall_time_s" in r and old["wall_time_s"] > 0:
+                ratio = r["wall_time_s"] / old["wall_time_s"]
+                # Les mesures sous la milliseconde sont trop bruitées pour être signalées
+                flag = "  <-- RÉGRESSION" if ratio > 1.10 and r["wall_time_s"] > 0.001 else ""
+                print(f"  [{run['scale']}] {r['name']:<28} x{ratio:.2f}{flag}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES, key=SCALES.get),
+                        help="Échelle prédéfinie (répétable). Par défaut : 1k et 10k.")
+    parser.add_argument("--orders", type=int, help="Nombre de commandes (échelle personnalisée)")
+    parser.add_argument("--clients", type=int, help="Nombre de clients")
+    parser.add_argument("--login-events", type=int, help="Nombre d'enregistrements de connexion")
+    parser.add_argument("--inventory-items", type=int, help="Nombre de produits en inventaire")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions par mesure (meilleur temps retenu)")
+    parser.add_argument("--output", default="bench_results.json", help="Fichier JSON de résultats")
+    parser.add_argument("--compare", help="Fichier de résultats précédent à comparer")
+    parser.add_argument("--workdir", help="Dossier des fichiers générés (temporaire par défaut)")
+    return parser.parse_args(argv)
+
+
+def build_scales(args):
+    if args.orders is not None:
+        orders = args.orders
+        return {"custom": {
+            "orders": orders,
+            "clients": args.clients if args.clients is not None else max(orders // 10, 1),
+            "login_events": args.login_events if args.login_events is not None else orders,
+            "inventory_items": args.inventory_items if args.inventory_items is not None else max(orders // 20, 25),
+            "seed": args.seed,
+        }}
+    labels = args.scale or ["1k", "10k"]
+    return {label: {"orders": SCALES[label], "clients": max(SCALES[label] // 10, 1),
+                    "login_events": SCALES[label], "inventory_items": max(SCALES[label] // 20, 25),
+                    "seed": args.seed} for label in labels}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        for label, sizes in build_scales(args).items():
+            report["runs"].append(run_scale(label, sizes, args.repeat, workdir))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nRésultats écrits dans {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,20 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk, filedialog
 import logging
-import hashlib
-from datetime import datetime
-import json
-import pandas as pd  # For Excel reading and analysis
 import os
+import threading
+import time
 import webbrowser
+from collections import OrderedDict
+from datetime import datetime
+
+from company_core import (
+    DEFAULT_BUNDLE_DIR, DEFAULT_VENDOR_DIR, ApiServer, CompanyCore, CompanyError, EXPORT_EXTENSIONS,
+    EXPORT_SOURCES, GRANULARITIES, IMPORT_SCHEMAS, OPEN_STATUSES, TASK_STATUSES, Instrumentation, ShiftConflictError,
+    SEARCH_LABELS, client_key, ensure_bundle, guess_mapping, hash_password, now_str, open_storage, read_header,
+    lttb, safe_due, AGGREGATES, OPERATORS, QUERY_SOURCES, aggregate_name, JOB_FREQUENCIES, JOB_KINDS,
+    DIFF_COLUMNS, guess_key, TableSorter, FORMULA_EXAMPLES, format_result, CallQueue
+)
 
 # -----------------------------------------------------------------------------
 # CONFIGURATION DU LOGGING
@@ -18,13 +26,6 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# -----------------------------------------------------------------------------
-# FONCTION DE HACHAGE DES MOTS DE PASSE
-# -----------------------------------------------------------------------------
-def hash_password(password):
-    """Retourne le hachage SHA-256 du mot de passe donné."""
-    return hashlib.sha256(password.encode()).hexdigest()
-
 # -----------------------------------------------------------------------------
 # BASE DE DONNÉES DES UTILISATEURS : Administrateur et Employé
 # -----------------------------------------------------------------------------
@@ -33,37 +34,171 @@ users = {
     "employee": {"password": hash_password("emp456"), "role": "employee"}
 }
 
+
+def _data_attribute(name):
+    """Expose un attribut de CompanyData comme attribut de l'application."""
+    return property(lambda self: getattr(self.core.data, name),
+                    lambda self, value: setattr(self.core.data, name, value))
+
 # -----------------------------------------------------------------------------
 # CLASSE APPLICATION : Ultimate Company App (Version Française)
 # -----------------------------------------------------------------------------
 class Application(tk.Tk):
+    # Données en mémoire : elles vivent dans le cœur métier (company_core.CompanyData)
+    inventory_data = _data_attribute("inventory_data")
+    clients_list = _data_attribute("clients_list")
+    login_events = _data_attribute("login_events")
+    orders = _data_attribute("orders")
+    suppliers = _data_attribute("suppliers")
+    projects = _data_attribute("projects")
+    announcements = _data_attribute("announcements")
+    shifts = _data_attribute("shifts")
+    expenses = _data_attribute("expenses")
+    feedbacks = _data_attribute("feedbacks")
+    tasks = _data_attribute("tasks")
+    settings = _data_attribute("settings")
+
+    # Actions mesurées par l'instrumentation (navigation et opérations qui modifient les données)
+    INSTRUMENTED_ACTIONS = (
+        "show_dashboard", "show_inventory", "show_clients_list", "show_employees_list", "show_employee_summary",
+        "show_orders", "show_suppliers", "show_projects", "show_announcements", "show_shift_scheduling",
+        "show_financial_dashboard", "show_reports", "show_profile", "show_settings", "show_feedback",
+        "show_tasks", "show_analysis", "show_import", "show_export_options", "show_calculator",
+        "add_product", "modify_product", "delete_product", "search_product", "add_client", "filter_clients",
+        "delete_client", "add_order", "delete_order", "add_supplier", "modify_supplier", "delete_supplier",
+        "add_project", "modify_project", "delete_project", "add_announcement", "add_shift", "add_expense", "add_feedback",
+        "add_task", "save_data", "load_data", "run_import", "export_data", "reset_data", "clear_login_logs",
+        "show_search", "run_query", "save_query", "delete_query", "save_scheduled_job", "delete_scheduled_job",
+        "toggle_scheduled_job", "run_scheduled_job_now", "archive_cold_data", "analyse_workbook",
+        "run_workbook_compare", "sort_tree", "save_computed_column", "delete_computed_column",
+        "receive_stock", "adjust_stock", "set_reorder_point"
+    )
+
+    # Actions qui modifient les données : sauvegarde immédiate quand le stockage est partagé
+    MUTATING_ACTIONS = (
+        "record_login_event", "add_product", "modify_product", "delete_product", "add_client", "delete_client",
+        "add_order", "delete_order", "add_supplier", "modify_supplier", "delete_supplier", "add_project", "modify_project",
+        "delete_project", "add_announcement", "add_shift", "add_expense", "add_feedback", "add_task",
+        "run_import", "reset_data", "clear_login_logs", "save_settings", "change_task_status", "undo", "redo",
+        "save_query", "delete_query", "save_scheduled_job", "delete_scheduled_job", "toggle_scheduled_job",
+        "save_computed_column", "delete_computed_column", "receive_stock", "adjust_stock", "set_reorder_point"
+    )
+    # Libellés des actions dans l'historique (Annuler / Rétablir)
+    ACTION_LABELS = {
+        "record_login_event": "connexion", "add_product": "ajout du produit", "modify_product": "modification du produit",
+        "delete_product": "suppression du produit", "add_client": "ajout du client",
+        "delete_client": "suppression de client(s)", "add_order": "ajout de la commande",
+        "delete_order": "suppression de commande(s)",
+        "add_supplier": "ajout du fournisseur", "modify_supplier": "modification du fournisseur",
+        "delete_supplier": "suppression du fournisseur", "add_project": "ajout du projet",
+        "modify_project": "modification du projet", "delete_project": "suppression du projet",
+        "add_announcement": "publication de l'annonce", "add_shift": "ajout du quart", "add_expense": "ajout de la dépense",
+        "add_feedback": "envoi du feedback", "add_task": "ajout de la tâche", "run_import": "import",
+        "reset_data": "réinitialisation", "clear_login_logs": "effacement des connexions",
+        "save_settings": "modification des paramètres", "change_task_status": "changement de statut",
+        "save_query": "enregistrement de la requête", "delete_query": "suppression de la requête",
+        "save_scheduled_job": "enregistrement de la tâche planifiée",
+        "delete_scheduled_job": "suppression de la tâche planifiée",
+        "toggle_scheduled_job": "activation de la tâche planifiée",
+        "save_computed_column": "enregistrement de la colonne calculée",
+        "delete_computed_column": "suppression de la colonne calculée",
+        "receive_stock": "réception de stock", "adjust_stock": "ajustement de stock",
+        "set_reorder_point": "seuil de réapprovisionnement",
+    }
+
+    # Collections affichées par chaque écran (réaffichage quand un autre poste les modifie)
+    SCREEN_COLLECTIONS = {
+        "show_dashboard": ("inventory_data", "clients_list", "orders", "expenses", "announcements"),
+        "show_inventory": ("inventory_data", "stock_movements", "settings"),  # settings : colonnes calculées
+        "show_clients_list": ("clients_list", "orders"),
+        "show_employees_list": ("login_events",),
+        "show_employee_summary": ("login_events",),
+        "show_orders": ("orders",),
+        "show_suppliers": ("suppliers",),
+        "show_projects": ("projects",),
+        "show_announcements": ("announcements",),
+        "show_shift_scheduling": ("shifts",),
+        "show_financial_dashboard": ("orders", "expenses"),
+        "show_reports": ("inventory_data", "clients_list", "orders", "login_events"),
+        "show_profile": ("login_events",),
+        "show_feedback": ("feedbacks",),
+        "show_tasks": ("tasks",),
+        "show_settings": ("settings",),
+        "show_export_options": ("settings",),  # tâches planifiées
+        "show_calculator": ("settings",),      # colonnes calculées
+    }
+    SYNC_INTERVAL_MS = 3000  # fréquence de vérification des modifications des autres postes
+    TASK_TIMER_MAX_MS = 3600000  # le timer des rappels se réarme au moins toutes les heures (veille, changement d'heure)
+
+    # Écrans conservés en mémoire entre deux visites (cache LRU) : un écran dont les collections n'ont
+    # pas changé est réaffiché tel quel, sinon mis à jour par sa méthode refresh_* ou reconstruit.
+    MAX_CACHED_SCREENS = 8
+    MAX_SORTED_PATCH = 1000  # au-delà, un lot de lignes ajoutées ou supprimées retrie tout le tableau
+    SCREEN_REFRESHERS = {
+        "show_inventory": "refresh_inventory_list",
+        "show_clients_list": "refresh_clients_list",
+        "show_orders": "refresh_orders",
+        "show_suppliers": "refresh_suppliers",
+        "show_projects": "refresh_projects",
+        "show_announcements": "refresh_announcements",
+        "show_shift_scheduling": "refresh_shifts",
+        "show_tasks": "refresh_tasks",
+        "show_export_options": "refresh_scheduled_jobs",
+    }
+    # Courbes des graphiques : (série de FinanceService.timeseries, libellé, couleur)
+    FINANCE_CURVES = (("revenue", "Chiffre d'affaires", "steelblue"), ("expenses", "Dépenses", "indianred"),
+                      ("net", "Profit net", "seagreen"))
+    ORDER_CURVES = (("orders", "Commandes", "darkorange"),)
+    CHART_PERIODS = {"3 mois": 91, "12 mois": 365, "3 ans": 1096, "Tout": None}  # jours avant la dernière date
+    FORM_SCREENS = ("show_analysis", "show_import")  # sans données
+    TRANSIENT_SCREENS = ("show_performance", "show_search")  # reconstruits à chaque visite
+    # Résultat de la recherche globale -> (écran qui l'affiche, widget où le sélectionner)
+    SEARCH_TARGETS = {
+        "clients_list": ("show_clients_list", "clients_tree"),
+        "orders": ("show_orders", "orders_tree"),
+        "suppliers": ("show_suppliers", "suppliers_tree"),
+        "projects": ("show_projects", "projects_tree"),
+        "announcements": ("show_announcements", "announcements_tree"),
+        "shifts": ("show_shift_scheduling", "shifts_tree"),
+        "tasks": ("show_tasks", "tasks_tree"),
+        "feedbacks": ("show_feedback", "feedback_listbox"),
+        "inventory_data": ("show_inventory", "products_listbox"),
+        "expenses": ("show_financial_dashboard", None),
+    }
+
     def __init__(self):
         super().__init__()
         self.title("Ultimate Company App")
         self.geometry("900x650")
         self.current_user = None
         self.role = None  # "admin" ou "employee"
-        # Données en mémoire
-        self.inventory_data = {}       # {catégorie: [ {"name": nom, "price": prix}, ... ]}
-        self.clients_list = []         # [ {"name": nom, "purchases": montant}, ... ]
-        self.login_events = []         # [ {"user": utilisateur, "time": heure, "spent": dépensé}, ... ]
-        self.orders = []               # Commandes
-        self.suppliers = []            # Fournisseurs
-        self.projects = []             # Projets
-        self.announcements = []        # Annonces
-        self.shifts = []               # Quarts de travail
-        self.expenses = []             # Dépenses
-        # New data lists for extra functions:
-        self.feedbacks = []            # Pour recueillir les feedbacks des utilisateurs
-        self.tasks = []                # Pour les tâches à assigner
-
-        # Paramètres et configuration
-        self.settings = {
-            "company_name": "Ultimate Company App",
-            "theme_color": "lightgray",
-            "enable_notifications": True,
-            "auto_logout_time": 15  # minutes
-        }
+        # Cœur métier sans interface : données, services, export et analyse.
+        # Stockage : company_data.json par défaut, ou base partagée via COMPANY_APP_STORAGE=sqlite:/chemin/base.db
+        self.core = CompanyCore(storage=open_storage())
+        if self.core.storage.shared:
+            self.core.load()
+        self.current_screen = None
+        self.screen_cache = OrderedDict()  # {écran: (frame masquée, versions des collections affichées)}
+        self.tree_feeds = {}  # {Treeview: position du flux des modifications déjà affichée}
+        self.tree_sorters = {}  # {Treeview: TableSorter des tableaux triables}
+        self.sync_job = None
+        self.task_job = None
+        self.backup_job = None
+        self.jobs_job = None  # vérification périodique des tâches planifiées
+        self.search_generation = 0  # construction de l'index de recherche en cours (voir warm_search_index)
+        self.current_query = None  # dernière requête ad hoc, remise dans le formulaire quand Rapports est reconstruit
+        self.api_server = None  # serveur JSON local de la version HTML, démarré à la demande
+        self.api_calls = CallQueue()  # lectures de l'API exécutées sur le thread Tk (voir pump_api_calls)
+        for name in self.MUTATING_ACTIONS:
+            setattr(self, name, self.autosaving(getattr(self, name)))
+        for name in (*self.SCREEN_COLLECTIONS, *self.FORM_SCREENS, *self.TRANSIENT_SCREENS):
+            setattr(self, name, self.caching_screen(name, getattr(self, name)))
+        # Instrumentation opt-in (paramètre "enable_instrumentation" ou variable COMPANY_APP_PERF=1)
+        self.perf = Instrumentation()
+        self.configure_instrumentation()
+        for name in self.INSTRUMENTED_ACTIONS:
+            setattr(self, name, self.perf.wrap(name, getattr(self, name)))
+
         # Timer d'inactivité pour l'auto-déconnexion
         self.inactivity_timer = None
 
@@ -72,6 +207,7 @@ class Application(tk.Tk):
         self.login_frame = None
         self.main_menu_frame = None
         self.nav_frame = None
+        self.screen_container = None
         self.content_frame = None
         self.status_bar = None
 
@@ -82,65 +218,296 @@ class Application(tk.Tk):
     # Méthode pour lancer la version HTML du dashboard
     # ------------------------------------------------------------------------------
     def launch_html_dashboard(self):
-        # Construct the full path to the HTML file:
-        # Change according to your file system. Here it assumes the file "html version.html" is in "~/Desktop/goat/"
-        html_file = os.path.join(os.path.expanduser("~"), "Desktop", "goat", "html version.html")
+        # La page est servie par l'API locale : elle lit les données en direct de l'application
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        html_file = os.path.join(base_dir, "html version.html")
         if not os.path.exists(html_file):
             messagebox.showerror("Erreur", f"Le fichier HTML n'existe pas : {html_file}")
             return
-        # Open the file in the default browser
-        webbrowser.open("file:///" + html_file)
-        logging.info(f"{self.current_user} a lancé la version HTML du dashboard depuis : {html_file}")
+        # Bundle hors ligne (ressources de vendor/) si disponible, sinon la page d'origine avec ses CDN
+        try:
+            bundle = ensure_bundle(html_file, os.path.join(base_dir, DEFAULT_BUNDLE_DIR),
+                                   os.path.join(base_dir, DEFAULT_VENDOR_DIR))
+        except (CompanyError, OSError) as e:
+            logging.warning(f"Bundle HTML hors ligne indisponible : {e}")
+            bundle = None
+        try:
+            if self.api_server is None:
+                self.api_server = ApiServer(self.core, html_file=html_file,
+                                            static_dir=os.path.dirname(bundle) if bundle else None,
+                                            dispatch=self.api_calls).start()
+                self.pump_api_calls()
+        except OSError as e:
+            messagebox.showerror("Erreur", f"Impossible de démarrer le serveur local : {e}")
+            return
+        webbrowser.open(self.api_server.url)
+        logging.info(f"{self.current_user} a lancé la version HTML du dashboard : {self.api_server.url}")
+
+    def pump_api_calls(self):
+        # Les données ne sont lues que par le thread Tk, entre deux actions de l'utilisateur
+        if self.api_server is not None:
+            self.api_calls.pump()
+            self.after(20, self.pump_api_calls)
 
     # ------------------------------------------------------------------------------
     # Méthodes de stockage persistant (sauvegarder / charger les données)
     # ------------------------------------------------------------------------------
     def save_data(self):
-        data = {
-            "inventory_data": self.inventory_data,
-            "clients_list": self.clients_list,
-            "login_events": self.login_events,
-            "orders": self.orders,
-            "suppliers": self.suppliers,
-            "projects": self.projects,
-            "announcements": self.announcements,
-            "shifts": self.shifts,
-            "expenses": self.expenses,
-            "settings": self.settings,
-            "feedbacks": self.feedbacks,
-            "tasks": self.tasks
-        }
         try:
-            with open("company_data.json", "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+            self.core.save()
             messagebox.showinfo("Succès", "Données sauvegardées.")
-            logging.info("Données sauvegardées dans company_data.json.")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde: {e}")
 
     def load_data(self):
         try:
-            with open("company_data.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-            self.inventory_data = data.get("inventory_data", {})
-            self.clients_list = data.get("clients_list", [])
-            self.login_events = data.get("login_events", [])
-            self.orders = data.get("orders", [])
-            self.suppliers = data.get("suppliers", [])
-            self.projects = data.get("projects", [])
-            self.announcements = data.get("announcements", [])
-            self.shifts = data.get("shifts", [])
-            self.expenses = data.get("expenses", [])
-            self.settings = data.get("settings", self.settings)
-            self.feedbacks = data.get("feedbacks", [])
-            self.tasks = data.get("tasks", [])
+            self.start_backup("avant chargement")
+            self.core.load()
+            self.configure_instrumentation()
+            self.warm_search_index()
             messagebox.showinfo("Succès", "Données chargées.")
-            logging.info("Données chargées depuis company_data.json.")
             if self.content_frame:
+                self.reset_screens()
                 self.clear_content_frame()
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du chargement des données: {e}")
 
+    # ------------------------------------------------------------------------------
+    # Stockage partagé : sauvegarde après chaque modification et suivi des autres postes
+    # ------------------------------------------------------------------------------
+    def autosaving(self, func):
+        label = self.ACTION_LABELS.get(func.__name__, func.__name__)
+
+        def wrapper(*args, **kwargs):
+            # Les modifications de l'action forment une seule étape d'annulation
+            with self.core.history.command(label):
+                result = func(*args, **kwargs)
+            self.update_history_buttons()
+            self.notify_stock_alerts()
+            if self.core.storage.shared and self.core.data.dirty:
+                try:
+                    self.core.save()
+                except Exception as e:
+                    logging.error(f"Échec de la sauvegarde automatique : {e}")
+                    messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde: {e}")
+            return result
+        return wrapper
+
+    def undo(self):
+        self.replay_history(self.core.undo, "Rien à annuler.")
+
+    def redo(self):
+        self.replay_history(self.core.redo, "Rien à rétablir.")
+
+    def replay_history(self, step, nothing_message):
+        versions = dict(self.core.data.versions)
+        try:
+            label = step()
+        except CompanyError as e:
+            messagebox.showerror("Erreur", f"Historique indisponible : {e}")
+            return
+        if label is None:
+            messagebox.showinfo("Historique", nothing_message)
+            return
+        logging.info(f"{self.current_user} : {'annulation' if step == self.core.undo else 'rétablissement'} "
+                     f"de « {label} ».")
+        changed = {name for name, version in self.core.data.versions.items() if versions.get(name) != version}
+        if self.current_screen and changed.intersection(self.SCREEN_COLLECTIONS.get(self.current_screen, ())):
+            getattr(self, self.current_screen)()
+        self.notify_stock_alerts()
+        if "settings" in changed:
+            self.title(self.settings.get("company_name", "Ultimate Company App"))
+            self.nav_frame.config(bg=self.settings.get("theme_color", "lightgray"))
+            self.configure_instrumentation()
+        if "tasks" in changed or "settings" in changed:
+            self.schedule_task_notifications()
+        self.update_history_buttons()
+
+    def update_history_buttons(self):
+        history = self.core.history
+        for button, possible in ((getattr(self, "undo_button", None), history.can_undo()),
+                                 (getattr(self, "redo_button", None), history.can_redo())):
+            if button is not None and button.winfo_exists():
+                button.config(state=tk.NORMAL if possible else tk.DISABLED)
+
+    def refresh_tree(self, tree, collection, row_values, related=None):
+        """Met à jour un Treeview ligne par ligne à partir du flux des modifications, ou le reconstruit.
+
+        Les lignes ont pour iid l'identité de l'enregistrement affiché ; le flux indique celles
+        à insérer, supprimer ou modifier depuis le dernier affichage. related associe à une autre
+        collection dont dépendent les lignes une fonction enregistrement -> lignes à réafficher.
+        """
+        history = self.core.history
+        related = related or {}
+        operations = history.changes_since(self.tree_feeds.get(str(tree)))
+        sorter = self.tree_sorters.get(str(tree))
+        if operations is None or any((op.collection == collection or op.collection in related)
+                                     and (op.kind in ("replace", "rescan")
+                                          # tableau trié : un gros lot est plus vite retrié en entier
+                                          or (sorter is not None and sorter.order
+                                              and len(op.records or ()) > self.MAX_SORTED_PATCH))
+                                     for op in operations):
+            self.fill_tree(tree, {str(id(record)): row_values(record)
+                                  for record in getattr(self.core.data, collection)})
+        else:
+            for op in operations:
+                if op.collection in related:
+                    for record in (op.records or [op.record]):
+                        for target in related[op.collection](record):
+                            if tree.exists(str(id(target))):
+                                self.place_tree_row(tree, str(id(target)), row_values(target))
+                    continue
+                if op.collection != collection:
+                    continue
+                if op.kind == "update":
+                    if tree.exists(str(id(op.record))):
+                        self.place_tree_row(tree, str(id(op.record)), row_values(op.record))
+                elif op.kind in ("delete", "truncate"):
+                    iids = [str(id(record)) for record in op.records if tree.exists(str(id(record)))]
+                    tree.delete(*iids)
+                    if sorter is not None:
+                        sorter.delete(iids)
+                else:
+                    index = op.index if op.kind == "insert" else tk.END
+                    for offset, record in enumerate(op.records):
+                        self.place_tree_row(tree, str(id(record)), row_values(record),
+                                            index if index == tk.END else index + offset)
+        self.tree_feeds[str(tree)] = history.seq
+
+    # ------------------------------------------------------------------------------
+    # Tri des tableaux : clic sur un en-tête (Maj+clic pour trier sur plusieurs colonnes)
+    # ------------------------------------------------------------------------------
+    def make_sortable(self, tree):
+        """Rend les en-têtes d'un Treeview cliquables ; à appeler avant de le remplir (fill_tree, refresh_tree)."""
+        self.tree_sorters[str(tree)] = TableSorter()
+        for position, column in enumerate(tree["columns"]):
+            tree.heading(column, command=lambda p=position: self.sort_tree(tree, p))
+        tree.bind("<Shift-Button-1>", lambda event: self.shift_sort_tree(tree, event))
+        tree.bind("<Destroy>", lambda event: self.tree_sorters.pop(str(tree), None), add="+")
+
+    def shift_sort_tree(self, tree, event):
+        if tree.identify_region(event.x, event.y) != "heading":
+            return None
+        self.sort_tree(tree, int(tree.identify_column(event.x)[1:]) - 1, additive=True)
+        return "break"  # pas de tri simple au relâchement du bouton
+
+    def sort_tree(self, tree, column, additive=False):
+        sorter = self.tree_sorters.get(str(tree))
+        if sorter is None:
+            return
+        tree.set_children("", *sorter.click(column, additive))
+        ranks = {col: (rank, descending) for rank, (col, descending) in enumerate(sorter.order, 1)}
+        for position, name in enumerate(tree["columns"]):
+            if position not in ranks:
+                tree.heading(name, text=name)
+                continue
+            rank, descending = ranks[position]
+            arrow = "\u25bc" if descending else "\u25b2"
+            tree.heading(name, text=f"{name} {arrow}{rank if len(ranks) > 1 else ''}")
+
+    def fill_tree(self, tree, rows, tags=None):
+        """Remplace les lignes d'un Treeview ({iid: valeurs}), dans l'ordre de tri choisi s'il est triable."""
+        tree.delete(*tree.get_children())
+        sorter = self.tree_sorters.get(str(tree))
+        order = rows
+        if sorter is not None:
+            sorter.reset(rows)
+            order = sorter.sorted()
+        tags = tags or {}
+        for iid in order:
+            tree.insert("", tk.END, iid=iid, values=rows[iid], tags=tags.get(iid, ()))
+
+    def place_tree_row(self, tree, iid, values, index=tk.END):
+        """Ajoute ou modifie une ligne ; dans un tableau trié, elle est placée à sa position de tri."""
+        sorter = self.tree_sorters.get(str(tree))
+        position = sorter.insert(iid, values) if sorter is not None else None
+        if tree.exists(iid):
+            tree.item(iid, values=values)
+            if position is not None:
+                tree.move(iid, "", position)
+        else:
+            tree.insert("", index if position is None else position, iid=iid, values=values)
+
+    # ------------------------------------------------------------------------------
+    # Cache des écrans : masqués plutôt que détruits, rafraîchis seulement si leurs données ont changé
+    # ------------------------------------------------------------------------------
+    def screen_versions(self, name):
+        versions = self.core.data.versions
+        return tuple(versions.get(collection, 0) for collection in self.SCREEN_COLLECTIONS.get(name, ()))
+
+    def caching_screen(self, name, func):
+        def wrapper(*args, **kwargs):
+            # Rappeler l'écran courant (après une action ou une synchronisation) force sa mise à jour
+            rerender = name == self.current_screen
+            self.hide_current_screen()
+            self.current_screen = name
+            entry = self.screen_cache.pop(name, None)
+            if entry is not None:
+                frame, versions = entry
+                if not rerender and versions == self.screen_versions(name):
+                    self.display_screen(frame)
+                    return None
+                refresher = self.SCREEN_REFRESHERS.get(name)
+                if refresher:
+                    self.display_screen(frame)
+                    return getattr(self, refresher)()
+                frame.destroy()
+            self.display_screen(tk.Frame(self.screen_container))
+            return func(*args, **kwargs)
+        return wrapper
+
+    def display_screen(self, frame):
+        self.content_frame = frame
+        frame.pack(fill="both", expand=True)
+
+    def hide_current_screen(self):
+        """Masque l'écran affiché et le met en cache avec les versions des données qu'il montre.
+
+        Chaque écran se met à jour après ses propres actions : au moment où il est masqué,
+        il reflète donc les données courantes.
+        """
+        frame, name = self.content_frame, self.current_screen
+        if frame is None or not frame.winfo_exists():
+            return
+        if name is None or name in self.TRANSIENT_SCREENS:
+            frame.destroy()
+            return
+        frame.pack_forget()
+        self.screen_cache[name] = (frame, self.screen_versions(name))
+        while len(self.screen_cache) > self.MAX_CACHED_SCREENS:
+            _, (evicted, _) = self.screen_cache.popitem(last=False)
+            evicted.destroy()
+
+    def reset_screens(self):
+        """Oublie les écrans en cache (rechargement des données, déconnexion)."""
+        for frame, _ in self.screen_cache.values():
+            frame.destroy()
+        self.screen_cache.clear()
+        self.tree_feeds.clear()
+        self.tree_sorters.clear()
+        self.current_screen = None
+
+    def schedule_sync(self):
+        if self.core.storage.shared and self.sync_job is None:
+            self.sync_job = self.after(self.SYNC_INTERVAL_MS, self.sync_from_storage)
+
+    def sync_from_storage(self):
+        self.sync_job = None
+        if not self.content_frame:
+            return
+        try:
+            changed = self.core.refresh()
+        except Exception as e:
+            logging.error(f"Échec de la synchronisation avec {self.core.storage.description} : {e}")
+            changed = set()
+        if changed.intersection(self.SCREEN_COLLECTIONS.get(self.current_screen, ())):
+            getattr(self, self.current_screen)()
+        if "tasks" in changed or "settings" in changed:
+            self.schedule_task_notifications()
+        if "inventory_data" in changed or "stock_movements" in changed:
+            self.notify_stock_alerts()
+        self.schedule_sync()
+
     # ------------------------------------------------------------------------------
     # Auto‑déconnexion (inactivité)
     # ------------------------------------------------------------------------------
@@ -230,12 +597,7 @@ class Application(tk.Tk):
             logging.warning(f"Tentative de connexion admin avec un nom inconnu : {username}")
 
     def record_login_event(self):
-        event = {
-            "user": self.current_user,
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "spent": 0
-        }
-        self.login_events.append(event)
+        event = self.core.logins.record_login(self.current_user)
         logging.info(f"Enregistrement de connexion : {event}")
 
     # ------------------------------------------------------------------------------
@@ -243,6 +605,9 @@ class Application(tk.Tk):
     # ------------------------------------------------------------------------------
     def on_closing(self):
         if messagebox.askokcancel("Quitter", "Voulez-vous vraiment quitter ?"):
+            if self.api_server:
+                self.api_server.stop()
+            self.core.jobs.shutdown(wait=False)  # une tâche en cours finit d'écrire son fichier
             self.destroy()
 
     # ------------------------------------------------------------------------------
@@ -250,14 +615,21 @@ class Application(tk.Tk):
     # ------------------------------------------------------------------------------
     def create_main_menu_frame(self):
         self.prepare_data()  # Initialise l’inventaire si nécessaire
+        self.core.history.clear()  # chaque session n'annule que ses propres actions
         self.main_menu_frame = tk.Frame(self)
         self.main_menu_frame.pack(fill="both", expand=True)
         # Navigation à gauche
         self.nav_frame = tk.Frame(self.main_menu_frame, width=200, bg=self.settings["theme_color"])
         self.nav_frame.pack(side="left", fill="y")
-        # Zone de contenu à droite
-        self.content_frame = tk.Frame(self.main_menu_frame)
-        self.content_frame.pack(side="right", fill="both", expand=True)
+        # Recherche globale : Entrée ouvre les résultats
+        self.global_search_entry = tk.Entry(self.nav_frame, width=22)
+        self.global_search_entry.pack(pady=(10, 5), padx=5)
+        self.global_search_entry.bind("<Return>", lambda event: self.show_search(self.global_search_entry.get()))
+        # Zone de contenu à droite : chaque écran y place sa propre frame (voir caching_screen)
+        self.screen_container = tk.Frame(self.main_menu_frame)
+        self.screen_container.pack(side="right", fill="both", expand=True)
+        self.content_frame = None
+        self.reset_screens()
         
         # Définition des boutons de navigation
         nav_buttons = [
@@ -279,16 +651,28 @@ class Application(tk.Tk):
         # Pour les administrateurs
         elif self.role == "admin":
             nav_buttons.append(("Paramètres", self.show_settings))
+            nav_buttons.append(("Performance", self.show_performance))
         
         # Nouveaux boutons complémentaires
         nav_buttons.append(("Feedback", self.show_feedback))
         nav_buttons.append(("Mes Tâches", self.show_tasks))
         nav_buttons.append(("Analyse Excel", self.show_analysis))  # Remplace le module Calendrier
+        nav_buttons.append(("Importer", self.show_import))
         nav_buttons.append(("Exporter", self.show_export_options))
         nav_buttons.append(("Calculatrice", self.show_calculator))  # <-- New Calculatrice button
         
         for (text, cmd) in nav_buttons:
             tk.Button(self.nav_frame, text=text, command=cmd, width=20).pack(pady=5, padx=5)
+
+        # Annuler / Rétablir (Ctrl+Z / Ctrl+Y) : historique de la session en cours
+        history_frame = tk.Frame(self.nav_frame, bg=self.settings["theme_color"])
+        history_frame.pack(pady=5)
+        self.undo_button = tk.Button(history_frame, text="↶ Annuler", command=self.undo, width=9)
+        self.undo_button.pack(side="left", padx=2)
+        self.redo_button = tk.Button(history_frame, text="Rétablir ↷", command=self.redo, width=9)
+        self.redo_button.pack(side="left", padx=2)
+        self.bind_all("<Control-z>", lambda event: self.undo())
+        self.bind_all("<Control-y>", lambda event: self.redo())
             
         # Bouton de déconnexion
         tk.Button(self.nav_frame, text="Déconnexion", command=self.logout, width=20, bg="salmon")\
@@ -298,28 +682,26 @@ class Application(tk.Tk):
         self.status_bar.pack(side="bottom", fill="x")
         self.update_status_bar()
         self.setup_inactivity_timer()
+        self.schedule_sync()
         self.show_dashboard()
+        self.core.tasks.reset_notifications()
+        self.schedule_task_notifications()
+        self.notify_stock_alerts()  # construit le StockLedger : seules les sorties suivantes alertent
+        self.schedule_backup()
+        self.schedule_jobs()
+        if self.settings.get("archive_at_login", False):
+            self.archive_cold_data()
+        self.update_history_buttons()
+        self.warm_search_index()
 
     def update_status_bar(self):
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = now_str()
         status_text = f"Connecté en tant que : {self.current_user}  |  Heure actuelle : {now}"
         self.status_bar.config(text=status_text)
         self.status_bar.after(1000, self.update_status_bar)
 
     def prepare_data(self):
-        if not self.inventory_data:
-            categories = [
-                "E36 : Matériaux Technologiques", "O15 : Fournitures de Bureau", "F58 : Mobilier et Installations",
-                "I29 : Équipements Industriels", "C12 : Électronique Grand Public", "A04 : Vêtements et Accessoires",
-                "B07 : Livres et Magazines", "H11 : Outils et Quincaillerie", "T22 : Jouets et Jeux",
-                "G31 : Épicerie et Alimentation", "P44 : Produits Pharmaceutiques", "M66 : Instruments de Musique",
-                "L55 : Éclairage et Équipements Électriques", "F20 : Alimentation et Boissons", "S33 : Matériel Sportif",
-                "A77 : Pièces Automobiles", "W88 : Technologies Portables", "D99 : Accessoires Numériques",
-                "R50 : Produits Écologiques", "L88 : Biens de Luxe", "M21 : Fournitures Médicales",
-                "CH01 : Produits pour Enfants", "PH02 : Fournitures pour Animaux", "AR03 : Matériel d'Art et Artisanat",
-                "TR04 : Accessoires de Voyage"
-            ]
-            self.inventory_data = {cat: [] for cat in categories}
+        self.core.data.prepare()
 
     def clear_content_frame(self):
         for widget in self.content_frame.winfo_children():
@@ -331,6 +713,22 @@ class Application(tk.Tk):
     def show_analysis(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Analyse de Fichier Excel", font=("Arial", 16)).pack(pady=10)
+        mode_frame = tk.Frame(self.content_frame)
+        mode_frame.pack(pady=5)
+        tk.Button(mode_frame, text="Analyser un classeur", command=self.analyse_workbook)\
+          .pack(side="left", padx=5)
+        tk.Button(mode_frame, text="Comparer deux classeurs", command=self.show_workbook_compare)\
+          .pack(side="left", padx=5)
+        self.analysis_frame = tk.Frame(self.content_frame)
+        self.analysis_frame.pack(expand=True, fill="both")
+        self.compare_paths = {"old": None, "new": None}
+        self.last_compare_report = None
+
+    def clear_analysis_frame(self):
+        for widget in self.analysis_frame.winfo_children():
+            widget.destroy()
+
+    def analyse_workbook(self):
         file_path = filedialog.askopenfilename(
             title="Importer un fichier Excel",
             filetypes=[("Excel Files", "*.xlsx *.xls")]
@@ -339,29 +737,115 @@ class Application(tk.Tk):
             return
         
         try:
-            excel_data = pd.read_excel(file_path, sheet_name=None)
-            analysis_text = f"Analyse du fichier : {file_path}\n\n"
-            for sheet_name, df in excel_data.items():
-                analysis_text += f"Feuille: {sheet_name}\n"
-                analysis_text += f"  Nombre de lignes: {len(df)}\n"
-                analysis_text += f"  Nombre de colonnes: {len(df.columns)}\n"
-                analysis_text += f"  Colonnes: {', '.join(df.columns.astype(str))}\n"
-                for col in df.columns:
-                    dtype = df[col].dtype
-                    non_null = df[col].count()
-                    sample_values = df[col].dropna().unique()[:5].tolist()
-                    analysis_text += f"    '{col}': type {dtype}, non-null: {non_null}, exemples: {sample_values}\n"
-                analysis_text += "\n"
+            sheets = self.core.analysis.analyse_excel(file_path)
+            analysis_text = self.core.analysis.format_report(file_path, sheets)
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de l'analyse : {e}")
             logging.error(f"Erreur lors de l'analyse du fichier Excel '{file_path}': {e}")
             return
 
-        text_widget = tk.Text(self.content_frame, wrap="word", font=("Arial", 12))
+        self.clear_analysis_frame()
+        text_widget = tk.Text(self.analysis_frame, wrap="word", font=("Arial", 12))
         text_widget.insert("1.0", analysis_text)
         text_widget.config(state="disabled")
         text_widget.pack(expand=True, fill="both", padx=10, pady=10)
 
+    # Comparaison de deux versions d'un classeur (tarifs fournisseurs...) : lecture en flux en arrière-plan
+    def show_workbook_compare(self):
+        self.clear_analysis_frame()
+        self.compare_paths = {"old": None, "new": None}
+        self.last_compare_report = None
+        form_frame = tk.Frame(self.analysis_frame)
+        form_frame.pack(pady=5)
+        self.compare_labels = {}
+        for row, (which, label) in enumerate((("old", "Ancienne version :"), ("new", "Nouvelle version :"))):
+            tk.Label(form_frame, text=label).grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            tk.Button(form_frame, text="Choisir un fichier (CSV / Excel)",
+                      command=lambda w=which: self.choose_compare_file(w)).grid(row=row, column=1, padx=5, pady=2)
+            self.compare_labels[which] = tk.Label(form_frame, text="Aucun fichier sélectionné.")
+            self.compare_labels[which].grid(row=row, column=2, sticky="w", padx=5, pady=2)
+        tk.Label(form_frame, text="Colonne clé :").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        self.compare_key_var = tk.StringVar()
+        self.compare_key_box = ttk.Combobox(form_frame, textvariable=self.compare_key_var, values=[], state="readonly")
+        self.compare_key_box.grid(row=2, column=1, padx=5, pady=2)
+        btn_frame = tk.Frame(self.analysis_frame)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Comparer", command=self.run_workbook_compare).pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Exporter les différences", command=self.export_compare_diffs)\
+          .pack(side="left", padx=5)
+        self.compare_status = tk.Label(self.analysis_frame, text="", font=("Arial", 12))
+        self.compare_status.pack(pady=5)
+        self.compare_text = tk.Text(self.analysis_frame, wrap="word", font=("Arial", 11), height=10)
+        self.compare_text.pack(fill="x", padx=10, pady=5)
+        self.compare_text.config(state="disabled")
+        self.compare_tree = ttk.Treeview(self.analysis_frame, columns=DIFF_COLUMNS, show="headings")
+        for col in DIFF_COLUMNS:
+            self.compare_tree.heading(col, text=col)
+        self.compare_tree.pack(pady=5, fill="both", expand=True)
+
+    def choose_compare_file(self, which):
+        file_path = filedialog.askopenfilename(
+            title="Choisir une version du classeur",
+            filetypes=[("CSV / Excel", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel Files", "*.xlsx")]
+        )
+        if not file_path:
+            return
+        self.compare_paths[which] = file_path
+        self.compare_labels[which].config(text=os.path.basename(file_path))
+        if not all(self.compare_paths.values()):
+            return
+        # Colonnes communes aux premières feuilles, pour choisir la clé de rapprochement
+        try:
+            headers = [read_header(self.compare_paths[name]) for name in ("old", "new")]
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
+            return
+        columns = [col for col in headers[0] if col and col in headers[1]]
+        self.compare_key_box.config(values=columns)
+        if self.compare_key_var.get() not in columns:
+            self.compare_key_var.set(guess_key(columns) or "")
+
+    def run_workbook_compare(self):
+        if not all(self.compare_paths.values()):
+            messagebox.showerror("Erreur", "Choisissez les deux versions du classeur à comparer.")
+            return
+        old_path, new_path = self.compare_paths["old"], self.compare_paths["new"]
+        key = self.compare_key_var.get() or None
+        self.compare_status.config(text="Comparaison en cours...")
+
+        def done(report, error):
+            if not self.compare_status.winfo_exists():
+                return
+            if error is not None:
+                self.compare_status.config(text="")
+                messagebox.showerror("Erreur", f"Erreur lors de la comparaison : {error}")
+                logging.error(f"Erreur lors de la comparaison de '{old_path}' et '{new_path}': {error}")
+                return
+            self.last_compare_report = report
+            shown = len(report.samples)
+            total = sum(diff.added + diff.removed + diff.changed for diff in report.sheets)
+            self.compare_status.config(text=f"{total} ligne(s) différente(s) en {report.elapsed:.1f} s"
+                                            f"{f' ({shown} différences affichées)' if total else ''}.")
+            self.compare_text.config(state="normal")
+            self.compare_text.delete("1.0", tk.END)
+            self.compare_text.insert("1.0", self.core.analysis.format_comparison(report))
+            self.compare_text.config(state="disabled")
+            self.compare_tree.delete(*self.compare_tree.get_children())
+            for line in report.samples:
+                self.compare_tree.insert("", tk.END, values=line)
+            logging.info(f"{self.current_user} a comparé '{old_path}' et '{new_path}'.")
+        self.run_in_background(lambda: self.core.analysis.compare_workbooks(old_path, new_path, key), done)
+
+    def export_compare_diffs(self):
+        if not self.last_compare_report or not self.last_compare_report.samples:
+            messagebox.showinfo("Information", "Aucune différence à exporter.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
+        if not file_path:
+            return
+        self.last_compare_report.write_samples(file_path)
+        messagebox.showinfo("Succès", f"Différences exportées vers {file_path}")
+
     # ------------------------------------------------------------------------------
     # NEW: Module Calculatrice
     # ------------------------------------------------------------------------------
@@ -382,15 +866,15 @@ class Application(tk.Tk):
                 display.delete(0, tk.END)
             elif value == "=":
                 try:
-                    # Evaluate the expression in the display; only arithmetic operators are allowed.
-                    expression = display.get()
-                    result = eval(expression)
+                    # Formule compilée et vérifiée (voir company_core/formula.py), jamais eval du texte saisi
+                    result = self.core.formulas.evaluate(display.get())
                     display.delete(0, tk.END)
-                    display.insert(tk.END, str(result))
-                except Exception as e:
+                    display.insert(tk.END, format_result(result))
+                except CompanyError as e:
                     messagebox.showerror("Erreur", f"Expression invalide: {e}")
             else:
                 display.insert(tk.END, value)
+        display.bind("<Return>", lambda e: on_button_click("="))
         
         # List of buttons with their positions (row, column)
         buttons = [
@@ -410,6 +894,186 @@ class Application(tk.Tk):
                             font=("Arial", 14),
                             command=lambda val=text: on_button_click(val))
             btn.grid(row=row, column=col, padx=3, pady=3)
+        tk.Label(self.content_frame, text="Formules : SUM(orders.total), AVG(expenses.amount), COUNT(orders), "
+                                          "ROUND(x, 2), MIN, MAX, IF(condition, si vrai, si faux)",
+                 fg="gray").pack(pady=2)
+        self.show_computed_columns()
+
+    def show_computed_columns(self):
+        """Colonnes calculées : une formule évaluée sur chaque ligne d'une collection (Marge = price - cost)."""
+        frame = tk.LabelFrame(self.content_frame, text="Colonnes calculées")
+        frame.pack(pady=10, padx=10, fill="x")
+        self.computed_list = tk.Listbox(frame, width=80, height=6)
+        self.computed_list.grid(row=0, column=0, columnspan=4, padx=5, pady=5)
+        self.computed_rows = []
+        for collection, columns in self.core.formulas.definitions().items():
+            for name, text in columns.items():
+                self.computed_rows.append((collection, name, text))
+                self.computed_list.insert(tk.END, f"{QUERY_SOURCES.get(collection, collection)} · {name} = {text}")
+        self.computed_list.bind("<<ListboxSelect>>", lambda e: self.select_computed_column())
+        self.computed_source_var = tk.StringVar(value=QUERY_SOURCES["inventory_data"])
+        tk.Label(frame, text="Collection :").grid(row=1, column=0, sticky="e")
+        ttk.Combobox(frame, textvariable=self.computed_source_var, values=list(QUERY_SOURCES.values()),
+                     state="readonly", width=15).grid(row=1, column=1, sticky="w", padx=5)
+        tk.Label(frame, text="Nom :").grid(row=1, column=2, sticky="e")
+        self.computed_name_entry = tk.Entry(frame, width=20)
+        self.computed_name_entry.grid(row=1, column=3, sticky="w", padx=5)
+        tk.Label(frame, text="Formule :").grid(row=2, column=0, sticky="e")
+        self.computed_formula_entry = tk.Entry(frame, width=60)
+        self.computed_formula_entry.grid(row=2, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+        tk.Label(frame, text="Exemples : " + " · ".join(FORMULA_EXAMPLES[2:]), fg="gray")\
+          .grid(row=3, column=0, columnspan=4)
+        btn_frame = tk.Frame(frame)
+        btn_frame.grid(row=4, column=0, columnspan=4, pady=5)
+        tk.Button(btn_frame, text="Enregistrer la colonne", command=self.save_computed_column)\
+          .pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Supprimer la colonne", command=self.delete_computed_column)\
+          .pack(side="left", padx=5)
+
+    def select_computed_column(self):
+        selection = self.computed_list.curselection()
+        if not selection:
+            return
+        collection, name, text = self.computed_rows[selection[0]]
+        self.computed_source_var.set(QUERY_SOURCES.get(collection, collection))
+        self.computed_name_entry.delete(0, tk.END)
+        self.computed_name_entry.insert(0, name)
+        self.computed_formula_entry.delete(0, tk.END)
+        self.computed_formula_entry.insert(0, text)
+
+    def computed_source(self):
+        label = self.computed_source_var.get()
+        return next(name for name, text in QUERY_SOURCES.items() if text == label)
+
+    def save_computed_column(self):
+        collection, name = self.computed_source(), self.computed_name_entry.get().strip()
+        try:
+            self.core.formulas.save_column(collection, name, self.computed_formula_entry.get())
+            column = next(c for c in self.core.formulas.columns(collection) if c.name == name)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        logging.info(f"{self.current_user} a enregistré la colonne calculée « {name} » ({collection}).")
+        messagebox.showinfo("Succès", f"Colonne « {name} » enregistrée : {len(column.values)} ligne(s) "
+                                      f"calculée(s) en {column.elapsed * 1000:.0f} ms.")
+        self.show_calculator()
+
+    def delete_computed_column(self):
+        collection, name = self.computed_source(), self.computed_name_entry.get().strip()
+        if not name or not messagebox.askyesno("Confirmer", f"Supprimer la colonne calculée « {name} » ?"):
+            return
+        try:
+            self.core.formulas.delete_column(collection, name)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        logging.info(f"{self.current_user} a supprimé la colonne calculée « {name} » ({collection}).")
+        self.show_calculator()
+
+    # ------------------------------------------------------------------------------
+    # Module Import en masse (CSV / Excel) : clients, commandes, inventaire
+    # ------------------------------------------------------------------------------
+    def show_import(self):
+        self.clear_content_frame()
+        tk.Label(self.content_frame, text="Import en Masse", font=("Arial", 16)).pack(pady=10)
+        form_frame = tk.Frame(self.content_frame)
+        form_frame.pack(pady=5)
+        tk.Label(form_frame, text="Données à importer :")\
+          .grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.import_target_var = tk.StringVar(value=list(IMPORT_SCHEMAS)[0])
+        target_box = ttk.Combobox(form_frame, textvariable=self.import_target_var,
+                                  values=list(IMPORT_SCHEMAS), state="readonly")
+        target_box.grid(row=0, column=1, padx=5, pady=5)
+        target_box.bind("<<ComboboxSelected>>", lambda e: self.build_import_mapping())
+        tk.Button(form_frame, text="Choisir un fichier (CSV / Excel)", command=self.choose_import_file)\
+          .grid(row=1, column=0, columnspan=2, pady=5)
+        self.import_path = None
+        self.import_header = []
+        self.import_file_label = tk.Label(self.content_frame, text="Aucun fichier sélectionné.")
+        self.import_file_label.pack(pady=5)
+        self.import_mapping_frame = tk.LabelFrame(self.content_frame, text="Correspondance des colonnes",
+                                                  padx=10, pady=10)
+        self.import_mapping_frame.pack(pady=5)
+        self.import_mapping_vars = {}
+        btn_frame = tk.Frame(self.content_frame)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Importer", command=self.run_import)\
+          .pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Exporter les rejets", command=self.export_import_rejects)\
+          .pack(side="left", padx=5)
+        self.import_result_label = tk.Label(self.content_frame, text="", font=("Arial", 12))
+        self.import_result_label.pack(pady=5)
+        columns = ("Ligne", "Raison", "Valeurs")
+        self.import_rejects_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
+        for col in columns:
+            self.import_rejects_tree.heading(col, text=col)
+        self.import_rejects_tree.pack(pady=5, fill="both", expand=True)
+        self.last_import_report = None
+
+    def choose_import_file(self):
+        file_path = filedialog.askopenfilename(
+            title="Importer un fichier",
+            filetypes=[("CSV / Excel", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel Files", "*.xlsx")]
+        )
+        if not file_path:
+            return
+        try:
+            self.import_header = read_header(file_path)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
+            return
+        self.import_path = file_path
+        self.import_file_label.config(text=f"Fichier : {file_path}")
+        self.build_import_mapping()
+
+    def build_import_mapping(self):
+        for widget in self.import_mapping_frame.winfo_children():
+            widget.destroy()
+        self.import_mapping_vars = {}
+        target = self.import_target_var.get()
+        guessed = guess_mapping(target, self.import_header)
+        choices = [""] + self.import_header
+        for row, (field, (_, required, _)) in enumerate(IMPORT_SCHEMAS[target].items()):
+            label = f"{field}{' *' if required else ''} :"
+            tk.Label(self.import_mapping_frame, text=label).grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            var = tk.StringVar(value=guessed.get(field, ""))
+            ttk.Combobox(self.import_mapping_frame, textvariable=var, values=choices, state="readonly")\
+              .grid(row=row, column=1, padx=5, pady=2)
+            self.import_mapping_vars[field] = var
+
+    def run_import(self):
+        if not self.import_path:
+            messagebox.showerror("Erreur", "Sélectionnez d'abord un fichier à importer.")
+            return
+        target = self.import_target_var.get()
+        mapping = {field: var.get() for field, var in self.import_mapping_vars.items() if var.get()}
+        self.prepare_data()
+        try:
+            report = self.core.imports.import_file(target, self.import_path, mapping)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de l'import : {e}")
+            logging.error(f"Erreur lors de l'import de '{self.import_path}': {e}")
+            return
+        self.last_import_report = report
+        self.import_result_label.config(text=report.summary())
+        for row in self.import_rejects_tree.get_children():
+            self.import_rejects_tree.delete(row)
+        for line_no, reason, values in report.rejects:
+            self.import_rejects_tree.insert("", tk.END, values=(line_no, reason, " | ".join(map(str, values))))
+        logging.info(f"{self.current_user} a importé {self.import_path} : {report.summary()}")
+
+    def export_import_rejects(self):
+        if not self.last_import_report or not self.last_import_report.rejects:
+            messagebox.showinfo("Information", "Aucune ligne rejetée à exporter.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
+        if not file_path:
+            return
+        self.last_import_report.write_rejects(file_path)
+        messagebox.showinfo("Succès", f"Lignes rejetées exportées vers {file_path}")
 
     # ------------------------------------------------------------------------------
     # Module Export Options (reste inchangé)
@@ -421,8 +1085,7 @@ class Application(tk.Tk):
         export_frame.pack(pady=10)
         tk.Label(export_frame, text="Sélectionnez les données à exporter :")\
           .grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        data_options = ["Inventaire", "Clients", "Commandes", "Fournisseurs", "Projets", 
-                        "Annonces", "Quarts de travail", "Dépenses", "Feedback", "Tâches"]
+        data_options = list(EXPORT_SOURCES)
         self.export_data_var = tk.StringVar(value=data_options[0])
         ttk.Combobox(export_frame, textvariable=self.export_data_var, values=data_options, state="readonly")\
           .grid(row=0, column=1, padx=5, pady=5)
@@ -434,126 +1097,220 @@ class Application(tk.Tk):
           .grid(row=1, column=1, padx=5, pady=5)
         tk.Button(self.content_frame, text="Exporter", command=self.export_data)\
           .pack(pady=10)
+        self.create_scheduled_jobs_frame(self.content_frame)
 
     def export_data(self):
         selected_data = self.export_data_var.get()
         selected_format = self.export_format_var.get()
-        export_extensions = {"JSON": ".json", "CSV": ".csv", "Excel": ".xlsx", "PDF": ".pdf"}
-        file_ext = export_extensions.get(selected_format, ".txt")
+        file_ext = EXPORT_EXTENSIONS.get(selected_format, ".txt")
         file_path = filedialog.asksaveasfilename(defaultextension=file_ext,
                                                  filetypes=[(f"{selected_format} Files", f"*{file_ext}")])
         if not file_path:
             return
-        data_to_export = None
-        if selected_data == "Inventaire":
-            data_to_export = self.inventory_data
-        elif selected_data == "Clients":
-            data_to_export = self.clients_list
-        elif selected_data == "Commandes":
-            data_to_export = self.orders
-        elif selected_data == "Fournisseurs":
-            data_to_export = self.suppliers
-        elif selected_data == "Projets":
-            data_to_export = self.projects
-        elif selected_data == "Annonces":
-            data_to_export = self.announcements
-        elif selected_data == "Quarts de travail":
-            data_to_export = self.shifts
-        elif selected_data == "Dépenses":
-            data_to_export = self.expenses
-        elif selected_data == "Feedback":
-            data_to_export = self.feedbacks
-        elif selected_data == "Tâches":
-            data_to_export = self.tasks
-        else:
-            data_to_export = {}
-
         try:
-            if selected_format == "JSON":
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(data_to_export, f, indent=4)
-            elif selected_format == "CSV":
-                import csv
-                if isinstance(data_to_export, dict):
-                    if selected_data == "Inventaire":
-                        rows = []
-                        for cat, products in data_to_export.items():
-                            for prod in products:
-                                row = {"Catégorie": cat, "Nom": prod.get("name", ""), "Prix": prod.get("price", "")}
-                                rows.append(row)
-                        if rows:
-                            with open(file_path, "w", newline='', encoding="utf-8") as f:
-                                writer = csv.DictWriter(f, fieldnames=["Catégorie", "Nom", "Prix"])
-                                writer.writeheader()
-                                writer.writerows(rows)
-                    else:
-                        with open(file_path, "w", newline='', encoding="utf-8") as f:
-                            writer = csv.writer(f)
-                            for key, value in data_to_export.items():
-                                writer.writerow([key, value])
-                elif isinstance(data_to_export, list):
-                    if data_to_export and isinstance(data_to_export[0], dict):
-                        keys = list(data_to_export[0].keys())
-                        with open(file_path, "w", newline='', encoding="utf-8") as f:
-                            writer = csv.DictWriter(f, fieldnames=keys)
-                            writer.writeheader()
-                            writer.writerows(data_to_export)
-                    else:
-                        with open(file_path, "w", newline='', encoding="utf-8") as f:
-                            writer = csv.writer(f)
-                            for item in data_to_export:
-                                writer.writerow([item])
-                else:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(str(data_to_export))
-            elif selected_format == "Excel":
-                try:
-                    from openpyxl import Workbook
-                except ImportError:
-                    messagebox.showerror("Erreur", "Le module openpyxl est requis pour l'export Excel.")
-                    return
-                wb = Workbook()
-                ws = wb.active
-                if isinstance(data_to_export, list) and data_to_export and isinstance(data_to_export[0], dict):
-                    headers = list(data_to_export[0].keys())
-                    ws.append(headers)
-                    for row in data_to_export:
-                        ws.append([row.get(header, "") for header in headers])
-                elif isinstance(data_to_export, dict):
-                    if selected_data == "Inventaire":
-                        ws.append(["Catégorie", "Nom", "Prix"])
-                        for cat, products in data_to_export.items():
-                            for prod in products:
-                                ws.append([cat, prod.get("name", ""), prod.get("price", "")])
-                    else:
-                        ws.append(["Clé", "Valeur"])
-                        for key, value in data_to_export.items():
-                            ws.append([key, str(value)])
-                else:
-                    ws.append(["Données"])
-                    ws.append([str(data_to_export)])
-                wb.save(file_path)
-            elif selected_format == "PDF":
-                try:
-                    from fpdf import FPDF
-                except ImportError:
-                    messagebox.showerror("Erreur", "Le module fpdf est requis pour l'export PDF.")
-                    return
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", size=12)
-                if isinstance(data_to_export, dict) or isinstance(data_to_export, list):
-                    text = json.dumps(data_to_export, indent=4, ensure_ascii=False)
-                else:
-                    text = str(data_to_export)
-                for line in text.splitlines():
-                    pdf.cell(0, 10, txt=line, ln=1)
-                pdf.output(file_path)
+            self.core.exports.export(selected_data, selected_format, file_path)
             messagebox.showinfo("Succès", f"Données exportées avec succès vers {file_path}")
             logging.info(f"{self.current_user} a exporté {selected_data} en {selected_format} vers {file_path}.")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de l'export: {e}")
 
+    # ------------------------------------------------------------------------------
+    # Exports planifiés : tâches récurrentes exécutées en arrière-plan (company_core.jobs)
+    # ------------------------------------------------------------------------------
+    JOB_CHECK_MS = 60000  # fréquence de vérification des échéances
+    WEEKDAYS = ("lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche")
+
+    def create_scheduled_jobs_frame(self, parent):
+        frame = tk.LabelFrame(parent, text="Exports planifiés", padx=10, pady=10)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        form = tk.Frame(frame)
+        form.pack(fill="x")
+        self.job_vars = {key: tk.StringVar() for key in ("name", "kind", "content", "format", "every", "at", "day",
+                                                        "directory")}
+        self.job_vars["kind"].set(JOB_KINDS["export"])
+        self.job_vars["format"].set("CSV")
+        self.job_vars["every"].set(JOB_FREQUENCIES["daily"])
+        self.job_vars["at"].set("02:00")
+        self.job_vars["directory"].set("exports")
+        fields = (("Nom :", "name", None), ("Type :", "kind", list(JOB_KINDS.values())), ("Contenu :", "content", ()),
+                  ("Format :", "format", list(EXPORT_EXTENSIONS)), ("Fréquence :", "every", list(JOB_FREQUENCIES.values())),
+                  ("Heure (HH:MM) :", "at", None), ("Jour :", "day", ()), ("Dossier :", "directory", None))
+        self.job_boxes = {}
+        for position, (label, key, values) in enumerate(fields):
+            row, column = divmod(position, 2)
+            tk.Label(form, text=label).grid(row=row, column=column * 2, sticky="w", padx=5, pady=2)
+            if values is None:
+                widget = tk.Entry(form, textvariable=self.job_vars[key], width=22)
+            else:
+                widget = self.job_boxes[key] = ttk.Combobox(form, textvariable=self.job_vars[key], values=values,
+                                                            state="readonly", width=20)
+            widget.grid(row=row, column=column * 2 + 1, padx=5, pady=2)
+        self.job_boxes["kind"].bind("<<ComboboxSelected>>", lambda event: self.update_job_choices())
+        self.job_boxes["every"].bind("<<ComboboxSelected>>", lambda event: self.update_job_choices())
+        buttons = tk.Frame(frame)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Enregistrer la tâche", command=self.save_scheduled_job).pack(side="left", padx=5)
+        tk.Button(buttons, text="Exécuter maintenant", command=self.run_scheduled_job_now).pack(side="left", padx=5)
+        tk.Button(buttons, text="Activer / désactiver", command=self.toggle_scheduled_job).pack(side="left", padx=5)
+        tk.Button(buttons, text="Supprimer", command=self.delete_scheduled_job).pack(side="left", padx=5)
+        columns = ("Tâche", "Contenu", "Fréquence", "Prochaine", "Dernière", "État", "Durée", "Taille", "Fichier")
+        self.jobs_tree = ttk.Treeview(frame, columns=columns, show="headings", height=6)
+        for col, width in zip(columns, (130, 120, 130, 120, 120, 70, 70, 80, 220)):
+            self.jobs_tree.heading(col, text=col)
+            self.jobs_tree.column(col, width=width)
+        self.jobs_tree.pack(fill="both", expand=True)
+        self.jobs_tree.bind("<<TreeviewSelect>>", lambda event: self.fill_job_form())
+        self.update_job_choices()
+        self.refresh_scheduled_jobs()
+
+    def update_job_choices(self):
+        """Contenus et jours proposés selon le type et la fréquence choisis."""
+        kind = self.job_key(JOB_KINDS, self.job_vars["kind"].get())
+        contents = {"export": list(EXPORT_SOURCES), "finance": list(GRANULARITIES.values()),
+                    "query": list(self.core.queries.saved())}[kind]
+        self.job_boxes["content"].config(values=contents)
+        if self.job_vars["content"].get() not in contents:
+            self.job_vars["content"].set(GRANULARITIES["month"] if kind == "finance" else contents[0] if contents else "")
+        every = self.job_key(JOB_FREQUENCIES, self.job_vars["every"].get())
+        days = {"daily": (), "weekly": self.WEEKDAYS, "monthly": [str(day) for day in range(1, 29)]}[every]
+        self.job_boxes["day"].config(values=days, state="readonly" if days else "disabled")
+        if self.job_vars["day"].get() not in days:
+            self.job_vars["day"].set(days[0] if days else "")
+
+    @staticmethod
+    def job_key(labels, label):
+        return next((key for key, text in labels.items() if text == label), next(iter(labels)))
+
+    def read_job_form(self):
+        v = self.job_vars
+        job = {"name": v["name"].get(), "kind": self.job_key(JOB_KINDS, v["kind"].get()), "format": v["format"].get(),
+               "every": self.job_key(JOB_FREQUENCIES, v["every"].get()), "at": v["at"].get().strip(),
+               "directory": v["directory"].get()}
+        content = v["content"].get()
+        if job["kind"] == "export":
+            job["source"] = content
+        elif job["kind"] == "finance":
+            job["granularity"] = self.job_key(GRANULARITIES, content)
+        else:
+            job["query"] = content
+        if job["every"] == "weekly":
+            job["weekday"] = self.WEEKDAYS.index(v["day"].get())
+        elif job["every"] == "monthly":
+            job["day"] = int(v["day"].get())
+        return job
+
+    def job_content(self, job):
+        if job["kind"] == "export":
+            return job["source"]
+        if job["kind"] == "finance":
+            return GRANULARITIES[job["granularity"]]
+        return job["query"]
+
+    def fill_job_form(self):
+        selected = self.jobs_tree.selection()
+        if not selected:
+            return
+        job = self.core.jobs.job(selected[0])
+        v = self.job_vars
+        v["name"].set(job["name"])
+        v["kind"].set(JOB_KINDS[job["kind"]])
+        v["format"].set(job["format"])
+        v["every"].set(JOB_FREQUENCIES[job["every"]])
+        v["at"].set(job["at"])
+        v["directory"].set(job["directory"])
+        self.update_job_choices()
+        v["content"].set(self.job_content(job))
+        if job["every"] == "weekly":
+            v["day"].set(self.WEEKDAYS[job["weekday"]])
+        elif job["every"] == "monthly":
+            v["day"].set(str(job["day"]))
+
+    def refresh_scheduled_jobs(self):
+        tree = getattr(self, "jobs_tree", None)
+        if tree is None or not tree.winfo_exists():
+            return
+        selected = tree.selection()
+        tree.delete(*tree.get_children())
+        for job in self.core.jobs.jobs():
+            runs = self.core.jobs.state(job["name"]).get("runs", [])
+            last = runs[0] if runs else {}
+            next_run = self.core.jobs.next_run(job)
+            frequency = JOB_FREQUENCIES[job["every"]] + f" à {job['at']}"
+            if job["every"] == "weekly":
+                frequency += f" ({self.WEEKDAYS[job['weekday']]})"
+            elif job["every"] == "monthly":
+                frequency += f" (le {job['day']})"
+            tree.insert("", tk.END, iid=job["name"], values=(
+                job["name"], self.job_content(job) + f" ({job['format']})", frequency,
+                "désactivée" if not job.get("enabled", True) else
+                next_run.strftime("%d/%m/%Y %H:%M") if next_run else "à la prochaine vérification",
+                last.get("time", "jamais"), last.get("status", ""),
+                f"{last['elapsed']:.0f} ms" if last else "", f"{last.get('size', 0) / 1024:.1f} Ko" if last else "",
+                last.get("error") or last.get("path") or ""))
+        for iid in selected:
+            if tree.exists(iid):
+                tree.selection_set(iid)
+
+    def save_scheduled_job(self):
+        try:
+            job = self.core.jobs.save_job(self.read_job_form())
+        except (CompanyError, ValueError) as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        logging.info(f"{self.current_user} a enregistré la tâche planifiée « {job['name']} ».")
+        self.refresh_scheduled_jobs()
+
+    def selected_scheduled_job(self):
+        selected = self.jobs_tree.selection()
+        if not selected:
+            messagebox.showwarning("Avertissement", "Sélectionnez une tâche.")
+            return None
+        return self.core.jobs.job(selected[0])
+
+    def delete_scheduled_job(self):
+        job = self.selected_scheduled_job()
+        if job is None or not messagebox.askyesno("Confirmer", f"Supprimer la tâche « {job['name']} » ?"):
+            return
+        self.core.jobs.delete_job(job["name"])
+        logging.info(f"{self.current_user} a supprimé la tâche planifiée « {job['name']} ».")
+        self.refresh_scheduled_jobs()
+
+    def toggle_scheduled_job(self):
+        job = self.selected_scheduled_job()
+        if job is None:
+            return
+        self.core.jobs.save_job(dict(job, enabled=not job.get("enabled", True)))
+        self.refresh_scheduled_jobs()
+
+    def run_scheduled_job_now(self):
+        job = self.selected_scheduled_job()
+        if job is not None:
+            self.watch_scheduled_job(self.core.jobs.run_now(job["name"]), notify=True)
+
+    def schedule_jobs(self):
+        if self.jobs_job is None:
+            self.jobs_job = self.after(self.JOB_CHECK_MS, self.run_scheduled_jobs)
+
+    def run_scheduled_jobs(self):
+        """Lance les tâches dues : copie des données ici, mise en forme et écriture dans le pool."""
+        self.jobs_job = None
+        for future in self.core.jobs.run_due():
+            self.watch_scheduled_job(future)
+        self.schedule_jobs()
+
+    def watch_scheduled_job(self, future, notify=False):
+        def poll():
+            if not future.done():
+                self.after(200, poll)
+                return
+            run = future.result()
+            self.refresh_scheduled_jobs()
+            if notify and run["status"] == "erreur":
+                messagebox.showerror("Erreur", f"Échec de la tâche : {run['error']}")
+            elif notify:
+                messagebox.showinfo("Succès", f"Tâche terminée ({run['status']}) : {run['path']}")
+        self.after(200, poll)
+
     # ------------------------------------------------------------------------------
     # Modules restants : Dashboard, Inventaire, Clients, Commandes, etc.
     # ------------------------------------------------------------------------------
@@ -568,15 +1325,12 @@ class Application(tk.Tk):
           .grid(row=0, column=0, columnspan=2, pady=10)
         
         # Calculating key metrics
-        inventory_count = sum(len(products) for products in self.inventory_data.values())
-        clients_count = len(self.clients_list)
-        orders_count = len(self.orders)
-        total_expenses = sum(exp["amount"] for exp in self.expenses) if self.expenses else 0
+        metrics = self.core.dashboard_stats()
         stats = [
-            ("Inventaire Total", inventory_count),
-            ("Nombre de Clients", clients_count),
-            ("Nombre de Commandes", orders_count),
-            ("Dépenses Totales", f"{total_expenses:.2f}€")
+            ("Inventaire Total", metrics["inventory_count"]),
+            ("Nombre de Clients", metrics["clients_count"]),
+            ("Nombre de Commandes", metrics["orders_count"]),
+            ("Dépenses Totales", f"{metrics['total_expenses']:.2f}€")
         ]
         
         # Creating stat panels in a grid layout
@@ -593,7 +1347,7 @@ class Application(tk.Tk):
         ann_frame.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=10, pady=10)
         tk.Label(ann_frame, text="Annonces Récentes", font=("Arial", 14, "bold")).pack(pady=5)
         if self.announcements:
-            for ann in self.announcements[-3:]:
+            for ann in self.core.announcements.recent(3):
                 ann_text = f"{ann['date']}: {ann['title']} - {ann['content']}"
                 tk.Label(ann_frame, text=ann_text, font=("Arial", 12), wraplength=800, justify="left")\
                   .pack(anchor="w", padx=5, pady=2)
@@ -627,6 +1381,9 @@ class Application(tk.Tk):
         tk.Label(self.content_frame, text="Prix :").pack(pady=5)
         self.price_entry = tk.Entry(self.content_frame)
         self.price_entry.pack(pady=5)
+        tk.Label(self.content_frame, text="Coût (facultatif) :").pack(pady=5)
+        self.cost_entry = tk.Entry(self.content_frame)
+        self.cost_entry.pack(pady=5)
         tk.Button(self.content_frame, text="Ajouter le produit", command=self.add_product)\
           .pack(pady=5)
         if self.role == "admin":
@@ -634,6 +1391,13 @@ class Application(tk.Tk):
               .pack(pady=5)
             tk.Button(self.content_frame, text="Supprimer le produit", command=self.delete_product)\
               .pack(pady=5)
+        stock_frame = tk.Frame(self.content_frame)
+        stock_frame.pack(pady=5)
+        tk.Button(stock_frame, text="Réception", command=self.receive_stock).pack(side="left", padx=5)
+        tk.Button(stock_frame, text="Inventaire physique", command=self.adjust_stock).pack(side="left", padx=5)
+        if self.role == "admin":
+            tk.Button(stock_frame, text="Seuil et fournisseur", command=self.set_reorder_point)\
+              .pack(side="left", padx=5)
         search_frame = tk.Frame(self.content_frame)
         search_frame.pack(pady=5)
         tk.Label(search_frame, text="Rechercher :").pack(side="left")
@@ -646,30 +1410,137 @@ class Application(tk.Tk):
         tk.Label(self.content_frame, text="Produits :").pack(pady=5)
         self.products_listbox = tk.Listbox(self.content_frame, width=60)
         self.products_listbox.pack(pady=5)
+        tk.Label(self.content_frame, text="À commander (stock au seuil ou en dessous) :").pack(pady=5)
+        columns = ("Produit", "Catégorie", "Stock", "Seuil", "À commander", "Fournisseur")
+        self.shortages_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings", height=6)
+        for col in columns:
+            self.shortages_tree.heading(col, text=col)
+        self.shortages_tree.pack(pady=5, fill="x")
+        self.make_sortable(self.shortages_tree)
         self.refresh_inventory_list()
 
     def add_product(self):
         categorie = self.category_var.get()
-        nom = self.prod_name_entry.get().strip()
-        prix = self.price_entry.get().strip()
-        if not nom or not prix:
-            messagebox.showerror("Erreur", "Veuillez fournir le nom et le prix du produit.")
-            return
         try:
-            prix_val = float(prix)
-        except ValueError:
-            messagebox.showerror("Erreur", "Format de prix invalide.")
+            produit = self.core.inventory.add_product(categorie, self.prod_name_entry.get(),
+                                                      self.price_entry.get().strip(), self.cost_entry.get().strip())
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        self.inventory_data.setdefault(categorie, []).append({"name": nom, "price": prix_val})
+        nom, prix_val = produit["name"], produit["price"]
         messagebox.showinfo("Succès", f"Produit '{nom}' ajouté dans {categorie}.")
         logging.info(f"{self.current_user} a ajouté '{nom}' dans '{categorie}' à {prix_val}€.")
         self.refresh_inventory_list()
 
+    def product_line(self, idx, prod, columns, category):
+        line = f"{idx+1}. {prod['name']} - {prod['price']:.2f}€"
+        line += f" | Stock : {self.core.stock.quantity(category, prod['name']):g}"
+        if prod.get("reorder_point") is not None:
+            line += f" (seuil {prod['reorder_point']:g})"
+        for column in columns:  # colonnes calculées (Calculatrice), recalculées seulement pour les lignes modifiées
+            line += f" | {column.name} : {format_result(column.value(prod)) or '-'}"
+        return line
+
     def refresh_inventory_list(self):
+        self.category_dropdown.config(values=self.core.inventory.categories())
         self.products_listbox.delete(0, tk.END)
         categorie = self.category_var.get()
-        for idx, prod in enumerate(self.inventory_data.get(categorie, [])):
-            self.products_listbox.insert(tk.END, f"{idx+1}. {prod['name']} - {prod['price']:.2f}€")
+        columns = self.core.formulas.columns("inventory_data")
+        for idx, prod in enumerate(self.core.inventory.products(categorie)):
+            self.products_listbox.insert(tk.END, self.product_line(idx, prod, columns, categorie))
+        self.refresh_shortages()
+
+    def refresh_shortages(self):
+        # Lus dans le tas des marges du StockLedger : pas de parcours de l'inventaire
+        self.fill_tree(self.shortages_tree, {
+            f"{row['category']}\0{row['name']}": (row["name"], row["category"], f"{row['quantity']:g}",
+                                                  f"{row['reorder_point']:g}", f"{row['order']:g}", row["supplier"])
+            for row in self.core.stock.shortages()})
+
+    def selected_product(self, action):
+        """(catégorie, produit) sélectionné dans la liste, ou None après un message d'erreur."""
+        selection = self.products_listbox.curselection()
+        if not selection:
+            messagebox.showerror("Erreur", f"Sélectionnez un produit {action}.")
+            return None
+        categorie = self.category_var.get()
+        idx = int(self.products_listbox.get(selection[0]).split(".", 1)[0]) - 1  # aussi après une recherche
+        return categorie, self.inventory_data[categorie][idx]
+
+    def receive_stock(self):
+        selected = self.selected_product("reçu")
+        if selected is None:
+            return
+        categorie, prod = selected
+        quantite = simpledialog.askstring("Réception", f"Quantité reçue de « {prod['name']} » :")
+        if not quantite:
+            return
+        fournisseur = simpledialog.askstring("Réception", "Fournisseur :", initialvalue=prod.get("supplier", ""))
+        try:
+            movement = self.core.stock.receive(categorie, prod, quantite, fournisseur)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        logging.info(f"{self.current_user} a réceptionné {movement['quantity']:g} × '{prod['name']}'.")
+        self.refresh_inventory_list()
+
+    def adjust_stock(self):
+        selected = self.selected_product("à compter")
+        if selected is None:
+            return
+        categorie, prod = selected
+        actuel = self.core.stock.quantity(categorie, prod["name"])
+        compte = simpledialog.askstring("Inventaire physique", f"Quantité comptée de « {prod['name']} » :",
+                                        initialvalue=f"{actuel:g}")
+        if compte is None:
+            return
+        try:
+            movement = self.core.stock.adjust(categorie, prod, compte)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        if movement is not None:
+            logging.info(f"{self.current_user} a ajusté le stock de '{prod['name']}' de {movement['quantity']:+g}.")
+        self.refresh_inventory_list()
+
+    def set_reorder_point(self):
+        selected = self.selected_product("à configurer")
+        if selected is None:
+            return
+        categorie, prod = selected
+        seuil = simpledialog.askstring("Réapprovisionnement", "Seuil d'alerte (vide = aucun) :",
+                                       initialvalue=f"{prod['reorder_point']:g}" if prod.get("reorder_point") is not None else "")
+        if seuil is None:
+            return
+        quantite = simpledialog.askstring("Réapprovisionnement", "Quantité à recommander (vide = automatique) :",
+                                          initialvalue=f"{prod['reorder_quantity']:g}" if prod.get("reorder_quantity") else "")
+        if quantite is None:
+            return
+        noms = ", ".join(s["name"] for s in self.suppliers[:10])
+        fournisseur = simpledialog.askstring("Réapprovisionnement", f"Fournisseur ({noms}) :",
+                                             initialvalue=prod.get("supplier", ""))
+        if fournisseur is None:
+            return
+        try:
+            self.core.stock.set_reorder(categorie, prod, seuil, quantite, fournisseur)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        logging.info(f"L'administrateur {self.current_user} a configuré le réapprovisionnement de '{prod['name']}'.")
+        self.refresh_inventory_list()
+
+    def notify_stock_alerts(self):
+        """Alertes « stock bas » émises par les dernières modifications (voir company_core/stock.py)."""
+        alerts = self.core.stock.pop_alerts()
+        if not alerts:
+            return
+        for alert in alerts:
+            logging.warning(f"Stock bas : {alert.message}")
+        if self.current_user and self.settings.get("enable_notifications", True):
+            lines = [f"  • {alert.message}" for alert in alerts[:15]]
+            if len(alerts) > 15:
+                lines.append(f"  … et {len(alerts) - 15} autre(s)")
+            messagebox.showwarning("Stock bas", "Produits à commander :\n" + "\n".join(lines))
 
     def modify_product(self):
         selection = self.products_listbox.curselection()
@@ -685,12 +1556,14 @@ class Application(tk.Tk):
         nouveau_prix = simpledialog.askstring("Modifier le produit", "Nouveau prix :", initialvalue=str(prod["price"]))
         if not nouveau_prix:
             return
+        nouveau_cout = simpledialog.askstring("Modifier le produit", "Coût (facultatif) :",
+                                              initialvalue=str(prod.get("cost", "")))
         try:
-            nouveau_prix_val = float(nouveau_prix)
-        except ValueError:
-            messagebox.showerror("Erreur", "Prix invalide.")
+            nouveau_prix_val = self.core.inventory.modify_product(categorie, idx, nouveau_nom, nouveau_prix,
+                                                                  nouveau_cout)["price"]
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        self.inventory_data[categorie][idx] = {"name": nouveau_nom.strip(), "price": nouveau_prix_val}
         messagebox.showinfo("Succès", "Produit modifié.")
         logging.info(f"{self.current_user} a modifié le produit à '{nouveau_nom}' à {nouveau_prix_val}€.")
         self.refresh_inventory_list()
@@ -704,7 +1577,7 @@ class Application(tk.Tk):
         categorie = self.category_var.get()
         prod = self.inventory_data[categorie][idx]
         if messagebox.askyesno("Confirmer", f"Supprimer '{prod['name']}' ?"):
-            del self.inventory_data[categorie][idx]
+            self.core.inventory.delete_product(categorie, idx)
             messagebox.showinfo("Succès", "Produit supprimé.")
             logging.info(f"{self.current_user} a supprimé '{prod['name']}' de '{categorie}'.")
             self.refresh_inventory_list()
@@ -716,18 +1589,19 @@ class Application(tk.Tk):
             return
         self.products_listbox.delete(0, tk.END)
         categorie = self.category_var.get()
-        for idx, prod in enumerate(self.inventory_data.get(categorie, [])):
-            if mot_cle in prod["name"].lower():
-                self.products_listbox.insert(tk.END, f"{idx+1}. {prod['name']} - {prod['price']:.2f}€")
+        columns = self.core.formulas.columns("inventory_data")
+        for idx, prod in self.core.inventory.search(categorie, mot_cle):
+            self.products_listbox.insert(tk.END, self.product_line(idx, prod, columns, categorie))
 
     def show_clients_list(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Liste des Clients", font=("Arial", 16)).pack(pady=10)
-        columns = ("Nom", "Achats")
+        columns = ("Nom", "Achats", "Commandes", "Dernière commande")
         self.clients_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
         for col in columns:
             self.clients_tree.heading(col, text=col)
         self.clients_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.clients_tree)
         filter_frame = tk.Frame(self.content_frame)
         filter_frame.pack(pady=5)
         tk.Label(filter_frame, text="Achat minimum :").pack(side="left")
@@ -750,44 +1624,43 @@ class Application(tk.Tk):
         nom = simpledialog.askstring("Ajouter un client", "Entrez le nom du client :")
         if not nom:
             return
-        montant = simpledialog.askstring("Ajouter un client", "Entrez le montant d'achat :")
+        montant = simpledialog.askstring("Ajouter un client", "Achats antérieurs (hors commandes enregistrées) :",
+                                         initialvalue="0")
         try:
-            montant_val = float(montant)
-        except (ValueError, TypeError):
-            messagebox.showerror("Erreur", "Montant d'achat invalide.")
+            montant_val = self.core.clients.add_client(nom, montant)["purchases"]
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        self.clients_list.append({"name": nom.strip(), "purchases": montant_val})
         messagebox.showinfo("Succès", f"Client '{nom}' ajouté.")
         logging.info(f"{self.current_user} a ajouté le client '{nom}' pour {montant_val}€ d'achat.")
         self.refresh_clients_list()
 
+    def client_row(self, client):
+        account = self.core.clients.account(client)
+        return (client["name"], f"{self.core.clients.purchases(client):.2f}", account.order_count,
+                account.last_order or "")
+
     def refresh_clients_list(self):
-        for row in self.clients_tree.get_children():
-            self.clients_tree.delete(row)
-        for client in self.clients_list:
-            self.clients_tree.insert("", tk.END, values=(client["name"], client["purchases"]))
+        # Une commande ajoutée ou supprimée ne réaffiche que la ligne de son client
+        ledger = self.core.clients.ledger
+        self.refresh_tree(self.clients_tree, "clients_list", self.client_row,
+                          related={"orders": lambda order: ledger.clients.get(client_key(order.get("client")), ())})
 
     def filter_clients(self):
         try:
-            min_achat = float(self.min_purchase_entry.get())
-        except ValueError:
-            messagebox.showerror("Erreur", "Valeur de filtrage invalide.")
+            clients = self.core.clients.filter_clients(self.min_purchase_entry.get())
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        for row in self.clients_tree.get_children():
-            self.clients_tree.delete(row)
-        for client in self.clients_list:
-            if client["purchases"] >= min_achat:
-                self.clients_tree.insert("", tk.END, values=(client["name"], client["purchases"]))
+        self.fill_tree(self.clients_tree, {str(id(client)): self.client_row(client) for client in clients})
+        self.tree_feeds.pop(str(self.clients_tree), None)  # liste filtrée : prochain affichage complet
 
     def delete_client(self):
         selected = self.clients_tree.selection()
         if not selected:
             messagebox.showerror("Erreur", "Sélectionnez un client à supprimer.")
             return
-        for sel in selected:
-            values = self.clients_tree.item(sel, "values")
-            nom = values[0]
-            self.clients_list = [c for c in self.clients_list if c["name"] != nom]
+        self.core.clients.delete_clients(self.clients_tree.item(sel, "values")[0] for sel in selected)
         messagebox.showinfo("Succès", "Client(s) supprimé(s).")
         logging.info(f"{self.current_user} a supprimé un ou plusieurs clients.")
         self.refresh_clients_list()
@@ -801,22 +1674,24 @@ class Application(tk.Tk):
         for col in columns:
             self.employees_tree.heading(col, text=col)
         self.employees_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.employees_tree)
         if not self.login_events:
             tk.Label(self.content_frame, text="Aucun enregistrement de connexion.",
                      font=("Arial", 14), fg="red").pack(pady=5)
         else:
-            for record in self.login_events:
-                self.employees_tree.insert("", tk.END, values=(record["user"], record["time"], record["spent"]))
+            self.fill_tree(self.employees_tree, {str(id(record)): (record["user"], record["time"], record["spent"])
+                                                 for record in self.login_events})
+        archived = self.core.data.archived_count("login_events")
+        if archived:
+            tk.Label(self.content_frame, text=f"{archived} connexion(s) archivée(s), comptées dans le résumé.")\
+              .pack(pady=2)
         tk.Button(self.content_frame, text="Résumé des employés", command=self.show_employee_summary)\
           .pack(pady=5)
 
     def show_employee_summary(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Résumé des Employés", font=("Arial", 16)).pack(pady=10)
-        summary = {}
-        for record in self.login_events:
-            user = record["user"]
-            summary[user] = summary.get(user, 0) + 1
+        summary = self.core.logins.summary()
         if not summary:
             tk.Label(self.content_frame, text="Aucun enregistrement de connexion.",
                      font=("Arial", 14), fg="red").pack(pady=5)
@@ -834,13 +1709,19 @@ class Application(tk.Tk):
     def show_orders(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Gestion des Commandes", font=("Arial", 16)).pack(pady=10)
-        tk.Button(self.content_frame, text="Ajouter une commande", command=self.add_order)\
-          .pack(pady=5)
+        btn_frame = tk.Frame(self.content_frame)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Ajouter une commande", command=self.add_order)\
+          .pack(side="left", padx=5)
+        if self.role == "admin":
+            tk.Button(btn_frame, text="Supprimer la commande", command=self.delete_order)\
+              .pack(side="left", padx=5)
         columns = ("ID Commande", "Client", "Montant Total", "Date de commande")
         self.orders_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
         for col in columns:
             self.orders_tree.heading(col, text=col)
         self.orders_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.orders_tree)
         self.refresh_orders()
 
     def add_order(self):
@@ -848,25 +1729,33 @@ class Application(tk.Tk):
         if not client:
             return
         total = simpledialog.askstring("Ajouter une commande", "Entrez le montant total :")
+        produit = simpledialog.askstring("Ajouter une commande", "Produit sorti du stock (facultatif) :")
+        quantite = None
+        if produit:
+            quantite = simpledialog.askstring("Ajouter une commande", f"Quantité de « {produit} » :", initialvalue="1")
         try:
-            total_val = float(total)
-        except:
-            messagebox.showerror("Erreur", "Montant invalide.")
-            return
-        order_id = len(self.orders) + 1
-        order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        order = {"order_id": order_id, "client": client.strip(), "total": total_val, "order_date": order_date}
-        self.orders.append(order)
+            order = self.core.orders.add_order(client, total, product=produit, quantity=quantite)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
         messagebox.showinfo("Succès", "Commande ajoutée avec succès !")
         logging.info(f"{self.current_user} a ajouté la commande {order}.")
         self.refresh_orders()
 
+    def delete_order(self):
+        selected = set(self.orders_tree.selection())
+        if not selected:
+            messagebox.showerror("Erreur", "Sélectionnez une commande à supprimer.")
+            return
+        orders = [order for order in self.orders if str(id(order)) in selected]
+        self.core.orders.delete_orders(orders)
+        messagebox.showinfo("Succès", "Commande(s) supprimée(s).")
+        logging.info(f"{self.current_user} a supprimé {len(orders)} commande(s).")
+        self.refresh_orders()
+
     def refresh_orders(self):
-        for row in self.orders_tree.get_children():
-            self.orders_tree.delete(row)
-        for order in self.orders:
-            self.orders_tree.insert("", tk.END, values=(order["order_id"], order["client"],
-                                                         f"{order['total']:.2f}€", order["order_date"]))
+        self.refresh_tree(self.orders_tree, "orders", lambda order: (order["order_id"], order["client"],
+                                                                     f"{order['total']:.2f}€", order["order_date"]))
 
     def show_suppliers(self):
         self.clear_content_frame()
@@ -880,11 +1769,14 @@ class Application(tk.Tk):
               .pack(side="left", padx=5)
             tk.Button(btn_frame, text="Supprimer un fournisseur", command=self.delete_supplier)\
               .pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Produits et commandes", command=self.show_supplier_products)\
+          .pack(side="left", padx=5)
         columns = ("Nom", "Contact", "Note")
         self.suppliers_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
         for col in columns:
             self.suppliers_tree.heading(col, text=col)
         self.suppliers_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.suppliers_tree)
         self.refresh_suppliers()
 
     def add_supplier(self):
@@ -894,21 +1786,35 @@ class Application(tk.Tk):
         contact = simpledialog.askstring("Ajouter un fournisseur", "Contact :")
         rating = simpledialog.askstring("Ajouter un fournisseur", "Note (1-5) :")
         try:
-            rating_val = float(rating)
-        except:
-            messagebox.showerror("Erreur", "Note invalide.")
+            supplier = self.core.suppliers.add_supplier(nom, contact, rating)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        supplier = {"name": nom.strip(), "contact": contact.strip() if contact else "", "rating": rating_val}
-        self.suppliers.append(supplier)
         messagebox.showinfo("Succès", "Fournisseur ajouté avec succès !")
         logging.info(f"{self.current_user} a ajouté le fournisseur {supplier}.")
         self.refresh_suppliers()
 
     def refresh_suppliers(self):
-        for row in self.suppliers_tree.get_children():
-            self.suppliers_tree.delete(row)
-        for supp in self.suppliers:
-            self.suppliers_tree.insert("", tk.END, values=(supp["name"], supp["contact"], supp["rating"]))
+        self.refresh_tree(self.suppliers_tree, "suppliers", lambda supp: (supp["name"], supp["contact"], supp["rating"]))
+
+    def show_supplier_products(self):
+        selected = self.suppliers_tree.selection()
+        if not selected:
+            messagebox.showerror("Erreur", "Sélectionnez un fournisseur.")
+            return
+        nom = str(self.suppliers_tree.item(selected[0], "values")[0])
+        produits = self.core.stock.supplier_products(nom)
+        lines = [f"  • {prod['name']} ({categorie}) : {self.core.stock.quantity(categorie, prod['name']):g} en stock"
+                 for categorie, prod in produits[:20]]
+        if len(produits) > 20:
+            lines.append(f"  … et {len(produits) - 20} autre(s)")
+        commande = self.core.stock.reorder_lists().get(nom, [])
+        if commande:
+            lines.append("\nÀ commander :")
+            lines.extend(f"  • {row['name']} : {row['order']:g}" for row in commande)
+        messagebox.showinfo(f"Fournisseur {nom}",
+                            f"{len(produits)} produit(s) lié(s)\n" + "\n".join(lines) if produits else
+                            "Aucun produit lié à ce fournisseur (Inventaire → Seuil et fournisseur).")
 
     def modify_supplier(self):
         selected = self.suppliers_tree.selection()
@@ -917,20 +1823,16 @@ class Application(tk.Tk):
             return
         item = self.suppliers_tree.item(selected[0])
         nom = item["values"][0]
-        for supplier in self.suppliers:
-            if supplier["name"] == nom:
-                nouveau_nom = simpledialog.askstring("Modifier", "Nouveau nom :", initialvalue=supplier["name"])
-                nouveau_contact = simpledialog.askstring("Modifier", "Nouveau contact :", initialvalue=supplier["contact"])
-                nouvelle_note = simpledialog.askstring("Modifier", "Nouvelle note (1-5) :", initialvalue=str(supplier["rating"]))
-                try:
-                    nouvelle_note_val = float(nouvelle_note)
-                except:
-                    messagebox.showerror("Erreur", "Note invalide.")
-                    return
-                supplier["name"] = nouveau_nom.strip()
-                supplier["contact"] = nouveau_contact.strip() if nouveau_contact else ""
-                supplier["rating"] = nouvelle_note_val
-                break
+        supplier = self.core.suppliers.find(nom)
+        if supplier is not None:
+            nouveau_nom = simpledialog.askstring("Modifier", "Nouveau nom :", initialvalue=supplier["name"])
+            nouveau_contact = simpledialog.askstring("Modifier", "Nouveau contact :", initialvalue=supplier["contact"])
+            nouvelle_note = simpledialog.askstring("Modifier", "Nouvelle note (1-5) :", initialvalue=str(supplier["rating"]))
+            try:
+                self.core.suppliers.modify_supplier(supplier, nouveau_nom, nouveau_contact, nouvelle_note)
+            except CompanyError as e:
+                messagebox.showerror("Erreur", str(e))
+                return
         messagebox.showinfo("Succès", "Fournisseur modifié.")
         logging.info(f"L'administrateur {self.current_user} a modifié le fournisseur : {supplier}.")
         self.refresh_suppliers()
@@ -942,7 +1844,7 @@ class Application(tk.Tk):
             return
         item = self.suppliers_tree.item(selected[0])
         nom = item["values"][0]
-        self.suppliers = [s for s in self.suppliers if s["name"] != nom]
+        self.core.suppliers.delete_supplier(nom)
         messagebox.showinfo("Succès", "Fournisseur supprimé.")
         logging.info(f"{self.current_user} a supprimé le fournisseur '{nom}'.")
         self.refresh_suppliers()
@@ -964,6 +1866,7 @@ class Application(tk.Tk):
         for col in columns:
             self.projects_tree.heading(col, text=col)
         self.projects_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.projects_tree)
         self.refresh_projects()
 
     def add_project(self):
@@ -973,20 +1876,14 @@ class Application(tk.Tk):
         deadline = simpledialog.askstring("Ajouter un projet", "Date limite (AAAA-MM-JJ) :")
         statut = simpledialog.askstring("Ajouter un projet", "Statut (En attente/En cours/Terminé) :")
         assigné = simpledialog.askstring("Ajouter un projet", "Assigné à (nom de l'employé) :")
-        project_id = len(self.projects) + 1
-        projet = {"project_id": project_id, "name": nom.strip(), "deadline": deadline,
-                  "status": statut, "assigned_to": assigné}
-        self.projects.append(projet)
+        projet = self.core.projects.add_project(nom, deadline, statut, assigné)
         messagebox.showinfo("Succès", "Projet ajouté.")
         logging.info(f"{self.current_user} a ajouté le projet {projet}.")
         self.refresh_projects()
 
     def refresh_projects(self):
-        for row in self.projects_tree.get_children():
-            self.projects_tree.delete(row)
-        for proj in self.projects:
-            self.projects_tree.insert("", tk.END,
-                                      values=(proj["project_id"], proj["name"], proj["deadline"], proj["status"], proj["assigned_to"]))
+        self.refresh_tree(self.projects_tree, "projects",
+                          lambda proj: (proj["project_id"], proj["name"], proj["deadline"], proj["status"], proj["assigned_to"]))
 
     def modify_project(self):
         selected = self.projects_tree.selection()
@@ -995,17 +1892,13 @@ class Application(tk.Tk):
             return
         item = self.projects_tree.item(selected[0])
         proj_id = item["values"][0]
-        for proj in self.projects:
-            if proj["project_id"] == proj_id:
-                nouveau_nom = simpledialog.askstring("Modifier un projet", "Nouveau nom :", initialvalue=proj["name"])
-                nouvelle_deadline = simpledialog.askstring("Modifier un projet", "Nouvelle date limite (AAAA-MM-JJ) :", initialvalue=proj["deadline"])
-                nouveau_statut = simpledialog.askstring("Modifier un projet", "Nouveau statut :", initialvalue=proj["status"])
-                nouveau_assigné = simpledialog.askstring("Modifier un projet", "Assigné à :", initialvalue=proj["assigned_to"])
-                proj["name"] = nouveau_nom.strip()
-                proj["deadline"] = nouvelle_deadline
-                proj["status"] = nouveau_statut
-                proj["assigned_to"] = nouveau_assigné
-                break
+        proj = self.core.projects.find(proj_id)
+        if proj is not None:
+            nouveau_nom = simpledialog.askstring("Modifier un projet", "Nouveau nom :", initialvalue=proj["name"])
+            nouvelle_deadline = simpledialog.askstring("Modifier un projet", "Nouvelle date limite (AAAA-MM-JJ) :", initialvalue=proj["deadline"])
+            nouveau_statut = simpledialog.askstring("Modifier un projet", "Nouveau statut :", initialvalue=proj["status"])
+            nouveau_assigné = simpledialog.askstring("Modifier un projet", "Assigné à :", initialvalue=proj["assigned_to"])
+            self.core.projects.modify_project(proj, nouveau_nom, nouvelle_deadline, nouveau_statut, nouveau_assigné)
         messagebox.showinfo("Succès", "Projet modifié.")
         logging.info(f"L'administrateur {self.current_user} a modifié le projet {proj}.")
         self.refresh_projects()
@@ -1017,7 +1910,7 @@ class Application(tk.Tk):
             return
         item = self.projects_tree.item(selected[0])
         proj_id = item["values"][0]
-        self.projects = [p for p in self.projects if p["project_id"] != proj_id]
+        self.core.projects.delete_project(proj_id)
         messagebox.showinfo("Succès", "Projet supprimé.")
         logging.info(f"{self.current_user} a supprimé le projet avec l'ID {proj_id}.")
         self.refresh_projects()
@@ -1040,18 +1933,13 @@ class Application(tk.Tk):
         if not titre:
             return
         contenu = simpledialog.askstring("Ajouter une annonce", "Contenu :")
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        annonce = {"title": titre.strip(), "content": contenu, "date": date}
-        self.announcements.append(annonce)
+        annonce = self.core.announcements.add_announcement(titre, contenu)
         messagebox.showinfo("Succès", "Annonce ajoutée.")
         logging.info(f"{self.current_user} a ajouté l'annonce {annonce}.")
         self.refresh_announcements()
 
     def refresh_announcements(self):
-        for row in self.announcements_tree.get_children():
-            self.announcements_tree.delete(row)
-        for ann in self.announcements:
-            self.announcements_tree.insert("", tk.END, values=(ann["title"], ann["date"], ann["content"]))
+        self.refresh_tree(self.announcements_tree, "announcements", lambda ann: (ann["title"], ann["date"], ann["content"]))
 
     def show_shift_scheduling(self):
         self.clear_content_frame()
@@ -1060,11 +1948,28 @@ class Application(tk.Tk):
         if self.role == "admin":
             tk.Button(self.content_frame, text="Ajouter un quart", command=self.add_shift)\
               .pack(pady=5)
-        columns = ("Employé", "Date", "Début", "Fin", "Notes")
+        # Vue calendrier : tous les quarts, une journée ou une semaine (lundi -> dimanche)
+        filter_frame = tk.Frame(self.content_frame)
+        filter_frame.pack(pady=5)
+        self.shift_view_var = tk.StringVar(value="Tous")
+        ttk.Combobox(filter_frame, textvariable=self.shift_view_var, values=("Tous", "Jour", "Semaine"),
+                     state="readonly", width=10).pack(side="left", padx=5)
+        tk.Label(filter_frame, text="Date :").pack(side="left")
+        self.shift_date_entry = tk.Entry(filter_frame, width=12)
+        self.shift_date_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        self.shift_date_entry.pack(side="left", padx=5)
+        tk.Label(filter_frame, text="Employé :").pack(side="left")
+        self.shift_employee_entry = tk.Entry(filter_frame, width=15)
+        self.shift_employee_entry.pack(side="left", padx=5)
+        tk.Button(filter_frame, text="Afficher", command=self.refresh_shifts).pack(side="left", padx=5)
+        tk.Button(filter_frame, text="Qui travaille ?", command=self.ask_working_at).pack(side="left", padx=5)
+        columns = ("Employé", "Date", "Début", "Fin", "Notes", "Conflit")
         self.shifts_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
         for col in columns:
             self.shifts_tree.heading(col, text=col)
+        self.shifts_tree.tag_configure("conflict", background="mistyrose")
         self.shifts_tree.pack(pady=5, fill="both", expand=True)
+        self.make_sortable(self.shifts_tree)
         self.refresh_shifts()
 
     def add_shift(self):
@@ -1073,17 +1978,54 @@ class Application(tk.Tk):
         debut = simpledialog.askstring("Ajouter un quart", "Heure de début (HH:MM) :")
         fin = simpledialog.askstring("Ajouter un quart", "Heure de fin (HH:MM) :")
         notes = simpledialog.askstring("Ajouter un quart", "Notes :")
-        shift = {"employee": employe.strip(), "date": date, "start": debut, "end": fin, "notes": notes}
-        self.shifts.append(shift)
+        try:
+            shift = self.core.shifts.add_shift(employe, date, debut, fin, notes)
+        except ShiftConflictError as e:
+            details = "\n".join(f"{s['date']} {s['start']}-{s['end']}" for s in e.conflicts[:10])
+            if not messagebox.askyesno("Chevauchement", f"{e}\n{details}\n\nAjouter quand même ?"):
+                return
+            shift = self.core.shifts.add_shift(employe, date, debut, fin, notes, allow_overlap=True)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
         messagebox.showinfo("Succès", "Quart ajouté.")
         logging.info(f"{self.current_user} a ajouté le quart {shift}.")
         self.refresh_shifts()
 
     def refresh_shifts(self):
-        for row in self.shifts_tree.get_children():
-            self.shifts_tree.delete(row)
-        for s in self.shifts:
-            self.shifts_tree.insert("", tk.END, values=(s["employee"], s["date"], s["start"], s["end"], s["notes"]))
+        view = self.shift_view_var.get()
+        employee = self.shift_employee_entry.get().strip() or None
+        try:
+            if view == "Jour":
+                shifts = self.core.shifts.day(self.shift_date_entry.get(), employee)
+            elif view == "Semaine":
+                shifts = self.core.shifts.week(self.shift_date_entry.get(), employee)
+            else:
+                shifts = [s for s in self.shifts if employee is None or s["employee"] == employee]
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        overlapping = self.core.shifts.overlapping()
+        self.fill_tree(self.shifts_tree,
+                       {str(id(s)): (s["employee"], s["date"], s["start"], s["end"], s["notes"],
+                                     "Chevauchement" if id(s) in overlapping else "") for s in shifts},
+                       tags={str(id(s)): ("conflict",) for s in shifts if id(s) in overlapping})
+
+    def ask_working_at(self):
+        moment = simpledialog.askstring("Qui travaille ?", "Date et heure (AAAA-MM-JJ HH:MM) :",
+                                        initialvalue=datetime.now().strftime("%Y-%m-%d %H:%M"))
+        if not moment:
+            return
+        try:
+            moment = datetime.strptime(moment.strip(), "%Y-%m-%d %H:%M")
+        except ValueError:
+            messagebox.showerror("Erreur", "Format attendu : AAAA-MM-JJ HH:MM")
+            return
+        shifts = self.core.shifts.working_at(moment)
+        if not shifts:
+            messagebox.showinfo("Qui travaille ?", "Personne n'est planifié à ce moment.")
+            return
+        messagebox.showinfo("Qui travaille ?", "\n".join(f"{s['employee']} : {s['start']}-{s['end']}" for s in shifts))
 
     def show_financial_dashboard(self):
         self.clear_content_frame()
@@ -1091,41 +2033,39 @@ class Application(tk.Tk):
           .pack(pady=10)
         tk.Button(self.content_frame, text="Ajouter une dépense", command=self.add_expense)\
           .pack(pady=5)
-        total_revenue = sum(order["total"] for order in self.orders)
-        order_count = len(self.orders)
-        avg_order_val = (total_revenue / order_count) if order_count > 0 else 0
-        total_expenses = sum(exp["amount"] for exp in self.expenses) if self.expenses else 0
-        net_profit = total_revenue - total_expenses
+        summary = self.core.finance.summary()
         report_text = (
-            f"Revenu Total : {total_revenue:.2f}€\n"
-            f"Nombre de Commandes : {order_count}\n"
-            f"Valeur Moyenne par Commande : {avg_order_val:.2f}€\n"
-            f"Dépenses Totales : {total_expenses:.2f}€\n"
-            f"Profit Net : {net_profit:.2f}€\n"
+            f"Revenu Total : {summary['total_revenue']:.2f}€\n"
+            f"Nombre de Commandes : {summary['order_count']}\n"
+            f"Valeur Moyenne par Commande : {summary['avg_order_value']:.2f}€\n"
+            f"Dépenses Totales : {summary['total_expenses']:.2f}€\n"
+            f"Profit Net : {summary['net_profit']:.2f}€\n"
         )
         tk.Label(self.content_frame, text=report_text, font=("Arial", 14), justify="left")\
           .pack(padx=10, pady=10)
+        self.create_time_chart(self.content_frame, self.FINANCE_CURVES, granularity="week", period="12 mois")
         columns = ("ID Commande", "Client", "Total", "Date")
         self.financial_orders_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
         for col in columns:
             self.financial_orders_tree.heading(col, text=col)
         self.financial_orders_tree.pack(pady=5, fill="both", expand=True)
-        for order in self.orders:
-            self.financial_orders_tree.insert("", tk.END,
-                                              values=(order["order_id"], order["client"],
-                                                      f"{order['total']:.2f}€", order["order_date"]))
+        self.make_sortable(self.financial_orders_tree)
+        self.fill_tree(self.financial_orders_tree,
+                       {str(id(order)): (order["order_id"], order["client"], f"{order['total']:.2f}€",
+                                         order["order_date"]) for order in self.orders})
+        archived = self.core.data.archived_count("orders")
+        if archived:
+            tk.Label(self.content_frame, text=f"{archived} commande(s) archivée(s), non listées ci-dessus : "
+                                              "comptées dans les totaux et les courbes.").pack(pady=2)
 
     def add_expense(self):
         objet = simpledialog.askstring("Ajouter une dépense", "Objet de la dépense :")
         montant = simpledialog.askstring("Ajouter une dépense", "Montant de la dépense :")
         try:
-            montant_val = float(montant)
-        except:
-            messagebox.showerror("Erreur", "Montant invalide.")
+            expense = self.core.finance.add_expense(objet, montant)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
             return
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        expense = {"purpose": objet, "amount": montant_val, "date": date}
-        self.expenses.append(expense)
         messagebox.showinfo("Succès", "Dépense ajoutée.")
         logging.info(f"{self.current_user} a ajouté la dépense {expense}.")
         self.show_financial_dashboard()
@@ -1133,21 +2073,304 @@ class Application(tk.Tk):
     def show_reports(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Rapports", font=("Arial", 16)).pack(pady=10)
-        total_products = sum(len(prods) for prods in self.inventory_data.values())
+        total_products = self.core.inventory.count()
         client_count = len(self.clients_list)
-        avg_purchase = (sum(c["purchases"] for c in self.clients_list) / client_count) if client_count > 0 else 0
-        login_count = len(self.login_events)
+        avg_purchase = self.core.clients.average_purchase()
+        unlinked = self.core.clients.ledger.unlinked()
+        login_count = len(self.login_events) + self.core.data.archived_count("login_events")
         report_text = (
             f"Total d'articles en inventaire : {total_products}\n"
             f"Nombre de clients : {client_count}\n"
-            f"Achat moyen par client : {avg_purchase:.2f}€\n"
+            f"Achat moyen par client : {avg_purchase:.2f}€ (achats antérieurs et commandes)\n"
+            f"Commandes sans fiche client : {sum(a.order_count for a in unlinked.values())} "
+            f"({len(unlinked)} nom(s))\n"
             f"Total des enregistrements de connexion : {login_count}\n\n"
             "Inventaire par catégorie :\n"
         )
-        for cat, prods in self.inventory_data.items():
-            report_text += f"  {cat} : {len(prods)} articles\n"
+        for cat, count in self.core.inventory.count_by_category().items():
+            report_text += f"  {cat} : {count} articles\n"
         tk.Label(self.content_frame, text=report_text, font=("Arial", 14), justify="left")\
           .pack(padx=10, pady=10)
+        self.create_time_chart(self.content_frame, self.ORDER_CURVES, height=180)
+        self.create_query_builder(self.content_frame)
+
+    # ------------------------------------------------------------------------------
+    # Requêtes ad hoc (écran Rapports) : filtres, regroupement, agrégats, tri et limite
+    # ------------------------------------------------------------------------------
+    QUERY_FILTER_ROWS = 3
+    QUERY_GROUP_FIELDS = 2
+    QUERY_AGGREGATE_ROWS = 3
+    QUERY_DISPLAY_MAX = 1000  # lignes affichées au plus (la requête, elle, compte tout)
+
+    def create_query_builder(self, parent):
+        frame = tk.LabelFrame(parent, text="Requêtes")
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.query_vars = {}
+        self.query_field_boxes = []
+
+        saved_frame = tk.Frame(frame)
+        saved_frame.pack(fill="x", pady=2)
+        tk.Label(saved_frame, text="Requête enregistrée :").pack(side="left")
+        self.query_saved_var = tk.StringVar()
+        self.query_saved_box = ttk.Combobox(saved_frame, textvariable=self.query_saved_var, state="readonly", width=35,
+                                            values=list(self.core.queries.saved()))
+        self.query_saved_box.pack(side="left", padx=5)
+        self.query_saved_box.bind("<<ComboboxSelected>>", lambda event: self.load_query())
+        tk.Button(saved_frame, text="Enregistrer", command=self.save_query).pack(side="left", padx=5)
+        tk.Button(saved_frame, text="Supprimer", command=self.delete_query).pack(side="left", padx=5)
+
+        source_frame = tk.Frame(frame)
+        source_frame.pack(fill="x", pady=2)
+        tk.Label(source_frame, text="Source :").pack(side="left")
+        self.query_vars["source"] = tk.StringVar(value=QUERY_SOURCES["orders"])
+        source_box = ttk.Combobox(source_frame, textvariable=self.query_vars["source"], state="readonly", width=14,
+                                  values=list(QUERY_SOURCES.values()))
+        source_box.pack(side="left", padx=5)
+        source_box.bind("<<ComboboxSelected>>", lambda event: self.update_query_fields())
+
+        self.query_vars["filters"] = []
+        for row in range(self.QUERY_FILTER_ROWS):
+            filter_frame = tk.Frame(frame)
+            filter_frame.pack(fill="x", pady=1)
+            tk.Label(filter_frame, text="Filtre :" if row == 0 else "et :", width=8, anchor="w").pack(side="left")
+            field, operator, value = tk.StringVar(), tk.StringVar(value="="), tk.StringVar()
+            self.query_field_boxes.append(ttk.Combobox(filter_frame, textvariable=field, width=14))
+            self.query_field_boxes[-1].pack(side="left", padx=2)
+            ttk.Combobox(filter_frame, textvariable=operator, values=OPERATORS, state="readonly", width=12)\
+              .pack(side="left", padx=2)
+            tk.Entry(filter_frame, textvariable=value, width=20).pack(side="left", padx=2)
+            self.query_vars["filters"].append((field, operator, value))
+
+        group_frame = tk.Frame(frame)
+        group_frame.pack(fill="x", pady=2)
+        tk.Label(group_frame, text="Grouper par :").pack(side="left")
+        self.query_vars["group_by"] = []
+        for _ in range(self.QUERY_GROUP_FIELDS):
+            field = tk.StringVar()
+            self.query_field_boxes.append(ttk.Combobox(group_frame, textvariable=field, width=14))
+            self.query_field_boxes[-1].pack(side="left", padx=2)
+            self.query_vars["group_by"].append(field)
+        tk.Label(group_frame, text="Agrégats :").pack(side="left", padx=(10, 0))
+        self.query_vars["aggregates"] = []
+        for _ in range(self.QUERY_AGGREGATE_ROWS):
+            function, field = tk.StringVar(), tk.StringVar()
+            ttk.Combobox(group_frame, textvariable=function, values=("", *AGGREGATES), state="readonly", width=6)\
+              .pack(side="left", padx=2)
+            self.query_field_boxes.append(ttk.Combobox(group_frame, textvariable=field, width=12))
+            self.query_field_boxes[-1].pack(side="left", padx=2)
+            self.query_vars["aggregates"].append((function, field))
+
+        run_frame = tk.Frame(frame)
+        run_frame.pack(fill="x", pady=2)
+        tk.Label(run_frame, text="Trier par :").pack(side="left")
+        self.query_vars["sort"] = tk.StringVar()
+        self.query_sort_box = ttk.Combobox(run_frame, textvariable=self.query_vars["sort"], width=16,
+                                           postcommand=self.update_query_sort_columns)
+        self.query_sort_box.pack(side="left", padx=2)
+        self.query_vars["descending"] = tk.BooleanVar(value=False)
+        tk.Checkbutton(run_frame, text="décroissant", variable=self.query_vars["descending"]).pack(side="left")
+        tk.Label(run_frame, text="Limite :").pack(side="left", padx=(10, 0))
+        self.query_vars["limit"] = tk.StringVar(value="100")
+        tk.Entry(run_frame, textvariable=self.query_vars["limit"], width=6).pack(side="left", padx=2)
+        tk.Button(run_frame, text="Exécuter", command=self.run_query).pack(side="left", padx=10)
+
+        self.query_status = tk.Label(frame, text="", anchor="w", justify="left")
+        self.query_status.pack(fill="x")
+        self.query_tree = ttk.Treeview(frame, show="headings", height=10)
+        self.query_tree.pack(fill="both", expand=True, pady=5)
+        self.update_query_fields()
+        if self.current_query:
+            self.fill_query_form(self.current_query)
+
+    def query_source(self):
+        label = self.query_vars["source"].get()
+        return next(name for name, text in QUERY_SOURCES.items() if text == label)
+
+    def update_query_fields(self):
+        fields = ("", *self.core.queries.fields(self.query_source()))
+        for box in self.query_field_boxes:
+            box.config(values=fields)
+
+    def update_query_sort_columns(self):
+        query = self.read_query_form()
+        columns = [*query["group_by"], *(aggregate_name(function, field) for function, field in query["aggregates"])]
+        self.query_sort_box.config(values=columns or self.core.queries.fields(query["source"]))
+
+    def read_query_form(self):
+        """Requête décrite par le formulaire (dict JSON, comme les requêtes enregistrées)."""
+        v = self.query_vars
+        sort = v["sort"].get().strip()
+        return {
+            "source": self.query_source(),
+            "filters": [[field.get(), operator.get(), value.get()] for field, operator, value in v["filters"]
+                        if field.get()],
+            "group_by": [field.get() for field in v["group_by"] if field.get()],
+            "aggregates": [[function.get(), field.get() or None] for function, field in v["aggregates"]
+                           if function.get()],
+            "sort": [[sort, v["descending"].get()]] if sort else [],
+            "fields": [],
+            "limit": v["limit"].get().strip() or None,
+        }
+
+    def fill_query_form(self, query):
+        v = self.query_vars
+        v["source"].set(QUERY_SOURCES.get(query.get("source"), QUERY_SOURCES["orders"]))
+        self.update_query_fields()
+        filters = list(query.get("filters") or ())
+        for position, (field, operator, value) in enumerate(v["filters"]):
+            entry = filters[position] if position < len(filters) else ("", "=", "")
+            field.set(entry[0])
+            operator.set(entry[1])
+            value.set("" if entry[2] is None else str(entry[2]))
+        group_by = list(query.get("group_by") or ())
+        for position, field in enumerate(v["group_by"]):
+            field.set(group_by[position] if position < len(group_by) else "")
+        aggregates = list(query.get("aggregates") or ())
+        for position, (function, field) in enumerate(v["aggregates"]):
+            entry = aggregates[position] if position < len(aggregates) else ("", None)
+            function.set(entry[0])
+            field.set(entry[1] or "")
+        sort = list(query.get("sort") or ())
+        v["sort"].set(sort[0][0] if sort else "")
+        v["descending"].set(bool(sort[0][1]) if sort else False)
+        limit = query.get("limit")
+        v["limit"].set("" if limit is None else str(limit))
+
+    def load_query(self):
+        query = self.core.queries.saved().get(self.query_saved_var.get())
+        if query:
+            self.fill_query_form(query)
+            self.run_query()
+
+    def run_query(self):
+        query = self.read_query_form()
+        try:
+            result = self.core.queries.run(query)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        self.current_query = query
+        tree = self.query_tree
+        tree.delete(*tree.get_children())
+        tree.config(columns=result.columns)
+        for column in result.columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=max(80, 700 // len(result.columns)))
+        for row in result.rows[:self.QUERY_DISPLAY_MAX]:
+            tree.insert("", tk.END, values=[f"{value:.2f}" if type(value) is float else
+                                            "" if value is None else value for value in row])
+        shown = f" ({self.QUERY_DISPLAY_MAX} affichées)" if len(result.rows) > self.QUERY_DISPLAY_MAX else ""
+        self.query_status.config(text=f"{result.matched} ligne(s) retenue(s), {len(result.rows)} ligne(s) de résultat"
+                                      f"{shown} en {result.elapsed:.1f} ms\n" + " ; ".join(result.plan))
+        logging.info(f"{self.current_user} a exécuté une requête sur {query['source']} : "
+                     f"{len(result.rows)} ligne(s) en {result.elapsed:.1f} ms.")
+
+    def save_query(self):
+        name = simpledialog.askstring("Enregistrer la requête", "Nom de la requête :",
+                                      initialvalue=self.query_saved_var.get())
+        if name is None:
+            return
+        try:
+            self.core.queries.save(name, self.read_query_form())
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        self.query_saved_box.config(values=list(self.core.queries.saved()))
+        self.query_saved_var.set(name.strip())
+        logging.info(f"{self.current_user} a enregistré la requête « {name.strip()} ».")
+
+    def delete_query(self):
+        name = self.query_saved_var.get()
+        if not name or not messagebox.askyesno("Confirmer", f"Supprimer la requête « {name} » ?"):
+            return
+        try:
+            self.core.queries.delete(name)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        self.query_saved_box.config(values=list(self.core.queries.saved()))
+        self.query_saved_var.set("")
+        logging.info(f"{self.current_user} a supprimé la requête « {name} ».")
+
+    # ------------------------------------------------------------------------------
+    # Graphiques temporels (Canvas) : séries pré-agrégées, réduites par LTTB avant le tracé
+    # ------------------------------------------------------------------------------
+    def create_time_chart(self, parent, curves, granularity="month", period="Tout", height=240):
+        frame = tk.Frame(parent)
+        frame.pack(fill="x", padx=10, pady=5)
+        controls = tk.Frame(frame)
+        controls.pack(fill="x")
+        granularity_var = tk.StringVar(value=GRANULARITIES[granularity])
+        period_var = tk.StringVar(value=period)
+        tk.Label(controls, text="Période :").pack(side="left")
+        period_box = ttk.Combobox(controls, textvariable=period_var, values=list(self.CHART_PERIODS),
+                                  state="readonly", width=8)
+        period_box.pack(side="left", padx=5)
+        tk.Label(controls, text="Par :").pack(side="left")
+        granularity_box = ttk.Combobox(controls, textvariable=granularity_var, values=list(GRANULARITIES.values()),
+                                       state="readonly", width=8)
+        granularity_box.pack(side="left", padx=5)
+        info = tk.Label(controls, text="", fg="gray")
+        info.pack(side="right")
+        canvas = tk.Canvas(frame, height=height, bg="white", highlightthickness=0)
+        canvas.pack(fill="x", expand=True)
+
+        def redraw(event=None):
+            key = next(key for key, label in GRANULARITIES.items() if label == granularity_var.get())
+            self.draw_time_chart(canvas, info, curves, key, self.CHART_PERIODS[period_var.get()])
+        period_box.bind("<<ComboboxSelected>>", redraw)
+        granularity_box.bind("<<ComboboxSelected>>", redraw)
+        canvas.bind("<Configure>", redraw)  # premier affichage, redimensionnement, retour sur l'écran
+        return canvas
+
+    def draw_time_chart(self, canvas, info, curves, granularity, days):
+        started = time.perf_counter()
+        canvas.delete("all")
+        width, height = max(canvas.winfo_width(), 200), max(canvas.winfo_height(), 100)
+        left, right, top, bottom = 75, 15, 10, 45
+        series = self.core.finance.series
+        end = series.last_day()
+        xs, values = series.series(granularity, end - days + 1 if end and days else None, end)
+        if not xs:
+            canvas.create_text(width / 2, height / 2, text="Aucune commande ni dépense datée.", fill="gray")
+            info.config(text="")
+            return
+        # Au plus un point tous les deux pixels : quelques centaines de points même sur des années de données
+        threshold = max(3, (width - left - right) // 2)
+        lines = [(*lttb(xs, values[key], threshold), label, color) for key, label, color in curves]
+        low = min(0, *(min(ys) for _, ys, _, _ in lines))
+        high = max(0, *(max(ys) for _, ys, _, _ in lines))
+        if high == low:
+            high = low + 1
+        first, last = xs[0], max(xs[-1], xs[0] + 1)
+
+        def px(x):
+            return left + (x - first) * (width - left - right) / (last - first)
+
+        def py(y):
+            return top + (high - y) * (height - top - bottom) / (high - low)
+        for step in range(5):
+            value = low + (high - low) * step / 4
+            y = py(value)
+            canvas.create_line(left, y, width - right, y, fill="#e6e6e6")
+            canvas.create_text(left - 5, y, text=f"{value:,.0f}".replace(",", " "), anchor="e", font=("Arial", 8))
+        canvas.create_line(left, py(0), width - right, py(0), fill="gray")
+        date_format = "%m/%Y" if granularity == "month" else "%d/%m/%Y"
+        for step in range(5):
+            x = first + (last - first) * step / 4
+            canvas.create_text(px(x), height - bottom + 12, font=("Arial", 8),
+                               text=datetime.fromordinal(int(x)).strftime(date_format))
+        for position, (line_x, line_y, label, color) in enumerate(lines):
+            coords = [coord for x, y in zip(line_x, line_y) for coord in (px(x), py(y))]
+            if len(line_x) > 1:
+                canvas.create_line(*coords, fill=color, width=2)
+            else:
+                canvas.create_oval(coords[0] - 3, coords[1] - 3, coords[0] + 3, coords[1] + 3, fill=color, outline="")
+            legend_x = left + position * 150
+            canvas.create_rectangle(legend_x, height - 14, legend_x + 12, height - 4, fill=color, outline="")
+            canvas.create_text(legend_x + 16, height - 9, text=label, anchor="w", font=("Arial", 9))
+        elapsed = (time.perf_counter() - started) * 1000
+        info.config(text=f"{len(lines[0][0])} points par courbe ({len(xs)} intervalles) en {elapsed:.1f} ms")
 
     def show_settings(self):
         self.clear_content_frame()
@@ -1156,6 +2379,8 @@ class Application(tk.Tk):
         theme_color_var = tk.StringVar(value=self.settings.get("theme_color", "lightgray"))
         enable_notifications_var = tk.BooleanVar(value=self.settings.get("enable_notifications", True))
         auto_logout_time_var = tk.StringVar(value=str(self.settings.get("auto_logout_time", 15)))
+        archive_after_var = tk.StringVar(value=str(self.settings.get("archive_after_days", 365)))
+        archive_at_login_var = tk.BooleanVar(value=self.settings.get("archive_at_login", False))
         form_frame = tk.Frame(self.content_frame)
         form_frame.pack(pady=10)
         tk.Label(form_frame, text="Nom de l'entreprise :")\
@@ -1176,6 +2401,14 @@ class Application(tk.Tk):
           .grid(row=3, column=0, sticky="w", padx=5, pady=5)
         tk.Entry(form_frame, textvariable=auto_logout_time_var)\
           .grid(row=3, column=1, padx=5, pady=5)
+        tk.Label(form_frame, text="Archiver après (jours, 0 = jamais) :")\
+          .grid(row=4, column=0, sticky="w", padx=5, pady=5)
+        tk.Entry(form_frame, textvariable=archive_after_var)\
+          .grid(row=4, column=1, padx=5, pady=5)
+        tk.Label(form_frame, text="Archiver automatiquement à la connexion :")\
+          .grid(row=5, column=0, sticky="w", padx=5, pady=5)
+        tk.Checkbutton(form_frame, variable=archive_at_login_var)\
+          .grid(row=5, column=1, padx=5, pady=5)
         
         admin_frame = tk.LabelFrame(self.content_frame, text="Options Administrateur", padx=10, pady=10)
         admin_frame.pack(pady=10)
@@ -1187,34 +2420,244 @@ class Application(tk.Tk):
           .pack(pady=5)
         tk.Button(admin_frame, text="Charger données", command=self.load_data)\
           .pack(pady=5)
+        if self.core.archive is not None:
+            archived = ", ".join(f"{self.core.data.archived_count(name)} {label}" for name, label in
+                                 (("orders", "commandes"), ("expenses", "dépenses"), ("login_events", "connexions")))
+            tk.Label(admin_frame, text=f"Archives : {archived}").pack(pady=2)
+            tk.Button(admin_frame, text="Archiver maintenant", command=lambda: self.archive_cold_data(manual=True))\
+              .pack(pady=5)
+
+        backup_frame = tk.LabelFrame(self.content_frame, text="Sauvegardes", padx=10, pady=10)
+        backup_frame.pack(pady=10, fill="x", padx=10)
+        columns = ("Date", "Origine", "Commandes", "Clients", "Nouveaux octets")
+        self.backups_tree = ttk.Treeview(backup_frame, columns=columns, show="headings", height=6)
+        for col in columns:
+            self.backups_tree.heading(col, text=col)
+        self.backups_tree.pack(fill="x")
+        backup_buttons = tk.Frame(backup_frame)
+        backup_buttons.pack(pady=5)
+        tk.Button(backup_buttons, text="Sauvegarder maintenant", command=lambda: self.start_backup("manuelle"))\
+          .pack(side="left", padx=5)
+        tk.Button(backup_buttons, text="Restaurer la sauvegarde sélectionnée", command=self.restore_backup)\
+          .pack(side="left", padx=5)
+        self.refresh_backups()
         
         button_frame = tk.Frame(self.content_frame)
         button_frame.pack(pady=10)
         tk.Button(button_frame, text="Enregistrer les paramètres", command=lambda: self.save_settings(
-            company_name_var.get(), theme_color_var.get(), enable_notifications_var.get(), auto_logout_time_var.get()
+            company_name_var.get(), theme_color_var.get(), enable_notifications_var.get(), auto_logout_time_var.get(),
+            archive_after_var.get(), archive_at_login_var.get()
         )).pack(side="left", padx=10)
         tk.Button(button_frame, text="Réinitialiser les données", command=self.reset_data)\
           .pack(side="left", padx=10)
 
-    def save_settings(self, company_name, theme_color, enable_notifications, auto_logout_time):
+    # ------------------------------------------------------------------------------
+    # Sauvegardes versionnées : capture sur le thread Tk, écriture et restauration en arrière-plan
+    # ------------------------------------------------------------------------------
+    def run_in_background(self, work, on_done):
+        """Exécute work() dans un thread ; on_done(résultat, erreur) est rappelé sur le thread Tk."""
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = work()
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+
+        def poll():
+            if thread.is_alive():
+                self.after(100, poll)
+            else:
+                on_done(outcome.get("result"), outcome.get("error"))
+        self.after(100, poll)
+
+    def schedule_backup(self):
+        interval = self.settings.get("backup_interval", 30)
+        if self.backup_job is None and interval:
+            self.backup_job = self.after(int(interval * 60000), self.run_scheduled_backup)
+
+    def run_scheduled_backup(self):
+        self.backup_job = None
+        if self.core.backups.has_changes():
+            self.start_backup("auto")
+        self.schedule_backup()
+
+    def start_backup(self, label):
+        """Copie les données modifiées maintenant, puis écrit les blocs et applique la rétention en arrière-plan."""
+        job = self.core.backups.capture(label)
+        manual = label == "manuelle"
+
+        def write():
+            manifest = self.core.backups.write(job)
+            self.core.backups.prune()
+            return manifest
+
+        def done(manifest, error):
+            if error is not None:
+                logging.error(f"Échec de la sauvegarde ({label}) : {error}")
+                if manual:
+                    messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde: {error}")
+                return
+            self.refresh_backups()
+            if manual:
+                messagebox.showinfo("Succès", f"Sauvegarde {manifest['created']} terminée "
+                                              f"({manifest['new_bytes']} octets nouveaux).")
+        self.run_in_background(write, done)
+
+    def refresh_backups(self):
+        tree = getattr(self, "backups_tree", None)
+        if tree is None or not tree.winfo_exists():
+            return
+        for row in tree.get_children():
+            tree.delete(row)
+        try:
+            manifests = self.core.backups.list_backups()
+        except CompanyError as e:
+            logging.error(f"Lecture des sauvegardes impossible : {e}")
+            return
+        for manifest in manifests:
+            records = manifest.get("records", {})
+            tree.insert("", tk.END, iid=manifest["id"], values=(
+                manifest["created"], manifest["label"], records.get("orders", ""), records.get("clients_list", ""),
+                manifest.get("new_bytes", "")))
+
+    def restore_backup(self):
+        selected = self.backups_tree.selection()
+        if not selected:
+            messagebox.showerror("Erreur", "Sélectionnez une sauvegarde à restaurer.")
+            return
+        backup_id = selected[0]
+        created = self.backups_tree.item(backup_id, "values")[0]
+        if not messagebox.askyesno("Restaurer", f"Remplacer toutes les données par la sauvegarde du {created} ?\n"
+                                                "L'état actuel sera sauvegardé avant la restauration."):
+            return
+        self.start_backup("avant restauration")
+
+        def done(data, error):
+            if error is not None:
+                messagebox.showerror("Erreur", f"Erreur lors de la restauration: {error}")
+                return
+            try:
+                self.core.restore_backup(backup_id, data)
+            except Exception as e:
+                messagebox.showerror("Erreur", f"Erreur lors de la restauration: {e}")
+                return
+            logging.info(f"{self.current_user} a restauré la sauvegarde {backup_id}.")
+            self.configure_instrumentation()
+            self.warm_search_index()
+            self.reset_screens()
+            self.show_settings()
+            messagebox.showinfo("Succès", f"Données restaurées à l'état du {created}.")
+        self.run_in_background(lambda: self.core.backups.restore(backup_id), done)
+
+    def save_settings(self, company_name, theme_color, enable_notifications, auto_logout_time,
+                      archive_after_days=None, archive_at_login=None):
         try:
             auto_logout_time = int(auto_logout_time)
         except ValueError:
             messagebox.showerror("Erreur", "Le temps d'auto-déconnexion doit être un entier.")
             return
-        self.settings["company_name"] = company_name
-        self.settings["theme_color"] = theme_color
-        self.settings["enable_notifications"] = enable_notifications
-        self.settings["auto_logout_time"] = auto_logout_time
+        values = {"company_name": company_name, "theme_color": theme_color,
+                  "enable_notifications": enable_notifications, "auto_logout_time": auto_logout_time}
+        if archive_after_days is not None:
+            try:
+                values["archive_after_days"] = max(0, int(archive_after_days))
+            except ValueError:
+                messagebox.showerror("Erreur", "Le délai d'archivage doit être un nombre entier de jours.")
+                return
+        if archive_at_login is not None:
+            values["archive_at_login"] = bool(archive_at_login)
+        self.core.data.update("settings", self.settings, values)
         self.title(company_name)
         self.nav_frame.config(bg=theme_color)
         messagebox.showinfo("Succès", "Paramètres enregistrés avec succès !")
         self.reset_logout_timer()
+        self.schedule_task_notifications()
+        self.schedule_backup()
+
+    # ------------------------------------------------------------------------------
+    # Module Performance (administrateur) : latences par action et profils
+    # ------------------------------------------------------------------------------
+    def configure_instrumentation(self):
+        forced = os.environ.get("COMPANY_APP_PERF") == "1"
+        self.perf.configure(
+            enabled=forced or self.settings.get("enable_instrumentation", False),
+            profile=self.settings.get("profile_actions", False),
+            trace_memory=self.settings.get("trace_memory", False)
+        )
+
+    def show_performance(self):
+        self.clear_content_frame()
+        tk.Label(self.content_frame, text="Performance", font=("Arial", 16)).pack(pady=10)
+        options_frame = tk.Frame(self.content_frame)
+        options_frame.pack(pady=5)
+        enabled_var = tk.BooleanVar(value=self.perf.enabled)
+        profile_var = tk.BooleanVar(value=self.perf.profile)
+        memory_var = tk.BooleanVar(value=self.perf.trace_memory)
+
+        def apply_options():
+            self.core.data.update("settings", self.settings, {
+                "enable_instrumentation": enabled_var.get(), "profile_actions": profile_var.get(),
+                "trace_memory": memory_var.get()})
+            self.configure_instrumentation()
+            logging.info(f"{self.current_user} a modifié l'instrumentation : {self.settings}.")
+
+        tk.Checkbutton(options_frame, text="Mesurer les actions", variable=enabled_var, command=apply_options)\
+          .pack(side="left", padx=5)
+        tk.Checkbutton(options_frame, text="cProfile", variable=profile_var, command=apply_options)\
+          .pack(side="left", padx=5)
+        tk.Checkbutton(options_frame, text="tracemalloc", variable=memory_var, command=apply_options)\
+          .pack(side="left", padx=5)
+
+        columns = ("Action", "Appels", "Moyenne (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)", "Mémoire (Ko)")
+        self.performance_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings")
+        for col in columns:
+            self.performance_tree.heading(col, text=col)
+            self.performance_tree.column(col, width=90 if col != "Action" else 180)
+        self.performance_tree.pack(pady=5, fill="both", expand=True)
+
+        btn_frame = tk.Frame(self.content_frame)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Rafraîchir", command=self.refresh_performance)\
+          .pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Réinitialiser", command=self.reset_performance)\
+          .pack(side="left", padx=5)
+        tk.Button(btn_frame, text="Exporter les profils", command=self.dump_performance)\
+          .pack(side="left", padx=5)
+        self.refresh_performance()
+
+    def refresh_performance(self):
+        for row in self.performance_tree.get_children():
+            self.performance_tree.delete(row)
+        for action, stats in self.perf.summary().items():
+            self.performance_tree.insert("", tk.END, values=(
+                action, stats["count"], f"{stats['mean_ms']:.1f}", f"{stats['p50_ms']:.1f}",
+                f"{stats['p95_ms']:.1f}", f"{stats['p99_ms']:.1f}", f"{stats['max_ms']:.1f}",
+                f"{stats['peak_memory_kb']:.0f}"))
+
+    def reset_performance(self):
+        self.perf.reset()
+        self.refresh_performance()
+
+    def dump_performance(self):
+        directory = filedialog.askdirectory(title="Dossier de destination des profils")
+        if not directory:
+            return
+        try:
+            written = self.perf.dump(directory)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de l'export des profils : {e}")
+            return
+        messagebox.showinfo("Succès", f"{len(written)} fichier(s) écrit(s) dans {directory}")
+        logging.info(f"{self.current_user} a exporté les profils de performance vers {directory}.")
 
     def reset_data(self):
         if messagebox.askyesno("Réinitialiser", "Réinitialiser l'inventaire et la liste des clients ?"):
-            self.prepare_data()
-            self.clients_list = []
+            self.start_backup("avant réinitialisation")
+            self.core.reset()
             messagebox.showinfo("Réinitialisation", "Les données ont été réinitialisées.")
 
     def update_admin_password(self):
@@ -1234,16 +2677,38 @@ class Application(tk.Tk):
         logging.info(f"{self.current_user} a mis à jour le mot de passe admin.")
 
     def clear_login_logs(self):
-        self.login_events = []
+        archived = self.core.data.archived_count("login_events")
+        if archived and not messagebox.askyesno(
+                "Effacer", f"{archived} connexion(s) archivée(s) seront aussi supprimées, sans annulation possible. "
+                           "Continuer ?"):
+            return
+        self.core.logins.clear()
         messagebox.showinfo("Succès", "Les logs de connexion ont été effacés.")
         logging.info(f"{self.current_user} a effacé les logs de connexion.")
 
+    def archive_cold_data(self, manual=False):
+        """Archive les commandes, dépenses et connexions anciennes (depuis les paramètres, ou à la connexion
+        si le paramètre archive_at_login est activé)."""
+        try:
+            moved = self.core.archive_cold()
+        except (OSError, CompanyError) as e:
+            logging.error(f"Échec de l'archivage : {e}")
+            if manual:
+                messagebox.showerror("Erreur", f"Erreur lors de l'archivage: {e}")
+            return
+        if moved:
+            logging.info(f"{self.current_user} : {sum(moved.values())} enregistrement(s) archivé(s).")
+            self.update_history_buttons()  # les collections relues vident l'historique d'annulation
+        if manual:
+            messagebox.showinfo("Archivage", f"{sum(moved.values())} enregistrement(s) archivé(s)."
+                                if moved else "Aucun enregistrement à archiver.")
+            self.show_settings()
+
     def show_profile(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Mon Profil", font=("Arial", 16)).pack(pady=10)
         info_text = f"Utilisateur : {self.current_user}\n"
-        user_events = [event for event in self.login_events if event["user"] == self.current_user]
-        info_text += f"Nombre de connexions : {len(user_events)}\n"
+        info_text += f"Nombre de connexions : {self.core.logins.count_for(self.current_user)}\n"
         tk.Label(self.content_frame, text=info_text, font=("Arial", 14), justify="left")\
           .pack(padx=10, pady=10)
 
@@ -1252,10 +2717,10 @@ class Application(tk.Tk):
         tk.Label(self.content_frame, text="Feedback", font=("Arial", 16)).pack(pady=10)
         feedback_frame = tk.Frame(self.content_frame)
         feedback_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        feedback_listbox = tk.Listbox(feedback_frame, width=80, height=10)
-        feedback_listbox.pack(pady=5)
+        self.feedback_listbox = tk.Listbox(feedback_frame, width=80, height=10)
+        self.feedback_listbox.pack(pady=5)
         for fb in self.feedbacks:
-            feedback_listbox.insert(
+            self.feedback_listbox.insert(
                 tk.END, f"{fb['time']} - {fb['user']}: {fb['message']}"
             )
         tk.Button(self.content_frame, text="Ajouter Feedback", command=self.add_feedback)\
@@ -1264,28 +2729,170 @@ class Application(tk.Tk):
     def add_feedback(self):
         message = simpledialog.askstring("Ajouter Feedback", "Entrez votre feedback :")
         if message:
-            fb = {
-                "user": self.current_user,
-                "message": message,
-                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            self.feedbacks.append(fb)
+            self.core.feedbacks.add_feedback(self.current_user, message)
             messagebox.showinfo("Succès", "Feedback ajouté.")
             self.show_feedback()
 
+    # ------------------------------------------------------------------------------
+    # Recherche globale
+    # ------------------------------------------------------------------------------
+    def warm_search_index(self):
+        """Construit l'index de recherche en arrière-plan à partir d'une copie des collections."""
+        self.search_generation += 1
+        generation = self.search_generation
+        self.core.search.reset()
+        copy = self.core.search.snapshot()
+
+        def done(index, error):
+            if error is not None:
+                logging.error(f"Échec de la construction de l'index de recherche : {error}")
+            elif generation == self.search_generation:
+                self.core.search.install(index)
+                logging.info(f"Index de recherche prêt : {len(index.docs)} élément(s).")
+        self.run_in_background(lambda: self.core.search.build_index(copy), done)
+
+    def show_search(self, query=None):
+        self.clear_content_frame()
+        tk.Label(self.content_frame, text="Recherche globale", font=("Arial", 16)).pack(pady=10)
+        search_frame = tk.Frame(self.content_frame)
+        search_frame.pack(pady=5)
+        self.search_query_entry = tk.Entry(search_frame, width=40)
+        self.search_query_entry.pack(side="left", padx=5)
+        if query:
+            self.search_query_entry.insert(0, query)
+        self.search_type_var = tk.StringVar(value="Tout")
+        ttk.Combobox(search_frame, textvariable=self.search_type_var, values=("Tout", *SEARCH_LABELS.values()),
+                     state="readonly", width=12).pack(side="left", padx=5)
+        tk.Button(search_frame, text="Rechercher", command=self.run_search).pack(side="left", padx=5)
+        self.search_query_entry.bind("<Return>", lambda event: self.run_search())
+        self.search_status = tk.Label(self.content_frame, text="")
+        self.search_status.pack(pady=5)
+        columns = ("Type", "Résultat", "Détail")
+        self.search_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings", height=15)
+        for col, width in zip(columns, (100, 220, 420)):
+            self.search_tree.heading(col, text=col)
+            self.search_tree.column(col, width=width)
+        self.search_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.search_tree.bind("<Double-1>", lambda event: self.open_search_result())
+        self.search_tree.bind("<Return>", lambda event: self.open_search_result())
+        tk.Label(self.content_frame, text="Double-clic : ouvrir l'élément dans son écran.").pack(pady=5)
+        self.search_hits = {}
+        self.search_query_entry.focus_set()
+        if query:
+            self.run_search()
+
+    def run_search(self):
+        query = self.search_query_entry.get().strip()
+        label = self.search_type_var.get()
+        collections = None if label == "Tout" else [name for name, text in SEARCH_LABELS.items() if text == label]
+        started = datetime.now()
+        hits = self.core.search.search(query, limit=200, collections=collections)
+        elapsed = (datetime.now() - started).total_seconds() * 1000
+        self.search_tree.delete(*self.search_tree.get_children())
+        self.search_hits = {}
+        for hit in hits:
+            title, detail = hit.describe()
+            row = self.search_tree.insert("", tk.END, values=(hit.label, title, detail))
+            self.search_hits[row] = hit
+        self.search_status.config(text=f"{len(hits)} résultat(s) en {elapsed:.1f} ms")
+        logging.info(f"{self.current_user} a recherché « {query} » : {len(hits)} résultat(s) en {elapsed:.1f} ms.")
+
+    def open_search_result(self):
+        selected = self.search_tree.selection()
+        if not selected:
+            return
+        hit = self.search_hits[selected[0]]
+        screen, widget_name = self.SEARCH_TARGETS[hit.collection]
+        getattr(self, screen)()
+        widget = getattr(self, widget_name, None) if widget_name else None
+        if isinstance(widget, tk.Listbox):
+            if hit.collection == "inventory_data":
+                self.category_var.set(hit.category)
+                self.refresh_inventory_list()
+                records = self.core.inventory.products(hit.category)
+            else:
+                records = self.feedbacks
+            position = next((i for i, record in enumerate(records) if record is hit.record), None)
+            if position is not None:
+                widget.selection_clear(0, tk.END)
+                widget.selection_set(position)
+                widget.see(position)
+                widget.focus_set()
+                return
+        elif widget is not None:
+            if hit.collection == "shifts":
+                self.shift_view_var.set("Tous")
+                self.shift_employee_entry.delete(0, tk.END)
+                self.refresh_shifts()
+            if hit.collection == "tasks":
+                row = next((row for row, task in self.task_rows.items() if task is hit.record), None)
+            else:
+                row = str(id(hit.record))
+                if not widget.exists(row) and screen in self.SCREEN_REFRESHERS:
+                    getattr(self, self.SCREEN_REFRESHERS[screen])()  # liste filtrée : on réaffiche tout
+            if row is not None and widget.exists(row):
+                widget.selection_set(row)
+                widget.see(row)
+                widget.focus_set()
+                return
+        messagebox.showinfo("Recherche", "Cet élément n'est pas affiché dans cet écran.")
+
     def show_tasks(self):
         self.clear_content_frame()
         tk.Label(self.content_frame, text="Mes Tâches", font=("Arial", 16)).pack(pady=10)
-        tasks_listbox = tk.Listbox(self.content_frame, width=80, height=10)
-        tasks_listbox.pack(pady=5)
-        for t in self.tasks:
-            if self.role == "employee" and t.get("assignee") != self.current_user:
-                continue
-            tasks_listbox.insert(
-                tk.END, f"{t.get('due','N/A')} - {t.get('task')} (Status : {t.get('status','Pending')})"
-            )
+        columns = ("Échéance", "Tâche", "Assigné à", "Statut")
+        self.tasks_tree = ttk.Treeview(self.content_frame, columns=columns, show="headings", height=12)
+        for col in columns:
+            self.tasks_tree.heading(col, text=col)
+        self.tasks_tree.tag_configure("overdue", background="mistyrose")
+        self.tasks_tree.tag_configure("closed", foreground="gray")
+        self.tasks_tree.pack(pady=5, fill="both", expand=True)
+        status_frame = tk.Frame(self.content_frame)
+        status_frame.pack(pady=5)
+        self.task_status_var = tk.StringVar(value=TASK_STATUSES["In Progress"])
+        ttk.Combobox(status_frame, textvariable=self.task_status_var, values=list(TASK_STATUSES.values()),
+                     state="readonly", width=12).pack(side="left", padx=5)
+        tk.Button(status_frame, text="Changer le statut", command=self.change_task_status)\
+          .pack(side="left", padx=5)
         tk.Button(self.content_frame, text="Ajouter Tâche", command=self.add_task)\
           .pack(pady=5)
+        self.refresh_tasks()
+
+    def refresh_tasks(self):
+        for row in self.tasks_tree.get_children():
+            self.tasks_tree.delete(row)
+        self.task_rows = {}
+        user = self.current_user if self.role == "employee" else None
+        now = datetime.now()
+        for t in self.core.tasks.tasks_for(user):
+            status = t.get("status", "Pending")
+            due = safe_due(t)
+            if status not in OPEN_STATUSES:
+                tags = ("closed",)
+            elif due is not None and due < now:
+                tags = ("overdue",)
+            else:
+                tags = ()
+            row = self.tasks_tree.insert("", tk.END, tags=tags, values=(
+                t.get("due") or "N/A", t.get("task"), t.get("assignee"), TASK_STATUSES.get(status, status)))
+            self.task_rows[row] = t
+
+    def change_task_status(self):
+        selected = self.tasks_tree.selection()
+        if not selected:
+            messagebox.showerror("Erreur", "Sélectionnez une tâche.")
+            return
+        label = self.task_status_var.get()
+        status = next(code for code, text in TASK_STATUSES.items() if text == label)
+        try:
+            for row in selected:
+                self.core.tasks.set_status(self.task_rows[row], status)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+        else:
+            logging.info(f"{self.current_user} a passé {len(selected)} tâche(s) au statut '{status}'.")
+        self.refresh_tasks()
+        self.schedule_task_notifications()
 
     def add_task(self):
         if self.role != "admin":
@@ -1295,16 +2902,47 @@ class Application(tk.Tk):
         if not task_text:
             return
         assignee = simpledialog.askstring("Ajouter Tâche", "Attribuer à l'employé (nom) :")
-        due_date = simpledialog.askstring("Ajouter Tâche", "Date d'échéance (AAAA-MM-JJ) :")
-        new_task = {
-            "task": task_text,
-            "assignee": assignee,
-            "due": due_date,
-            "status": "Pending"
-        }
-        self.tasks.append(new_task)
+        due_date = simpledialog.askstring("Ajouter Tâche", "Date d'échéance (AAAA-MM-JJ ou AAAA-MM-JJ HH:MM) :")
+        try:
+            self.core.tasks.add_task(task_text, assignee, due_date)
+        except CompanyError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
         messagebox.showinfo("Succès", "Tâche ajoutée.")
         self.show_tasks()
+        self.schedule_task_notifications()
+
+    # ------------------------------------------------------------------------------
+    # Rappels de tâches : un seul timer, armé sur le prochain rappel de la file
+    # ------------------------------------------------------------------------------
+    def schedule_task_notifications(self):
+        if self.task_job:
+            self.after_cancel(self.task_job)
+            self.task_job = None
+        if not self.current_user or not self.settings.get("enable_notifications", True):
+            return
+        user = self.current_user if self.role == "employee" else None
+        notifications = self.core.tasks.due_notifications(datetime.now(), user)
+        if notifications:
+            self.show_task_notifications(notifications)
+        next_time = self.core.tasks.next_notification_time()
+        if next_time is not None:
+            delay_ms = int((next_time - datetime.now()).total_seconds() * 1000)
+            self.task_job = self.after(min(max(delay_ms, 0), self.TASK_TIMER_MAX_MS),
+                                       self.schedule_task_notifications)
+
+    def show_task_notifications(self, notifications):
+        overdue = [t for kind, t in notifications if kind == "overdue"]
+        upcoming = [t for kind, t in notifications if kind == "upcoming"]
+        lines = []
+        if overdue:
+            lines.append("Tâches en retard :")
+            lines.extend(f"  • {t.get('task')} ({t.get('assignee')}, échéance {t.get('due')})" for t in overdue[:15])
+        if upcoming:
+            lines.append("À rendre dans les prochaines 24 h :")
+            lines.extend(f"  • {t.get('task')} ({t.get('assignee')}, échéance {t.get('due')})" for t in upcoming[:15])
+        logging.info(f"Rappels de tâches : {len(overdue)} en retard, {len(upcoming)} bientôt dues.")
+        messagebox.showwarning("Rappel de tâches", "\n".join(lines))
 
     def logout(self):
         if messagebox.askyesno("Déconnexion", "Confirmez-vous la déconnexion ?"):
@@ -1313,9 +2951,26 @@ class Application(tk.Tk):
             self.role = None
             if self.inactivity_timer:
                 self.after_cancel(self.inactivity_timer)
+            if self.sync_job:
+                self.after_cancel(self.sync_job)
+                self.sync_job = None
+            if self.task_job:
+                self.after_cancel(self.task_job)
+                self.task_job = None
+            if self.backup_job:
+                self.after_cancel(self.backup_job)
+                self.backup_job = None
+            if self.jobs_job:
+                self.after_cancel(self.jobs_job)
+                self.jobs_job = None
             self.unbind_all("<Any-KeyPress>")
             self.unbind_all("<Any-Button>")
+            self.unbind_all("<Control-z>")
+            self.unbind_all("<Control-y>")
+            self.core.history.clear()
+            self.reset_screens()
             self.main_menu_frame.destroy()
+            self.content_frame = None
             self.create_start_frame()
 
 # -----------------------------------------------------------------------------
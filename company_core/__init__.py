@@ -0,0 +1,52 @@
+"""Cœur métier de Ultimate Company App, sans dépendance à Tkinter."""
+from .analysis import AnalysisService
+from .api import ApiServer, CallQueue, CompanyApi
+from .archive import ARCHIVE_LAYOUTS, DEFAULT_ARCHIVE_DIR, ArchiveStore, archivable
+from .backup import DEFAULT_BACKUP_DIR, BackupManager, RetentionPolicy
+from .bundle import DEFAULT_BUNDLE_DIR, DEFAULT_VENDOR_DIR, build_bundle, download_assets, ensure_bundle
+from .compare import DIFF_COLUMNS, CompareReport, SheetDiff, WorkbookComparer, guess_key
+from .core import CompanyCore
+from .errors import CompanyError, DependencyError, ShiftConflictError, ValidationError
+from .formula import FORMULA_EXAMPLES, ComputedColumn, FormulaEngine, compile_formula, format_result
+from .export import EXPORT_EXTENSIONS, EXPORT_SOURCES, ExportService
+from .history import Command, CommandLog, Operation
+from .importer import IMPORT_SCHEMAS, BulkImporter, ImportReport, guess_mapping, read_header
+from .instrumentation import ActionStats, Instrumentation
+from .jobs import DEFAULT_JOB_STATE, JOB_FREQUENCIES, JOB_KINDS, JobScheduler, next_run
+from .ledger import Account, ClientLedger, client_key
+from .models import (
+    DATA_KEYS, DEFAULT_CATEGORIES, DEFAULT_SETTINGS, LIST_COLLECTIONS, CompanyData,
+    hash_password, now_str
+)
+from .persistence import DEFAULT_DATA_FILE, load_data_file, load_json, save_data_file, save_json
+from .query import AGGREGATES, OPERATORS, PRESET_QUERIES, QUERY_SOURCES, QueryEngine, QueryResult, aggregate_name
+from .scheduling import IntervalTree, ShiftSchedule, parse_shift
+from .search import SEARCH_FIELDS, SEARCH_LABELS, SearchHit, SearchIndex, tokenize
+from .snapshot import SNAPSHOT_EXTENSION, load_snapshot, save_snapshot
+from .sorting import TableSorter, sort_key
+from .stock import MOVEMENT_KINDS, StockAlert, StockLedger, product_key
+from .storage import JsonStorage, SnapshotStorage, SQLiteStorage, StorageBackend, open_storage
+from .tasks import OPEN_STATUSES, TASK_STATUSES, TASK_TRANSITIONS, TaskQueue, parse_due, safe_due
+from .timeseries import GRANULARITIES, FinanceSeries, lttb
+
+__all__ = [
+    "AnalysisService", "ApiServer", "CallQueue", "CompanyApi", "ARCHIVE_LAYOUTS", "DEFAULT_ARCHIVE_DIR",
+    "ArchiveStore", "archivable", "DEFAULT_BACKUP_DIR", "BackupManager", "RetentionPolicy",
+    "DEFAULT_BUNDLE_DIR", "DEFAULT_VENDOR_DIR", "build_bundle", "download_assets", "ensure_bundle",
+    "DIFF_COLUMNS", "CompareReport", "SheetDiff", "WorkbookComparer", "guess_key", "CompanyCore",
+    "CompanyError", "DependencyError", "ShiftConflictError", "ValidationError", "FORMULA_EXAMPLES",
+    "ComputedColumn", "FormulaEngine", "compile_formula", "format_result", "EXPORT_EXTENSIONS",
+    "EXPORT_SOURCES", "ExportService", "Command", "CommandLog", "Operation", "IMPORT_SCHEMAS",
+    "BulkImporter", "ImportReport", "guess_mapping", "read_header", "ActionStats",
+    "Instrumentation", "DEFAULT_JOB_STATE", "JOB_FREQUENCIES", "JOB_KINDS", "JobScheduler",
+    "next_run", "Account", "ClientLedger", "client_key", "DATA_KEYS", "DEFAULT_CATEGORIES",
+    "DEFAULT_SETTINGS", "LIST_COLLECTIONS", "CompanyData", "hash_password", "now_str",
+    "DEFAULT_DATA_FILE", "load_data_file", "load_json", "save_data_file", "save_json", "AGGREGATES",
+    "OPERATORS", "PRESET_QUERIES", "QUERY_SOURCES", "QueryEngine", "QueryResult", "aggregate_name",
+    "IntervalTree", "ShiftSchedule", "parse_shift", "SEARCH_FIELDS", "SEARCH_LABELS", "SearchHit",
+    "SearchIndex", "tokenize", "SNAPSHOT_EXTENSION", "load_snapshot", "save_snapshot",
+    "TableSorter", "sort_key", "MOVEMENT_KINDS", "StockAlert", "StockLedger", "product_key",
+    "JsonStorage", "SnapshotStorage", "SQLiteStorage", "StorageBackend", "open_storage",
+    "OPEN_STATUSES", "TASK_STATUSES", "TASK_TRANSITIONS", "TaskQueue", "parse_due", "safe_due",
+    "GRANULARITIES", "FinanceSeries", "lttb"
+]
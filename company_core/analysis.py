@@ -0,0 +1,50 @@
+from .compare import WorkbookComparer
+from .errors import DependencyError
+
+
+class AnalysisService:
+    """Analyse de classeurs Excel (pandas est importé seulement à l'usage)."""
+
+    def analyse_excel(self, file_path):
+        """Retourne un résumé par feuille : lignes, colonnes et statistiques par colonne."""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise DependencyError("Le module pandas est requis pour l'analyse Excel.")
+        excel_data = pd.read_excel(file_path, sheet_name=None)
+        sheets = []
+        for sheet_name, df in excel_data.items():
+            columns = []
+            for col in df.columns:
+                columns.append({
+                    "name": col,
+                    "dtype": str(df[col].dtype),
+                    "non_null": int(df[col].count()),
+                    "samples": df[col].dropna().unique()[:5].tolist(),
+                })
+            sheets.append({
+                "sheet": sheet_name,
+                "rows": len(df),
+                "columns": columns,
+            })
+        return sheets
+
+    def compare_workbooks(self, old_path, new_path, key=None, output=None):
+        """Lignes ajoutées, supprimées et modifiées entre deux versions d'un classeur (voir compare.py)."""
+        return WorkbookComparer().compare(old_path, new_path, key, output)
+
+    def format_comparison(self, report):
+        return WorkbookComparer.format_report(report)
+
+    def format_report(self, file_path, sheets):
+        analysis_text = f"Analyse du fichier : {file_path}\n\n"
+        for sheet in sheets:
+            analysis_text += f"Feuille: {sheet['sheet']}\n"
+            analysis_text += f"  Nombre de lignes: {sheet['rows']}\n"
+            analysis_text += f"  Nombre de colonnes: {len(sheet['columns'])}\n"
+            analysis_text += f"  Colonnes: {', '.join(str(c['name']) for c in sheet['columns'])}\n"
+            for col in sheet["columns"]:
+                analysis_text += (f"    '{col['name']}': type {col['dtype']}, non-null: {col['non_null']}, "
+                                  f"exemples: {col['samples']}\n")
+            analysis_text += "\n"
+        return analysis_text
@@ -0,0 +1,296 @@
+import argparse
+import copy
+import gzip
+import json
+import logging
+import mimetypes
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .models import DATA_KEYS, LIST_COLLECTIONS
+
+# -----------------------------------------------------------------------------
+# API JSON LOCALE : lecture des données en direct par la version HTML
+# -----------------------------------------------------------------------------
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+GZIP_MIN_SIZE = 1024  # en dessous, la compression ne vaut pas le coût
+CALL_TIMEOUT = 10     # secondes d'attente du thread des données avant une réponse 503
+
+
+def inventory_records(inventory_data):
+    """Aplatit l'inventaire en lignes {"category", "name", "price"} paginables."""
+    return [dict(product, category=category)
+            for category, products in inventory_data.items() for product in products]
+
+
+class CallQueue:
+    """Appels exécutés par le thread qui modifie les données (le thread Tk), quand il appelle pump().
+
+    Les threads du serveur HTTP n'y lisent jamais les collections directement : ils y déposent
+    la construction de la réponse et attendent sa copie, encodée ensuite en JSON de leur côté.
+    """
+
+    def __init__(self):
+        self._calls = queue.Queue()
+
+    def __call__(self, func, timeout=CALL_TIMEOUT):
+        done = threading.Event()
+        outcome = {}
+        self._calls.put((func, done, outcome))
+        if not done.wait(timeout):
+            raise TimeoutError("Le thread des données n'a pas répondu.")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def pump(self):
+        """Exécute les appels en attente ; à rappeler régulièrement depuis le thread des données."""
+        while True:
+            try:
+                func, done, outcome = self._calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                outcome["result"] = func()
+            except Exception as e:
+                outcome["error"] = e
+            done.set()
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes en lecture seule :
+
+    GET /                       -> la page HTML du dashboard (index.html du bundle hors ligne s'il existe)
+    GET /vendor/...             -> ressources du bundle hors ligne
+    GET /api/summary            -> indicateurs du tableau de bord (sans télécharger les collections)
+    GET /api/collections        -> {collection: {"count", "version", "archived"}}
+    GET /api/<collection>       -> page {"total", "offset", "limit", "archived", "items"} (?offset=&limit=)
+
+    count et total ne portent que sur les enregistrements en mémoire, les seuls envoyés ;
+    archived compte ceux sortis vers l'archive (voir archive.py).
+    GET /api/settings           -> paramètres de l'entreprise
+    """
+    server_version = "CompanyApp"
+
+    def log_message(self, format, *args):
+        logging.debug(f"API {self.address_string()} - {format % args}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = url.path.rstrip("/") or "/"
+        try:
+            if route in ("/", "/index.html"):
+                if self.server.static_dir:
+                    self._send_static("index.html")
+                else:
+                    self._send_file(self.server.html_file, "text/html; charset=utf-8")
+            elif route == "/api/summary":
+                self._send_json(self.server.api.summary, etag=self.server.api.etag(*DATA_KEYS))
+            elif route == "/api/collections":
+                self._send_json(self.server.api.collections, etag=self.server.api.etag(*DATA_KEYS))
+            elif route.startswith("/api/"):
+                name = route[len("/api/"):]
+                if name not in DATA_KEYS:
+                    self._send_error(404, f"Collection inconnue : {name}")
+                    return
+                offset = max(0, int(query.get("offset", 0)))
+                limit = min(MAX_PAGE_SIZE, max(1, int(query.get("limit", DEFAULT_PAGE_SIZE))))
+                etag = self.server.api.etag(name, offset, limit)
+                self._send_json(lambda: self.server.api.page(name, offset, limit), etag=etag)
+            elif self.server.static_dir:
+                self._send_static(route.lstrip("/"))
+            else:
+                self._send_error(404, "Ressource introuvable")
+        except ValueError:
+            self._send_error(400, "Paramètres de pagination invalides")
+        except TimeoutError:
+            self._send_error(503, "Application occupée, réessayez.")
+
+    def _send_json(self, payload, etag):
+        """Répond 304 si le client possède déjà cette version, sinon le JSON (gzip si accepté)."""
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self._common_headers(etag)
+            self.end_headers()
+            return
+        if callable(payload):
+            # Copie construite par le thread des données : l'encodage ne lit plus rien de partagé
+            payload = self.server.dispatch(payload)
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._send_body(body, "application/json; charset=utf-8", etag)
+
+    def _send_file(self, path, content_type, max_age=0):
+        if not path or not os.path.isfile(path):
+            self._send_error(404, "Ressource introuvable")
+            return
+        etag = f'"{os.path.getmtime(path):.0f}-{os.path.getsize(path)}"'
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self._common_headers(etag, max_age)
+            self.end_headers()
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self._send_body(body, content_type, etag, max_age)
+
+    def _send_static(self, relative):
+        root = os.path.realpath(self.server.static_dir)
+        path = os.path.realpath(os.path.join(root, relative))
+        if not path.startswith(root + os.sep):
+            self._send_error(404, "Ressource introuvable")
+            return
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type.endswith("javascript"):
+            content_type += "; charset=utf-8"
+        # Les fichiers de vendor/ portent leur version dans le nom : cache long, sans revalidation
+        max_age = 31536000 if relative.startswith("vendor/") else 0
+        self._send_file(path, content_type, max_age)
+
+    def _send_body(self, body, content_type, etag, max_age=0):
+        gzipped = len(body) >= GZIP_MIN_SIZE and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(200)
+        self._common_headers(etag, max_age)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _common_headers(self, etag, max_age=0):
+        self.send_header("ETag", etag)
+        # Par défaut le navigateur garde la réponse mais la revalide toujours (If-None-Match -> 304)
+        self.send_header("Cache-Control", f"max-age={max_age}, immutable" if max_age else "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CompanyApi:
+    """Vues JSON sur un CompanyCore ; les ETags reposent sur CompanyData.versions.
+
+    summary, collections et page retournent des copies : elles sont appelées sur le thread
+    des données (CallQueue) et encodées ensuite par le thread de la requête.
+    """
+
+    def __init__(self, core):
+        self.core = core
+        self.started = int(time.time())  # distingue les versions de deux lancements successifs
+        self._inventory_cache = (None, [])
+
+    def etag(self, *parts):
+        versions = self.core.data.versions
+        tokens = [str(versions.get(part, part)) if isinstance(part, str) else str(part) for part in parts]
+        return f'"{self.started}-{"-".join(tokens)}"'
+
+    def summary(self):
+        data = self.core.data
+        return dict(self.core.dashboard_stats(), **self.core.finance.summary(),
+                    company_name=data.settings.get("company_name"),
+                    recent_announcements=[dict(a) for a in self.core.announcements.recent(3)])
+
+    def collections(self):
+        data = self.core.data
+        result = {name: {"count": len(getattr(data, name)), "version": data.versions.get(name, 0),
+                         "archived": data.archived_count(name)}
+                  for name in LIST_COLLECTIONS}
+        result["inventory_data"] = {"count": self.core.inventory.count(),
+                                    "version": data.versions.get("inventory_data", 0), "archived": 0,
+                                    "categories": self.core.inventory.categories()}
+        return result
+
+    def records(self, name):
+        data = self.core.data
+        if name == "inventory_data":
+            version = data.versions.get(name, 0)
+            if self._inventory_cache[0] != version:
+                self._inventory_cache = (version, inventory_records(data.inventory_data))
+            return self._inventory_cache[1]
+        return getattr(data, name)
+
+    def page(self, name, offset, limit):
+        if name == "settings":
+            return copy.deepcopy(self.core.data.settings)
+        records = self.records(name)
+        return {"total": len(records), "offset": offset, "limit": limit,
+                "archived": self.core.data.archived_count(name),
+                "items": [dict(record) for record in records[offset:offset + limit]]}
+
+
+class ApiServer:
+    """Serveur HTTP local (un thread par requête) démarré en arrière-plan.
+
+    Sans dispatch, les lectures sont faites par le thread de la requête : à réserver au cas où
+    rien ne modifie les données pendant ce temps (API seule, en ligne de commande). Avec une
+    interface, dispatch est une CallQueue vidée par la boucle Tk.
+    Les réponses ne portent pas d'en-tête CORS : seule la page servie par ce serveur (même
+    origine) peut lire les données, pas un autre site ouvert dans le navigateur.
+    """
+
+    def __init__(self, core, host="127.0.0.1", port=0, html_file=None, static_dir=None, dispatch=None):
+        self.httpd = ThreadingHTTPServer((host, port), ApiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = CompanyApi(core)
+        self.httpd.dispatch = dispatch or (lambda func: func())
+        self.httpd.html_file = html_file
+        self.httpd.static_dir = static_dir
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.httpd.serve_forever, name="company-api", daemon=True)
+            self._thread.start()
+            logging.info(f"API locale démarrée sur {self.url}")
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self._thread = None
+            logging.info("API locale arrêtée.")
+
+
+def main(argv=None):
+    from .core import CompanyCore
+    from .storage import open_storage
+    parser = argparse.ArgumentParser(description="Sert les données de l'entreprise en JSON (sans interface).")
+    parser.add_argument("--storage", help="json:chemin.json ou sqlite:chemin.db (défaut : COMPANY_APP_STORAGE)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--html", help="Page HTML servie sur /")
+    parser.add_argument("--static", help="Dossier du bundle hors ligne (python -m company_core.bundle)")
+    args = parser.parse_args(argv)
+    core = CompanyCore(storage=open_storage(args.storage))
+    core.load()
+    server = ApiServer(core, args.host, args.port, args.html, args.static)
+    print(f"API disponible sur {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from .errors import CompanyError
+
+# -----------------------------------------------------------------------------
+# ARCHIVES : commandes, dépenses et connexions anciennes dans des segments mappés en mémoire
+# -----------------------------------------------------------------------------
+# Les enregistrements plus anciens que le seuil (paramètre "archive_after_days") quittent les
+# collections en mémoire pour des segments d'archive, un par collection et par mois :
+#   archive/index.json                    index temporel : segments de chaque collection, du plus ancien au plus récent
+#   archive/orders-2021-03-<n>.seg        en-tête, enregistrements de largeur fixe triés par date, pied JSON
+# Le pied d'un segment porte ses agrégats (montants et nombre par jour, par client / objet /
+# utilisateur) : tableaux de bord et grand livre les lisent sans décoder un seul enregistrement.
+# Les segments ne sont jamais modifiés : archiver d'autres enregistrements d'un mois réécrit un
+# nouveau segment pour ce mois, puis l'index est remplacé d'un bloc. Chaque archivage incrémente
+# la génération de l'index, que les données enregistrent dans settings["archive_generation"] :
+# des données d'une génération antérieure (interruption avant leur enregistrement, sauvegarde
+# restaurée) contiennent encore des enregistrements archivés, retirés par reconcile().
+DEFAULT_ARCHIVE_DIR = "archive"
+SEGMENT_MAGIC = b"CSEG"
+SEGMENT_VERSION = 1
+HEADER = struct.Struct("<4sHI")   # magic, version, largeur d'un enregistrement
+TRAILER = struct.Struct("<Q")     # position du pied JSON
+DATE_LENGTH = 19                  # "AAAA-MM-JJ HH:MM:SS"
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\Z")
+
+# Champs de chaque collection archivable, dans l'ordre des enregistrements :
+#   "int" entier 64 bits, "float" flottant (un indicateur garde les montants saisis en entiers),
+#   "text" code dans la table des chaînes du segment, "date" date ISO de 19 caractères
+ARCHIVE_LAYOUTS = {
+    "orders": (("order_id", "int"), ("client", "text"), ("total", "float"), ("order_date", "date")),
+    "expenses": (("purpose", "text"), ("amount", "float"), ("date", "date")),
+    "login_events": (("user", "text"), ("time", "date"), ("spent", "float")),
+}
+# Champ texte et montant agrégés dans le pied des segments
+ARCHIVE_GROUPS = {"orders": ("client", "total"), "expenses": ("purpose", "amount"), "login_events": ("user", "spent")}
+STRUCT_CODES = {"int": "q", "float": "d", "text": "I", "date": f"{DATE_LENGTH}s"}
+
+
+def _date_field(collection):
+    return next(name for name, kind in ARCHIVE_LAYOUTS[collection] if kind == "date")
+
+
+def archivable(collection, record):
+    """Vrai si l'enregistrement peut être archivé sans perte (mêmes champs, dans le même ordre, bien typés)."""
+    layout = ARCHIVE_LAYOUTS[collection]
+    if len(record) != len(layout):
+        return False
+    for (name, kind), key in zip(layout, record):
+        value = record[key]
+        if key != name:
+            return False
+        if kind == "int" and type(value) is not int:
+            return False
+        if kind == "float" and type(value) not in (int, float):
+            return False
+        if kind == "text" and type(value) is not str:
+            return False
+        if kind == "date" and not (type(value) is str and ISO_DATE.match(value)):
+            return False
+    return True
+
+
+def cutoff_date(days, now=None):
+    """Date ISO avant laquelle les enregistrements sont archivés."""
+    return ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d 00:00:00")
+
+
+class Segment:
+    """Segment d'archive ouvert : pied JSON en mémoire, enregistrements lus dans la projection mmap."""
+
+    def __init__(self, path, collection):
+        self.path = path
+        self.collection = collection
+        layout = ARCHIVE_LAYOUTS[collection]
+        self.record = struct.Struct("<B" + "".join(STRUCT_CODES[kind] for _, kind in layout))
+        # position de la date dans un enregistrement : indicateurs (1 octet) puis champs précédents
+        names = [name for name, _ in layout]
+        self.date_offset = 1 + sum(struct.calcsize("<" + STRUCT_CODES[kind])
+                                   for _, kind in layout[:names.index(_date_field(collection))])
+        with open(path, "rb") as f:
+            magic, version, width = HEADER.unpack(f.read(HEADER.size))
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or width != self.record.size:
+                raise CompanyError(f"Segment d'archive illisible : {path}")
+            f.seek(-TRAILER.size, os.SEEK_END)
+            footer_at = TRAILER.unpack(f.read(TRAILER.size))[0]
+            f.seek(footer_at)
+            self.footer = json.loads(f.read()[:-TRAILER.size].decode("utf-8"))
+        self.count = self.footer["count"]
+
+    def _date_at(self, mapped, position):
+        start = HEADER.size + position * self.record.size + self.date_offset
+        return mapped[start:start + DATE_LENGTH].decode("ascii")
+
+    def _bound(self, mapped, date):
+        """Première position dont la date est >= date (les enregistrements sont triés par date)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._date_at(mapped, middle) < date:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=None, end=None):
+        """Enregistrements (dicts) dont la date est dans [start, end[ ; toutes les dates par défaut."""
+        if not self.count:
+            return []
+        strings = self.footer["strings"]
+        layout = ARCHIVE_LAYOUTS[self.collection]
+        names = [name for name, _ in layout]
+        texts = [position for position, (_, kind) in enumerate(layout) if kind == "text"]
+        dates = [position for position, (_, kind) in enumerate(layout) if kind == "date"]
+        floats = [position for position, (_, kind) in enumerate(layout) if kind == "float"]
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            first = self._bound(mapped, start) if start else 0
+            last = self._bound(mapped, end) if end else self.count
+            view = memoryview(mapped)[HEADER.size + first * self.record.size:HEADER.size + last * self.record.size]
+            try:
+                result = []
+                for row in self.record.iter_unpack(view):
+                    flags, values = row[0], list(row[1:])
+                    for position in texts:
+                        values[position] = strings[values[position]]
+                    for position in dates:
+                        values[position] = values[position].decode("ascii")
+                    if flags:
+                        for bit, position in enumerate(floats):
+                            if flags >> bit & 1:
+                                values[position] = int(values[position])
+                    result.append(dict(zip(names, values)))
+            finally:
+                view.release()
+        return result
+
+    def column(self, name):
+        """Valeurs d'un seul champ, dans l'ordre des enregistrements, sans construire de dicts."""
+        if not self.count:
+            return []
+        layout = ARCHIVE_LAYOUTS[self.collection]
+        names = [field for field, _ in layout]
+        position = names.index(name)
+        kind = layout[position][1]
+        code = STRUCT_CODES[kind]
+        offset = 1 + sum(struct.calcsize("<" + STRUCT_CODES[other]) for _, other in layout[:position])
+        rest = self.record.size - offset - struct.calcsize("<" + code)
+        # Indicateurs et champ seuls : les autres octets de l'enregistrement sont sautés
+        field = struct.Struct(f"<B{offset - 1}x{code}{rest}x")
+        floats = [field_name for field_name, other in layout if other == "float"]
+        bit = floats.index(name) if kind == "float" else None
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[HEADER.size:HEADER.size + self.count * self.record.size]
+            try:
+                if kind == "text":
+                    strings = self.footer["strings"]
+                    return [strings[value] for _, value in field.iter_unpack(view)]
+                if kind == "date":
+                    return [value.decode("ascii") for _, value in field.iter_unpack(view)]
+                if kind == "float":
+                    return [int(value) if flags >> bit & 1 else value for flags, value in field.iter_unpack(view)]
+                return [value for _, value in field.iter_unpack(view)]
+            finally:
+                view.release()
+
+
+def write_segment(path, collection, records):
+    """Écrit un segment (enregistrements triés par date) et retourne son pied."""
+    layout = ARCHIVE_LAYOUTS[collection]
+    date_field = _date_field(collection)
+    group_field, amount_field = ARCHIVE_GROUPS[collection]
+    record_struct = struct.Struct("<B" + "".join(STRUCT_CODES[kind] for _, kind in layout))
+    records = sorted(records, key=lambda record: record[date_field])
+    strings, days, groups, maxima = {}, {}, {}, {}
+    floats = [name for name, kind in layout if kind == "float"]
+    rows = bytearray()
+    for record in records:
+        flags = 0
+        values = []
+        for name, kind in layout:
+            value = record[name]
+            if kind == "text":
+                value = strings.setdefault(value, len(strings))
+            elif kind == "date":
+                value = value.encode("ascii")
+            elif kind == "float":
+                if type(value) is int:
+                    flags |= 1 << floats.index(name)
+            elif value > maxima.get(name, value - 1):
+                maxima[name] = value
+            values.append(value)
+        rows += record_struct.pack(flags, *values)
+        amount = record[amount_field]
+        day = days.setdefault(record[date_field][:10], [0, 0])
+        day[0] += amount
+        day[1] += 1
+        group = groups.get(record[group_field])
+        if group is None:
+            groups[record[group_field]] = [amount, 1, record[date_field]]
+        else:
+            group[0] += amount
+            group[1] += 1
+            group[2] = record[date_field]  # tri par date : le dernier est le plus récent
+    footer = {
+        "collection": collection, "count": len(records),
+        "first": records[0][date_field] if records else None, "last": records[-1][date_field] if records else None,
+        "strings": list(strings), "days": days, "groups": groups, "max": maxima,
+    }
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, record_struct.size))
+        f.write(rows)
+        footer_at = f.tell()
+        f.write(json.dumps(footer, ensure_ascii=False).encode("utf-8"))
+        f.write(TRAILER.pack(footer_at))
+    os.replace(temporary, path)
+    return footer
+
+
+class ArchiveStore:
+    """Segments d'archive d'un dossier, avec leurs agrégats fusionnés (mis en cache jusqu'au prochain archivage)."""
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._index = None
+        self._segments = {}   # {fichier: Segment}
+        self._totals = {}     # {collection: agrégats fusionnés}
+
+    # -- Index -------------------------------------------------------------------------
+    def _index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def index(self):
+        """{"generation", "collections": {collection: [segments par mois]}, "cutoff": {collection: date}}."""
+        if self._index is None:
+            try:
+                with open(self._index_path(), "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except OSError:
+                self._index = {"generation": 0, "collections": {}, "cutoff": {}}
+        return self._index
+
+    def _write_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        temporary = f"{self._index_path()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(temporary, self._index_path())
+        self._index = index
+        self._totals.clear()
+
+    @property
+    def generation(self):
+        """Numéro incrémenté à chaque archivage (empreinte des exports planifiés)."""
+        return self.index()["generation"]
+
+    def segments(self, collection, start=None, end=None):
+        """Segments de la collection qui recoupent [start, end[, du plus ancien au plus récent."""
+        result = []
+        for entry in self.index()["collections"].get(collection, ()):
+            if (start and entry["last"] < start) or (end and entry["first"] >= end):
+                continue
+            segment = self._segments.get(entry["file"])
+            if segment is None:
+                segment = self._segments[entry["file"]] = Segment(os.path.join(self.root, entry["file"]), collection)
+            result.append(segment)
+        return result
+
+    # -- Lecture --------------------------------------------------------------------------
+    def count(self, collection):
+        return sum(entry["count"] for entry in self.index()["collections"].get(collection, ()))
+
+    def records(self, collection, start=None, end=None):
+        """Enregistrements archivés (dicts), par ordre de date ; décodés à la demande."""
+        records = []
+        for segment in self.segments(collection, start, end):
+            records.extend(segment.records(start, end))
+        return records
+
+    def column(self, collection, name):
+        """Un champ des enregistrements archivés (liste), par ordre de date, segment par segment."""
+        values = []
+        for segment in self.segments(collection):
+            values.extend(segment.column(name))
+        return values
+
+    def totals(self, collection):
+        """Agrégats des pieds de segments : {"count", "amount", "days": {jour: [montant, nombre]},
+        "groups": {nom: [montant, nombre, dernière date]}, "max": {champ: maximum}}."""
+        with self._lock:
+            totals = self._totals.get(collection)
+            if totals is None:
+                totals = {"count": 0, "amount": 0, "days": {}, "groups": {}, "max": {}}
+                for segment in self.segments(collection):
+                    footer = segment.footer
+                    totals["count"] += footer["count"]
+                    for day, (amount, count) in footer["days"].items():
+                        totals["amount"] += amount
+                        merged = totals["days"].setdefault(day, [0, 0])
+                        merged[0] += amount
+                        merged[1] += count
+                    for name, (amount, count, last) in footer["groups"].items():
+                        merged = totals["groups"].get(name)
+                        if merged is None:
+                            totals["groups"][name] = [amount, count, last]
+                        else:
+                            merged[0] += amount
+                            merged[1] += count
+                            merged[2] = max(merged[2], last)
+                    for name, value in footer["max"].items():
+                        totals["max"][name] = max(totals["max"].get(name, value), value)
+                self._totals[collection] = totals
+            return totals
+
+    # -- Archivage ---------------------------------------------------------------------------
+    def split(self, collection, records, cutoff):
+        """(à archiver, à garder en mémoire) : les enregistrements archivables antérieurs à cutoff."""
+        date_field = _date_field(collection)
+        cold, hot = [], []
+        for record in records:
+            if record.get(date_field, cutoff) < cutoff and archivable(collection, record):
+                cold.append(record)
+            else:
+                hot.append(record)
+        return cold, hot
+
+    def append(self, collection, records, cutoff):
+        """Écrit les enregistrements dans les segments de leur mois ; retourne leur nombre."""
+        if not records:
+            return 0
+        date_field = _date_field(collection)
+        by_month = {}
+        for record in records:
+            by_month.setdefault(record[date_field][:7], []).append(record)
+        index = json.loads(json.dumps(self.index()))
+        generation = index["generation"] + 1
+        entries = {entry["month"]: entry for entry in index["collections"].get(collection, ())}
+        replaced = []
+        os.makedirs(self.root, exist_ok=True)
+        for month, month_records in sorted(by_month.items()):
+            previous = entries.get(month)
+            if previous is not None:
+                month_records = self.segments(collection, month, month + "\uffff")[0].records() + month_records
+                replaced.append(previous["file"])
+            name = f"{collection}-{month}-{generation}.seg"
+            footer = write_segment(os.path.join(self.root, name), collection, month_records)
+            entries[month] = {"month": month, "file": name, "count": footer["count"],
+                              "first": footer["first"], "last": footer["last"]}
+        index["collections"][collection] = [entries[month] for month in sorted(entries)]
+        index["generation"] = generation
+        index["cutoff"][collection] = max(index["cutoff"].get(collection, cutoff), cutoff)
+        self._write_index(index)
+        for name in replaced:
+            self._segments.pop(name, None)
+            os.remove(os.path.join(self.root, name))
+        logging.info(f"Archive {collection} : {len(records)} enregistrement(s) archivé(s) dans "
+                     f"{len(by_month)} segment(s).")
+        return len(records)
+
+    def reconcile(self, data):
+        """Retire des collections en mémoire les enregistrements que l'archive contient déjà.
+
+        Seuls les enregistrements identiques à un enregistrement archivé du même mois sont retirés
+        (autant de fois qu'il y est) : une commande ancienne saisie après l'archivage reste en
+        mémoire. Retourne les collections modifiées.
+        """
+        changed = []
+        for collection, cutoff in self.index()["cutoff"].items():
+            candidates, _ = self.split(collection, getattr(data, collection), cutoff)
+            if not candidates:
+                continue
+            names = [name for name, _ in ARCHIVE_LAYOUTS[collection]]
+            date_field = _date_field(collection)
+            archived = Counter()
+            for month in {record[date_field][:7] for record in candidates}:
+                for segment in self.segments(collection, month, month + "\uffff"):
+                    archived.update(tuple(record[name] for name in names) for record in segment.records())
+            removed = set()
+            for record in candidates:
+                key = tuple(record[name] for name in names)
+                if archived[key] > 0:
+                    archived[key] -= 1
+                    removed.add(id(record))
+            if removed:
+                setattr(data, collection, [record for record in getattr(data, collection) if id(record) not in removed])
+                changed.append(collection)
+                logging.warning(f"Archive {collection} : {len(removed)} enregistrement(s) déjà archivé(s) "
+                                f"retiré(s) des données en mémoire.")
+        return changed
+
+    def clear(self, collection):
+        """Supprime toute l'archive d'une collection (effacement des connexions)."""
+        index = json.loads(json.dumps(self.index()))
+        entries = index["collections"].pop(collection, [])
+        index["cutoff"].pop(collection, None)
+        index["generation"] += 1
+        self._write_index(index)
+        for entry in entries:
+            self._segments.pop(entry["file"], None)
+            os.remove(os.path.join(self.root, entry["file"]))
@@ -0,0 +1,251 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from .errors import CompanyError
+from .models import DATA_KEYS, LIST_COLLECTIONS, CompanyData
+from .snapshot import decode_records, encode_records
+
+# -----------------------------------------------------------------------------
+# SAUVEGARDES VERSIONNÉES : blocs adressés par contenu, dédupliqués entre sauvegardes
+# -----------------------------------------------------------------------------
+# backups/
+#   objects/ab/abcdef...   blocs compressés, nommés par le SHA-256 de leur contenu
+#   manifests/<id>.json    une sauvegarde = la liste des blocs de chaque collection
+DEFAULT_BACKUP_DIR = "backups"
+CHUNK_RECORDS = 5000  # un ajout en fin de collection ne réécrit que le dernier bloc
+BACKUP_ID_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+
+class RetentionPolicy:
+    """Sauvegardes conservées : les `keep_last` plus récentes, puis la plus récente de chacun
+    des `keep_daily` derniers jours et de chacune des `keep_weekly` dernières semaines."""
+
+    def __init__(self, keep_last=10, keep_daily=7, keep_weekly=4):
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+    def retained(self, backup_ids, now=None):
+        """backup_ids triés du plus récent au plus ancien -> ensemble des identifiants à garder."""
+        now = now or datetime.now()
+        keep = set(backup_ids[:max(self.keep_last, 1)])
+        days, weeks = set(), set()
+        for backup_id in backup_ids:
+            created = datetime.strptime(backup_id, BACKUP_ID_FORMAT)
+            day = created.date()
+            week = created.isocalendar()[:2]
+            if now - created <= timedelta(days=self.keep_daily) and day not in days:
+                days.add(day)
+                keep.add(backup_id)
+            if now - created <= timedelta(weeks=self.keep_weekly) and week not in weeks:
+                weeks.add(week)
+                keep.add(backup_id)
+        return keep
+
+
+class BackupJob:
+    """État des données au moment de la capture, écrit ensuite en arrière-plan.
+
+    La capture ne copie que les listes de références (les collections changent de longueur
+    ensuite) ; les enregistrements sont copiés par le thread d'écriture. Un enregistrement
+    modifié entre-temps est relu dans preimages, sa copie faite par CompanyData.apply avant
+    la première modification (copie sur écriture).
+    """
+
+    def __init__(self, label, collections, reused, versions, counts, preimages):
+        self.label = label
+        self.created = datetime.now()
+        self.collections = collections  # {nom: références des enregistrements} pour les collections modifiées
+        self.reused = reused            # {nom: blocs de la sauvegarde précédente} pour les autres
+        self.versions = versions
+        self.counts = counts
+        self.preimages = preimages
+
+    def frozen(self, records):
+        """Copies des enregistrements tels qu'ils étaient à la capture."""
+        return CompanyData.freeze(records, self.preimages)
+
+
+class BackupManager:
+    def __init__(self, data, root=DEFAULT_BACKUP_DIR, retention=None):
+        self.data = data
+        self.root = root
+        self.retention = retention or RetentionPolicy()
+        self._lock = threading.Lock()
+        self._last = {}  # {collection: (version, blocs)} de la dernière sauvegarde écrite
+
+    # -- Capture (thread de l'interface) ---------------------------------------------
+    def capture(self, label="auto"):
+        """Références des seules collections modifiées depuis la dernière sauvegarde (sans copier les
+        enregistrements : write() le fait hors du thread de l'interface)."""
+        collections, reused, versions = {}, {}, {}
+        for name in DATA_KEYS:
+            version = self.data.versions.get(name, 0)
+            versions[name] = version
+            last = self._last.get(name)
+            if last is not None and last[0] == version:
+                reused[name] = last[1]
+            elif name == "inventory_data":
+                collections[name] = {cat: list(products) for cat, products in self.data.inventory_data.items()}
+            elif name == "settings":
+                collections[name] = dict(self.data.settings)
+            else:
+                collections[name] = list(getattr(self.data, name))
+        counts = {name: len(getattr(self.data, name)) for name in LIST_COLLECTIONS}
+        counts["inventory_data"] = sum(len(products) for products in self.data.inventory_data.values())
+        return BackupJob(label, collections, reused, versions, counts, self.data.watch())
+
+    # -- Écriture (n'importe quel thread) ----------------------------------------------
+    def write(self, job):
+        """Écrit les blocs absents du dépôt puis le manifeste ; retourne le manifeste."""
+        with self._lock:
+            written = [0, 0]  # blocs, octets
+            chunks = dict(job.reused)
+            try:
+                for name, value in job.collections.items():
+                    if name == "inventory_data":
+                        chunks[name] = [[category, self._store_records(job.frozen(products), written)]
+                                        for category, products in value.items()]
+                    elif name == "settings":
+                        chunks[name] = [self._store(json.dumps(value, ensure_ascii=False, sort_keys=True)
+                                                    .encode("utf-8"), written)]
+                    else:
+                        chunks[name] = self._store_records(job.frozen(value), written)
+            finally:
+                # Plus besoin des copies sur écriture une fois les enregistrements copiés
+                self.data.unwatch(job.preimages)
+            backup_id = job.created.strftime(BACKUP_ID_FORMAT)
+            manifest = {
+                "id": backup_id,
+                "created": job.created.strftime("%Y-%m-%d %H:%M:%S"),
+                "label": job.label,
+                "collections": chunks,
+                "records": job.counts,
+                "new_chunks": written[0],
+                "new_bytes": written[1],
+            }
+            self._write_atomic(self._manifest_path(backup_id),
+                               json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+            for name, version in job.versions.items():
+                self._last[name] = (version, chunks[name])
+            logging.info(f"Sauvegarde {backup_id} ({job.label}) : {written[0]} nouveau(x) bloc(s), "
+                         f"{written[1]} octets écrits.")
+            return manifest
+
+    def has_changes(self):
+        """Vrai si une collection a changé depuis la dernière sauvegarde écrite par ce processus."""
+        return any(self._last.get(name, (None,))[0] != self.data.versions.get(name, 0) for name in DATA_KEYS)
+
+    def backup(self, label="auto"):
+        return self.write(self.capture(label))
+
+    def _store_records(self, records, written):
+        return [self._store(encode_records(records[start:start + CHUNK_RECORDS]), written)
+                for start in range(0, len(records), CHUNK_RECORDS)]
+
+    def _store(self, raw, written):
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            payload = gzip.compress(raw, compresslevel=6, mtime=0)
+            self._write_atomic(path, payload)
+            written[0] += 1
+            written[1] += len(payload)
+        return digest
+
+    @staticmethod
+    def _write_atomic(path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(payload)
+        os.replace(temporary, path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _manifest_path(self, backup_id):
+        return os.path.join(self.root, "manifests", f"{backup_id}.json")
+
+    # -- Consultation et restauration ----------------------------------------------------
+    def backup_ids(self):
+        """Identifiants des sauvegardes, de la plus récente à la plus ancienne."""
+        directory = os.path.join(self.root, "manifests")
+        if not os.path.isdir(directory):
+            return []
+        return sorted((name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json")),
+                      reverse=True)
+
+    def manifest(self, backup_id):
+        try:
+            with open(self._manifest_path(backup_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError:
+            raise CompanyError(f"Sauvegarde introuvable : {backup_id}")
+
+    def list_backups(self):
+        return [self.manifest(backup_id) for backup_id in self.backup_ids()]
+
+    def _load(self, digest):
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                raw = gzip.decompress(f.read())
+        except OSError:
+            raise CompanyError(f"Bloc de sauvegarde manquant : {digest[:12]}")
+        if hashlib.sha256(raw).hexdigest() != digest:
+            raise CompanyError(f"Bloc de sauvegarde corrompu : {digest[:12]}")
+        return raw
+
+    def _load_records(self, digests):
+        records = []
+        for digest in digests:
+            records.extend(decode_records(self._load(digest))[0])
+        return records
+
+    def restore(self, backup_id):
+        """Relit une sauvegarde et retourne un dict au format de company_data.json."""
+        with self._lock:
+            chunks = self.manifest(backup_id)["collections"]
+            data = {}
+            for name, digests in chunks.items():
+                if name == "inventory_data":
+                    data[name] = {category: self._load_records(cat_digests) for category, cat_digests in digests}
+                elif name == "settings":
+                    data[name] = json.loads(self._load(digests[0]).decode("utf-8"))
+                else:
+                    data[name] = self._load_records(digests)
+            return data
+
+    # -- Rétention -------------------------------------------------------------------
+    def prune(self, now=None):
+        """Supprime les sauvegardes hors politique de rétention puis les blocs qui ne servent plus."""
+        with self._lock:
+            backup_ids = self.backup_ids()
+            keep = self.retention.retained(backup_ids, now)
+            removed = [backup_id for backup_id in backup_ids if backup_id not in keep]
+            for backup_id in removed:
+                os.remove(self._manifest_path(backup_id))
+            if not removed:
+                return []
+            used = set()
+            for backup_id in keep:
+                for name, digests in self.manifest(backup_id)["collections"].items():
+                    if name == "inventory_data":
+                        for _, cat_digests in digests:
+                            used.update(cat_digests)
+                    else:
+                        used.update(digests)
+            objects = os.path.join(self.root, "objects")
+            freed = 0
+            for directory, _, files in os.walk(objects):
+                for name in files:
+                    if name not in used:
+                        os.remove(os.path.join(directory, name))
+                        freed += 1
+            logging.info(f"Rétention des sauvegardes : {len(removed)} sauvegarde(s) et {freed} bloc(s) supprimés.")
+            return removed
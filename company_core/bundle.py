@@ -0,0 +1,193 @@
+import argparse
+import logging
+import os
+import re
+import shutil
+import urllib.request
+
+from .errors import DependencyError
+
+# -----------------------------------------------------------------------------
+# BUNDLE HORS LIGNE DE LA VERSION HTML (ressources locales, sans CDN)
+# -----------------------------------------------------------------------------
+DEFAULT_HTML_FILE = "html version.html"
+DEFAULT_VENDOR_DIR = "vendor"
+DEFAULT_BUNDLE_DIR = "dashboard_bundle"
+
+# URL du CDN -> fichier local (le numéro de version dans le nom permet un cache long côté navigateur)
+VENDOR_ASSETS = {
+    "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css": "bootstrap-5.3.0.min.css",
+    "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js": "bootstrap-5.3.0.bundle.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.18.5/xlsx.full.min.js": "xlsx-0.18.5.full.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js": "jspdf-2.5.1.umd.min.js",
+}
+# Feuilles de style intégrées directement dans index.html (aucune requête avant le premier affichage)
+INLINE_STYLESHEETS = ("https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",)
+
+
+def download_assets(vendor_dir=DEFAULT_VENDOR_DIR, force=False):
+    """Télécharge les ressources du CDN dans vendor_dir (à faire une fois, sur un poste connecté)."""
+    os.makedirs(vendor_dir, exist_ok=True)
+    downloaded = []
+    for url, name in VENDOR_ASSETS.items():
+        path = os.path.join(vendor_dir, name)
+        if os.path.exists(path) and not force:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        downloaded.append(path)
+        logging.info(f"Ressource téléchargée : {url} -> {path}")
+    return downloaded
+
+
+def missing_assets(vendor_dir=DEFAULT_VENDOR_DIR):
+    return [name for name in VENDOR_ASSETS.values() if not os.path.exists(os.path.join(vendor_dir, name))]
+
+
+def _template_lines(code):
+    """Pour chaque ligne : (commence dans un gabarit `...`, finit dans un gabarit).
+
+    Le texte d'un gabarit JavaScript est une chaîne : ni ses espaces, ni ses lignes vides, ni
+    ses « // » ne doivent être touchés. Suit les chaînes, gabarits imbriqués (${...}),
+    expressions régulières littérales et commentaires de fin de ligne.
+    """
+    stack = []  # "`" : texte d'un gabarit ; entier : accolades ouvertes dans une expression ${...}
+    states = []
+    for line in code.splitlines():
+        start = bool(stack) and stack[-1] == "`"
+        quote = None
+        previous = ""  # dernier caractère significatif du code : « / » après un opérateur ouvre une regex
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if stack and stack[-1] == "`":
+                if char == "\\":
+                    i += 1
+                elif char == "`":
+                    stack.pop()
+                elif line.startswith("${", i):
+                    stack.append(0)
+                    i += 1
+            elif quote:
+                if char == "\\":
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char == "`":
+                stack.append("`")
+            elif line.startswith("//", i):
+                break
+            elif char == "/" and (not previous or previous in "(,=:[!&|?{};+-*%<>~^"):
+                i = _regex_end(line, i)
+            elif char == "{" and stack:
+                stack[-1] += 1
+            elif char == "}" and stack:
+                if stack[-1] == 0:
+                    stack.pop()  # fin de ${...} : retour au texte du gabarit
+                else:
+                    stack[-1] -= 1
+            if not char.isspace() and not (stack and stack[-1] == "`"):
+                previous = char
+            i += 1
+        states.append((start, bool(stack) and stack[-1] == "`"))
+    return states
+
+
+def _regex_end(line, i):
+    """Position du « / » fermant l'expression régulière ouverte en i (classes [...] comprises)."""
+    in_class = False
+    i += 1
+    while i < len(line):
+        char = line[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            return i
+        i += 1
+    return i
+
+
+def _minify_block(code):
+    """Minification prudente : indentation, lignes vides et commentaires de ligne entière,
+    hors du texte des gabarits `...` recopié tel quel."""
+    lines = []
+    for line, (start, end) in zip(code.splitlines(), _template_lines(code)):
+        if start:
+            lines.append(line)
+            continue
+        stripped = line.lstrip() if end else line.strip()
+        if not stripped or stripped.startswith("//") or (stripped.startswith("/*") and stripped.endswith("*/")):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines)
+
+
+def _minify_html(html):
+    # Les blocs <script> sont minifiés à part : leurs gabarits peuvent contenir « <!-- » ou des lignes vides
+    parts = re.split(r"(<script>.*?</script>)", html, flags=re.S)
+    for i, part in enumerate(parts):
+        if i % 2:
+            parts[i] = "<script>" + _minify_block(part[len("<script>"):-len("</script>")]) + "</script>"
+        else:
+            part = re.sub(r"<!--.*?-->", "", part, flags=re.S)
+            part = re.sub(r"(<style>)(.*?)(</style>)", lambda m: m.group(1) + _minify_block(m.group(2)) + m.group(3),
+                          part, flags=re.S)
+            parts[i] = re.sub(r"\n\s*\n+", "\n", part)
+    return "".join(parts)
+
+
+def build_bundle(html_file=DEFAULT_HTML_FILE, output_dir=DEFAULT_BUNDLE_DIR, vendor_dir=DEFAULT_VENDOR_DIR):
+    """Construit output_dir/index.html + output_dir/vendor/ à partir de la page et des ressources locales."""
+    missing = missing_assets(vendor_dir)
+    if missing:
+        raise DependencyError(f"Ressources absentes de {vendor_dir} : {', '.join(missing)}. "
+                              f"Lancez 'python -m company_core.bundle --download' sur un poste connecté.")
+    with open(html_file, "r", encoding="utf-8") as f:
+        html = f.read()
+    html = _minify_html(html)
+    for url in INLINE_STYLESHEETS:
+        with open(os.path.join(vendor_dir, VENDOR_ASSETS[url]), "r", encoding="utf-8") as f:
+            css = f.read()
+        html = re.sub(rf'<link href="{re.escape(url)}" rel="stylesheet">', lambda _: f"<style>{css}</style>", html)
+    os.makedirs(os.path.join(output_dir, "vendor"), exist_ok=True)
+    for url, name in VENDOR_ASSETS.items():
+        if url in html:
+            html = html.replace(url, f"vendor/{name}")
+            shutil.copyfile(os.path.join(vendor_dir, name), os.path.join(output_dir, "vendor", name))
+    index = os.path.join(output_dir, "index.html")
+    with open(index, "w", encoding="utf-8", newline="\n") as f:
+        f.write(html)
+    logging.info(f"Bundle HTML construit : {index} ({os.path.getsize(index)} octets)")
+    return index
+
+
+def ensure_bundle(html_file=DEFAULT_HTML_FILE, output_dir=DEFAULT_BUNDLE_DIR, vendor_dir=DEFAULT_VENDOR_DIR):
+    """Reconstruit le bundle si la page a changé ; retourne None si les ressources locales manquent."""
+    if missing_assets(vendor_dir):
+        return None
+    index = os.path.join(output_dir, "index.html")
+    if not os.path.exists(index) or os.path.getmtime(index) < os.path.getmtime(html_file):
+        build_bundle(html_file, output_dir, vendor_dir)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit la version HTML autonome (sans CDN).")
+    parser.add_argument("--html", default=DEFAULT_HTML_FILE)
+    parser.add_argument("--output", default=DEFAULT_BUNDLE_DIR)
+    parser.add_argument("--vendor", default=DEFAULT_VENDOR_DIR)
+    parser.add_argument("--download", action="store_true", help="Télécharge d'abord les ressources manquantes")
+    args = parser.parse_args(argv)
+    if args.download:
+        download_assets(args.vendor)
+    print(build_bundle(args.html, args.output, args.vendor))
+
+
+if __name__ == "__main__":
+    main()
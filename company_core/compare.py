@@ -0,0 +1,286 @@
+import argparse
+import csv
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+
+from .errors import DependencyError, ValidationError
+from .importer import _is_excel, iter_file_rows
+from .models import DATE_FORMAT
+
+# -----------------------------------------------------------------------------
+# COMPARAISON DE CLASSEURS : lignes ajoutées, supprimées et modifiées entre deux versions
+# -----------------------------------------------------------------------------
+# Les lignes sont rapprochées par une colonne clé (référence, code...) et comparées sur les
+# colonnes communes aux deux versions, en trois lectures en flux de chaque feuille :
+#   1. nouvelle version : {clé: empreinte de la ligne}
+#   2. ancienne version : ligne identique, modifiée (cellules gardées) ou supprimée
+#   3. nouvelle version : colonnes modifiées des lignes changées, lignes ajoutées
+# La mémoire dépend du nombre de clés et de lignes modifiées, pas de la taille des feuilles.
+# L'empreinte est le hachage Python de la ligne (64 bits) : une collision ferait passer une
+# ligne modifiée pour identique, avec une probabilité négligeable à cette échelle.
+MAX_REPORTED_DIFFS = 1000  # différences conservées dans le rapport (toutes sont écrites dans output)
+DIFF_COLUMNS = ("Feuille", "Statut", "Clé", "Colonne", "Ancienne valeur", "Nouvelle valeur")
+MISSING = object()
+KEY_HINTS = ("id", "code", "référence", "reference", "réf", "ref", "sku", "ean", "clé", "cle", "nom", "name")
+
+
+def cell_text(value):
+    """Valeur d'une cellule sous forme de texte comparable (CSV et Excel donnent le même texte)."""
+    if value.__class__ is str:
+        return value.strip()
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    return str(value).strip()
+
+
+def sheet_names(path):
+    """Feuilles d'un classeur Excel, [None] pour un fichier CSV."""
+    if not _is_excel(path):
+        return [None]
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise DependencyError("Le module openpyxl est requis pour comparer des fichiers Excel.")
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def guess_key(columns):
+    """Colonne clé probable : un identifiant, une référence ou un code, sinon la première colonne."""
+    for hint in KEY_HINTS:
+        for column in columns:
+            if column.strip().lower() == hint:
+                return column
+    return columns[0] if columns else None
+
+
+def _header(rows):
+    for row in rows:
+        header = [cell_text(cell) for cell in row]
+        if any(header):
+            return header
+    return []
+
+
+def _values(rows, positions):
+    """Cellules des colonnes comparées, en texte ; les lignes vides sont sautées."""
+    width = max(positions) + 1
+    getter = itemgetter(*positions) if len(positions) > 1 else (lambda row: (row[positions[0]],))
+    for row in rows:
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        values = tuple(map(cell_text, getter(row)))
+        if any(values):
+            yield values
+
+
+class SheetDiff:
+    """Différences d'une feuille : compteurs, colonnes modifiées et premières différences."""
+
+    def __init__(self, sheet, key, columns, added_columns, removed_columns, max_reported=MAX_REPORTED_DIFFS):
+        self.sheet = sheet
+        self.key = key
+        self.columns = columns
+        self.added_columns = added_columns
+        self.removed_columns = removed_columns
+        self.old_rows = self.new_rows = 0
+        self.added = self.removed = self.changed = self.unchanged = 0
+        self.duplicates = 0   # clés déjà vues dans la même version (seule la première ligne compte)
+        self.blank_keys = 0   # lignes sans valeur dans la colonne clé
+        self.column_changes = Counter()
+        self.samples = []     # lignes au format DIFF_COLUMNS
+        self.max_reported = max_reported
+
+    @property
+    def identical(self):
+        return not (self.added or self.removed or self.changed or self.added_columns or self.removed_columns)
+
+    def note(self, lines, writer):
+        if writer is not None:
+            writer.writerows(lines)
+        room = self.max_reported - len(self.samples)
+        if room > 0:
+            self.samples.extend(lines[:room])
+
+
+class CompareReport:
+    def __init__(self, old_path, new_path):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.sheets = []
+        self.only_old = []  # feuilles absentes de la nouvelle version
+        self.only_new = []
+        self.elapsed = 0.0
+
+    @property
+    def samples(self):
+        return [line for sheet in self.sheets for line in sheet.samples]
+
+    def write_samples(self, path):
+        """Écrit les différences conservées dans le rapport (CSV)."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(DIFF_COLUMNS)
+            writer.writerows(self.samples)
+
+
+class WorkbookComparer:
+    """Compare deux versions d'un classeur (XLSX ou CSV), feuille par feuille, en lecture en flux."""
+
+    def __init__(self, max_reported=MAX_REPORTED_DIFFS):
+        self.max_reported = max_reported
+
+    def compare(self, old_path, new_path, key=None, output=None):
+        """Retourne un CompareReport ; output (CSV) reçoit toutes les différences au fil de la lecture.
+
+        key est le nom de la colonne clé ; par défaut, une colonne devinée dans chaque feuille.
+        """
+        started = time.perf_counter()
+        report = CompareReport(old_path, new_path)
+        old_sheets, new_sheets = sheet_names(old_path), sheet_names(new_path)
+        common = [name for name in old_sheets if name in new_sheets]
+        if not common and (None in old_sheets or None in new_sheets or (len(old_sheets) == len(new_sheets) == 1)):
+            pairs = [(old_sheets[0], new_sheets[0])]  # fichier CSV, ou feuille unique renommée
+        else:
+            pairs = [(name, name) for name in common]
+            report.only_old = [name for name in old_sheets if name not in new_sheets]
+            report.only_new = [name for name in new_sheets if name not in old_sheets]
+        out = open(output, "w", newline="", encoding="utf-8") if output else None
+        try:
+            writer = None
+            if out is not None:
+                writer = csv.writer(out)
+                writer.writerow(DIFF_COLUMNS)
+            for old_sheet, new_sheet in pairs:
+                report.sheets.append(self.compare_sheet(old_path, new_path, old_sheet, new_sheet, key, writer))
+        finally:
+            if out is not None:
+                out.close()
+        report.elapsed = time.perf_counter() - started
+        logging.info(f"Comparaison de {old_path} et {new_path} : {len(report.sheets)} feuille(s) "
+                     f"en {report.elapsed:.1f} s.")
+        return report
+
+    def compare_sheet(self, old_path, new_path, old_sheet, new_sheet, key=None, writer=None):
+        sheet = new_sheet or old_sheet or ""
+        old_header = _header(iter_file_rows(old_path, old_sheet))
+        new_header = _header(iter_file_rows(new_path, new_sheet))
+        columns = [column for column in dict.fromkeys(old_header) if column and column in new_header]
+        key = key if key in columns else guess_key(columns)
+        if key is None:
+            raise ValidationError(f"Feuille « {sheet} » : aucune colonne commune aux deux versions.")
+        diff = SheetDiff(sheet, key, columns,
+                         [column for column in dict.fromkeys(new_header) if column and column not in old_header],
+                         [column for column in dict.fromkeys(old_header) if column and column not in new_header],
+                         self.max_reported)
+        old_positions = [old_header.index(column) for column in columns]
+        new_positions = [new_header.index(column) for column in columns]
+        at = columns.index(key)
+
+        def rows(path, name, positions):
+            lines = iter_file_rows(path, name)
+            _header(lines)  # en-tête déjà lu
+            return _values(lines, positions)
+
+        # 1. Nouvelle version : empreinte de chaque ligne ; None une fois la clé rapprochée
+        hashes = {}
+        for values in rows(new_path, new_sheet, new_positions):
+            diff.new_rows += 1
+            row_key = values[at]
+            if not row_key:
+                diff.blank_keys += 1
+            elif row_key in hashes:
+                diff.duplicates += 1
+            else:
+                hashes[row_key] = hash(values)
+
+        # 2. Ancienne version : identique, modifiée ou supprimée
+        changed, removed = {}, set()
+        for values in rows(old_path, old_sheet, old_positions):
+            diff.old_rows += 1
+            row_key = values[at]
+            if not row_key:
+                diff.blank_keys += 1
+                continue
+            stamp = hashes.get(row_key, MISSING)
+            if stamp is MISSING:
+                if row_key in removed:
+                    diff.duplicates += 1
+                    continue
+                removed.add(row_key)
+                diff.removed += 1
+                diff.note([(sheet, "supprimée", row_key, "", " | ".join(values), "")], writer)
+            elif stamp is None:
+                diff.duplicates += 1
+            else:
+                hashes[row_key] = None
+                if stamp == hash(values):
+                    diff.unchanged += 1
+                else:
+                    changed[row_key] = values
+
+        # 3. Nouvelle version : cellules modifiées et lignes ajoutées
+        for values in rows(new_path, new_sheet, new_positions):
+            row_key = values[at]
+            old = changed.pop(row_key, None)
+            if old is not None:
+                lines = [(sheet, "modifiée", row_key, column, before, after)
+                         for column, before, after in zip(columns, old, values) if before != after]
+                diff.changed += 1
+                diff.column_changes.update(line[3] for line in lines)
+                diff.note(lines, writer)
+            elif row_key and hashes.get(row_key) is not None:
+                hashes[row_key] = None
+                diff.added += 1
+                diff.note([(sheet, "ajoutée", row_key, "", "", " | ".join(values))], writer)
+        return diff
+
+    @staticmethod
+    def format_report(report):
+        text = f"Comparaison de {report.old_path}\n        avec {report.new_path}\n\n"
+        for diff in report.sheets:
+            text += f"Feuille : {diff.sheet or '(fichier CSV)'} (clé : {diff.key})\n"
+            text += f"  Lignes : {diff.old_rows} -> {diff.new_rows}\n"
+            text += (f"  Ajoutées : {diff.added}, supprimées : {diff.removed}, modifiées : {diff.changed}, "
+                     f"identiques : {diff.unchanged}\n")
+            if diff.column_changes:
+                text += "  Colonnes modifiées : " + ", ".join(
+                    f"{column} ({count})" for column, count in diff.column_changes.most_common()) + "\n"
+            if diff.added_columns:
+                text += f"  Colonnes ajoutées : {', '.join(diff.added_columns)}\n"
+            if diff.removed_columns:
+                text += f"  Colonnes supprimées : {', '.join(diff.removed_columns)}\n"
+            if diff.duplicates or diff.blank_keys:
+                text += f"  Clés en double ignorées : {diff.duplicates}, lignes sans clé : {diff.blank_keys}\n"
+            text += "\n"
+        if report.only_old:
+            text += f"Feuilles supprimées : {', '.join(report.only_old)}\n"
+        if report.only_new:
+            text += f"Feuilles ajoutées : {', '.join(report.only_new)}\n"
+        text += f"Durée : {report.elapsed:.1f} s\n"
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare deux versions d'un classeur (XLSX ou CSV).")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--key", help="Colonne clé (devinée par défaut)")
+    parser.add_argument("--output", help="CSV où écrire toutes les différences")
+    args = parser.parse_args(argv)
+    comparer = WorkbookComparer()
+    print(comparer.format_report(comparer.compare(args.old, args.new, args.key, args.output)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import logging
+import os
+
+from .analysis import AnalysisService
+from .archive import ARCHIVE_LAYOUTS, DEFAULT_ARCHIVE_DIR, ArchiveStore, cutoff_date
+from .backup import DEFAULT_BACKUP_DIR, BackupManager
+from .export import ExportService
+from .importer import BulkImporter
+from .jobs import DEFAULT_JOB_STATE, JobScheduler
+from .models import DATA_KEYS, DEFAULT_SETTINGS, CompanyData
+from .persistence import DEFAULT_DATA_FILE, load_data_file, save_data_file
+from .services import (
+    AnnouncementService, ClientService, FeedbackService, FinanceService, FormulaService, InventoryService,
+    LoginService, OrderService, ProjectService, QueryService, SearchService, ShiftService, StockService,
+    SupplierService, TaskService
+)
+from .storage import JsonStorage
+
+
+# -----------------------------------------------------------------------------
+# FAÇADE DU CŒUR MÉTIER : utilisable sans affichage (scripts, serveurs, tests)
+# -----------------------------------------------------------------------------
+class CompanyCore:
+    def __init__(self, data=None, data_file=DEFAULT_DATA_FILE, storage=None):
+        self.data = data if data is not None else CompanyData()
+        self.data_file = data_file
+        # Stockage principal : fichier JSON local par défaut, ou base partagée (voir storage.open_storage)
+        self.storage = storage if storage is not None else JsonStorage(data_file)
+        self.history = self.data.history  # annuler / rétablir et flux des modifications
+        # Archives, sauvegardes et état des tâches sont rangés à côté du fichier de stockage configuré
+        self.root = os.path.dirname(os.path.abspath(self.storage.path or data_file))
+        # Archives des enregistrements anciens (voir archive.py) ;
+        # pas d'archive locale pour un stockage partagé, que les autres postes lisent en entier
+        self.archive = None if self.storage.shared else ArchiveStore(os.path.join(self.root, DEFAULT_ARCHIVE_DIR))
+        self.data.archive = self.archive
+        self._pending_changes = set()  # collections modifiées ailleurs mais non rechargées (modifs locales en cours)
+        self.inventory = InventoryService(self.data)
+        self.clients = ClientService(self.data)
+        self.stock = StockService(self.data)
+        self.orders = OrderService(self.data, self.clients, self.stock)
+        self.finance = FinanceService(self.data)
+        self.suppliers = SupplierService(self.data)
+        self.projects = ProjectService(self.data)
+        self.announcements = AnnouncementService(self.data)
+        self.shifts = ShiftService(self.data)
+        self.logins = LoginService(self.data)
+        self.feedbacks = FeedbackService(self.data)
+        self.tasks = TaskService(self.data)
+        self.search = SearchService(self.data)
+        self.queries = QueryService(self.data)
+        self.formulas = FormulaService(self.data, self.queries.engine)
+        self.exports = ExportService(self.data)
+        self.imports = BulkImporter(self.data, self.clients)
+        self.analysis = AnalysisService()
+        # Sauvegardes versionnées (voir backup.py)
+        self.backups = BackupManager(self.data, os.path.join(self.root, DEFAULT_BACKUP_DIR))
+        # Exports et rapports récurrents et leur état (voir jobs.py)
+        self.jobs = JobScheduler(self.data, os.path.join(self.root, DEFAULT_JOB_STATE))
+
+    def save(self, path=None):
+        """Sauvegarde dans le stockage principal, ou dans le fichier donné (JSON, ou snapshot si .snap)."""
+        if path:
+            save_data_file(self.data.to_dict(), path)
+        else:
+            self.storage.save(self.data)
+        logging.info(f"Données sauvegardées dans {path or self.storage.description}.")
+
+    def load(self, path=None):
+        self.data.load_dict(load_data_file(path) if path else self.storage.load())
+        logging.info(f"Données chargées depuis {path or self.storage.description}.")
+        self._reconcile_archive()
+
+    def _reconcile_archive(self):
+        """Données enregistrées avant le dernier archivage : retire ce qui est déjà archivé."""
+        if self.archive is None or self.data.settings.get("archive_generation", 0) == self.archive.generation:
+            return
+        changed = self.archive.reconcile(self.data)
+        self.data.settings["archive_generation"] = self.archive.generation
+        self.data.touch("settings", *changed)
+
+    def archive_cold(self, now=None):
+        """Archive les commandes, dépenses et connexions plus anciennes que settings["archive_after_days"].
+
+        Les collections en mémoire sont ensuite enregistrées sans elles. Retourne
+        {collection: nombre d'enregistrements archivés}.
+        """
+        days = self.data.settings.get("archive_after_days", DEFAULT_SETTINGS["archive_after_days"])
+        if self.archive is None or not days:
+            return {}
+        cutoff = cutoff_date(days, now)
+        moved = {}
+        for collection in ARCHIVE_LAYOUTS:
+            cold, hot = self.archive.split(collection, getattr(self.data, collection), cutoff)
+            if cold:
+                self.archive.append(collection, cold, cutoff)
+                setattr(self.data, collection, hot)
+                moved[collection] = len(cold)
+        if moved:
+            self.data.settings["archive_generation"] = self.archive.generation
+            self.data.touch("settings", *moved)
+            self.save()
+            logging.info(f"Archivage avant le {cutoff[:10]} : "
+                         + ", ".join(f"{name} {count}" for name, count in moved.items()))
+        return moved
+
+    def refresh(self):
+        """Recharge les collections modifiées par d'autres instances ; retourne leurs noms."""
+        changed = self.storage.poll_changes() | self._pending_changes
+        self._pending_changes = changed & self.data.dirty
+        changed -= self.data.dirty
+        if changed:
+            self.data.load_collections(self.storage.load_collections(changed))
+            logging.info(f"Collections rechargées depuis {self.storage.description} : {', '.join(sorted(changed))}")
+        return changed
+
+    def undo(self):
+        label = self.data.undo()
+        if label is not None:
+            logging.info(f"Action annulée : {label}")
+        return label
+
+    def redo(self):
+        label = self.data.redo()
+        if label is not None:
+            logging.info(f"Action rétablie : {label}")
+        return label
+
+    def dashboard_stats(self):
+        return {
+            "inventory_count": self.inventory.count(),
+            "clients_count": len(self.data.clients_list),
+            "orders_count": len(self.data.orders) + self.data.archived_count("orders"),
+            "total_expenses": self.finance.total_expenses(),
+        }
+
+    def restore_backup(self, backup_id, data=None):
+        """Remplace les données par celles d'une sauvegarde, puis les enregistre dans le stockage principal."""
+        self.data.load_dict(data if data is not None else self.backups.restore(backup_id))
+        self._reconcile_archive()
+        self.data.touch(*DATA_KEYS)
+        self.save()
+        logging.info(f"Sauvegarde {backup_id} restaurée.")
+
+    def reset(self):
+        """Réinitialise l'inventaire et la liste des clients."""
+        with self.history.command("Réinitialisation"):
+            self.data.prepare()
+            self.data.replace("clients_list", [])
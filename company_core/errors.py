@@ -0,0 +1,21 @@
+# -----------------------------------------------------------------------------
+# EXCEPTIONS DU CŒUR MÉTIER
+# -----------------------------------------------------------------------------
+class CompanyError(Exception):
+    """Erreur de base levée par le cœur métier (sans interface graphique)."""
+
+
+class ValidationError(CompanyError, ValueError):
+    """Donnée saisie invalide (prix, montant, note, ...)."""
+
+
+class DependencyError(CompanyError, ImportError):
+    """Module optionnel manquant (openpyxl, fpdf, pandas, ...)."""
+
+
+class ShiftConflictError(ValidationError):
+    """Quart qui chevauche un autre quart du même employé (`conflicts` liste les quarts en cause)."""
+
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
@@ -0,0 +1,137 @@
+import csv
+import json
+
+from .errors import DependencyError
+
+# Libellés affichés dans l'écran d'export -> attribut de CompanyData
+EXPORT_SOURCES = {
+    "Inventaire": "inventory_data",
+    "Clients": "clients_list",
+    "Commandes": "orders",
+    "Fournisseurs": "suppliers",
+    "Projets": "projects",
+    "Annonces": "announcements",
+    "Quarts de travail": "shifts",
+    "Dépenses": "expenses",
+    "Feedback": "feedbacks",
+    "Tâches": "tasks",
+    "Mouvements de stock": "stock_movements",
+}
+
+EXPORT_EXTENSIONS = {"JSON": ".json", "CSV": ".csv", "Excel": ".xlsx", "PDF": ".pdf"}
+
+
+def inventory_rows(inventory_data):
+    """Aplatit l'inventaire en lignes {Catégorie, Nom, Prix}."""
+    rows = []
+    for cat, products in inventory_data.items():
+        for prod in products:
+            rows.append({"Catégorie": cat, "Nom": prod.get("name", ""), "Prix": prod.get("price", "")})
+    return rows
+
+
+class ExportService:
+    def __init__(self, data):
+        self.data = data
+
+    def collection(self, selected_data):
+        """Enregistrements de la collection, archives comprises (relues dans les segments)."""
+        attr = EXPORT_SOURCES.get(selected_data)
+        if not attr:
+            return {}
+        if self.data.archived_count(attr):
+            return self.data.archive.records(attr) + getattr(self.data, attr)
+        return getattr(self.data, attr)
+
+    def export(self, selected_data, selected_format, file_path):
+        """Exporte la collection choisie au format demandé vers file_path."""
+        return self.write(self.collection(selected_data), selected_data, selected_format, file_path)
+
+    def write(self, data_to_export, selected_data, selected_format, file_path):
+        """Écrit des données déjà préparées (lignes d'un rapport, résultat d'une requête) au format demandé."""
+        writer = {
+            "JSON": self._write_json,
+            "CSV": self._write_csv,
+            "Excel": self._write_excel,
+            "PDF": self._write_pdf,
+        }.get(selected_format)
+        if writer is None:
+            raise ValueError(f"Format d'export inconnu : {selected_format}")
+        writer(data_to_export, selected_data, file_path)
+        return file_path
+
+    def _write_json(self, data_to_export, selected_data, file_path):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(data_to_export, f, indent=4)
+
+    def _write_csv(self, data_to_export, selected_data, file_path):
+        if isinstance(data_to_export, dict):
+            if selected_data == "Inventaire":
+                rows = inventory_rows(data_to_export)
+                if rows:
+                    with open(file_path, "w", newline='', encoding="utf-8") as f:
+                        writer = csv.DictWriter(f, fieldnames=["Catégorie", "Nom", "Prix"])
+                        writer.writeheader()
+                        writer.writerows(rows)
+            else:
+                with open(file_path, "w", newline='', encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    for key, value in data_to_export.items():
+                        writer.writerow([key, value])
+        elif isinstance(data_to_export, list):
+            if data_to_export and isinstance(data_to_export[0], dict):
+                keys = list(data_to_export[0].keys())
+                with open(file_path, "w", newline='', encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, fieldnames=keys)
+                    writer.writeheader()
+                    writer.writerows(data_to_export)
+            else:
+                with open(file_path, "w", newline='', encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    for item in data_to_export:
+                        writer.writerow([item])
+        else:
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(str(data_to_export))
+
+    def _write_excel(self, data_to_export, selected_data, file_path):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise DependencyError("Le module openpyxl est requis pour l'export Excel.")
+        wb = Workbook()
+        ws = wb.active
+        if isinstance(data_to_export, list) and data_to_export and isinstance(data_to_export[0], dict):
+            headers = list(data_to_export[0].keys())
+            ws.append(headers)
+            for row in data_to_export:
+                ws.append([row.get(header, "") for header in headers])
+        elif isinstance(data_to_export, dict):
+            if selected_data == "Inventaire":
+                ws.append(["Catégorie", "Nom", "Prix"])
+                for row in inventory_rows(data_to_export):
+                    ws.append([row["Catégorie"], row["Nom"], row["Prix"]])
+            else:
+                ws.append(["Clé", "Valeur"])
+                for key, value in data_to_export.items():
+                    ws.append([key, str(value)])
+        else:
+            ws.append(["Données"])
+            ws.append([str(data_to_export)])
+        wb.save(file_path)
+
+    def _write_pdf(self, data_to_export, selected_data, file_path):
+        try:
+            from fpdf import FPDF
+        except ImportError:
+            raise DependencyError("Le module fpdf est requis pour l'export PDF.")
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        if isinstance(data_to_export, dict) or isinstance(data_to_export, list):
+            text = json.dumps(data_to_export, indent=4, ensure_ascii=False)
+        else:
+            text = str(data_to_export)
+        for line in text.splitlines():
+            pdf.cell(0, 10, txt=line, ln=1)
+        pdf.output(file_path)
@@ -0,0 +1,340 @@
+import ast
+import math
+import time
+from functools import lru_cache
+from operator import itemgetter
+
+from .errors import ValidationError
+from .query import QUERY_SOURCES, _reduce
+
+# -----------------------------------------------------------------------------
+# FORMULES : calculatrice et colonnes calculées, sans eval du texte saisi
+# -----------------------------------------------------------------------------
+# Une formule est une expression au format Python, vérifiée nœud par nœud :
+#   nombres, "texte", + - * / // % **, comparaisons, and / or / not ;
+#   champs de la ligne (price, cost, total...) pour une colonne calculée ;
+#   fonctions : ABS, ROUND/ARRONDI, MIN, MAX, IF/SI(condition, si vrai, si faux) ;
+#   agrégats d'une collection : SUM(orders.total), AVG(inventory_data.price), COUNT(orders)...
+# Le texte est compilé une fois (cache) en fonction Python (champs -> valeur) ; les agrégats
+# sont calculés une fois par évaluation, hors de la boucle sur les lignes.
+MAX_EXPONENT = 1000  # 9 ** 9 ** 9 bloquerait l'application
+# Entiers d'au plus ~4 200 chiffres : au-delà, str() lève ValueError (limite de Python à 4 300)
+MAX_INT_BITS = 14000
+MAX_ROUND_DIGITS = 308  # ROUND(5, -10000000) prendrait des secondes
+MAX_TEXT_LENGTH = 10000  # "x" * 300000000 allouerait 300 Mo sur le thread de l'interface
+MAX_CACHED_FORMULAS = 256
+DEFAULT_COMPUTED_COLUMNS = {"inventory_data": {"Marge": "price - cost"}}
+FORMULA_EXAMPLES = ("(12.5 + 7.5) * 1.2", "SUM(orders.total) / COUNT(orders)", "ROUND(price * 1.2, 2)",
+                    "IF(cost, (price - cost) / price * 100, None)")
+
+
+def _round(value, digits=0):
+    digits = int(digits)
+    if abs(digits) > MAX_ROUND_DIGITS:
+        raise ValidationError(f"Nombre de décimales trop grand (au plus {MAX_ROUND_DIGITS}).")
+    return round(value, digits)
+
+
+def _bounded(value):
+    """Refuse un entier trop grand : c'est le résultat qui est borné, pas chaque opérande."""
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ValidationError("Résultat trop grand.")
+    return value
+
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise ValidationError(f"Exposant trop grand (au plus {MAX_EXPONENT}).")
+    if isinstance(base, int) and isinstance(exponent, int) and base.bit_length() * exponent > MAX_INT_BITS:
+        raise ValidationError("Résultat trop grand.")  # avant le calcul : (10 ** 1000) ** 1000
+    return base ** exponent
+
+
+def _multiply(left, right):
+    if isinstance(left, str) or isinstance(right, str):
+        text, count = (left, right) if isinstance(left, str) else (right, left)
+        if isinstance(count, int) and len(text) * count > MAX_TEXT_LENGTH:
+            raise ValidationError(f"Texte trop long (au plus {MAX_TEXT_LENGTH} caractères).")
+    elif isinstance(left, int) and isinstance(right, int) and left.bit_length() + right.bit_length() > MAX_INT_BITS:
+        raise ValidationError("Résultat trop grand.")  # 9**1000 * 9**1000 * ... en chaîne
+    return left * right
+
+
+def _modulo(left, right):
+    if isinstance(left, str):
+        raise ValidationError("L'opérateur % ne s'applique pas à du texte.")  # formatage "%0999999999d"
+    return left % right
+
+
+FUNCTIONS = {  # fonctions d'une ligne, noms anglais et français
+    "ABS": abs, "ROUND": _round, "ARRONDI": _round, "MIN": min, "MAX": max,
+}
+CONDITIONS = ("IF", "SI")  # compilées en expression conditionnelle : seule la branche retenue est calculée
+AGGREGATES = {  # agrégats d'une colonne de collection (voir query._reduce)
+    "SUM": "sum", "SOMME": "sum", "AVG": "avg", "MOYENNE": "avg", "MIN": "min", "MAX": "max",
+    "COUNT": "count", "NB": "count",
+}
+CONSTANTS = {"PI": math.pi}
+# Opérations dont le résultat peut être démesuré : remplacées par un appel qui en borne la taille
+BINARY_GUARDS = {ast.Pow: "_power", ast.Mult: "_multiply", ast.Mod: "_modulo"}
+ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+    ast.Call, ast.Attribute, ast.IfExp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class Formula:
+    """Formule compilée : fields (champs de la ligne, dans l'ordre des arguments de la fonction),
+    aggregates ([(agrégat, collection, champ ou None)]) et make(valeurs des agrégats) -> fonction."""
+
+    def __init__(self, text, fields, aggregates, make):
+        self.text = text
+        self.fields = fields
+        self.aggregates = aggregates
+        self.make = make
+
+    @property
+    def collections(self):
+        return {collection for _, collection, _ in self.aggregates}
+
+
+class _Compiler(ast.NodeTransformer):
+    """Vérifie l'arbre syntaxique et remplace champs, fonctions et agrégats par des noms internes."""
+
+    def __init__(self):
+        self.fields = []
+        self.aggregates = []
+
+    def generic_visit(self, node):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValidationError(f"Élément non autorisé dans une formule : {type(node).__name__}.")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if node.value is not None and not isinstance(node.value, (int, float, str)):
+            raise ValidationError(f"Valeur non autorisée : {node.value!r}.")
+        return node
+
+    def visit_Name(self, node):
+        if node.id.startswith("_"):
+            raise ValidationError(f"Nom non autorisé : {node.id}.")
+        if node.id in CONSTANTS:
+            return ast.Constant(CONSTANTS[node.id])
+        if node.id.upper() in FUNCTIONS or node.id.upper() in AGGREGATES or node.id.upper() in CONDITIONS:
+            raise ValidationError(f"{node.id.upper()} est une fonction : {node.id.upper()}(...).")
+        if node.id not in self.fields:
+            self.fields.append(node.id)
+        return ast.Name(f"_c{self.fields.index(node.id)}", ast.Load())
+
+    def visit_Attribute(self, node):
+        raise ValidationError("Une colonne de collection (orders.total) s'utilise dans un agrégat : "
+                              "SUM, AVG, MIN, MAX ou COUNT.")
+
+    def visit_BinOp(self, node):
+        node = self.generic_visit(node)
+        guard = BINARY_GUARDS.get(type(node.op))
+        if guard is not None:
+            return ast.Call(ast.Name(guard, ast.Load()), [node.left, node.right], [])
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise ValidationError("Appel de fonction non autorisé.")
+        name = node.func.id.upper()
+        if name in AGGREGATES and len(node.args) == 1 and self._reference(node.args[0]) is not None:
+            collection, field = self._reference(node.args[0])
+            if field is None and AGGREGATES[name] != "count":
+                raise ValidationError(f"{name} porte sur une colonne : {name}({collection}.champ).")
+            self.aggregates.append((AGGREGATES[name], collection, field))
+            return ast.Name(f"_a{len(self.aggregates) - 1}", ast.Load())
+        if name in CONDITIONS:
+            if len(node.args) not in (2, 3):
+                raise ValidationError(f"{name}(condition, si vrai[, si faux]).")
+            args = [self.visit(arg) for arg in node.args]
+            return ast.IfExp(args[0], args[1], args[2] if len(args) == 3 else ast.Constant(None))
+        if name in AGGREGATES and name not in FUNCTIONS:
+            raise ValidationError(f"{name} porte sur une colonne de collection : {name}(orders.total).")
+        if name not in FUNCTIONS:
+            known = ", ".join(sorted(set(FUNCTIONS) | set(AGGREGATES) | set(CONDITIONS)))
+            raise ValidationError(f"Fonction inconnue : {node.func.id} (connues : {known}).")
+        node.args = [self.visit(arg) for arg in node.args]
+        node.func = ast.Name(f"_f_{name}", ast.Load())
+        return node
+
+    @staticmethod
+    def _reference(node):
+        """(collection, champ) pour orders.total, (collection, None) pour orders ; sinon None."""
+        if isinstance(node, ast.Name) and node.id in QUERY_SOURCES:
+            return node.id, None
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            if node.value.id not in QUERY_SOURCES:
+                raise ValidationError(f"Collection inconnue : {node.value.id} "
+                                      f"(connues : {', '.join(QUERY_SOURCES)}).")
+            return node.value.id, node.attr
+        return None
+
+
+NAMESPACE = {"__builtins__": {}, "_power": _power, "_multiply": _multiply, "_modulo": _modulo, **{f"_f_{name}": func for name, func in FUNCTIONS.items()}}
+
+
+@lru_cache(maxsize=MAX_CACHED_FORMULAS)
+def compile_formula(text):
+    """Formula du texte, lève ValidationError pour une formule invalide ou non autorisée."""
+    text = (text or "").strip()
+    if not text:
+        raise ValidationError("Formule vide.")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ValidationError(f"Formule invalide : {e.msg} (colonne {e.offset}).")
+    compiler = _Compiler()
+    body = compiler.visit(tree).body
+
+    def arguments(prefix, count):
+        return ast.arguments(posonlyargs=[], args=[ast.arg(f"{prefix}{i}") for i in range(count)],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+
+    # lambda _a0, ...: lambda _c0, ...: corps (agrégats liés une fois, puis fonction par ligne)
+    make = ast.Lambda(arguments("_a", len(compiler.aggregates)),
+                      ast.Lambda(arguments("_c", len(compiler.fields)), body))
+    code = compile(ast.fix_missing_locations(ast.Expression(make)), "<formule>", "eval")
+    return Formula(text, tuple(compiler.fields), tuple(compiler.aggregates), eval(code, dict(NAMESPACE)))
+
+
+def format_result(value):
+    if isinstance(value, float):
+        return f"{value:.12g}"
+    try:
+        return "" if value is None else str(value)
+    except ValueError:
+        raise ValidationError("Résultat trop grand pour être affiché.")
+
+
+def _column(records, field):
+    try:
+        return list(map(itemgetter(field), records))
+    except KeyError:
+        return [record.get(field) for record in records]
+
+
+class ComputedColumn:
+    """Valeurs d'une colonne calculée par enregistrement ({id(enregistrement): valeur}).
+
+    Suit le flux des modifications : seules les lignes ajoutées ou modifiées sont recalculées,
+    sauf si la collection est remplacée ou si une collection agrégée par la formule a changé.
+    """
+
+    def __init__(self, engine, collection, name, text):
+        self.engine = engine
+        self.collection = collection
+        self.name = name
+        self.formula = compile_formula(text)
+        self.values = {}
+        self.function = None
+        self.elapsed = 0.0  # durée du dernier recalcul complet (s)
+        self.seq = None
+
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        watched = self.formula.collections
+        if operations is None or any(op.kind in ("replace", "rescan") and op.collection == self.collection
+                                     or op.collection in watched for op in operations):
+            self.recompute(data)
+            return
+        for op in operations:
+            if op.collection != self.collection:
+                continue
+            if op.kind == "update":
+                self.values[id(op.record)] = self._row(op.record, op.category)
+            elif op.kind in ("delete", "truncate"):
+                for record in op.records:
+                    self.values.pop(id(record), None)
+            else:
+                for record in op.records:
+                    self.values[id(record)] = self._row(record, op.category)
+        self.seq = data.history.seq
+
+    def recompute(self, data):
+        """Recalcule toute la colonne, colonne par colonne : une liste par champ, puis map."""
+        started = time.perf_counter()
+        self.function = self.engine.bind(self.formula)
+        if self.collection == "inventory_data":
+            records, categories = [], []
+            for category, products in data.inventory_data.items():
+                records.extend(products)
+                categories.extend([category] * len(products))
+        else:
+            records, categories = getattr(data, self.collection), None
+        columns = [categories if field == "category" and categories is not None else _column(records, field)
+                   for field in self.formula.fields]
+        try:
+            results = list(map(self.function, *columns)) if columns else [self.function()] * len(records)
+        except (TypeError, ValueError, ArithmeticError, ValidationError):
+            results = list(map(self._safe, *columns)) if columns else [None] * len(records)
+        self.values = dict(zip(map(id, records), results))
+        self.seq = data.history.seq
+        self.elapsed = time.perf_counter() - started
+
+    def _row(self, record, category=None):
+        return self._safe(*(category if field == "category" and category is not None else record.get(field)
+                            for field in self.formula.fields))
+
+    def _safe(self, *values):
+        """Valeur d'une ligne ; None (cellule vide) si un champ manque ou si le calcul échoue."""
+        if None in values:  # champ absent (produit sans coût...) : sans lever d'exception par ligne
+            return None
+        try:
+            return self.function(*values)
+        except (TypeError, ValueError, ArithmeticError, ValidationError):
+            return None
+
+    def value(self, record):
+        return self.values.get(id(record))
+
+
+class FormulaEngine:
+    """Évalue les formules ; les agrégats lisent les colonnes du moteur de requêtes (archives comprises)."""
+
+    def __init__(self, data, queries):
+        self.data = data
+        self.queries = queries
+        self._aggregates = {}  # {(agrégat, collection, champ): (magasin, révision, valeur)}
+
+    def aggregate(self, function, collection, field):
+        store = self.queries.store(collection)
+        if field is None:
+            return store.count()
+        if field not in store.fields():
+            raise ValidationError(f"Champ inconnu : {collection}.{field}.")
+        column = store.column(field)
+        # La colonne est prolongée ou raccourcie sur place : seule la révision du magasin dit si elle a changé
+        cached = self._aggregates.get((function, collection, field))
+        if cached is not None and cached[0] is store and cached[1] == store.revision:
+            return cached[2]
+        if function == "count":
+            value = sum(value is not None for value in column)
+        else:
+            value = _reduce(function, [value for value in column if type(value) in (int, float)])
+        self._aggregates[(function, collection, field)] = (store, store.revision, value)
+        return value
+
+    def bind(self, formula):
+        """Fonction d'une ligne, agrégats calculés."""
+        return formula.make(*(self.aggregate(*aggregate) for aggregate in formula.aggregates))
+
+    def evaluate(self, text, values=None):
+        """Valeur d'une formule ; values donne les champs d'une ligne ({champ: valeur})."""
+        formula = compile_formula(text)
+        values = values or {}
+        missing = [field for field in formula.fields if field not in values]
+        if missing:
+            raise ValidationError(f"Nom inconnu : {', '.join(missing)}.")
+        try:
+            return _bounded(self.bind(formula)(*(values[field] for field in formula.fields)))
+        except ValidationError:
+            raise
+        except ZeroDivisionError:
+            raise ValidationError("Division par zéro.")
+        except (TypeError, ValueError, ArithmeticError) as e:
+            raise ValidationError(f"Calcul impossible : {e}")
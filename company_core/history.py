@@ -0,0 +1,196 @@
+import itertools
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# JOURNAL DES MODIFICATIONS : annuler / rétablir et flux des changements
+# -----------------------------------------------------------------------------
+# Chaque modification passe par CompanyData.apply() sous forme d'Operation :
+#   - l'historique regroupe les opérations d'une action en une Command annulable ;
+#   - le flux (feed) numérote toutes les opérations, y compris les annulations, pour les
+#     consommateurs incrémentaux (stockage SQLite, tableaux de l'interface).
+MAX_COMMANDS = 200
+MAX_RECORDS = 200000  # enregistrements retenus par l'historique (borne mémoire)
+FEED_SIZE = 10000     # opérations gardées dans le flux ; un consommateur en retard relit tout
+
+MISSING = object()  # champ absent avant (ou après) une mise à jour
+
+
+class Operation:
+    """Modification élémentaire d'une collection, avec de quoi l'inverser.
+
+    kind :
+      "insert" / "delete"   record placé à / retiré de la position index ;
+      "extend" / "truncate" liste record ajoutée / retirée à partir de index ;
+      "update"              champs modifiés de record (before -> after, MISSING = champ absent) ;
+      "replace"             collection entière remplacée (before -> after) ;
+      "rescan"              modification hors journal : pas d'inverse, les consommateurs relisent tout.
+    category désigne la liste d'une catégorie de l'inventaire.
+    """
+    __slots__ = ("kind", "collection", "category", "index", "record", "before", "after")
+
+    INVERSES = {"insert": "delete", "delete": "insert", "extend": "truncate", "truncate": "extend",
+                "update": "update", "replace": "replace"}
+
+    def __init__(self, kind, collection, category=None, index=None, record=None, before=None, after=None):
+        self.kind = kind
+        self.collection = collection
+        self.category = category
+        self.index = index
+        self.record = record
+        self.before = before
+        self.after = after
+
+    def inverse(self):
+        return Operation(self.INVERSES[self.kind], self.collection, self.category, self.index, self.record,
+                         self.after, self.before)
+
+    @property
+    def records(self):
+        """Enregistrements ajoutés ou retirés par l'opération."""
+        if self.kind in ("extend", "truncate"):
+            return self.record
+        return [self.record] if self.kind in ("insert", "delete") else []
+
+    @property
+    def cost(self):
+        """Nombre approximatif d'enregistrements que l'opération garde en mémoire."""
+        if self.kind in ("extend", "truncate"):
+            return len(self.record)
+        if self.kind == "replace":
+            return len(self.before) if isinstance(self.before, (list, dict)) else 1
+        return 1
+
+
+class Command:
+    """Action utilisateur annulable : ses opérations, dans l'ordre d'exécution."""
+
+    def __init__(self, label, operations=None):
+        self.label = label
+        self.operations = operations or []
+
+    def touches(self, collection):
+        return any(operation.collection == collection for operation in self.operations)
+
+    @property
+    def cost(self):
+        return sum(operation.cost for operation in self.operations)
+
+
+class CommandLog:
+    def __init__(self, max_commands=MAX_COMMANDS, max_records=MAX_RECORDS, feed_size=FEED_SIZE):
+        self.max_commands = max_commands
+        self.max_records = max_records
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self._records = 0  # coût cumulé des deux piles
+        self._open = None
+        self._open_discarded = False  # l'action en cours touche une collection relue : pas annulable
+        self._depth = 0
+        self._replaying = False
+        self.feed = deque(maxlen=feed_size)
+        self.seq = 0  # numéro de la dernière opération du flux
+
+    # -- Enregistrement ---------------------------------------------------------------
+    @contextmanager
+    def command(self, label):
+        """Regroupe les opérations d'une action en une seule étape d'annulation (imbrication permise)."""
+        if self._depth == 0:
+            self._open = Command(label)
+            self._open_discarded = False
+        self._depth += 1
+        try:
+            yield self._open
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                command, self._open = self._open, None
+                if command.operations and not self._open_discarded:
+                    self._push(command)
+
+    @contextmanager
+    def replaying(self):
+        """Opérations d'annulation ou de rétablissement : dans le flux, mais pas dans l'historique."""
+        self._replaying = True
+        try:
+            yield
+        finally:
+            self._replaying = False
+
+    def record(self, operation):
+        self.seq += 1
+        self.feed.append((self.seq, operation))
+        if operation.kind == "rescan":
+            # Une modification hors journal rend inapplicables les inverses enregistrés pour cette
+            # collection ; les actions sur les autres collections restent annulables
+            self.discard(operation.collection)
+        elif self._replaying:
+            return
+        elif self._open is not None:
+            self._open.operations.append(operation)
+        else:
+            self._push(Command(operation.kind, [operation]))
+
+    def _push(self, command):
+        self._records -= sum(redone.cost for redone in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(command)
+        self._records += command.cost
+        while self.undo_stack and (len(self.undo_stack) > self.max_commands or self._records > self.max_records):
+            dropped = self.undo_stack.popleft()
+            self._records -= dropped.cost
+            logging.debug(f"Historique : « {dropped.label} » n'est plus annulable (limite atteinte).")
+
+    # -- Annuler / rétablir -------------------------------------------------------------
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def pop_undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return command
+
+    def pop_redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command
+
+    def clear(self):
+        """Vide l'historique (nouvelle session, données rechargées) ; le flux est conservé."""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._records = 0
+
+    def discard(self, collection):
+        """Retire des deux piles les actions qui touchent la collection (relue ou remplacée hors journal).
+
+        Une action est retirée en entier : une commande et son mouvement de stock, par exemple,
+        ne sont jamais annulés l'un sans l'autre.
+        """
+        if self._open is not None and self._open.touches(collection):
+            self._open_discarded = True
+        if not any(command.touches(collection) for command in itertools.chain(self.undo_stack, self.redo_stack)):
+            return
+        self.undo_stack = deque(command for command in self.undo_stack if not command.touches(collection))
+        self.redo_stack = [command for command in self.redo_stack if not command.touches(collection)]
+        self._records = sum(command.cost for command in itertools.chain(self.undo_stack, self.redo_stack))
+
+    # -- Flux des changements --------------------------------------------------------------
+    def changes_since(self, seq):
+        """Opérations inscrites après `seq`, ou None si le flux ne remonte plus jusque-là."""
+        if seq is None or seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        first = self.feed[0][0] if self.feed else self.seq + 1
+        if first > seq + 1:
+            return None
+        return [operation for _, operation in itertools.islice(self.feed, seq + 1 - first, None)]
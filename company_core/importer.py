@@ -0,0 +1,346 @@
+import argparse
+import csv
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+from .errors import DependencyError, ValidationError
+from .ledger import ClientLedger
+from .models import DATE_FORMAT, now_str
+
+# -----------------------------------------------------------------------------
+# IMPORT EN MASSE : clients, commandes et inventaire depuis CSV / XLSX
+# -----------------------------------------------------------------------------
+BATCH_SIZE = 10000
+MAX_REPORTED_REJECTS = 1000  # lignes rejetées conservées dans le rapport
+
+
+def to_text(value):
+    text = "" if value is None else str(value).strip()
+    if not text:
+        raise ValueError("valeur vide")
+    return text
+
+
+def to_amount(value):
+    """Accepte 12.5, "12,50", "1 234,50 €"..."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)  # cas le plus fréquent : "12.5"
+    except (TypeError, ValueError):
+        pass
+    text = str(value or "").replace("€", "").replace(" ", "").replace(" ", "").strip()
+    if not text:
+        raise ValueError("montant vide")
+    if "," in text and "." in text:
+        # Le dernier séparateur est le séparateur décimal : "1.234,50" ou "1,234.50"
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        text = text.replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"montant invalide '{value}'")
+
+
+CANONICAL_DATE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+DATE_INPUT_FORMATS = (DATE_FORMAT, "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%Y-%m-%dT%H:%M:%S")
+
+
+def to_date(value):
+    """Normalise une date vers le format de l'application (AAAA-MM-JJ HH:MM:SS)."""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    text = to_text(value)
+    if CANONICAL_DATE.match(text):
+        return text
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime(DATE_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(f"date non reconnue '{text}'")
+
+
+def to_int(value):
+    return int(to_amount(value))
+
+
+# Schémas d'import : champ -> (convertisseur, obligatoire, alias de colonnes reconnus)
+IMPORT_SCHEMAS = {
+    "Clients": {
+        "name": (to_text, True, ("name", "nom", "client")),
+        "purchases": (to_amount, False, ("purchases", "achats", "achat", "montant")),
+    },
+    "Commandes": {
+        "client": (to_text, True, ("client", "nom", "name")),
+        "total": (to_amount, True, ("total", "montant", "montant total", "amount")),
+        "order_date": (to_date, False, ("order_date", "date", "date de commande")),
+        "order_id": (to_int, False, ("order_id", "id", "id commande")),
+    },
+    "Inventaire": {
+        "category": (to_text, True, ("category", "catégorie", "categorie")),
+        "name": (to_text, True, ("name", "nom", "produit")),
+        "price": (to_amount, True, ("price", "prix")),
+        "cost": (to_amount, False, ("cost", "coût", "cout", "prix d'achat")),
+    },
+}
+
+
+# Collection de CompanyData alimentée par chaque type d'import
+IMPORT_COLLECTIONS = {"Clients": "clients_list", "Commandes": "orders", "Inventaire": "inventory_data"}
+
+
+def _normalise(label):
+    return str(label or "").strip().lower()
+
+
+def guess_mapping(target, header):
+    """Associe chaque champ du schéma à une colonne du fichier à partir des alias connus."""
+    by_label = {_normalise(col): col for col in header}
+    mapping = {}
+    for field, (_, _, aliases) in IMPORT_SCHEMAS[target].items():
+        for alias in aliases:
+            if alias in by_label:
+                mapping[field] = by_label[alias]
+                break
+    return mapping
+
+
+# -----------------------------------------------------------------------------
+# LECTURE EN FLUX DES FICHIERS
+# -----------------------------------------------------------------------------
+def _is_excel(path):
+    return os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm")
+
+
+def iter_file_rows(path, sheet=None):
+    """Génère (en-tête, puis lignes sous forme de tuples) sans charger tout le fichier."""
+    if _is_excel(path):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise DependencyError("Le module openpyxl est requis pour importer un fichier Excel.")
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            for row in ws.iter_rows(values_only=True):
+                yield row
+        finally:
+            wb.close()
+    else:
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            for row in csv.reader(f, dialect):
+                yield row
+
+
+def read_header(path, sheet=None):
+    for row in iter_file_rows(path, sheet):
+        return [str(col) if col is not None else "" for col in row]
+    return []
+
+
+# -----------------------------------------------------------------------------
+# PIPELINE D'IMPORT
+# -----------------------------------------------------------------------------
+class ImportReport:
+    def __init__(self, target, path):
+        self.target = target
+        self.path = path
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = []   # [(numéro de ligne, raison, ligne brute)]
+        self.renumbered = 0  # commandes dont l'identifiant était déjà pris
+        self.batches = 0
+        self.elapsed = 0.0
+
+    def reject(self, line_no, reason, row):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append((line_no, reason, list(row)))
+
+    def summary(self):
+        text = (f"{self.target} : {self.accepted} ligne(s) importée(s), {self.rejected} rejetée(s) "
+                f"en {self.elapsed:.2f} s ({self.batches} lot(s)).")
+        if self.renumbered:
+            text += f" {self.renumbered} identifiant(s) de commande déjà utilisé(s) renuméroté(s)."
+        return text
+
+    def write_rejects(self, path):
+        """Écrit les lignes rejetées (numéro, raison, valeurs) dans un CSV."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Ligne", "Raison", "Valeurs"])
+            for line_no, reason, row in self.rejects:
+                writer.writerow([line_no, reason] + row)
+
+
+class BulkImporter:
+    """Convertit et valide les lignes par lots, puis les ajoute aux collections de CompanyData.
+
+    Avec atomic=True (par défaut), rien n'est ajouté tant que tout le fichier n'a pas été lu :
+    une erreur de lecture laisse les données intactes. Avec atomic=False, chaque lot valide
+    est validé (ajouté) dès qu'il est prêt.
+    """
+
+    def __init__(self, data, clients=None, batch_size=BATCH_SIZE, atomic=True):
+        self.data = data
+        self.clients = clients  # ClientService : noms des commandes rattachés aux fiches existantes
+        self.batch_size = batch_size
+        self.atomic = atomic
+
+    def import_file(self, target, path, mapping=None, sheet=None, progress=None):
+        if target not in IMPORT_SCHEMAS:
+            raise ValidationError(f"Type d'import inconnu : {target}")
+        start = time.perf_counter()
+        report = ImportReport(target, path)
+        rows = iter_file_rows(path, sheet)
+        header = next(rows, None)
+        if header is None:
+            raise ValidationError("Le fichier est vide.")
+        header = [str(col) if col is not None else "" for col in header]
+        mapping = mapping or guess_mapping(target, header)
+        schema = IMPORT_SCHEMAS[target]
+        missing = [field for field, (_, required, _) in schema.items() if required and field not in mapping]
+        if missing:
+            raise ValidationError(f"Colonnes obligatoires non associées : {', '.join(missing)}")
+        positions = {col: idx for idx, col in enumerate(header)}
+        unknown = [col for col in mapping.values() if col not in positions]
+        if unknown:
+            raise ValidationError(f"Colonnes introuvables dans le fichier : {', '.join(unknown)}")
+        # (champ, index de colonne, convertisseur, obligatoire) précalculés une fois pour tout le fichier
+        plan = [(field, positions[mapping[field]], schema[field][0], schema[field][1]) for field in mapping]
+
+        # Un import = une seule étape d'annulation, même validé lot par lot (atomic=False)
+        with self.data.history.command(f"import {target}"):
+            staged = []
+            batch = []
+            line_no = 1
+            for row in rows:
+                line_no += 1
+                if not row or all(value in (None, "") for value in row):
+                    continue
+                batch.append((line_no, row))
+                if len(batch) >= self.batch_size:
+                    staged.extend(self._convert_batch(target, plan, batch, report))
+                    batch = []
+                    report.batches += 1
+                    if not self.atomic:
+                        self._commit(target, staged, report)
+                        staged = []
+                    if progress:
+                        progress(line_no - 1)
+            if batch:
+                staged.extend(self._convert_batch(target, plan, batch, report))
+                report.batches += 1
+            self._commit(target, staged, report)
+        report.elapsed = time.perf_counter() - start
+        logging.info(f"Import de {path} : {report.summary()}")
+        return report
+
+    def _convert_batch(self, target, plan, batch, report):
+        records = []
+        append = records.append
+        for line_no, row in batch:
+            record = {}
+            try:
+                for field, idx, convert, required in plan:
+                    value = row[idx] if idx < len(row) else None
+                    if value is None or value == "":
+                        if required:
+                            raise ValueError(f"champ '{field}' manquant")
+                        continue
+                    try:
+                        record[field] = convert(value)
+                    except ValueError as e:
+                        raise ValueError(f"{field} : {e}")
+            except ValueError as e:
+                report.reject(line_no, str(e), row)
+                continue
+            append(record)
+        report.accepted += len(records)
+        return records
+
+    def _ledger(self):
+        if self.clients is not None:
+            return self.clients.ledger
+        ledger = ClientLedger()
+        ledger.sync(self.data)
+        return ledger
+
+    def _commit(self, target, records, report):
+        """Ajoute les enregistrements validés en une seule opération par collection."""
+        if not records:
+            return
+        if target == "Clients":
+            self.data.extend("clients_list",
+                             ({"name": r["name"], "purchases": r.get("purchases", 0.0)} for r in records))
+        elif target == "Commandes":
+            # Un identifiant déjà pris (ou peut-être archivé) est remplacé : les mouvements de
+            # stock sont rattachés aux commandes par leur identifiant
+            archived = self.data.archived("orders")
+            floor = archived["max"].get("order_id", 0) if archived else 0
+            used = {order.get("order_id") for order in self.data.orders}
+            next_id = self.data.next_order_id()
+            resolve = self._ledger().resolve
+            default_date = now_str()
+            new_orders = []
+            for r in records:
+                order_id = r.get("order_id")
+                if order_id is None or order_id in used or order_id <= floor:
+                    if order_id is not None:
+                        report.renumbered += 1
+                    order_id = next_id
+                used.add(order_id)
+                next_id = max(next_id, order_id + 1)
+                new_orders.append({"order_id": order_id, "client": resolve(r["client"]),
+                                   "total": r["total"], "order_date": r.get("order_date", default_date)})
+            self.data.extend("orders", new_orders)
+        elif target == "Inventaire":
+            by_category = {}
+            for r in records:
+                product = {"name": r["name"], "price": r["price"]}
+                if "cost" in r:
+                    product["cost"] = r["cost"]
+                by_category.setdefault(r["category"], []).append(product)
+            for category, products in by_category.items():
+                self.data.extend("inventory_data", products, category)
+
+
+def main(argv=None):
+    from .core import CompanyCore
+    parser = argparse.ArgumentParser(description="Import en masse dans company_data.json (sans interface).")
+    parser.add_argument("target", choices=sorted(IMPORT_SCHEMAS))
+    parser.add_argument("path")
+    parser.add_argument("--data-file", default="company_data.json")
+    parser.add_argument("--sheet")
+    parser.add_argument("--map", action="append", default=[], metavar="CHAMP=COLONNE",
+                        help="Association manuelle d'une colonne (répétable)")
+    parser.add_argument("--rejects", help="CSV où écrire les lignes rejetées")
+    args = parser.parse_args(argv)
+    core = CompanyCore(data_file=args.data_file)
+    if os.path.exists(args.data_file):
+        core.load()
+    core.data.prepare()
+    mapping = dict(item.split("=", 1) for item in args.map) or None
+    report = core.imports.import_file(args.target, args.path, mapping, args.sheet)
+    if args.rejects and report.rejects:
+        report.write_rejects(args.rejects)
+    core.save()
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
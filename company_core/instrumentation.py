@@ -0,0 +1,159 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# INSTRUMENTATION : durées par action, cProfile et tracemalloc optionnels
+# -----------------------------------------------------------------------------
+SAMPLE_WINDOW = 2048  # nombre de mesures récentes conservées par action
+
+
+class ActionStats:
+    """Histogramme d'une action : compteurs globaux + fenêtre des dernières durées."""
+
+    def __init__(self, window=SAMPLE_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+        self.peak_memory = 0      # octets, si tracemalloc est actif
+        self.profile = None       # cProfile.Profile cumulé, si le profilage est actif
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.samples.append(duration)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+            "peak_memory_kb": self.peak_memory / 1024,
+        }
+
+
+class Instrumentation:
+    """Mesure des actions (opt-in). Désactivée, une action ne coûte qu'un test booléen."""
+
+    def __init__(self, enabled=False, profile=False, trace_memory=False, slow_threshold_ms=500):
+        self.enabled = enabled
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.slow_threshold_ms = slow_threshold_ms
+        self.stats = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=None, profile=None, trace_memory=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if profile is not None:
+            self.profile = profile
+        if trace_memory is not None:
+            self.trace_memory = trace_memory
+
+    def _stats_for(self, name):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = ActionStats()
+            return stats
+
+    @contextmanager
+    def span(self, name):
+        """Mesure le bloc ; le profilage ne s'applique qu'à l'action la plus externe."""
+        if not self.enabled:
+            yield
+            return
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        outer = depth == 0
+        stats = self._stats_for(name)
+        profiler = None
+        started_tracing = False
+        if outer and self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+        if outer and self.profile:
+            if stats.profile is None:
+                stats.profile = cProfile.Profile()
+            profiler = stats.profile
+            try:
+                profiler.enable()
+            except ValueError:  # un autre profileur est déjà actif
+                profiler = None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            if outer and self.trace_memory and tracemalloc.is_tracing():
+                stats.peak_memory = max(stats.peak_memory, tracemalloc.get_traced_memory()[1])
+                if started_tracing:
+                    tracemalloc.stop()
+            self._local.depth = depth
+            stats.add(duration)
+            if duration * 1000 >= self.slow_threshold_ms:
+                logging.warning(f"Action lente : {name} a pris {duration * 1000:.1f} ms.")
+
+    def wrap(self, name, func):
+        """Retourne func enveloppée dans un span nommé."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with self.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def summary(self):
+        """{action: statistiques}, triées de la plus lente (p95) à la plus rapide."""
+        with self._lock:
+            items = [(name, stats.summary()) for name, stats in self.stats.items()]
+        return dict(sorted(items, key=lambda item: item[1]["p95_ms"], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def dump(self, directory):
+        """Écrit un résumé JSON et un fichier .prof (pstats) par action profilée."""
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        summary_path = os.path.join(directory, "perf_summary.json")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
+        written.append(summary_path)
+        with self._lock:
+            profiles = [(name, stats.profile) for name, stats in self.stats.items() if stats.profile is not None]
+        for name, profile in profiles:
+            path = os.path.join(directory, re.sub(r"[^\w.-]", "_", name) + ".prof")
+            profile.dump_stats(path)
+            written.append(path)
+        logging.info(f"Profils de performance écrits dans {directory} ({len(written)} fichiers).")
+        return written
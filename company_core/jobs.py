@@ -0,0 +1,372 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from .errors import CompanyError, ValidationError
+from .export import EXPORT_EXTENSIONS, EXPORT_SOURCES, ExportService
+from .models import CompanyData
+from .query import PRESET_QUERIES, QUERY_SOURCES, QueryEngine
+from .snapshot import encode_records
+from .timeseries import GRANULARITIES, FinanceSeries
+
+# -----------------------------------------------------------------------------
+# TÂCHES PLANIFIÉES : exports et rapports récurrents, écrits en arrière-plan
+# -----------------------------------------------------------------------------
+# Une tâche est un dict JSON enregistré dans settings["scheduled_jobs"] :
+#   {"name": "Commandes du jour", "kind": "export", "source": "Commandes", "format": "CSV",
+#    "every": "daily", "at": "02:00", "directory": "exports", "enabled": true}
+# L'état des exécutions (dernière exécution, empreinte des données, durée, taille) est gardé
+# à part, dans un fichier JSON à côté des données : il change sans modifier les données.
+# Une tâche dont les données n'ont pas changé depuis sa dernière exécution réussie n'écrit rien.
+DEFAULT_JOB_STATE = "scheduled_jobs.json"
+DEFAULT_JOB_DIRECTORY = "exports"
+JOB_KINDS = {"export": "Export", "finance": "Rapport financier", "query": "Requête enregistrée"}
+JOB_FREQUENCIES = {"daily": "Chaque jour", "weekly": "Chaque semaine", "monthly": "Chaque mois"}
+JOB_WORKERS = 2
+JOB_HISTORY = 20  # exécutions gardées par tâche dans le fichier d'état
+FILE_DATE_FORMAT = "%Y-%m-%d"
+FINANCE_COLUMNS = ("Période", "Chiffre d'affaires", "Dépenses", "Résultat net", "Commandes")
+
+
+def job_inputs(job, saved_queries=None):
+    """Collections lues par la tâche."""
+    if job["kind"] == "export":
+        return (EXPORT_SOURCES[job["source"]],)
+    if job["kind"] == "finance":
+        return ("orders", "expenses")
+    return ((saved_queries or {}).get(job["query"], {}).get("source", "orders"),)
+
+
+def next_run(job, after):
+    """Première échéance de la tâche strictement postérieure à after (datetime)."""
+    hour, minute = map(int, job.get("at", "02:00").split(":"))
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if job["every"] == "weekly":
+        candidate += timedelta(days=(job.get("weekday", 0) - candidate.weekday()) % 7)
+        if candidate <= after:
+            candidate += timedelta(days=7)
+    elif job["every"] == "monthly":
+        candidate = candidate.replace(day=job.get("day", 1))
+        if candidate <= after:
+            year, month = (after.year + 1, 1) if after.month == 12 else (after.year, after.month + 1)
+            candidate = candidate.replace(year=year, month=month)
+    elif candidate <= after:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def _slug(name):
+    return re.sub(r"[^\w-]+", "_", name).strip("_") or "tache"
+
+
+class JobScheduler:
+    """Planifie et exécute les tâches de settings["scheduled_jobs"] dans un pool de threads.
+
+    Le thread appelant (celui de l'interface) ne garde que les références des données lues
+    par une tâche, comme pour les sauvegardes ; la copie, l'empreinte, la mise en forme et
+    l'écriture se font ensuite dans le pool. Une tâche est sautée quand ses données ont l'empreinte de sa dernière
+    exécution réussie et que le fichier produit existe encore.
+    """
+
+    def __init__(self, data, state_path=DEFAULT_JOB_STATE, base_dir=None, workers=JOB_WORKERS):
+        self.data = data
+        self.state_path = state_path
+        self.base_dir = base_dir if base_dir is not None else os.path.dirname(state_path)
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._state = None
+        self._running = set()
+        self._versions = {}  # {tâche: (versions des collections lues, empreinte)} du dernier passage
+
+    # -- Définitions ---------------------------------------------------------------------
+    def jobs(self):
+        return list(self.data.settings.get("scheduled_jobs", []))
+
+    def job(self, name):
+        job = next((job for job in self.jobs() if job["name"] == name), None)
+        if job is None:
+            raise CompanyError(f"Tâche planifiée inconnue : {name}")
+        return job
+
+    def validate(self, job):
+        """Tâche complétée et vérifiée ; lève ValidationError avec un message lisible."""
+        job = dict(job)
+        job["name"] = (job.get("name") or "").strip()
+        if not job["name"]:
+            raise ValidationError("Donnez un nom à la tâche.")
+        if job.get("kind") not in JOB_KINDS:
+            raise ValidationError(f"Type de tâche inconnu : {job.get('kind')}")
+        if job.get("format") not in EXPORT_EXTENSIONS:
+            raise ValidationError(f"Format inconnu : {job.get('format')}")
+        if job["kind"] == "export" and job.get("source") not in EXPORT_SOURCES:
+            raise ValidationError(f"Données à exporter inconnues : {job.get('source')}")
+        if job["kind"] == "finance" and job.setdefault("granularity", "month") not in GRANULARITIES:
+            raise ValidationError(f"Granularité inconnue : {job['granularity']}")
+        if job["kind"] == "query" and job.get("query") not in self.queries():
+            raise ValidationError(f"Requête inconnue : {job.get('query')}")
+        if job.get("every") not in JOB_FREQUENCIES:
+            raise ValidationError(f"Fréquence inconnue : {job.get('every')}")
+        try:
+            hour, minute = map(int, str(job.setdefault("at", "02:00")).split(":"))
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError
+        except ValueError:
+            raise ValidationError("Heure invalide (format HH:MM).")
+        job["at"] = f"{hour:02d}:{minute:02d}"
+        if job["every"] == "weekly" and job.setdefault("weekday", 0) not in range(7):
+            raise ValidationError("Jour de la semaine invalide (0 = lundi ... 6 = dimanche).")
+        if job["every"] == "monthly" and job.setdefault("day", 1) not in range(1, 29):
+            raise ValidationError("Jour du mois invalide (1 à 28).")
+        job["directory"] = (job.get("directory") or DEFAULT_JOB_DIRECTORY).strip()
+        job.setdefault("enabled", True)
+        return job
+
+    def save_job(self, job):
+        """Ajoute la tâche, ou remplace celle du même nom (modification annulable)."""
+        job = self.validate(job)
+        jobs = [other for other in self.jobs() if other["name"] != job["name"]] + [job]
+        self.data.update("settings", self.data.settings, {"scheduled_jobs": jobs})
+        return job
+
+    def delete_job(self, name):
+        self.job(name)
+        self.data.update("settings", self.data.settings,
+                         {"scheduled_jobs": [job for job in self.jobs() if job["name"] != name]})
+
+    # -- Planning ------------------------------------------------------------------------
+    def state(self, name):
+        """{"last_run", "stamp", "path", "runs": [...]} de la tâche (vide si elle n'a jamais tourné)."""
+        with self._lock:
+            return dict(self._load_state().get(name, {}))
+
+    def next_run(self, job):
+        last = self.state(job["name"]).get("last_run")
+        return next_run(job, datetime.strptime(last, "%Y-%m-%d %H:%M:%S")) if last else None
+
+    def due(self, now=None):
+        """Tâches actives dont l'échéance est passée (une tâche qui n'a jamais tourné est due)."""
+        now = now or datetime.now()
+        due = []
+        for job in self.jobs():
+            if not job.get("enabled", True) or job["name"] in self._running:
+                continue
+            scheduled = self.next_run(job)
+            if scheduled is None or scheduled <= now:
+                due.append(job)
+        return due
+
+    # -- Exécution -----------------------------------------------------------------------
+    def run_due(self, now=None):
+        """Lance les tâches dues ; retourne leurs futures (résultat : dict de l'exécution)."""
+        return [self.submit(job, now) for job in self.due(now)]
+
+    def submit(self, job, now=None):
+        """Capture les données lues par la tâche (thread appelant) puis l'exécute dans le pool.
+
+        Seules les listes de références sont prises ici ; les enregistrements sont copiés par le
+        worker, avec les copies sur écriture de ceux modifiés entre-temps (voir CompanyData.watch).
+        """
+        now = now or datetime.now()
+        queries = self.queries()
+        names = job_inputs(job, queries)
+        archive = self.data.archive.generation if self.data.archive is not None else 0
+        versions = tuple(self.data.versions.get(name, 0) for name in names) + (archive,)
+        previous = self._versions.get(job["name"])
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._running.add(job["name"])
+        if previous == (versions, self._output(job["name"])) and previous[1] is not None:
+            # Rien n'a changé depuis la dernière exécution de ce processus : pas même de copie des données
+            future = self._executor.submit(self._run, job, None, now)
+        else:
+            spec = dict(job, query=queries.get(job.get("query"))) if job["kind"] == "query" else dict(job)
+            if archive:
+                spec["archive"] = archive  # segments immuables : leur génération suffit à l'empreinte
+            inputs = {name: self._capture(name) for name in names}
+            future = self._executor.submit(self._run, job, (spec, inputs, versions, self.data.watch()), now)
+        future.add_done_callback(lambda _: self._running.discard(job["name"]))
+        return future
+
+    def queries(self):
+        """Requêtes utilisables par une tâche : proposées et enregistrées, comme dans l'écran Rapports."""
+        return {**PRESET_QUERIES, **self.data.settings.get("saved_queries", {})}
+
+    def _output(self, name):
+        """Empreinte de la dernière exécution réussie si son fichier existe encore, sinon None."""
+        last = self.state(name)
+        return last.get("stamp") if last.get("path") and os.path.exists(last["path"]) else None
+
+    def run_now(self, name):
+        """Exécute une tâche tout de suite, qu'elle soit due ou non."""
+        return self.submit(self.job(name))
+
+    def _capture(self, name):
+        if name == "inventory_data":
+            return {category: list(products) for category, products in self.data.inventory_data.items()}
+        return list(getattr(self.data, name))
+
+    def _freeze(self, inputs, preimages):
+        """Copies des données capturées, telles qu'elles étaient à la capture (thread du worker)."""
+        try:
+            return {name: {category: CompanyData.freeze(products, preimages) for category, products in value.items()}
+                    if name == "inventory_data" else CompanyData.freeze(value, preimages)
+                    for name, value in inputs.items()}
+        finally:
+            self.data.unwatch(preimages)
+
+    def _run(self, job, captured, now):
+        started = time.perf_counter()
+        run = {"time": now.strftime("%Y-%m-%d %H:%M:%S"), "status": "ok", "path": None, "size": 0}
+        stamp = None
+        try:
+            if captured is not None:
+                spec, inputs, versions, preimages = captured
+                inputs = self._freeze(inputs, preimages)
+                stamp = self._stamp(spec, inputs)
+            last = self.state(job["name"])
+            if captured is None or stamp == self._output(job["name"]):
+                run.update(status="inchangé", path=last["path"], size=os.path.getsize(last["path"]))
+                stamp = last["stamp"]
+            else:
+                run["path"] = self._write(spec, inputs, now)
+                run["size"] = os.path.getsize(run["path"])
+            if captured is not None:
+                self._versions[job["name"]] = (versions, stamp)
+        except Exception as e:
+            run.update(status="erreur", error=str(e))
+            stamp = None
+        run["elapsed"] = round((time.perf_counter() - started) * 1000, 1)
+        self._record(job["name"], run, stamp)
+        if run["status"] == "erreur":
+            logging.error(f"Tâche planifiée « {job['name']} » : échec après {run['elapsed']} ms : {run['error']}")
+        else:
+            logging.info(f"Tâche planifiée « {job['name']} » ({run['status']}) : {run['path']}, "
+                         f"{run['size']} octets, {run['elapsed']} ms.")
+        return run
+
+    @staticmethod
+    def _stamp(spec, inputs):
+        """Empreinte SHA-256 de la définition de la tâche et des données qu'elle lit."""
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        for name, value in inputs.items():
+            digest.update(name.encode("utf-8"))
+            groups = value.items() if name == "inventory_data" else ((None, value),)
+            for category, records in groups:
+                digest.update(str(category).encode("utf-8"))
+                for start in range(0, len(records), 5000):
+                    digest.update(encode_records(records[start:start + 5000]))
+        return digest.hexdigest()
+
+    def _write(self, spec, inputs, now):
+        snapshot = CompanyData()
+        snapshot.archive = self.data.archive
+        for name, value in inputs.items():
+            setattr(snapshot, name, value)
+        exports = ExportService(snapshot)
+        directory = spec["directory"] if os.path.isabs(spec["directory"]) \
+            else os.path.join(self.base_dir, spec["directory"])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{_slug(spec['name'])}_{now.strftime(FILE_DATE_FORMAT)}"
+                                       f"{EXPORT_EXTENSIONS[spec['format']]}")
+        temporary = f"{path}.tmp"  # le fichier précédent reste lisible jusqu'au remplacement
+        try:
+            if spec["kind"] == "export":
+                exports.export(spec["source"], spec["format"], temporary)
+            elif spec["kind"] == "finance":
+                exports.write(self._finance_rows(snapshot, spec["granularity"]), "Rapport financier",
+                              spec["format"], temporary)
+            else:
+                if spec["query"] is None:
+                    raise CompanyError("La requête enregistrée de cette tâche a été supprimée.")
+                result = QueryEngine(snapshot).run(spec["query"])
+                exports.write([dict(zip(result.columns, row)) for row in result.rows],
+                              QUERY_SOURCES.get(spec["query"].get("source"), ""), spec["format"], temporary)
+            if not os.path.exists(temporary):
+                open(temporary, "w").close()  # export CSV d'une collection vide : fichier vide
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return path
+
+    @staticmethod
+    def _finance_rows(snapshot, granularity):
+        series = FinanceSeries()
+        series.rebuild(snapshot)
+        xs, values = series.series(granularity)
+        date_format = "%Y-%m" if granularity == "month" else "%Y-%m-%d"
+        return [dict(zip(FINANCE_COLUMNS, (date.fromordinal(x).strftime(date_format), round(revenue, 2),
+                                           round(expense, 2), round(net, 2), orders)))
+                for x, revenue, expense, net, orders in zip(xs, values["revenue"], values["expenses"],
+                                                            values["net"], values["orders"])]
+
+    # -- État des exécutions ---------------------------------------------------------------
+    def _load_state(self):
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _record(self, name, run, stamp):
+        with self._lock:
+            state = self._load_state()
+            entry = state.setdefault(name, {})
+            entry["last_run"] = run["time"]
+            if stamp is not None:
+                entry["stamp"] = stamp
+                entry["path"] = run["path"]
+            entry["runs"] = ([run] + entry.get("runs", []))[:JOB_HISTORY]
+            temporary = f"{self.state_path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=4, ensure_ascii=False)
+            os.replace(temporary, self.state_path)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def main(argv=None):
+    from .core import CompanyCore
+    from .storage import open_storage
+    parser = argparse.ArgumentParser(description="Exécute les tâches planifiées (sans interface).")
+    parser.add_argument("--storage", help="json:chemin.json ou sqlite:chemin.db (défaut : COMPANY_APP_STORAGE)")
+    parser.add_argument("--job", action="append", default=[], help="Exécute cette tâche même si elle n'est pas due")
+    parser.add_argument("--list", action="store_true", help="Liste les tâches et leur prochaine échéance")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args(argv)
+    core = CompanyCore(storage=open_storage(args.storage))
+    core.load()
+    core.jobs.workers = args.workers
+    if args.list:
+        for job in core.jobs.jobs():
+            state = core.jobs.state(job["name"])
+            print(f"{job['name']} : {JOB_FREQUENCIES[job['every']]} à {job['at']}, dernière exécution "
+                  f"{state.get('last_run', 'jamais')}, prochaine {core.jobs.next_run(job) or 'maintenant'}")
+        return
+    futures = [core.jobs.run_now(name) for name in args.job] if args.job else core.jobs.run_due()
+    failed = 0
+    for future in futures:
+        run = future.result()
+        failed += run["status"] == "erreur"
+        print(f"{run['status']} : {run.get('path') or run.get('error')} ({run['size']} octets, {run['elapsed']} ms)")
+    core.jobs.shutdown()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# -----------------------------------------------------------------------------
+# GRAND LIVRE CLIENTS : commandes rattachées aux fiches clients, totaux tenus à jour
+# -----------------------------------------------------------------------------
+# Une commande désigne son client par un nom saisi librement : elle est rattachée à la fiche
+# dont le nom est le même à la casse et aux espaces près (client_key). Le montant « purchases »
+# d'une fiche reste le solde d'ouverture saisi à sa création (achats antérieurs à l'application).
+LEDGER_COLLECTIONS = ("clients_list", "orders")
+
+
+def client_key(name):
+    """Clé de rattachement : « Jean  DUPONT » et « jean dupont » désignent le même client."""
+    return " ".join(str(name or "").split()).casefold()
+
+
+class Account:
+    """Commandes d'un client : total, nombre et date de la dernière."""
+    __slots__ = ("total", "last_order", "dates", "archived", "archived_last")
+
+    def __init__(self):
+        self.total = 0.0
+        self.last_order = None
+        self.dates = {}  # {id(commande): date}, pour retrouver la dernière après une suppression
+        self.archived = 0  # commandes archivées, comptées d'après les pieds des segments
+        self.archived_last = None
+
+    @property
+    def order_count(self):
+        return len(self.dates) + self.archived
+
+    def _last(self):
+        return max([*self.dates.values(), *([self.archived_last] if self.archived_last else [])], default=None)
+
+
+EMPTY_ACCOUNT = Account()
+
+
+class ClientLedger:
+    """Comptes clients {clé: Account} et index des fiches {clé: [fiches]}.
+
+    Comme l'index de recherche, le grand livre rejoue le flux des modifications
+    (CompanyData.history) : une commande ajoutée, supprimée ou modifiée ne touche que le
+    compte de son client. Il est reconstruit si une collection a été remplacée ou relue,
+    ou si le flux ne remonte plus assez loin.
+    """
+
+    def __init__(self):
+        self.accounts = {}
+        self.clients = {}
+        self.seq = None
+        self.opening = 0.0  # somme des soldes d'ouverture des fiches
+        self.linked = 0.0   # somme, sur les fiches, des commandes qui leur sont rattachées
+        self._orders = {}   # {id(commande): (clé, montant)} : contribution enregistrée de chaque commande
+        self._entries = {}  # {id(fiche): (clé, solde d'ouverture)}
+
+    # -- Maintenance ---------------------------------------------------------------------
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        if operations is None or any(op.collection in LEDGER_COLLECTIONS and op.kind in ("replace", "rescan")
+                                     for op in operations):
+            self.rebuild(data)
+            return
+        for op in operations:
+            if op.collection == "orders":
+                add, remove = self._add_order, self._remove_order
+            elif op.collection == "clients_list":
+                add, remove = self._add_client, self._remove_client
+            else:
+                continue
+            if op.kind == "update":
+                # L'enregistrement est relu dans son état courant : rejouer deux fois la même
+                # modification laisse le compte inchangé
+                remove(op.record)
+                add(op.record)
+            elif op.kind in ("delete", "truncate"):
+                for record in op.records:
+                    remove(record)
+            else:
+                for record in op.records:
+                    add(record)
+        self.seq = data.history.seq
+
+    def rebuild(self, data):
+        self.accounts.clear()
+        self.clients.clear()
+        self._orders.clear()
+        self._entries.clear()
+        self.opening = self.linked = 0.0
+        for client in data.clients_list:
+            self._add_client(client)
+        archived = data.archived("orders")
+        for name, (total, count, last) in (archived["groups"].items() if archived else ()):
+            self._add_archived(name, total, count, last)
+        for order in data.orders:
+            self._add_order(order)
+        self.seq = data.history.seq
+
+    def _add_order(self, order):
+        if id(order) in self._orders:
+            self._remove_order(order)
+        key = client_key(order.get("client"))
+        total = order.get("total") or 0.0
+        account = self.accounts.get(key)
+        if account is None:
+            account = self.accounts[key] = Account()
+        date = str(order.get("order_date") or "")
+        account.total += total
+        account.dates[id(order)] = date
+        if account.last_order is None or date > account.last_order:
+            account.last_order = date
+        self._orders[id(order)] = (key, total)
+        self.linked += total * len(self.clients.get(key, ()))
+
+    def _remove_order(self, order):
+        entry = self._orders.pop(id(order), None)
+        if entry is None:
+            return
+        key, total = entry
+        account = self.accounts[key]
+        account.total -= total
+        date = account.dates.pop(id(order))
+        if not account.dates and not account.archived:
+            del self.accounts[key]  # aussi pour effacer les résidus d'arrondi du total
+        elif date == account.last_order:
+            account.last_order = account._last()
+        self.linked -= total * len(self.clients.get(key, ()))
+
+    def _add_archived(self, name, total, count, last):
+        """Commandes archivées d'un client : seulement leur total, leur nombre et la dernière date."""
+        key = client_key(name)
+        account = self.accounts.get(key)
+        if account is None:
+            account = self.accounts[key] = Account()
+        account.total += total
+        account.archived += count
+        if account.archived_last is None or last > account.archived_last:
+            account.archived_last = last
+        if account.last_order is None or last > account.last_order:
+            account.last_order = last
+        self.linked += total * len(self.clients.get(key, ()))
+
+    def _add_client(self, client):
+        if id(client) in self._entries:
+            self._remove_client(client)
+        key = client_key(client.get("name"))
+        opening = client.get("purchases") or 0.0
+        self.clients.setdefault(key, []).append(client)
+        self._entries[id(client)] = (key, opening)
+        self.opening += opening
+        self.linked += self.accounts.get(key, EMPTY_ACCOUNT).total
+
+    def _remove_client(self, client):
+        entry = self._entries.pop(id(client), None)
+        if entry is None:
+            return
+        key, opening = entry
+        homonyms = self.clients[key]
+        homonyms[:] = [other for other in homonyms if other is not client]
+        if not homonyms:
+            del self.clients[key]
+        self.opening -= opening
+        self.linked -= self.accounts.get(key, EMPTY_ACCOUNT).total
+
+    # -- Consultation ---------------------------------------------------------------------
+    def account(self, name):
+        return self.accounts.get(client_key(name), EMPTY_ACCOUNT)
+
+    def purchases(self, client):
+        """Achats du client : solde d'ouverture plus ses commandes."""
+        return (client.get("purchases") or 0.0) + self.account(client.get("name")).total
+
+    def resolve(self, name):
+        """Nom de la fiche client désignée par name (casse et espaces corrigés), sinon name nettoyé."""
+        homonyms = self.clients.get(client_key(name))
+        if homonyms:
+            return homonyms[0]["name"]
+        return " ".join(str(name or "").split())
+
+    def total_purchases(self):
+        """Somme des achats de toutes les fiches, sans parcourir les commandes."""
+        return self.opening + self.linked
+
+    def unlinked(self):
+        """Clients des commandes sans fiche : {clé: Account}."""
+        return {key: account for key, account in self.accounts.items() if key not in self.clients}
@@ -0,0 +1,273 @@
+import hashlib
+import threading
+from datetime import datetime
+
+from .archive import ARCHIVE_LAYOUTS
+from .errors import CompanyError
+from .history import MISSING, CommandLog, Operation
+
+# -----------------------------------------------------------------------------
+# FONCTIONS UTILITAIRES
+# -----------------------------------------------------------------------------
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def hash_password(password):
+    """Retourne le hachage SHA-256 du mot de passe donné."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def now_str():
+    """Retourne la date et l'heure courantes au format utilisé dans les données."""
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+# -----------------------------------------------------------------------------
+# VALEURS PAR DÉFAUT
+# -----------------------------------------------------------------------------
+DEFAULT_CATEGORIES = [
+    "E36 : Matériaux Technologiques", "O15 : Fournitures de Bureau", "F58 : Mobilier et Installations",
+    "I29 : Équipements Industriels", "C12 : Électronique Grand Public", "A04 : Vêtements et Accessoires",
+    "B07 : Livres et Magazines", "H11 : Outils et Quincaillerie", "T22 : Jouets et Jeux",
+    "G31 : Épicerie et Alimentation", "P44 : Produits Pharmaceutiques", "M66 : Instruments de Musique",
+    "L55 : Éclairage et Équipements Électriques", "F20 : Alimentation et Boissons", "S33 : Matériel Sportif",
+    "A77 : Pièces Automobiles", "W88 : Technologies Portables", "D99 : Accessoires Numériques",
+    "R50 : Produits Écologiques", "L88 : Biens de Luxe", "M21 : Fournitures Médicales",
+    "CH01 : Produits pour Enfants", "PH02 : Fournitures pour Animaux", "AR03 : Matériel d'Art et Artisanat",
+    "TR04 : Accessoires de Voyage"
+]
+
+DEFAULT_SETTINGS = {
+    "company_name": "Ultimate Company App",
+    "theme_color": "lightgray",
+    "enable_notifications": True,
+    "auto_logout_time": 15,  # minutes
+    "enable_instrumentation": False,  # mesures de performance (écran Performance)
+    "profile_actions": False,         # cProfile par action
+    "trace_memory": False,            # tracemalloc par action
+    "backup_interval": 30,            # minutes entre deux sauvegardes automatiques (0 = désactivées)
+    "archive_after_days": 365,        # commandes, dépenses et connexions archivées après ce délai (0 = jamais)
+    "archive_at_login": False         # archivage automatique à la connexion (sinon Paramètres → Archiver maintenant)
+}
+
+# Clés sauvegardées dans company_data.json (dans l'ordre historique du fichier)
+DATA_KEYS = (
+    "inventory_data", "clients_list", "login_events", "orders", "suppliers", "projects",
+    "announcements", "shifts", "expenses", "settings", "feedbacks", "tasks", "stock_movements"
+)
+
+# Collections sous forme de listes d'enregistrements (dict)
+LIST_COLLECTIONS = (
+    "clients_list", "login_events", "orders", "suppliers", "projects",
+    "announcements", "shifts", "expenses", "feedbacks", "tasks", "stock_movements"
+)
+
+
+# -----------------------------------------------------------------------------
+# MODÈLE DE DONNÉES EN MÉMOIRE
+# -----------------------------------------------------------------------------
+class CompanyData:
+    """Conteneur de toutes les données de l'entreprise, indépendant de Tkinter."""
+
+    def __init__(self):
+        self.inventory_data = {}       # {catégorie: [ {"name": nom, "price": prix}, ... ]}
+        self.clients_list = []         # [ {"name": nom, "purchases": montant}, ... ]
+        self.login_events = []         # [ {"user": utilisateur, "time": heure, "spent": dépensé}, ... ]
+        self.orders = []               # Commandes
+        self.suppliers = []            # Fournisseurs
+        self.projects = []             # Projets
+        self.announcements = []        # Annonces
+        self.shifts = []               # Quarts de travail
+        self.expenses = []             # Dépenses
+        self.feedbacks = []            # Feedbacks des utilisateurs
+        self.tasks = []                # Tâches assignées
+        self.stock_movements = []      # Mouvements de stock : réceptions, commandes, ajustements (voir stock.py)
+        self.settings = dict(DEFAULT_SETTINGS)
+        # Collections modifiées depuis la dernière sauvegarde (écritures ciblées du stockage)
+        self.dirty = set()
+        # Numéro de version par collection, incrémenté à chaque modification (ETag de l'API locale)
+        self.versions = dict.fromkeys(DATA_KEYS, 0)
+        # Journal des modifications : annuler / rétablir et flux des changements (voir history.py)
+        self.history = CommandLog()
+        # Enregistrements anciens sortis des collections en mémoire (voir archive.py), ou None
+        self.archive = None
+        # Copies avant modification ({id(enregistrement): copie}) des sauvegardes et tâches planifiées
+        # en cours de copie (voir freeze) ; le tuple est remplacé d'un bloc, jamais modifié sur place
+        self.preimages = ()
+        self._preimages_lock = threading.Lock()
+
+    def archived(self, name):
+        """Agrégats de la partie archivée d'une collection (voir ArchiveStore.totals), ou None."""
+        if self.archive is None or name not in ARCHIVE_LAYOUTS:
+            return None
+        return self.archive.totals(name)
+
+    def archived_count(self, name):
+        totals = self.archived(name)
+        return totals["count"] if totals else 0
+
+    def next_order_id(self):
+        """Identifiant libre pour une commande : au-delà du plus grand, en mémoire comme archivé.
+
+        Les mouvements de stock sont rattachés à leur commande par cet identifiant : il ne
+        doit jamais désigner une commande existante, même après des suppressions.
+        """
+        archived = self.archived("orders")
+        last = archived["max"].get("order_id", 0) if archived else 0
+        return max(max((order.get("order_id") or 0 for order in self.orders), default=0), last) + 1
+
+    # -- Copie sur écriture (lecture hors du thread de l'interface) -----------------------
+    def watch(self):
+        """Nouveau dict de copies avant modification, rempli par apply() jusqu'à unwatch()."""
+        preimages = {}
+        with self._preimages_lock:
+            self.preimages += (preimages,)
+        return preimages
+
+    def unwatch(self, preimages):
+        with self._preimages_lock:
+            self.preimages = tuple(p for p in self.preimages if p is not preimages)
+
+    @staticmethod
+    def freeze(records, preimages):
+        """Copies des enregistrements tels qu'ils étaient quand preimages a été créé par watch()."""
+        copies = []
+        for record in records:
+            # Copie d'abord : si une modification la suit, sa copie préalable est déjà enregistrée
+            copy = dict(record)
+            copies.append(preimages.get(id(record), copy))
+        return copies
+
+    def touch(self, *names):
+        """Signale que les collections données ont été modifiées hors journal (relues en entier)."""
+        self.dirty.update(names)
+        self._bump(names)
+        for name in names:
+            self.history.record(Operation("rescan", name))
+
+    def _bump(self, names):
+        for name in names:
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def prepare(self):
+        """Initialise les catégories d'inventaire si l'inventaire est vide."""
+        if not self.inventory_data:
+            self.replace("inventory_data", {cat: [] for cat in DEFAULT_CATEGORIES})
+
+    # -- Modifications journalisées ------------------------------------------------------
+    def _records(self, name, category=None):
+        if category is not None:
+            return self.inventory_data.setdefault(category, [])
+        return getattr(self, name)
+
+    @staticmethod
+    def _position(records, index, record):
+        """Position de record : index s'il y est toujours, sinon recherche par identité."""
+        if 0 <= index < len(records) and records[index] is record:
+            return index
+        for position, candidate in enumerate(records):
+            if candidate is record:
+                return position
+        raise CompanyError("Historique désynchronisé : enregistrement introuvable.")
+
+    def apply(self, op):
+        """Exécute une opération, l'inscrit au journal et signale la collection modifiée."""
+        if op.kind == "replace":
+            setattr(self, op.collection, op.after)
+        elif op.kind == "update":
+            for preimages in self.preimages:
+                if id(op.record) not in preimages:
+                    preimages[id(op.record)] = dict(op.record)  # copie sur écriture
+            for key, value in op.after.items():
+                if value is MISSING:
+                    op.record.pop(key, None)
+                else:
+                    op.record[key] = value
+        else:
+            records = self._records(op.collection, op.category)
+            if op.kind == "insert":
+                records.insert(op.index, op.record)
+            elif op.kind == "delete":
+                del records[self._position(records, op.index, op.record)]
+            elif op.kind == "extend":
+                records.extend(op.record)
+            elif op.kind == "truncate":
+                start = self._position(records, op.index, op.record[0]) if op.record else op.index
+                del records[start:start + len(op.record)]
+        self.dirty.add(op.collection)
+        self._bump((op.collection,))
+        self.history.record(op)
+
+    def insert(self, name, record, category=None, index=None):
+        records = self._records(name, category)
+        self.apply(Operation("insert", name, category, len(records) if index is None else index, record))
+        return record
+
+    def delete(self, name, index, category=None):
+        record = self._records(name, category)[index]
+        self.apply(Operation("delete", name, category, index, record))
+        return record
+
+    def extend(self, name, new_records, category=None):
+        new_records = list(new_records)
+        if new_records:
+            self.apply(Operation("extend", name, category, len(self._records(name, category)), new_records))
+        return new_records
+
+    def update(self, name, record, values, category=None):
+        """Modifie des champs d'un enregistrement ; seuls les champs qui changent sont journalisés."""
+        before, after = {}, {}
+        for key, value in values.items():
+            old = record.get(key, MISSING)
+            if old != value:
+                before[key], after[key] = old, value
+        if after:
+            self.apply(Operation("update", name, category, record=record, before=before, after=after))
+        return record
+
+    def replace(self, name, value):
+        self.apply(Operation("replace", name, before=getattr(self, name), after=value))
+
+    def undo(self):
+        """Annule la dernière action ; retourne son libellé (None s'il n'y a rien à annuler)."""
+        return self._replay(self.history.pop_undo(), undo=True)
+
+    def redo(self):
+        """Rétablit la dernière action annulée ; retourne son libellé."""
+        return self._replay(self.history.pop_redo(), undo=False)
+
+    def _replay(self, command, undo):
+        if command is None:
+            return None
+        operations = [op.inverse() for op in reversed(command.operations)] if undo else command.operations
+        try:
+            with self.history.replaying():
+                for op in operations:
+                    self.apply(op)
+        except CompanyError:
+            self.history.clear()
+            raise
+        return command.label
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in DATA_KEYS}
+
+    def load_dict(self, data):
+        """Remplace les données en mémoire par celles du dictionnaire fourni."""
+        self.inventory_data = data.get("inventory_data", {})
+        for key in LIST_COLLECTIONS:
+            setattr(self, key, data.get(key, []))
+        self.settings = data.get("settings", self.settings)
+        self.dirty = set()
+        self._bump(DATA_KEYS)
+        for key in DATA_KEYS:
+            self.history.record(Operation("rescan", key))
+
+    def load_collections(self, collections):
+        """Remplace seulement les collections fournies (rechargement après modification par un autre poste)."""
+        for key, value in collections.items():
+            if key in DATA_KEYS and value is not None:
+                setattr(self, key, value)
+                self.dirty.discard(key)
+                self._bump((key,))
+                self.history.record(Operation("rescan", key))
@@ -0,0 +1,52 @@
+import json
+import os
+from contextlib import contextmanager
+
+DEFAULT_DATA_FILE = "company_data.json"
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Fichier temporaire remplaçant path une fois écrit et synchronisé sur disque.
+
+    Une interruption (plantage, coupure) laisse l'ancien fichier intact.
+    """
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def save_json(data, path=DEFAULT_DATA_FILE):
+    """Écrit les données (dict) dans le fichier JSON donné."""
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=4)
+
+
+def load_json(path=DEFAULT_DATA_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_data_file(data, path=DEFAULT_DATA_FILE):
+    """Écrit un snapshot binaire si le fichier porte l'extension .snap, sinon du JSON."""
+    from .snapshot import SNAPSHOT_EXTENSION, save_snapshot
+    if os.path.splitext(path)[1].lower() == SNAPSHOT_EXTENSION:
+        save_snapshot(data, path)
+    else:
+        save_json(data, path)
+
+
+def load_data_file(path=DEFAULT_DATA_FILE):
+    """Lit un snapshot binaire ou un fichier JSON (détecté par l'en-tête du fichier)."""
+    from .snapshot import is_snapshot, load_snapshot
+    if is_snapshot(path):
+        return load_snapshot(path)
+    return load_json(path)
@@ -0,0 +1,588 @@
+import heapq
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress, repeat
+from operator import itemgetter
+
+from .archive import ARCHIVE_LAYOUTS
+from .errors import ValidationError
+
+# -----------------------------------------------------------------------------
+# REQUÊTES AD HOC : filtre, regroupement, agrégats, tri et limite sur les collections
+# -----------------------------------------------------------------------------
+# Une requête est un dict sérialisable en JSON (enregistrée dans settings["saved_queries"]) :
+#   {"source": "orders",
+#    "filters": [["month", "=", "2024-03"], ["total", ">", 500]],
+#    "group_by": ["client"],
+#    "aggregates": [["sum", "total"], ["count", None]],
+#    "sort": [["sum(total)", True]],        # (colonne du résultat, décroissant)
+#    "fields": [],                          # colonnes affichées sans regroupement (vide = toutes)
+#    "limit": 50}
+# Les données sont lues en colonnes (une liste par champ) et traitées colonne par colonne :
+# les filtres produisent des listes de positions, les regroupements travaillent sur les codes
+# entiers des valeurs (dictionnaire de la colonne), et un filtre d'égalité, d'intervalle ou de
+# préfixe passe par un index trié quand la colonne en a un.
+QUERY_SOURCES = {
+    "orders": "Commandes", "expenses": "Dépenses", "clients_list": "Clients",
+    "inventory_data": "Inventaire", "login_events": "Connexions",
+}
+SOURCE_FIELDS = {  # champs connus même quand la collection est vide
+    "orders": ("order_id", "client", "total", "order_date"),
+    "expenses": ("purpose", "amount", "date"),
+    "clients_list": ("name", "purchases"),
+    "inventory_data": ("category", "name", "price", "cost"),
+    "login_events": ("user", "time", "spent"),
+}
+# Champs calculés : début d'une date "AAAA-MM-JJ HH:MM:SS"
+DATE_FIELDS = {"orders": "order_date", "expenses": "date", "login_events": "time"}
+VIRTUAL_FIELDS = {"year": 4, "month": 7, "day": 10}
+OPERATORS = ("=", "!=", ">", ">=", "<", "<=", "contient", "commence par")
+INDEXED_OPERATORS = ("=", ">", ">=", "<", "<=", "commence par")
+AGGREGATES = {"count": "nombre", "sum": "somme", "avg": "moyenne", "min": "min", "max": "max"}
+INDEX_MIN_ROWS = 20000  # en dessous, parcourir la colonne coûte moins que trier un index
+INDEX_AFTER_USES = 2    # un index coûte une dizaine de parcours : construit au deuxième filtre sur le champ
+MAX_APPENDS = 1000      # ajouts insérés un à un dans un index avant de le reconstruire
+
+PRESET_QUERIES = {
+    "Chiffre d'affaires par mois": {
+        "source": "orders", "group_by": ["month"], "aggregates": [["sum", "total"], ["count", None]],
+        "sort": [["month", False]]},
+    "Meilleurs clients": {
+        "source": "orders", "group_by": ["client"], "aggregates": [["sum", "total"], ["count", None]],
+        "sort": [["sum(total)", True]], "limit": 20},
+    "Dépenses de plus de 500 € par objet": {
+        "source": "expenses", "filters": [["amount", ">", 500]], "group_by": ["purpose"],
+        "aggregates": [["sum", "amount"], ["count", None]], "sort": [["sum(amount)", True]]},
+    "Connexions par utilisateur": {
+        "source": "login_events", "group_by": ["user"], "aggregates": [["count", None]],
+        "sort": [["count", True]]},
+    "Prix par catégorie": {
+        "source": "inventory_data", "group_by": ["category"],
+        "aggregates": [["count", None], ["avg", "price"], ["max", "price"]], "sort": [["category", False]]},
+}
+
+
+def aggregate_name(function, field):
+    return function if function == "count" else f"{function}({field})"
+
+
+def _kind(values):
+    """ "number", "text", "mixed" (valeurs absentes ou types mélangés), ou None pour une colonne vide."""
+    types = set(map(type, values))
+    if not types:
+        return None
+    if types <= {int, float}:
+        return "number"
+    return "text" if types == {str} else "mixed"
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+def _sort_key(descending):
+    """Clé de tri tolérante aux colonnes mélangées ; les valeurs absentes restent en fin de liste."""
+    def key(value):
+        if value is None:
+            return (not descending, False, 0)
+        if isinstance(value, (int, float)):
+            return (descending, False, value)
+        return (descending, True, str(value))
+    return key
+
+
+class SortedIndex:
+    """Positions des lignes triées par valeur d'une colonne homogène (keys[i] = colonne[positions[i]])."""
+
+    def __init__(self, column):
+        self.positions = sorted(range(len(column)), key=column.__getitem__)
+        self.keys = list(map(column.__getitem__, self.positions))
+        self.appended = 0
+
+    def add(self, position, value):
+        at = bisect_right(self.keys, value)
+        self.keys.insert(at, value)
+        self.positions.insert(at, position)
+        self.appended += 1
+
+    def remove(self, position, value):
+        at = bisect_left(self.keys, value)
+        at += self.positions[at:bisect_right(self.keys, value)].index(position)
+        del self.keys[at]
+        del self.positions[at]
+
+    def truncate(self, length):
+        """Oublie les lignes à partir de la position length."""
+        keep = [position < length for position in self.positions]
+        self.positions = list(compress(self.positions, keep))
+        self.keys = list(compress(self.keys, keep))
+
+    def bounds(self, operator, value):
+        keys = self.keys
+        if operator == "=":
+            return bisect_left(keys, value), bisect_right(keys, value)
+        if operator == ">":
+            return bisect_right(keys, value), len(keys)
+        if operator == ">=":
+            return bisect_left(keys, value), len(keys)
+        if operator == "<":
+            return 0, bisect_left(keys, value)
+        if operator == "<=":
+            return 0, bisect_right(keys, value)
+        # commence par : toutes les chaînes entre le préfixe et le préfixe suivi du plus grand caractère
+        return bisect_left(keys, value), bisect_left(keys, value + "\U0010ffff")
+
+
+class ColumnStore:
+    """Lignes d'une source lues en colonnes, avec leurs dictionnaires et index triés, construits à la demande.
+
+    Suit le flux des modifications : des ajouts ou des suppressions en fin de collection
+    (saisie, annulation d'une saisie) prolongent ou raccourcissent les colonnes ; toute autre
+    modification les fait relire.
+
+    Les lignes archivées précèdent celles de la collection en mémoire (records) dans chaque
+    colonne. Elles ne sont jamais gardées sous forme de dicts : seule la colonne d'un champ
+    interrogé est lue dans les segments, et leur nombre vient des pieds de segments.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.records = None     # enregistrements en mémoire (hors archive)
+        self.categories = None  # inventaire : catégorie de chaque ligne
+        self.columns = {}
+        self.kinds = {}
+        self.encodings = {}     # {champ: ({valeur: code}, code de chaque ligne)}
+        self.indexes = {}
+        self.uses = Counter()   # filtres par champ, pour décider quels index construire
+        self.offset = 0         # lignes archivées placées avant celles de la collection en mémoire
+        self.archive = None
+        self.seq = None
+        self.revision = 0       # incrémenté à chaque changement des lignes (caches des agrégats de formules)
+
+    def count(self):
+        """Nombre de lignes, archives comprises."""
+        return self.offset + len(self.records)
+
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        if self.records is None or operations is None:
+            self._reset(data)
+            return
+        for op in operations:
+            if op.collection != self.source:
+                continue
+            if self.source == "inventory_data":
+                self._reset(data)
+                return
+            if op.kind in ("insert", "extend") and op.index == len(self.records):
+                self._append(op.records)
+            elif op.kind in ("delete", "truncate") and op.index + len(op.records) == len(self.records):
+                self._truncate(self.offset + op.index)
+            else:
+                self._reset(data)
+                return
+        self.seq = data.history.seq
+
+    def _reset(self, data):
+        if self.source == "inventory_data":
+            self.records, self.categories = [], []
+            for category, products in data.inventory_data.items():
+                self.records.extend(products)
+                self.categories.extend(repeat(category, len(products)))
+        else:
+            self.offset = data.archived_count(self.source)
+            self.archive = data.archive if self.offset else None
+            self.records = list(getattr(data, self.source))
+        self.columns.clear()
+        self.kinds.clear()
+        self.encodings.clear()
+        self.indexes.clear()
+        self.uses.clear()
+        self.revision += 1
+        self.seq = data.history.seq
+
+    def _append(self, records):
+        start = self.count()
+        self.revision += 1
+        self.records.extend(records)
+        for field, column in self.columns.items():
+            values = self._values(field, records)
+            column.extend(values)
+            kind, previous = _kind(values), self.kinds[field]
+            if kind is not None and kind != previous:
+                self.kinds[field] = kind if previous is None else "mixed"
+                self.indexes.pop(field, None)
+        for field, (mapping, codes) in self.encodings.items():
+            codes.extend(mapping.setdefault(value, len(mapping)) for value in self.columns[field][start:])
+        for field, index in list(self.indexes.items()):
+            if index.appended + len(records) > MAX_APPENDS:
+                del self.indexes[field]
+                continue
+            column = self.columns[field]
+            for position in range(start, self.count()):
+                index.add(position, column[position])
+
+    def _truncate(self, length):
+        self.revision += 1
+        for field, index in self.indexes.items():
+            column = self.columns[field]
+            if len(column) - length > MAX_APPENDS:
+                index.truncate(length)
+            else:
+                for position in range(length, len(column)):
+                    index.remove(position, column[position])
+        del self.records[length - self.offset:]
+        for column in self.columns.values():
+            del column[length:]
+        for _, codes in self.encodings.values():
+            del codes[length:]  # une valeur disparue garde son code, sans ligne
+
+    def fields(self):
+        names = dict.fromkeys(SOURCE_FIELDS[self.source])
+        for record in self.records[:1000]:
+            names.update(dict.fromkeys(record))
+        if self.source in DATE_FIELDS:
+            names.update(dict.fromkeys(VIRTUAL_FIELDS))
+        return list(names)
+
+    def _values(self, field, records):
+        if field == "category" and self.source == "inventory_data":
+            return self.categories[len(self.records) - len(records):]
+        if field in VIRTUAL_FIELDS and self.source in DATE_FIELDS:
+            size, date_field = VIRTUAL_FIELDS[field], DATE_FIELDS[self.source]
+            return [value[:size] if type(value) is str else None
+                    for value in (record.get(date_field) for record in records)]
+        try:
+            return list(map(itemgetter(field), records))
+        except KeyError:
+            return [record.get(field) for record in records]
+
+    def _archived(self, field):
+        """Colonne d'un champ pour les lignes archivées, lue dans les segments."""
+        if not self.offset:
+            return []
+        names = [name for name, _ in ARCHIVE_LAYOUTS[self.source]]
+        if field in VIRTUAL_FIELDS and self.source in DATE_FIELDS:
+            size = VIRTUAL_FIELDS[field]
+            return [value[:size] for value in self.archive.column(self.source, DATE_FIELDS[self.source])]
+        if field not in names:
+            return [None] * self.offset
+        return self.archive.column(self.source, field)
+
+    def column(self, field):
+        column = self.columns.get(field)
+        if column is None:
+            column = self._archived(field)
+            column.extend(self._values(field, self.records))
+            self.columns[field] = column
+            self.kinds[field] = _kind(column)
+        return column
+
+    def kind(self, field):
+        self.column(field)
+        return self.kinds[field]
+
+    def encoding(self, field):
+        """({valeur: code}, code de chaque ligne) : les regroupements travaillent sur des entiers."""
+        encoding = self.encodings.get(field)
+        if encoding is None:
+            mapping = {}
+            codes = [mapping.setdefault(value, len(mapping)) for value in self.column(field)]
+            encoding = self.encodings[field] = (mapping, codes)
+        return encoding
+
+    def index(self, field):
+        """Index trié du champ s'il existe, ou s'il est assez filtré pour en mériter un.
+
+        None pour une source trop petite ou une colonne aux types mélangés (non comparables).
+        """
+        index = self.indexes.get(field)
+        if index is None and self.count() >= INDEX_MIN_ROWS and self.kind(field) in ("number", "text"):
+            self.uses[field] += 1
+            if self.uses[field] >= INDEX_AFTER_USES:
+                index = self.indexes[field] = SortedIndex(self.column(field))
+        return index
+
+
+class QueryResult:
+    def __init__(self, columns, rows, plan, matched, elapsed):
+        self.columns = columns
+        self.rows = rows
+        self.plan = plan        # étapes d'exécution, en clair
+        self.matched = matched  # lignes retenues par les filtres
+        self.elapsed = elapsed  # ms
+
+
+class QueryEngine:
+    def __init__(self, data):
+        self.data = data
+        self.stores = {}
+
+    def store(self, source):
+        if source not in QUERY_SOURCES:
+            raise ValidationError(f"Source inconnue : {source}")
+        store = self.stores.get(source)
+        if store is None:
+            store = self.stores[source] = ColumnStore(source)
+        store.sync(self.data)
+        return store
+
+    def fields(self, source):
+        return self.store(source).fields()
+
+    # -- Validation ---------------------------------------------------------------------
+    def normalize(self, query):
+        """Requête complétée et vérifiée ; lève ValidationError avec un message lisible."""
+        source = query.get("source")
+        store = self.store(source)
+        known = store.fields()
+        filters = []
+        for field, operator, value in query.get("filters") or ():
+            if field not in known:
+                raise ValidationError(f"Champ inconnu pour {QUERY_SOURCES[source]} : {field}")
+            if operator not in OPERATORS:
+                raise ValidationError(f"Opérateur inconnu : {operator}")
+            filters.append([field, operator, self._coerce(store, field, operator, value)])
+        group_by = [field for field in query.get("group_by") or () if field]
+        for field in group_by:
+            if field not in known:
+                raise ValidationError(f"Champ de regroupement inconnu : {field}")
+        aggregates = []
+        for function, field in query.get("aggregates") or ():
+            if function not in AGGREGATES:
+                raise ValidationError(f"Agrégat inconnu : {function}")
+            if function != "count" and field not in known:
+                raise ValidationError(f"Champ à agréger inconnu : {field}")
+            aggregates.append([function, field if function != "count" else None])
+        if group_by or aggregates:
+            columns = group_by + [aggregate_name(function, field) for function, field in aggregates]
+        else:
+            columns = [field for field in query.get("fields") or () if field] or known
+            for field in columns:
+                if field not in known:
+                    raise ValidationError(f"Champ inconnu : {field}")
+        sort = []
+        for column, descending in query.get("sort") or ():
+            if column not in columns:
+                raise ValidationError(f"Tri sur une colonne absente du résultat : {column}")
+            sort.append([column, bool(descending)])
+        limit = query.get("limit")
+        if limit not in (None, ""):
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise ValidationError("La limite doit être un entier.")
+            if limit <= 0:
+                raise ValidationError("La limite doit être positive.")
+        return {"source": source, "filters": filters, "group_by": group_by, "aggregates": aggregates,
+                "sort": sort, "limit": limit or None, "columns": columns}
+
+    @staticmethod
+    def _coerce(store, field, operator, value):
+        """Valeur cherchée du type de la colonne : les comparaisons restent dans un seul type."""
+        kind = store.kind(field)
+        if kind == "mixed":
+            # Colonne avec des valeurs absentes (coût facultatif...) : type des valeurs présentes ;
+            # les lignes sans valeur échouent à la comparaison (_matches)
+            kind = _kind(value for value in store.column(field) if value is not None)
+        if operator in ("contient", "commence par") or kind == "text":
+            return str(value)
+        if kind == "number":
+            try:
+                return float(value) if _is_number(value) else float(str(value).replace(",", "."))
+            except ValueError:
+                raise ValidationError(f"{field} est numérique : valeur invalide « {value} ».")
+        return value
+
+    # -- Exécution ------------------------------------------------------------------------
+    def run(self, query):
+        started = time.perf_counter()
+        query = self.normalize(query)
+        store = self.store(query["source"])
+        plan = []
+        selection = self._select(store, query["filters"], plan)
+        matched = store.count() if selection is None else len(selection)
+        if query["group_by"] or query["aggregates"]:
+            rows = self._aggregate(store, selection, query["group_by"], query["aggregates"], plan)
+            rows = self._order(rows, query["columns"], query["sort"], query["limit"], plan)
+        else:
+            rows = self._project(store, selection, query, plan)
+        elapsed = (time.perf_counter() - started) * 1000
+        return QueryResult(query["columns"], rows, plan, matched, elapsed)
+
+    def _select(self, store, filters, plan):
+        """Positions des lignes qui passent les filtres (None = toutes).
+
+        Planification : parmi les filtres qu'un index trié peut servir, celui qui retient le moins
+        de lignes fournit les candidates ; les autres filtres ne parcourent que ces positions.
+        """
+        if not filters:
+            plan.append(f"Parcours complet : {store.count()} lignes")
+            return None
+        best = None
+        for position, (field, operator, value) in enumerate(filters):
+            if operator not in INDEXED_OPERATORS or (operator == "commence par" and store.kind(field) != "text"):
+                continue
+            index = store.index(field)
+            if index is not None:
+                low, high = index.bounds(operator, value)
+                if best is None or high - low < best[0]:
+                    best = (high - low, position, index, low, high)
+        selection = None
+        remaining = list(filters)
+        if best is not None:
+            count, position, index, low, high = best
+            field, operator, value = remaining.pop(position)
+            selection = sorted(index.positions[low:high])
+            plan.append(f"Index trié sur {field} ({operator} {value}) : {count} ligne(s) candidate(s)")
+        for field, operator, value in remaining:
+            before = store.count() if selection is None else len(selection)
+            selection = self._filter(store, selection, field, operator, value)
+            plan.append(f"Filtre {field} {operator} {value} : {before} -> {len(selection)} ligne(s)")
+            if not selection:
+                break
+        return selection
+
+    @staticmethod
+    def _filter(store, selection, field, operator, value):
+        column = store.column(field)
+        values = column if selection is None else list(map(column.__getitem__, selection))
+        positions = range(len(column)) if selection is None else selection
+        kind = store.kind(field)
+        if operator == "contient":
+            needle = value.casefold()
+            mask = [needle in v.casefold() for v in values] if kind == "text" \
+                else [v is not None and needle in str(v).casefold() for v in values]
+        elif operator == "commence par":
+            mask = map(str.startswith, values, repeat(value)) if kind == "text" \
+                else [v is not None and str(v).startswith(value) for v in values]
+        elif kind in ("number", "text"):
+            # Méthode de comparaison de la valeur cherchée appliquée à toute la colonne (boucle en C) ;
+            # _coerce a donné à la valeur le type de la colonne (un int face à un float répondrait NotImplemented)
+            compare = {"=": value.__eq__, "!=": value.__ne__, ">": value.__lt__, ">=": value.__le__,
+                       "<": value.__gt__, "<=": value.__ge__}[operator]
+            if kind == "number":
+                values = map(float, values)
+            mask = map(compare, values)
+        else:
+            mask = [_matches(v, operator, value) for v in values]
+        return list(compress(positions, mask))
+
+    @staticmethod
+    def _aggregate(store, selection, group_by, aggregates, plan):
+        def gather(column):
+            return column if selection is None else list(map(column.__getitem__, selection))
+
+        def numbers(field, codes=None):
+            values = gather(store.column(field))
+            if store.kind(field) == "number":
+                return codes, values
+            keep = list(map(_is_number, values))  # colonne mélangée : seules les valeurs numériques comptent
+            return (None if codes is None else list(compress(codes, keep))), list(compress(values, keep))
+
+        if not group_by:
+            row = []
+            for function, field in aggregates:
+                if function == "count":
+                    row.append(store.count() if selection is None else len(selection))
+                else:
+                    row.append(_reduce(function, numbers(field)[1]))
+            plan.append("Agrégats sur toutes les lignes retenues")
+            return [tuple(row)]
+        if len(group_by) == 1:
+            mapping, codes = store.encoding(group_by[0])
+            codes = gather(codes)
+            labels = [(value,) for value in mapping]
+        else:
+            mapping = {}
+            codes = [mapping.setdefault(key, len(mapping))
+                     for key in zip(*(gather(store.column(field)) for field in group_by))]
+            labels = list(mapping)
+        counts = Counter(codes)
+        columns = []
+        for function, field in aggregates:
+            if function == "count":
+                columns.append(counts)
+            else:
+                columns.append(_grouped(function, *numbers(field, codes), len(labels)))
+        plan.append(f"Regroupement par {', '.join(group_by)} : {len(counts)} groupe(s)")
+        return [labels[code] + tuple(column[code] for column in columns) for code in sorted(counts)]
+
+    @staticmethod
+    def _order(rows, columns, sort, limit, plan):
+        if sort:
+            if limit and len(sort) == 1 and limit < len(rows):
+                position, key = columns.index(sort[0][0]), _sort_key(sort[0][1])
+                pick = heapq.nlargest if sort[0][1] else heapq.nsmallest
+                plan.append(f"Tri partiel ({limit} premières lignes sur {len(rows)})")
+                return pick(limit, rows, key=lambda row: key(row[position]))
+            for column, descending in reversed(sort):  # tris stables successifs : dernière clé d'abord
+                position, key = columns.index(column), _sort_key(descending)
+                rows.sort(key=lambda row: key(row[position]), reverse=descending)
+            plan.append(f"Tri de {len(rows)} ligne(s)")
+        return rows[:limit] if limit else rows
+
+    def _project(self, store, selection, query, plan):
+        columns, sort, limit = query["columns"], query["sort"], query["limit"]
+        if selection is None and len(sort) == 1 and limit:
+            # Sans filtre, les premières lignes d'un index trié existant sont directement le résultat
+            field, descending = sort[0]
+            index = store.indexes.get(field)
+            if index is not None:
+                selection = index.positions[-limit:][::-1] if descending else index.positions[:limit]
+                plan.append(f"Tri par l'index de {field} : {len(selection)} ligne(s) lues")
+                sort = []
+        gathered = [store.column(name) if selection is None else list(map(store.column(name).__getitem__, selection))
+                    for name in columns]
+        return self._order(list(zip(*gathered)), columns, sort, limit, plan)
+
+
+def _matches(value, operator, expected):
+    if value is None:
+        return operator == "!="
+    try:
+        if operator == "=":
+            return value == expected
+        if operator == "!=":
+            return value != expected
+        if operator == ">":
+            return value > expected
+        if operator == ">=":
+            return value >= expected
+        if operator == "<":
+            return value < expected
+        return value <= expected
+    except TypeError:
+        return False
+
+
+def _reduce(function, values):
+    if not values:
+        return None
+    if function == "sum":
+        return sum(values)
+    if function == "avg":
+        return sum(values) / len(values)
+    if function == "min":
+        return min(values)
+    return max(values)
+
+
+def _grouped(function, codes, values, size):
+    """Agrégat par groupe : liste indexée par code de groupe (None pour un groupe sans valeur)."""
+    if function in ("sum", "avg"):
+        totals = [0] * size
+        for code, value in zip(codes, values):
+            totals[code] += value
+        if function == "sum":
+            return totals
+        counts = Counter(codes)
+        return [totals[code] / counts[code] if counts[code] else None for code in range(size)]
+    result = [None] * size
+    smaller = function == "min"
+    for code, value in zip(codes, values):
+        current = result[code]
+        if current is None or (value < current if smaller else value > current):
+            result[code] = value
+    return result
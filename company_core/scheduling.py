@@ -0,0 +1,213 @@
+import logging
+import random
+import re
+from datetime import datetime, timedelta
+
+from .errors import ValidationError
+
+# -----------------------------------------------------------------------------
+# PLANIFICATION : quarts de travail indexés par arbre d'intervalles
+# -----------------------------------------------------------------------------
+SHIFT_DATE_FORMAT = "%Y-%m-%d"
+SHIFT_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})$")
+SHIFT_TIME = re.compile(r"(\d{1,2}):(\d{2})$")
+
+
+def parse_shift(date, start, end):
+    """Convertit (AAAA-MM-JJ, HH:MM, HH:MM) en intervalle [début, fin[ ; une fin avant le début passe minuit."""
+    day = SHIFT_DATE.match(str(date or "").strip())
+    start_time = SHIFT_TIME.match(str(start or "").strip())
+    end_time = SHIFT_TIME.match(str(end or "").strip())
+    if day is None:
+        raise ValidationError("Date du quart invalide (AAAA-MM-JJ).")
+    if start_time is None or end_time is None:
+        raise ValidationError("Heure de quart invalide (HH:MM).")
+    # Expressions régulières + entiers : bien plus rapide que strptime pour indexer des milliers de quarts
+    try:
+        year, month, dom = int(day.group(1)), int(day.group(2)), int(day.group(3))
+        begin = datetime(year, month, dom, int(start_time.group(1)), int(start_time.group(2)))
+        finish = datetime(year, month, dom, int(end_time.group(1)), int(end_time.group(2)))
+    except ValueError:
+        raise ValidationError("Date ou heure de quart invalide.")
+    if finish == begin:
+        raise ValidationError("L'heure de fin doit être différente de l'heure de début.")
+    if finish < begin:
+        finish += timedelta(days=1)  # quart de nuit
+    return begin, finish
+
+
+def shift_interval(shift):
+    return parse_shift(shift.get("date"), shift.get("start"), shift.get("end"))
+
+
+class _Node:
+    __slots__ = ("start", "end", "item", "priority", "left", "right", "max_end")
+
+    def __init__(self, start, end, item, priority):
+        self.start = start
+        self.end = end
+        self.item = item
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+class IntervalTree:
+    """Intervalles semi-ouverts [début, fin[ dans un treap trié par début.
+
+    Chaque nœud garde la plus grande fin de son sous-arbre : une recherche ignore les
+    sous-arbres qui se terminent avant la période demandée, d'où O(log n + k) en moyenne.
+    """
+
+    def __init__(self, seed=0):
+        self._root = None
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, start, end, item):
+        self._root = self._insert(self._root, _Node(start, end, item, self._random.random()))
+        self._size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.start < node.start:
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                node = self._rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                node = self._rotate_left(node)
+        self._update(node)
+        return node
+
+    @staticmethod
+    def _update(node):
+        node.max_end = node.end
+        if node.left is not None and node.left.max_end > node.max_end:
+            node.max_end = node.left.max_end
+        if node.right is not None and node.right.max_end > node.max_end:
+            node.max_end = node.right.max_end
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left, pivot.right = pivot.right, node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right, pivot.left = pivot.left, node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def overlapping(self, start, end):
+        """(début, fin, élément) des intervalles qui chevauchent [start, end[, triés par début."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= start:
+                continue
+            if node.start < end:
+                if node.end > start:
+                    found.append((node.start, node.end, node.item))
+                stack.append(node.right)
+            stack.append(node.left)
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+    def covering(self, moment):
+        """(début, fin, élément) des intervalles qui contiennent l'instant donné."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= moment:
+                continue
+            if node.start <= moment:
+                if node.end > moment:
+                    found.append((node.start, node.end, node.item))
+                stack.append(node.right)
+            stack.append(node.left)
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+
+class ShiftSchedule:
+    """Index des quarts : un arbre global et un arbre par employé.
+
+    Les quarts dont la date ou les heures sont illisibles (saisies antérieures à la validation)
+    restent dans les données mais sont ignorés par l'index et comptés dans `invalid`.
+    """
+
+    def __init__(self, shifts=()):
+        self.all = IntervalTree()
+        self.by_employee = {}
+        self.invalid = 0
+        for shift in shifts:
+            try:
+                start, end = shift_interval(shift)
+            except ValidationError:
+                self.invalid += 1
+                continue
+            self.add(shift, start, end)
+        if self.invalid:
+            logging.warning(f"{self.invalid} quart(s) ignoré(s) par le planning : date ou heures invalides.")
+
+    def add(self, shift, start, end):
+        self.all.add(start, end, shift)
+        tree = self.by_employee.get(shift.get("employee"))
+        if tree is None:
+            tree = self.by_employee[shift.get("employee")] = IntervalTree()
+        tree.add(start, end, shift)
+
+    def conflicts(self, employee, start, end):
+        tree = self.by_employee.get(employee)
+        return [shift for _, _, shift in tree.overlapping(start, end)] if tree is not None else []
+
+    def between(self, start, end, employee=None):
+        tree = self.all if employee is None else self.by_employee.get(employee)
+        return [shift for _, _, shift in tree.overlapping(start, end)] if tree is not None else []
+
+    def working_at(self, moment):
+        return [shift for _, _, shift in self.all.covering(moment)]
+
+    def overlapping_shifts(self):
+        """Identifiants (id()) des quarts qui chevauchent un autre quart du même employé."""
+        flagged = set()
+        for tree in self.by_employee.values():
+            latest_end, latest = None, None
+            for start, end, shift in tree.overlapping(datetime.min, datetime.max):
+                if latest_end is not None and start < latest_end:
+                    flagged.add(id(shift))
+                    flagged.add(id(latest))
+                if latest_end is None or end > latest_end:
+                    latest_end, latest = end, shift
+        return flagged
+
+
+def day_bounds(date):
+    if isinstance(date, datetime):
+        start = date
+    else:
+        try:
+            start = datetime.strptime(str(date or "").strip(), SHIFT_DATE_FORMAT)
+        except ValueError:
+            raise ValidationError("Date invalide (AAAA-MM-JJ).")
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def week_bounds(date):
+    """Du lundi 00:00 au lundi suivant pour la semaine contenant la date."""
+    start, _ = day_bounds(date)
+    start -= timedelta(days=start.weekday())
+    return start, start + timedelta(days=7)
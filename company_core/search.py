@@ -0,0 +1,314 @@
+import gc
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from functools import lru_cache
+
+from .models import DATA_KEYS
+
+# -----------------------------------------------------------------------------
+# RECHERCHE GLOBALE : index inversé, sans accents, tenu à jour par le flux des modifications
+# -----------------------------------------------------------------------------
+# Champs indexés par collection, avec leur poids dans le classement
+SEARCH_FIELDS = {
+    "clients_list": {"name": 3},
+    "inventory_data": {"name": 3},
+    "orders": {"order_id": 3, "client": 2},
+    "suppliers": {"name": 3, "contact": 1},
+    "projects": {"name": 3, "assigned_to": 2, "status": 1},
+    "announcements": {"title": 3, "content": 1},
+    "feedbacks": {"user": 2, "message": 1},
+    "tasks": {"task": 3, "assignee": 2},
+    "shifts": {"employee": 2, "notes": 1},
+    "expenses": {"purpose": 2},
+}
+SEARCH_LABELS = {
+    "clients_list": "Client", "inventory_data": "Produit", "orders": "Commande", "suppliers": "Fournisseur",
+    "projects": "Projet", "announcements": "Annonce", "feedbacks": "Feedback", "tasks": "Tâche",
+    "shifts": "Quart", "expenses": "Dépense",
+}
+STOP_WORDS = frozenset(("a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les", "un", "une"))
+PREFIX_MIN_LENGTH = 2   # « du » cherche aussi « dupont » ; une seule lettre ne cherche que le mot exact
+MAX_EXPANSIONS = 200    # mots complétés au plus pour un préfixe
+PREFIX_FACTOR = 0.5     # un mot complété compte moitié moins qu'un mot exact
+
+TOKEN = re.compile(r"\w+")
+COMBINING = re.compile("[\u0300-\u036f]")  # accents séparés de leur lettre par la décomposition NFKD
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+
+def fold(text):
+    """Minuscules sans accents : « Élodie Dupré » -> « elodie dupre »."""
+    if text.isascii():
+        return text.lower()
+    return COMBINING.sub("", unicodedata.normalize("NFKD", text.lower().translate(LIGATURES)))
+
+
+@lru_cache(maxsize=131072)
+def tokenize(text):
+    """Mots indexés d'un texte (repliés par fold, sans mots vides)."""
+    return tuple(token for token in TOKEN.findall(fold(text)) if token not in STOP_WORDS)
+
+
+def _tokens(value):
+    if type(value) is int:
+        return (str(value),)  # identifiants : inutile de passer par le cache
+    return tokenize(value if type(value) is str else str(value))
+
+
+def query_terms(query):
+    """Mots d'une requête : le dernier est gardé même s'il est vide de sens (« du » -> « dupont »)."""
+    words = TOKEN.findall(fold(query or ""))
+    terms = [word for word in words[:-1] if word not in STOP_WORDS] + words[-1:]
+    return list(dict.fromkeys(terms))
+
+
+def snapshot(data):
+    """Copie superficielle des collections indexées, pour construire l'index dans un autre thread."""
+    collections = {name: list(getattr(data, name)) for name in SEARCH_FIELDS if name != "inventory_data"}
+    collections["inventory_data"] = {category: list(products) for category, products in data.inventory_data.items()}
+    return data.history.seq, collections
+
+
+class SearchHit:
+    __slots__ = ("collection", "category", "record", "score")
+
+    def __init__(self, collection, category, record, score):
+        self.collection = collection
+        self.category = category
+        self.record = record
+        self.score = score
+
+    @property
+    def label(self):
+        return SEARCH_LABELS.get(self.collection, self.collection)
+
+    def describe(self):
+        """(titre, détail) affichés dans la liste des résultats."""
+        r = self.record
+        if self.collection == "orders":
+            return f"Commande n°{r.get('order_id')}", f"{r.get('client')} — {r.get('total', 0):.2f}€ — {r.get('order_date')}"
+        if self.collection == "inventory_data":
+            return r.get("name"), f"{self.category} — {r.get('price', 0):.2f}€"
+        if self.collection == "clients_list":
+            return r.get("name"), f"Achats : {r.get('purchases', 0)}"
+        if self.collection == "suppliers":
+            return r.get("name"), f"{r.get('contact')} — note {r.get('rating')}"
+        if self.collection == "projects":
+            return r.get("name"), f"{r.get('status')} — {r.get('assigned_to')} — {r.get('deadline')}"
+        if self.collection == "announcements":
+            return r.get("title"), f"{r.get('date')} — {r.get('content')}"
+        if self.collection == "feedbacks":
+            return r.get("user"), f"{r.get('time')} — {r.get('message')}"
+        if self.collection == "tasks":
+            return r.get("task"), f"{r.get('assignee')} — échéance {r.get('due') or 'N/A'}"
+        if self.collection == "shifts":
+            return r.get("employee"), f"{r.get('date')} {r.get('start')}-{r.get('end')} — {r.get('notes')}"
+        if self.collection == "expenses":
+            return r.get("purpose"), f"{r.get('amount', 0):.2f}€ — {r.get('date')}"
+        return str(r), ""
+
+
+class SearchIndex:
+    """Index inversé {mot: {id(enregistrement): poids}} sur toutes les collections de SEARCH_FIELDS.
+
+    Il rejoue le flux des modifications (CompanyData.history) depuis sa dernière mise à jour :
+    seuls les enregistrements ajoutés, supprimés ou modifiés sont réindexés. Une collection
+    remplacée ou modifiée hors journal est réindexée en entier, et tout l'index si le flux
+    ne remonte plus assez loin.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}         # {id(enregistrement): (collection, catégorie, enregistrement, valeurs indexées)}
+        self.collections = {}  # {collection: ensemble des id indexés}
+        self.seq = None
+        self._vocabulary = []  # mots triés (complétion des préfixes par bisect), gardés après suppression
+        self._terms = set()
+        self._new_terms = []
+
+    # -- Maintenance ---------------------------------------------------------------------
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        if operations is None:
+            self.rebuild(data)
+            return
+        stale = set()
+        for op in operations:
+            name = op.collection
+            if name not in SEARCH_FIELDS or name in stale:
+                continue
+            if op.kind in ("replace", "rescan") or (name == "inventory_data" and op.category is None):
+                stale.add(name)
+            elif op.kind == "update":
+                entry = self.docs.get(id(op.record))
+                if entry is not None:
+                    self._remove(op.record)
+                    self._add(name, entry[1], op.record)
+            elif op.kind in ("delete", "truncate"):
+                for record in op.records:
+                    self._remove(record)
+            else:
+                for record in op.records:
+                    self._add(name, op.category, record)
+        for name in stale:
+            self._reindex(data, name)
+        self.seq = data.history.seq
+
+    def rebuild(self, data):
+        self.load(*snapshot(data))
+
+    def load(self, seq, collections):
+        """Construit l'index à partir de snapshot() ; le flux est ensuite rejoué à partir de seq."""
+        self.postings.clear()
+        self.docs.clear()
+        self.collections.clear()
+        self._terms.clear()
+        self._new_terms.clear()
+        # Des millions de petits objets créés d'un coup : le ramasse-miettes cyclique les parcourrait
+        # sans rien libérer (environ 30 % du temps de construction)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for name in DATA_KEYS:
+                if name in collections:
+                    self._index_collection(name, collections[name])
+        finally:
+            if collecting:
+                gc.enable()
+        self._vocabulary = sorted(self._terms)
+        self._new_terms.clear()
+        self.seq = seq
+
+    def _reindex(self, data, name):
+        for key in list(self.collections.get(name, ())):
+            self._remove(self.docs[key][2])
+        self._index_collection(name, getattr(data, name))
+
+    def _index_collection(self, name, records, category=None):
+        """Indexe des enregistrements par valeur distincte de chaque champ.
+
+        Les valeurs se répètent beaucoup (le client de milliers de commandes) : chaque valeur
+        n'est découpée en mots qu'une fois, et ses listes d'enregistrements sont ajoutées
+        d'un bloc aux postings (dict.update) plutôt qu'enregistrement par enregistrement.
+        """
+        if name == "inventory_data" and category is None:
+            for category, products in records.items():
+                self._index_collection(name, products, category)
+            return
+        fields = SEARCH_FIELDS[name]
+        docs = self.docs
+        keys = self.collections.setdefault(name, set())
+        by_value = [{} for _ in fields]
+        for record in records:
+            key = id(record)
+            if key in docs:
+                continue
+            values = tuple(map(record.get, fields))
+            docs[key] = (name, category, record, values)
+            keys.add(key)
+            for position, value in enumerate(values):
+                if value is not None and value != "":
+                    group = by_value[position].get(value)
+                    if group is None:
+                        by_value[position][value] = [key]
+                    else:
+                        group.append(key)
+        # Poids croissants : un mot présent dans deux champs garde le poids le plus fort
+        for position, weight in sorted(enumerate(fields.values()), key=lambda item: item[1]):
+            for value, group in by_value[position].items():
+                for token in _tokens(value):
+                    posting = self.postings.get(token)
+                    if posting is None:
+                        posting = self.postings[token] = {}
+                        if token not in self._terms:
+                            self._terms.add(token)
+                            self._new_terms.append(token)
+                    posting.update(dict.fromkeys(group, weight))
+
+    def _add(self, collection, category, record):
+        self._index_collection(collection, (record,), category)
+
+    def _remove(self, record):
+        key = id(record)
+        entry = self.docs.pop(key, None)
+        if entry is None:
+            return
+        self.collections[entry[0]].discard(key)
+        for value in entry[3]:
+            if value is None or value == "":
+                continue
+            for token in _tokens(value):
+                posting = self.postings.get(token)
+                if posting is not None:
+                    posting.pop(key, None)
+                    if not posting:
+                        del self.postings[token]
+
+    # -- Recherche ---------------------------------------------------------------------------
+    def _expand(self, term):
+        """Mots de l'index qui commencent par term (term lui-même compris)."""
+        if self._new_terms:
+            if len(self._new_terms) < 1000:
+                for new_term in self._new_terms:
+                    insort(self._vocabulary, new_term)
+            else:
+                self._vocabulary = sorted(self._vocabulary + self._new_terms)
+            self._new_terms.clear()
+        vocabulary = self._vocabulary
+        position = bisect_left(vocabulary, term)
+        expansions = []
+        while position < len(vocabulary) and vocabulary[position].startswith(term):
+            if vocabulary[position] in self.postings:
+                expansions.append(vocabulary[position])
+                if len(expansions) >= MAX_EXPANSIONS:
+                    break
+            position += 1
+        return expansions
+
+    def _postings(self, term):
+        """[(posting, facteur)] des mots qui correspondent à term : lui-même, ou ceux qu'il commence."""
+        total = len(self.docs) or 1
+        if len(term) < PREFIX_MIN_LENGTH:
+            tokens = [term] if term in self.postings else []
+        else:
+            tokens = self._expand(term)
+        # Pondération idf : un mot rare pèse plus qu'un mot présent partout
+        return [(self.postings[token], math.log(1 + total / len(self.postings[token]))
+                 * (1 if token == term else PREFIX_FACTOR)) for token in tokens]
+
+    def search(self, query, limit=50, collections=None):
+        """Enregistrements qui contiennent tous les mots de la requête, les mieux classés d'abord."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # On part du mot le plus sélectif ; les autres ne sont consultés que pour ses candidats
+        expanded = sorted((self._postings(term) for term in terms),
+                          key=lambda postings: sum(len(posting) for posting, _ in postings))
+        if not expanded[0]:
+            return []
+        posting, factor = expanded[0][0]
+        scores = {key: weight * factor for key, weight in posting.items()}
+        for posting, factor in expanded[0][1:]:
+            for key, weight in posting.items():
+                if scores.get(key, 0) < weight * factor:
+                    scores[key] = weight * factor
+        for postings in expanded[1:]:
+            narrowed = {}
+            for key, score in scores.items():
+                best = 0
+                for posting, factor in postings:
+                    weight = posting.get(key)
+                    if weight is not None and weight * factor > best:
+                        best = weight * factor
+                if best:
+                    narrowed[key] = score + best
+            scores = narrowed
+            if not scores:
+                return []
+        if collections is not None:
+            scores = {key: score for key, score in scores.items() if self.docs[key][0] in collections}
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [SearchHit(*self.docs[key][:3], score) for key, score in best]
@@ -0,0 +1,641 @@
+from .errors import ShiftConflictError, ValidationError
+from .formula import DEFAULT_COMPUTED_COLUMNS, ComputedColumn, FormulaEngine, compile_formula
+from .history import MISSING
+from .ledger import ClientLedger
+from .models import now_str
+from .query import PRESET_QUERIES, QUERY_SOURCES, VIRTUAL_FIELDS, QueryEngine
+from .scheduling import ShiftSchedule, day_bounds, parse_shift, week_bounds
+from .search import SearchIndex, snapshot
+from .stock import StockLedger, product_key, suggested_quantity
+from .tasks import OPEN_STATUSES, TASK_STATUSES, TASK_TRANSITIONS, TaskQueue, parse_due
+from .timeseries import FinanceSeries
+
+
+def parse_float(value, message):
+    """Convertit une saisie en float ou lève ValidationError avec le message donné."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        raise ValidationError(message)
+
+
+def parse_quantity(value):
+    quantity = parse_float(value, "Quantité invalide.")
+    if quantity <= 0:
+        raise ValidationError("La quantité doit être positive.")
+    return quantity
+
+
+class BaseService:
+    def __init__(self, data):
+        self.data = data
+
+    def _delete_where(self, name, predicate):
+        """Supprime (une opération journalisée par enregistrement) ceux qui vérifient predicate."""
+        records = getattr(self.data, name)
+        # De la fin vers le début : les positions enregistrées restent valables pour l'annulation
+        for index in [i for i, record in enumerate(records) if predicate(record)][::-1]:
+            self.data.delete(name, index)
+
+
+# -----------------------------------------------------------------------------
+# INVENTAIRE
+# -----------------------------------------------------------------------------
+class InventoryService(BaseService):
+    def categories(self):
+        return list(self.data.inventory_data.keys())
+
+    def products(self, category):
+        return self.data.inventory_data.get(category, [])
+
+    def count(self):
+        return sum(len(products) for products in self.data.inventory_data.values())
+
+    def count_by_category(self):
+        return {cat: len(prods) for cat, prods in self.data.inventory_data.items()}
+
+    def add_product(self, category, name, price, cost=None):
+        name = (name or "").strip()
+        if not name or price in (None, ""):
+            raise ValidationError("Veuillez fournir le nom et le prix du produit.")
+        product = {"name": name, "price": parse_float(price, "Format de prix invalide.")}
+        if cost not in (None, ""):  # coût d'achat facultatif (colonnes calculées : marge...)
+            product["cost"] = parse_float(cost, "Coût invalide.")
+        return self.data.insert("inventory_data", product, category=category)
+
+    def modify_product(self, category, index, name, price, cost=None):
+        changes = {"name": name.strip(), "price": parse_float(price, "Prix invalide.")}
+        if cost not in (None, ""):
+            changes["cost"] = parse_float(cost, "Coût invalide.")
+        product = self.data.inventory_data[category][index]
+        old_key = product_key(category, product["name"])
+        self.data.update("inventory_data", product, changes, category)
+        if product_key(category, changes["name"]) != old_key:
+            # Les mouvements de stock suivent le produit renommé
+            for movement in self.data.stock_movements:
+                if product_key(movement.get("category"), movement.get("product")) == old_key:
+                    self.data.update("stock_movements", movement, {"product": changes["name"]})
+        return product
+
+    def delete_product(self, category, index):
+        return self.data.delete("inventory_data", index, category)
+
+    def search(self, category, keyword):
+        """Retourne les couples (index, produit) dont le nom contient le mot-clé."""
+        keyword = keyword.strip().lower()
+        return [(idx, prod) for idx, prod in enumerate(self.products(category))
+                if keyword in prod["name"].lower()]
+
+
+# -----------------------------------------------------------------------------
+# STOCKS
+# -----------------------------------------------------------------------------
+class StockService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._ledger = None
+
+    @property
+    def ledger(self):
+        """Quantités et seuils des produits, mis à jour par le flux des modifications."""
+        if self._ledger is None:
+            self._ledger = StockLedger()
+        self._ledger.sync(self.data)
+        return self._ledger
+
+    def find_product(self, name):
+        """(catégorie, produit) du premier produit de ce nom, à la casse et aux espaces près."""
+        wanted = product_key(None, name)[1]
+        for category, products in self.data.inventory_data.items():
+            for product in products:
+                if product_key(category, product.get("name"))[1] == wanted:
+                    return category, product
+        raise ValidationError(f"Produit introuvable : {name}")
+
+    def quantity(self, category, name):
+        return self.ledger.quantity(category, name)
+
+    def move(self, kind, category, name, quantity, **fields):
+        movement = {"kind": kind, "category": category, "product": name, "quantity": quantity,
+                    "date": now_str(), **fields}
+        return self.data.insert("stock_movements", movement)
+
+    def receive(self, category, product, quantity, supplier=None):
+        """Réception d'une livraison, du fournisseur du produit par défaut."""
+        supplier = (supplier or "").strip() or product.get("supplier") or ""
+        return self.move("réception", category, product["name"], parse_quantity(quantity), supplier=supplier)
+
+    def adjust(self, category, product, counted):
+        """Inventaire physique : mouvement « ajustement » de l'écart avec la quantité comptée (None sans écart)."""
+        counted = parse_float(counted, "Quantité invalide.")
+        if counted < 0:
+            raise ValidationError("La quantité comptée ne peut pas être négative.")
+        difference = counted - self.quantity(category, product["name"])
+        return self.move("ajustement", category, product["name"], difference) if difference else None
+
+    def set_reorder(self, category, product, reorder_point, reorder_quantity, supplier):
+        """Seuil, quantité à recommander et fournisseur d'un produit ; une valeur vide les retire."""
+        values = {}
+        for field, value in (("reorder_point", reorder_point), ("reorder_quantity", reorder_quantity)):
+            value = str(value if value is not None else "").strip()
+            values[field] = parse_float(value, "Quantité invalide.") if value else MISSING
+            if value and values[field] < 0:
+                raise ValidationError("Les quantités ne peuvent pas être négatives.")
+        supplier = (supplier or "").strip()
+        if supplier and all(s["name"] != supplier for s in self.data.suppliers):
+            raise ValidationError(f"Fournisseur inconnu : {supplier}")
+        values["supplier"] = supplier or MISSING
+        return self.data.update("inventory_data", product, values, category)
+
+    def shortages(self):
+        """Produits au seuil ou en dessous, du plus en manque au moins en manque."""
+        ledger = self.ledger
+        rows = []
+        for key in ledger.shortages():
+            product, quantity = ledger.products[key], ledger.quantities.get(key, 0)
+            rows.append({"category": key[0], "name": product["name"], "quantity": quantity,
+                         "reorder_point": product["reorder_point"], "order": suggested_quantity(product, quantity),
+                         "supplier": product.get("supplier") or ""})
+        return rows
+
+    def reorder_lists(self):
+        """Commandes à passer : {fournisseur ("" si aucun): [produits à commander]}."""
+        lists = {}
+        for row in self.shortages():
+            lists.setdefault(row["supplier"], []).append(row)
+        return lists
+
+    def supplier_products(self, supplier):
+        """[(catégorie, produit)] des produits liés au fournisseur."""
+        return [(category, product) for category, products in self.data.inventory_data.items()
+                for product in products if product.get("supplier") == supplier]
+
+    def pop_alerts(self):
+        """Alertes « stock bas » émises depuis le dernier appel (StockAlert)."""
+        return self.ledger.pop_alerts()
+
+
+# -----------------------------------------------------------------------------
+# CLIENTS
+# -----------------------------------------------------------------------------
+class ClientService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._ledger = None
+
+    @property
+    def ledger(self):
+        """Grand livre des commandes par client, mis à jour par le flux des modifications."""
+        if self._ledger is None:
+            self._ledger = ClientLedger()
+        self._ledger.sync(self.data)
+        return self._ledger
+
+    def add_client(self, name, purchases):
+        client = {"name": name.strip(), "purchases": parse_float(purchases, "Montant d'achat invalide.")}
+        return self.data.insert("clients_list", client)
+
+    def delete_clients(self, names):
+        names = set(names)
+        self._delete_where("clients_list", lambda c: c["name"] in names)
+
+    def purchases(self, client):
+        """Achats du client : montant saisi à sa création plus ses commandes."""
+        return self.ledger.purchases(client)
+
+    def account(self, client):
+        """Compte du client (total, nombre et date de la dernière de ses commandes)."""
+        return self.ledger.account(client["name"])
+
+    def filter_clients(self, min_purchase):
+        min_purchase = parse_float(min_purchase, "Valeur de filtrage invalide.")
+        ledger = self.ledger
+        return [c for c in self.data.clients_list if ledger.purchases(c) >= min_purchase]
+
+    def average_purchase(self):
+        count = len(self.data.clients_list)
+        return (self.ledger.total_purchases() / count) if count > 0 else 0
+
+
+# -----------------------------------------------------------------------------
+# COMMANDES
+# -----------------------------------------------------------------------------
+class OrderService(BaseService):
+    def __init__(self, data, clients, stock):
+        super().__init__(data)
+        self.clients = clients
+        self.stock = stock
+
+    def add_order(self, client, total, order_date=None, product=None, quantity=None):
+        """Enregistre une commande ; avec un produit, sa quantité sort du stock (mouvement « commande »)."""
+        total_val = parse_float(total, "Montant invalide.")
+        if product:
+            category, record = self.stock.find_product(product)
+            quantity = parse_quantity(quantity)
+        # Rattachée à la fiche existante : même orthographe que la liste des clients
+        order_id = self.data.next_order_id()
+        order = {"order_id": order_id, "client": self.clients.ledger.resolve(client),
+                 "total": total_val, "order_date": order_date or now_str()}
+        self.data.insert("orders", order)
+        if product:
+            self.stock.move("commande", category, record["name"], -quantity, order_id=order_id)
+        return order
+
+    def delete_orders(self, orders):
+        orders = list(orders)
+        keys = set(map(id, orders))
+        order_ids = {order.get("order_id") for order in orders}
+        # Les quantités commandées reviennent en stock
+        self._delete_where("stock_movements",
+                           lambda m: m.get("kind") == "commande" and m.get("order_id") in order_ids)
+        self._delete_where("orders", lambda o: id(o) in keys)
+
+
+# -----------------------------------------------------------------------------
+# FINANCES
+# -----------------------------------------------------------------------------
+class FinanceService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._series = None
+
+    @property
+    def series(self):
+        """Montants par jour des commandes et des dépenses, mis à jour par le flux des modifications."""
+        if self._series is None:
+            self._series = FinanceSeries()
+        self._series.sync(self.data)
+        return self._series
+
+    def timeseries(self, granularity="month", start=None, end=None):
+        """Chiffre d'affaires, dépenses, profit net et nombre de commandes par jour, semaine ou mois."""
+        return self.series.series(granularity, start, end)
+
+    def total_revenue(self):
+        archived = self.data.archived("orders")
+        return sum(order["total"] for order in self.data.orders) + (archived["amount"] if archived else 0)
+
+    def total_expenses(self):
+        archived = self.data.archived("expenses")
+        return sum(exp["amount"] for exp in self.data.expenses) + (archived["amount"] if archived else 0)
+
+    def summary(self):
+        total_revenue = self.total_revenue()
+        order_count = len(self.data.orders) + self.data.archived_count("orders")
+        total_expenses = self.total_expenses()
+        return {
+            "total_revenue": total_revenue,
+            "order_count": order_count,
+            "avg_order_value": (total_revenue / order_count) if order_count > 0 else 0,
+            "total_expenses": total_expenses,
+            "net_profit": total_revenue - total_expenses,
+        }
+
+    def add_expense(self, purpose, amount):
+        expense = {"purpose": purpose, "amount": parse_float(amount, "Montant invalide."), "date": now_str()}
+        return self.data.insert("expenses", expense)
+
+
+# -----------------------------------------------------------------------------
+# FOURNISSEURS, PROJETS, ANNONCES, QUARTS
+# -----------------------------------------------------------------------------
+class SupplierService(BaseService):
+    def add_supplier(self, name, contact, rating):
+        supplier = {"name": name.strip(), "contact": contact.strip() if contact else "",
+                    "rating": parse_float(rating, "Note invalide.")}
+        return self.data.insert("suppliers", supplier)
+
+    def find(self, name):
+        for supplier in self.data.suppliers:
+            if supplier["name"] == name:
+                return supplier
+        return None
+
+    def modify_supplier(self, supplier, name, contact, rating):
+        rating_val = parse_float(rating, "Note invalide.")
+        old_name = supplier["name"]
+        self.data.update("suppliers", supplier, {"name": name.strip(),
+                                                 "contact": contact.strip() if contact else "",
+                                                 "rating": rating_val})
+        if supplier["name"] != old_name:
+            # Les produits liés au fournisseur gardent le lien
+            for category, products in self.data.inventory_data.items():
+                for product in products:
+                    if product.get("supplier") == old_name:
+                        self.data.update("inventory_data", product, {"supplier": supplier["name"]}, category)
+        return supplier
+
+    def delete_supplier(self, name):
+        self._delete_where("suppliers", lambda s: s["name"] == name)
+
+
+class ProjectService(BaseService):
+    def add_project(self, name, deadline, status, assigned_to):
+        project = {"project_id": len(self.data.projects) + 1, "name": name.strip(), "deadline": deadline,
+                   "status": status, "assigned_to": assigned_to}
+        return self.data.insert("projects", project)
+
+    def find(self, project_id):
+        for project in self.data.projects:
+            if project["project_id"] == project_id:
+                return project
+        return None
+
+    def modify_project(self, project, name, deadline, status, assigned_to):
+        return self.data.update("projects", project, {"name": name.strip(), "deadline": deadline,
+                                                      "status": status, "assigned_to": assigned_to})
+
+    def delete_project(self, project_id):
+        self._delete_where("projects", lambda p: p["project_id"] == project_id)
+
+
+class AnnouncementService(BaseService):
+    def add_announcement(self, title, content):
+        announcement = {"title": title.strip(), "content": content, "date": now_str()}
+        return self.data.insert("announcements", announcement)
+
+    def recent(self, count=3):
+        return self.data.announcements[-count:]
+
+
+class ShiftService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._schedule = None
+        self._schedule_version = None
+
+    @property
+    def schedule(self):
+        """Index des quarts, reconstruit seulement quand la collection a changé ailleurs."""
+        version = self.data.versions.get("shifts")
+        if self._schedule is None or self._schedule_version != version:
+            self._schedule = ShiftSchedule(self.data.shifts)
+            self._schedule_version = version
+        return self._schedule
+
+    def add_shift(self, employee, date, start, end, notes, allow_overlap=False):
+        """Ajoute un quart ; lève ShiftConflictError s'il chevauche un quart du même employé."""
+        employee = (employee or "").strip()
+        if not employee:
+            raise ValidationError("Veuillez indiquer l'employé.")
+        begin, finish = parse_shift(date, start, end)
+        schedule = self.schedule
+        conflicts = schedule.conflicts(employee, begin, finish)
+        if conflicts and not allow_overlap:
+            raise ShiftConflictError(f"Ce quart chevauche {len(conflicts)} quart(s) de {employee}.", conflicts)
+        shift = {"employee": employee, "date": date.strip(), "start": start.strip(), "end": end.strip(),
+                 "notes": notes}
+        self.data.insert("shifts", shift)
+        schedule.add(shift, begin, finish)
+        self._schedule_version = self.data.versions.get("shifts")
+        return shift
+
+    def day(self, date, employee=None):
+        return self.schedule.between(*day_bounds(date), employee=employee)
+
+    def week(self, date, employee=None):
+        return self.schedule.between(*week_bounds(date), employee=employee)
+
+    def working_at(self, moment):
+        """Quarts en cours à l'instant donné (datetime)."""
+        return self.schedule.working_at(moment)
+
+    def overlapping(self):
+        """id() des quarts existants qui chevauchent un autre quart du même employé."""
+        return self.schedule.overlapping_shifts()
+
+
+# -----------------------------------------------------------------------------
+# CONNEXIONS, FEEDBACK ET TÂCHES
+# -----------------------------------------------------------------------------
+class LoginService(BaseService):
+    def record_login(self, user):
+        event = {"user": user, "time": now_str(), "spent": 0}
+        return self.data.insert("login_events", event)
+
+    def summary(self):
+        """Nombre de connexions par utilisateur, archives comprises (lues dans les pieds des segments)."""
+        archived = self.data.archived("login_events")
+        summary = {user: group[1] for user, group in archived["groups"].items()} if archived else {}
+        for record in self.data.login_events:
+            summary[record["user"]] = summary.get(record["user"], 0) + 1
+        return summary
+
+    def events_for(self, user):
+        """Connexions récentes de l'utilisateur (les connexions archivées ne sont pas relues)."""
+        return [event for event in self.data.login_events if event["user"] == user]
+
+    def count_for(self, user):
+        """Nombre de connexions de l'utilisateur, archives comprises (pieds des segments)."""
+        archived = self.data.archived("login_events")
+        group = archived["groups"].get(user) if archived else None
+        return (group[1] if group else 0) + sum(1 for event in self.data.login_events if event["user"] == user)
+
+    def clear(self):
+        """Efface les connexions ; les connexions archivées sont supprimées sans retour possible."""
+        if self.data.archived_count("login_events"):
+            self.data.archive.clear("login_events")
+            self.data.update("settings", self.data.settings, {"archive_generation": self.data.archive.generation})
+        self.data.replace("login_events", [])
+
+
+class FeedbackService(BaseService):
+    def add_feedback(self, user, message):
+        feedback = {"user": user, "message": message, "time": now_str()}
+        return self.data.insert("feedbacks", feedback)
+
+
+class TaskService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._queue = None
+        self._queue_version = None
+        self._notified = set()  # rappels déjà affichés : (tâche, assigné, échéance, type)
+
+    @property
+    def queue(self):
+        """File des tâches, reconstruite seulement quand la collection a changé ailleurs."""
+        version = self.data.versions.get("tasks")
+        if self._queue is None or self._queue_version != version:
+            self._queue = TaskQueue(self.data.tasks)
+            self._queue_version = version
+        return self._queue
+
+    def _synced(self):
+        self._queue_version = self.data.versions.get("tasks")  # la file est déjà à jour
+
+    def add_task(self, task, assignee, due):
+        if not (task or "").strip():
+            raise ValidationError("Veuillez décrire la tâche.")
+        parse_due(due)
+        queue = self.queue
+        new_task = {"task": task.strip(), "assignee": (assignee or "").strip(), "due": (due or "").strip(),
+                    "status": "Pending"}
+        self.data.insert("tasks", new_task)
+        queue.add(new_task)
+        self._synced()
+        return new_task
+
+    def set_status(self, task, status):
+        current = task.get("status", "Pending")
+        if status not in TASK_TRANSITIONS.get(current, ()):
+            raise ValidationError(f"Passage impossible de « {TASK_STATUSES.get(current, current)} » "
+                                  f"à « {TASK_STATUSES.get(status, status)} ».")
+        queue = self.queue
+        self.data.update("tasks", task, {"status": status})
+        if status in OPEN_STATUSES and current not in OPEN_STATUSES:
+            queue.schedule(task)
+        self._synced()
+        return task
+
+    def tasks_for(self, user=None):
+        """Toutes les tâches, ou seulement celles assignées à l'utilisateur donné, par échéance."""
+        return self.queue.ordered(user)
+
+    def next_notification_time(self):
+        return self.queue.next_event_time()
+
+    def due_notifications(self, now, user=None):
+        """Rappels [(type, tâche)] arrivés à échéance et pas encore affichés ("upcoming" ou "overdue")."""
+        notifications = []
+        for kind, task in self.queue.pop_due(now, user):
+            key = (task.get("task"), task.get("assignee"), task.get("due"), kind)
+            if key not in self._notified:
+                self._notified.add(key)
+                notifications.append((kind, task))
+        return notifications
+
+    def reset_notifications(self):
+        """Reprogramme tous les rappels non encore affichés (changement d'utilisateur)."""
+        self._queue = None
+
+
+# -----------------------------------------------------------------------------
+# RECHERCHE GLOBALE
+# -----------------------------------------------------------------------------
+class SearchService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self._index = None
+
+    @property
+    def index(self):
+        """Index inversé, construit à la première recherche puis mis à jour par le flux des modifications."""
+        if self._index is None:
+            self._index = SearchIndex()
+        self._index.sync(self.data)
+        return self._index
+
+    @property
+    def ready(self):
+        return self._index is not None
+
+    def snapshot(self):
+        """Copie des collections indexées, à prendre sur le thread qui modifie les données."""
+        return snapshot(self.data)
+
+    @staticmethod
+    def build_index(copy):
+        """Construit un index à partir de snapshot() ; peut tourner dans un autre thread."""
+        index = SearchIndex()
+        index.load(*copy)
+        return index
+
+    def reset(self):
+        """Oublie l'index (données rechargées) : il sera reconstruit en entier."""
+        self._index = None
+
+    def install(self, index):
+        """Adopte un index construit en arrière-plan ; il rattrape les modifications faites entre-temps."""
+        if self._index is None:
+            self._index = index
+
+    def search(self, query, limit=50, collections=None):
+        return self.index.search(query, limit, collections)
+
+
+# -----------------------------------------------------------------------------
+# REQUÊTES AD HOC (écran Rapports)
+# -----------------------------------------------------------------------------
+class QueryService(BaseService):
+    def __init__(self, data):
+        super().__init__(data)
+        self.engine = QueryEngine(data)
+
+    def run(self, query):
+        return self.engine.run(query)
+
+    def fields(self, source):
+        return self.engine.fields(source)
+
+    def saved(self):
+        """Requêtes proposées puis requêtes enregistrées par les utilisateurs : {nom: requête}."""
+        return {**PRESET_QUERIES, **self.data.settings.get("saved_queries", {})}
+
+    def save(self, name, query):
+        name = (name or "").strip()
+        if not name:
+            raise ValidationError("Donnez un nom à la requête.")
+        self.engine.normalize(query)  # n'enregistre que des requêtes exécutables
+        saved = dict(self.data.settings.get("saved_queries", {}))
+        saved[name] = query
+        self.data.update("settings", self.data.settings, {"saved_queries": saved})
+
+    def delete(self, name):
+        saved = dict(self.data.settings.get("saved_queries", {}))
+        if name not in saved:
+            raise ValidationError("Seules les requêtes enregistrées peuvent être supprimées.")
+        del saved[name]
+        self.data.update("settings", self.data.settings, {"saved_queries": saved})
+
+
+# -----------------------------------------------------------------------------
+# FORMULES (Calculatrice et colonnes calculées)
+# -----------------------------------------------------------------------------
+class FormulaService(BaseService):
+    def __init__(self, data, queries):
+        super().__init__(data)
+        self.engine = FormulaEngine(data, queries)
+        self._columns = {}  # {(collection, nom): ComputedColumn}
+
+    def evaluate(self, text):
+        return self.engine.evaluate(text)
+
+    def definitions(self):
+        """Colonnes calculées : {collection: {nom: formule}}."""
+        return self.data.settings.get("computed_columns", DEFAULT_COMPUTED_COLUMNS)
+
+    def columns(self, collection):
+        """ComputedColumn à jour de la collection, dans l'ordre de définition."""
+        columns = []
+        for name, text in self.definitions().get(collection, {}).items():
+            column = self._columns.get((collection, name))
+            if column is None or column.formula.text != text:
+                column = self._columns[(collection, name)] = ComputedColumn(self.engine, collection, name, text)
+            column.sync(self.data)
+            columns.append(column)
+        return columns
+
+    def save_column(self, collection, name, text):
+        name, text = (name or "").strip(), (text or "").strip()
+        if collection not in QUERY_SOURCES:
+            raise ValidationError(f"Collection inconnue : {collection}")
+        if not name:
+            raise ValidationError("Donnez un nom à la colonne calculée.")
+        formula = compile_formula(text)
+        fields = [field for field in self.engine.queries.fields(collection) if field not in VIRTUAL_FIELDS]
+        unknown = [field for field in formula.fields if field not in fields]
+        if unknown:
+            raise ValidationError(f"Champ inconnu : {', '.join(unknown)} (champs : {', '.join(fields)}).")
+        self.engine.bind(formula)  # vérifie les agrégats (collection.champ)
+        definitions = {source: dict(columns) for source, columns in self.definitions().items()}
+        definitions.setdefault(collection, {})[name] = text
+        self.data.update("settings", self.data.settings, {"computed_columns": definitions})
+
+    def delete_column(self, collection, name):
+        definitions = {source: dict(columns) for source, columns in self.definitions().items()}
+        if name not in definitions.get(collection, {}):
+            raise ValidationError(f"Colonne calculée inconnue : {name}")
+        del definitions[collection][name]
+        self._columns.pop((collection, name), None)
+        self.data.update("settings", self.data.settings, {"computed_columns": definitions})
@@ -0,0 +1,227 @@
+import math
+import re
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from .search import fold
+
+# -----------------------------------------------------------------------------
+# TRI DES TABLEAUX : clés typées et permutations gardées en cache
+# -----------------------------------------------------------------------------
+# Les valeurs affichées ("1 234,50€", "2024-03-01 10:00:00", "Élodie") sont triées selon leur
+# type : nombres, puis dates, puis texte sans accents ni casse (« Élodie » avec « elodie »),
+# les cellules vides en dernier. Une colonne mêlant les types reste triée par type d'abord.
+MAX_CACHED_ORDERS = 4  # ordres de tri gardés par tableau (clic répété, ordre inversé...)
+NUMBER = re.compile(r"-?\d[\d\s\u00a0\u202f]*(?:[.,]\d+)?")
+DATE_INPUT_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+
+def _number(text):
+    if not (text[0].isdigit() or text[0] in "-+."):
+        return None  # ni "nan" ni "inf" : des noms, pas des nombres
+    text = text.rstrip("€% ")
+    try:
+        number = float(text)  # cas le plus fréquent : "12.5", "42", "12.50€"
+        return number if math.isfinite(number) else None
+    except ValueError:
+        pass
+    if not NUMBER.fullmatch(text):
+        return None
+    return float(re.sub(r"[\s\u00a0\u202f]", "", text).replace(",", "."))
+
+
+def _date(text):
+    """Date ISO ("AAAA-MM-JJ[ HH:MM:SS]") telle quelle, ou date française convertie en ISO ; sinon None."""
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-" and text[:4].isdigit():
+        return text
+    if len(text) >= 10 and text[2] == "/" and text[5] == "/":
+        for fmt in DATE_INPUT_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                continue
+    return None
+
+
+@lru_cache(maxsize=131072)
+def _text_key(text):
+    date = _date(text)  # avant les nombres : "2024-03-01" ferait échouer float() pour rien
+    if date is not None:
+        return (1, date)
+    number = _number(text)
+    if number is not None:
+        return (0, number)
+    return (2, fold(text), text)
+
+
+def sort_key(value):
+    """Clé de tri d'une cellule : (0, nombre), (1, date ISO), (2, texte replié, texte) ou (3,) si vide."""
+    if value.__class__ in (int, float):
+        return (0, value)
+    text = str(value).strip() if value is not None else ""
+    return _text_key(text) if text else (3,)
+
+
+# Colonnes d'un seul type : clés simples (nombre, date ISO, texte replié), plus rapides à calculer
+# et à comparer que les clés génériques. Chaque fonction lève ValueError pour une cellule d'un
+# autre type ; la colonne est alors triée avec sort_key.
+def _number_cell(value):
+    if value.__class__ in (int, float):
+        return value
+    number = _number(str(value).strip() or "?")
+    if number is None:
+        raise ValueError(value)
+    return number
+
+
+def _date_cell(value):
+    date = _date(str(value).strip())
+    if date is None:
+        raise ValueError(value)
+    return date
+
+
+@lru_cache(maxsize=131072)
+def _folded(text):
+    if _date(text) is not None or (text and _number(text) is not None):
+        raise ValueError(text)
+    return f"{fold(text)}\0{text}" if text else "\U0010ffff"  # cellules vides en dernier
+
+
+def _text_cell(value):
+    return _folded(str(value).strip() if value is not None else "")
+
+
+COLUMN_KINDS = (_number_cell, _date_cell, _text_cell)
+
+
+class TableSorter:
+    """Lignes d'un tableau {identifiant: valeurs} et leur ordre de tri sur une ou plusieurs colonnes.
+
+    L'ordre est une liste de (colonne, décroissant), la première colonne étant prioritaire ;
+    le tri est stable (les égalités gardent l'ordre d'insertion). Chaque ordre déjà calculé
+    garde sa permutation ; une ligne ajoutée, modifiée ou supprimée y est placée ou retirée
+    par recherche dichotomique au lieu de tout retrier. Les clés d'une colonne ne sont
+    calculées qu'au premier tri sur cette colonne.
+    """
+
+    def __init__(self):
+        self.rows = {}     # {identifiant: valeurs affichées}, dans l'ordre d'insertion
+        self.keys = {}     # {colonne: {identifiant: clé de tri}}, colonnes déjà triées seulement
+        self.kinds = {}    # {colonne: fonction de clé retenue (COLUMN_KINDS ou sort_key)}
+        self.order = []    # [(colonne, décroissant)]
+        self._cache = OrderedDict()  # {ordre: [identifiants triés]}
+
+    # -- Lignes -------------------------------------------------------------------------
+    def reset(self, rows):
+        """Remplace toutes les lignes ({identifiant: valeurs}) ; l'ordre de tri est conservé."""
+        self.rows = dict(rows)
+        self.keys.clear()
+        self.kinds.clear()
+        self._cache.clear()
+
+    def insert(self, iid, values):
+        """Ajoute (ou remplace) une ligne ; retourne sa position dans l'ordre courant (None sans tri)."""
+        if iid in self.rows:
+            self.delete((iid,))
+        self.rows[iid] = values
+        for column, keys in list(self.keys.items()):
+            try:
+                keys[iid] = self.kinds[column](values[column])
+            except ValueError:
+                self._forget(column)  # la colonne n'a plus un seul type : clés génériques au prochain tri
+        for order, permutation in self._cache.items():
+            permutation.insert(self._bisect(permutation, order, iid), iid)
+        return self.position(iid)
+
+    def delete(self, iids):
+        removed = {iid for iid in iids if iid in self.rows}
+        if not removed:
+            return
+        for iid in removed:
+            del self.rows[iid]
+            for keys in self.keys.values():
+                del keys[iid]
+        for permutation in self._cache.values():
+            if len(removed) == 1:
+                permutation.remove(next(iter(removed)))
+            else:
+                permutation[:] = [iid for iid in permutation if iid not in removed]
+
+    def position(self, iid):
+        """Position de la ligne dans l'ordre courant, ou None si le tableau n'est pas trié."""
+        return self.sorted().index(iid) if self.order else None
+
+    # -- Tri ------------------------------------------------------------------------------
+    def click(self, column, additive=False):
+        """Clic sur un en-tête : colonne principale (croissante, puis décroissante au clic suivant) ;
+        avec additive (Maj+clic), colonne ajoutée après les autres ou inversée si elle y est déjà."""
+        current = dict(self.order)
+        if additive and self.order:
+            if column in current:
+                self.order = [(col, not desc if col == column else desc) for col, desc in self.order]
+            else:
+                self.order = self.order + [(column, False)]
+        elif self.order and self.order[0][0] == column and len(self.order) == 1:
+            self.order = [(column, not self.order[0][1])]
+        else:
+            self.order = [(column, False)]
+        return self.sorted()
+
+    def sorted(self):
+        """Identifiants dans l'ordre courant (ordre d'insertion sans tri)."""
+        if not self.order:
+            return list(self.rows)
+        order = tuple(self.order)
+        permutation = self._cache.get(order)
+        if permutation is None:
+            permutation = list(self.rows)
+            # Tris stables successifs, de la colonne la moins prioritaire à la principale
+            for column, descending in reversed(order):
+                permutation.sort(key=self._column_keys(column).__getitem__, reverse=descending)
+            self._cache[order] = permutation
+            while len(self._cache) > MAX_CACHED_ORDERS:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(order)
+        return permutation
+
+    def _column_keys(self, column):
+        keys = self.keys.get(column)
+        if keys is None:
+            kinds = (self.kinds[column],) if column in self.kinds else (*COLUMN_KINDS, sort_key)
+            for kind in kinds:
+                try:
+                    keys = {iid: kind(values[column]) for iid, values in self.rows.items()}
+                except ValueError:
+                    continue
+                self.kinds[column] = kind
+                break
+            self.keys[column] = keys
+        return keys
+
+    def _forget(self, column):
+        del self.keys[column]
+        self.kinds[column] = sort_key
+        for order in [order for order in self._cache if any(col == column for col, _ in order)]:
+            del self._cache[order]
+
+    def _bisect(self, permutation, order, iid):
+        """Position d'insertion de iid dans une permutation triée (après les lignes égales)."""
+        columns = [(self.keys[column], descending) for column, descending in order]
+        low, high = 0, len(permutation)
+        while low < high:
+            middle = (low + high) // 2
+            if self._precedes(iid, permutation[middle], columns):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    @staticmethod
+    def _precedes(iid, other, columns):
+        for keys, descending in columns:
+            a, b = keys[iid], keys[other]
+            if a != b:
+                return a > b if descending else a < b
+        return False
@@ -0,0 +1,244 @@
+import heapq
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# STOCKS : quantités par produit, seuils de réapprovisionnement et fournisseurs
+# -----------------------------------------------------------------------------
+# La quantité d'un produit n'est pas saisie sur sa fiche : c'est la somme de ses mouvements
+# (collection stock_movements) — réceptions, sorties liées aux commandes, ajustements après
+# un inventaire physique. Un produit peut porter un seuil de réapprovisionnement
+# ("reorder_point"), une quantité à recommander ("reorder_quantity") et son fournisseur
+# ("supplier", nom d'une fiche fournisseur).
+#
+# Comme le grand livre clients, StockLedger rejoue le flux des modifications : un mouvement
+# ne touche que la quantité de son produit. L'alerte « stock bas » est émise par la
+# modification qui fait passer la quantité au niveau du seuil ou en dessous, et les produits
+# à commander sont lus dans un tas trié par marge (quantité - seuil), sans parcourir l'inventaire.
+STOCK_COLLECTIONS = ("inventory_data", "stock_movements")
+MOVEMENT_KINDS = {"réception": "Réception", "commande": "Commande", "ajustement": "Ajustement"}
+MAX_PENDING_ALERTS = 100
+
+
+def product_key(category, name):
+    """Clé d'un produit : sa catégorie et son nom à la casse et aux espaces près."""
+    return category, " ".join(str(name or "").split()).casefold()
+
+
+class StockAlert:
+    __slots__ = ("category", "product", "quantity", "reorder_point", "reorder_quantity", "supplier")
+
+    def __init__(self, category, product, quantity, reorder_point, reorder_quantity, supplier):
+        self.category = category
+        self.product = product
+        self.quantity = quantity
+        self.reorder_point = reorder_point
+        self.reorder_quantity = reorder_quantity
+        self.supplier = supplier
+
+    @property
+    def message(self):
+        text = f"{self.product} : {self.quantity:g} en stock (seuil {self.reorder_point:g})"
+        if self.reorder_quantity:
+            text += f", commander {self.reorder_quantity:g}"
+        return text + (f" chez {self.supplier}" if self.supplier else "")
+
+
+def suggested_quantity(product, quantity):
+    """Quantité à commander : celle de la fiche, sinon de quoi remonter au double du seuil."""
+    wanted = product.get("reorder_quantity")
+    if wanted:
+        return wanted
+    return max(2 * (product.get("reorder_point") or 0) - quantity, 0)
+
+
+class StockLedger:
+    """Quantités {clé: quantité}, fiches produits {clé: produit} et marges des produits à seuil.
+
+    La marge d'un produit est sa quantité moins son seuil ; il est à commander quand elle
+    est nulle ou négative. Chaque changement de marge est poussé dans un tas (marge, clé) ;
+    les entrées dépassées sont écartées à la lecture.
+    """
+
+    def __init__(self):
+        self.quantities = {}
+        self.products = {}
+        self.margins = {}   # {clé: quantité - seuil}, produits avec un seuil seulement
+        self.alerts = deque(maxlen=MAX_PENDING_ALERTS)
+        self.seq = None
+        self._heap = []
+        self._movements = {}  # {id(mouvement): (clé, quantité)} : contribution enregistrée de chaque mouvement
+        self._entries = {}    # {id(produit): clé}
+        self._touched = {}    # {id(produit): (produit, marge avant)} pendant une synchronisation
+
+    # -- Maintenance ---------------------------------------------------------------------
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        if operations is None or any(op.collection in STOCK_COLLECTIONS and op.kind in ("replace", "rescan")
+                                     for op in operations):
+            self.rebuild(data)
+            return
+        for op in operations:
+            if op.collection == "stock_movements":
+                add, remove = self._add_movement, self._remove_movement
+            elif op.collection == "inventory_data":
+                add = (lambda product, category=op.category: self._add_product(product, category))
+                remove = self._remove_product
+            else:
+                continue
+            if op.kind == "update":
+                # Relu dans son état courant (nom, seuil ou quantité modifiés)
+                remove(op.record)
+                add(op.record)
+            elif op.kind in ("delete", "truncate"):
+                for record in op.records:
+                    remove(record)
+            else:
+                for record in op.records:
+                    add(record)
+        self._raise_alerts()
+        self.seq = data.history.seq
+
+    def rebuild(self, data):
+        # Après un rechargement (autre poste, restauration), seuls les produits nouvellement
+        # sous leur seuil donnent une alerte
+        low = {id(self.products[key]) for key, margin in self.margins.items() if margin <= 0} \
+            if self.seq is not None else None
+        # En un passage : totaux des mouvements, puis marges et tas construits une seule fois
+        keys, quantities, movements = {}, {}, {}
+        for movement in data.stock_movements:
+            name = (movement.get("category"), movement.get("product"))
+            key = keys.get(name)
+            if key is None:
+                key = keys[name] = product_key(*name)
+            quantity = movement.get("quantity") or 0
+            movements[id(movement)] = (key, quantity)
+            quantities[key] = quantities.get(key, 0) + quantity
+        self.quantities, self._movements = quantities, movements
+        self.products, self._entries, self.margins = {}, {}, {}
+        for category, products in data.inventory_data.items():
+            for product in products:
+                key = product_key(category, product.get("name"))
+                self._entries[id(product)] = key
+                self.products[key] = product
+                point = product.get("reorder_point")
+                if point is not None:
+                    self.margins[key] = quantities.get(key, 0) - point
+        self._heap = [(margin, key) for key, margin in self.margins.items()]
+        heapq.heapify(self._heap)
+        self._touched.clear()
+        if low is not None:
+            for key in [key for key, margin in self.margins.items() if margin <= 0]:
+                if id(self.products[key]) not in low:
+                    self._alert(key)
+        self.seq = data.history.seq
+
+    def _add_movement(self, movement):
+        if id(movement) in self._movements:
+            self._remove_movement(movement)
+        key = product_key(movement.get("category"), movement.get("product"))
+        quantity = movement.get("quantity") or 0
+        self._movements[id(movement)] = (key, quantity)
+        self._change(key, quantity)
+
+    def _remove_movement(self, movement):
+        entry = self._movements.pop(id(movement), None)
+        if entry is not None:
+            self._change(entry[0], -entry[1])
+
+    def _change(self, key, quantity):
+        self._touch(key)
+        total = self.quantities.get(key, 0) + quantity
+        if total or key in self.products:
+            self.quantities[key] = total
+        else:
+            self.quantities.pop(key, None)
+        self._refresh(key)
+
+    def _add_product(self, product, category=None):
+        if id(product) in self._entries:
+            previous = self._entries[id(product)]
+            self._remove_product(product)
+            category = previous[0] if category is None else category
+        key = product_key(category, product.get("name"))
+        self._entries[id(product)] = key
+        self.products[key] = product
+        self._touch(key)
+        self._refresh(key)
+
+    def _remove_product(self, product):
+        key = self._entries.pop(id(product), None)
+        if key is None:
+            return
+        self._touch(key)
+        if self.products.get(key) is product:
+            del self.products[key]
+        self._refresh(key)
+
+    # -- Seuils --------------------------------------------------------------------------
+    def _refresh(self, key):
+        product = self.products.get(key)
+        point = product.get("reorder_point") if product else None
+        if point is None:
+            self.margins.pop(key, None)
+            return
+        margin = self.quantities.get(key, 0) - point
+        if self.margins.get(key) != margin:
+            self.margins[key] = margin
+            heapq.heappush(self._heap, (margin, key))
+            if len(self._heap) > 2 * len(self.margins) + 64:
+                self._heap = [(margin, key) for key, margin in self.margins.items()]
+                heapq.heapify(self._heap)
+
+    def _touch(self, key):
+        """Retient la marge du produit avant la première modification de la synchronisation."""
+        product = self.products.get(key)
+        if product is not None and id(product) not in self._touched:
+            self._touched[id(product)] = (product, self.margins.get(key))
+
+    def _raise_alerts(self):
+        """Alerte pour chaque produit passé sous son seuil pendant la synchronisation.
+
+        Le bilan est fait une fois les opérations rejouées : renommer un produit (ses
+        mouvements suivent) ou corriger une saisie annulée ne déclenche pas d'alerte.
+        """
+        for product, before in self._touched.values():
+            key = self._entries.get(id(product))
+            after = self.margins.get(key) if key is not None and self.products.get(key) is product else None
+            if after is not None and after <= 0 and (before is None or before > 0):
+                self._alert(key)
+        self._touched.clear()
+
+    def _alert(self, key):
+        product = self.products[key]
+        quantity = self.quantities.get(key, 0)
+        self.alerts.append(StockAlert(key[0], product.get("name"), quantity, product.get("reorder_point"),
+                                      suggested_quantity(product, quantity), product.get("supplier")))
+
+    # -- Lecture --------------------------------------------------------------------------
+    def quantity(self, category, name):
+        return self.quantities.get(product_key(category, name), 0)
+
+    def shortages(self):
+        """Clés des produits au seuil ou en dessous, du plus en manque au moins en manque.
+
+        Les entrées valides sont retirées du tas puis remises : le coût dépend du nombre de
+        produits à commander, pas de la taille de l'inventaire.
+        """
+        heap, found, seen = self._heap, [], set()
+        while heap:
+            margin, key = heap[0]
+            if self.margins.get(key) != margin or key in seen:
+                heapq.heappop(heap)  # marge dépassée, ou doublon d'une marge revenue à la même valeur
+                continue
+            if margin > 0:
+                break
+            seen.add(key)
+            found.append(heapq.heappop(heap))
+        for entry in found:
+            heapq.heappush(heap, entry)
+        return [key for _, key in found]
+
+    def pop_alerts(self):
+        alerts = list(self.alerts)
+        self.alerts.clear()
+        return alerts
@@ -0,0 +1,423 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+from .errors import CompanyError
+from .models import DATA_KEYS, LIST_COLLECTIONS, now_str
+from .persistence import DEFAULT_DATA_FILE, load_json, save_json
+from .snapshot import DEFAULT_COMPRESSION, SNAPSHOT_EXTENSION, load_snapshot, save_snapshot
+
+# -----------------------------------------------------------------------------
+# INTERFACE DE STOCKAGE
+# -----------------------------------------------------------------------------
+class StorageBackend:
+    """Interface commune à tous les stockages (fichier JSON local, SQLite partagé, ...).
+
+    - load() retourne un dict au format de company_data.json ;
+    - save(data) persiste un CompanyData (les stockages partagés n'écrivent que data.dirty) ;
+    - load_collections(names) relit seulement certaines collections ;
+    - poll_changes() retourne les collections modifiées par d'autres instances depuis le dernier appel.
+    """
+    shared = False  # True si plusieurs instances de l'application utilisent le même stockage
+    description = ""
+    path = None  # fichier du stockage, s'il y en a un (archives, sauvegardes et tâches sont rangées à côté)
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, data):
+        raise NotImplementedError
+
+    def load_collections(self, names):
+        loaded = self.load()
+        return {name: loaded.get(name) for name in names if name in loaded}
+
+    def poll_changes(self):
+        return set()
+
+    def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """Stockage historique : un fichier company_data.json réécrit en entier à chaque sauvegarde."""
+
+    def __init__(self, path=DEFAULT_DATA_FILE):
+        self.path = path
+        self.description = path
+        self._mtime = None
+
+    def load(self):
+        data = load_json(self.path)
+        self._mtime = self._current_mtime()
+        return data
+
+    def save(self, data):
+        save_json(data.to_dict(), self.path)
+        data.dirty.clear()
+        self._mtime = self._current_mtime()
+
+    def poll_changes(self):
+        """Si le fichier a été réécrit par un autre processus, toutes les collections sont périmées."""
+        mtime = self._current_mtime()
+        if self._mtime is None or mtime is None or mtime == self._mtime:
+            return set()
+        self._mtime = mtime
+        return set(DATA_KEYS)
+
+    def _current_mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+
+class SnapshotStorage(JsonStorage):
+    """Fichier local au format snapshot binaire (voir snapshot.py) : plus compact et plus rapide à relire."""
+
+    def __init__(self, path, compression=DEFAULT_COMPRESSION):
+        super().__init__(path)
+        self.description = f"snapshot:{path}"
+        self.compression = compression
+
+    def load(self):
+        data = load_snapshot(self.path)
+        self._mtime = self._current_mtime()
+        return data
+
+    def load_collections(self, names):
+        return load_snapshot(self.path, sections=set(names))
+
+    def save(self, data):
+        save_snapshot(data.to_dict(), self.path, self.compression)
+        data.dirty.clear()
+        self._mtime = self._current_mtime()
+
+
+# -----------------------------------------------------------------------------
+# STOCKAGE SQLITE PARTAGÉ (mode WAL, pool de connexions, écritures par ligne)
+# -----------------------------------------------------------------------------
+class ConnectionPool:
+    """Pool borné de connexions SQLite utilisables depuis n'importe quel thread."""
+
+    def __init__(self, path, size=4, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture (BEGIN IMMEDIATE) validée ou annulée en bloc."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_collection ON records (collection, position);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    changed_at TEXT NOT NULL
+);
+"""
+
+INVENTORY_PREFIX = "inventory_data:"
+
+
+class SQLiteStorage(StorageBackend):
+    """Base SQLite partagée entre plusieurs postes (fichier sur un partage réseau ou local).
+
+    Chaque enregistrement est une ligne ; une sauvegarde rejoue le flux du journal des modifications
+    (CompanyData.history) depuis la précédente et n'écrit que les lignes ajoutées, modifiées ou supprimées.
+    Sans flux exploitable (premier enregistrement, rechargement, remplacement d'une collection), elle
+    compare la collection entière à la dernière version connue.
+    Chaque écriture ajoute une entrée dans `changes`, que les autres instances lisent via poll_changes().
+    """
+    shared = True
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        self.description = f"sqlite:{path}"
+        self.instance = uuid.uuid4().hex
+        self.pool = ConnectionPool(path, size=pool_size)
+        self._lock = threading.Lock()
+        # {collection: {id(enregistrement): (enregistrement, id de ligne, instantané des valeurs)}}
+        self._rows = {}
+        self._next_position = {}
+        self._feed_seq = None  # dernière opération du journal déjà écrite
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+        self._last_seq = self._max_seq()
+
+    def _max_seq(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    # -- Lecture ----------------------------------------------------------------
+    def load(self):
+        with self._lock:
+            self._rows = {}
+            self._next_position = {}
+            return self._read(list(DATA_KEYS))
+
+    def load_collections(self, names):
+        with self._lock:
+            for name in names:
+                for key in [k for k in self._rows if k == name or (name == "inventory_data"
+                                                                   and k.startswith(INVENTORY_PREFIX))]:
+                    del self._rows[key]
+            return self._read(list(names))
+
+    def _read(self, names):
+        result = {}
+        with self.pool.connection() as conn:
+            documents = dict(conn.execute("SELECT name, body FROM documents"))
+            for name in names:
+                if name == "settings":
+                    if "settings" in documents:
+                        result["settings"] = json.loads(documents["settings"])
+                elif name == "inventory_data":
+                    categories = json.loads(documents.get("inventory_categories", "[]"))
+                    inventory = {cat: [] for cat in categories}
+                    rows = conn.execute("SELECT collection, id, position, body FROM records "
+                                        "WHERE collection LIKE ? ORDER BY collection, position",
+                                        (INVENTORY_PREFIX + "%",))
+                    for collection, row_id, position, body in rows:
+                        record = json.loads(body)
+                        inventory.setdefault(collection[len(INVENTORY_PREFIX):], []).append(record)
+                        self._remember(collection, record, row_id, position)
+                    result["inventory_data"] = inventory
+                elif name in LIST_COLLECTIONS:
+                    records = []
+                    rows = conn.execute("SELECT id, position, body FROM records WHERE collection = ? "
+                                        "ORDER BY position", (name,))
+                    for row_id, position, body in rows:
+                        record = json.loads(body)
+                        records.append(record)
+                        self._remember(name, record, row_id, position)
+                    self._rows.setdefault(name, {})
+                    result[name] = records
+        return result
+
+    def _remember(self, collection, record, row_id, position):
+        self._rows.setdefault(collection, {})[id(record)] = (record, row_id, tuple(record.items()))
+        self._next_position[collection] = max(self._next_position.get(collection, 0), position + 1)
+
+    # -- Écriture ---------------------------------------------------------------
+    def save(self, data):
+        """Écrit les collections modifiées (ou jamais écrites) ligne par ligne dans une transaction."""
+        with self._lock:
+            names = set(data.dirty)
+            names.update(name for name in LIST_COLLECTIONS if name not in self._rows)
+            if not any(key.startswith(INVENTORY_PREFIX) for key in self._rows):
+                names.add("inventory_data")
+            names.add("settings")
+            changed = set()
+            logged = self._logged_operations(data)
+            with self.pool.transaction() as conn:
+                for name in names:
+                    if name == "settings":
+                        conn.execute("INSERT OR REPLACE INTO documents (name, body) VALUES (?, ?)",
+                                     ("settings", json.dumps(data.settings, ensure_ascii=False)))
+                        if "settings" in data.dirty:
+                            changed.add("settings")
+                    elif name == "inventory_data":
+                        conn.execute("INSERT OR REPLACE INTO documents (name, body) VALUES (?, ?)",
+                                     ("inventory_categories", json.dumps(list(data.inventory_data),
+                                                                         ensure_ascii=False)))
+                        touched = False
+                        if "inventory_data" in logged and any(k.startswith(INVENTORY_PREFIX) for k in self._rows):
+                            by_category = {}
+                            for op in logged["inventory_data"]:
+                                by_category.setdefault(op.category, []).append(op)
+                            for category, ops in by_category.items():
+                                touched |= self._replay(conn, INVENTORY_PREFIX + category, ops,
+                                                        data.inventory_data.get(category, []))
+                        else:
+                            for category, products in data.inventory_data.items():
+                                touched |= self._sync(conn, INVENTORY_PREFIX + category, products)
+                            for key in [k for k in self._rows if k.startswith(INVENTORY_PREFIX)
+                                        and k[len(INVENTORY_PREFIX):] not in data.inventory_data]:
+                                touched |= self._sync(conn, key, [])
+                        if touched or "inventory_data" in data.dirty:
+                            changed.add("inventory_data")
+                    elif name in LIST_COLLECTIONS:
+                        if name in logged and name in self._rows:
+                            touched = self._replay(conn, name, logged[name], getattr(data, name))
+                        else:
+                            touched = self._sync(conn, name, getattr(data, name))
+                        if touched:
+                            changed.add(name)
+                for name in changed:
+                    conn.execute("INSERT INTO changes (collection, instance, changed_at) VALUES (?, ?, ?)",
+                                 (name, self.instance, now_str()))
+            data.dirty.clear()
+            return changed
+
+    def _logged_operations(self, data):
+        """{collection: opérations du journal à rejouer} ; les collections absentes sont comparées en entier."""
+        operations = data.history.changes_since(self._feed_seq)
+        self._feed_seq = data.history.seq
+        if operations is None:
+            return {}
+        logged = {}
+        unlogged = set()
+        for op in operations:
+            if op.kind in ("replace", "rescan") or (op.collection == "inventory_data" and op.category is None):
+                unlogged.add(op.collection)
+            else:
+                logged.setdefault(op.collection, []).append(op)
+        return {name: ops for name, ops in logged.items() if name not in unlogged}
+
+    def _replay(self, conn, collection, operations, records):
+        """Écrit les opérations du journal d'une collection : INSERT / UPDATE / DELETE des seules lignes concernées."""
+        touched = False
+        reordered = False
+        for op in operations:
+            # Insertion en milieu de liste (annulation d'une suppression) : positions à renuméroter
+            reordered |= op.kind == "insert" and op.index < len(self._rows.get(collection, ()))
+            touched |= self._write_operation(conn, collection, op)
+        if reordered:
+            known = self._rows[collection]
+            conn.executemany("UPDATE records SET position = ? WHERE id = ?",
+                             [(position, known[id(record)][1]) for position, record in enumerate(records)
+                              if id(record) in known])
+            self._next_position[collection] = len(records)
+        return touched
+
+    def _write_operation(self, conn, collection, op):
+        known = self._rows.setdefault(collection, {})
+        if op.kind == "update":
+            entry = known.get(id(op.record))
+            snapshot = tuple(op.record.items())
+            if entry is None or entry[2] == snapshot:
+                return False
+            conn.execute("UPDATE records SET body = ? WHERE id = ?",
+                         (json.dumps(op.record, ensure_ascii=False), entry[1]))
+            known[id(op.record)] = (op.record, entry[1], snapshot)
+            return True
+        if op.kind in ("delete", "truncate"):
+            rows = [known.pop(id(record))[1] for record in op.records if id(record) in known]
+            conn.executemany("DELETE FROM records WHERE id = ?", [(row_id,) for row_id in rows])
+            return bool(rows)
+        position = self._next_position.get(collection, 0)
+        inserted = False
+        for record in op.records:
+            if id(record) in known:
+                continue
+            cursor = conn.execute("INSERT INTO records (collection, position, body) VALUES (?, ?, ?)",
+                                  (collection, position, json.dumps(record, ensure_ascii=False)))
+            known[id(record)] = (record, cursor.lastrowid, tuple(record.items()))
+            position += 1
+            inserted = True
+        self._next_position[collection] = position
+        return inserted
+
+    def _sync(self, conn, collection, records):
+        """Synchronise une collection : INSERT / UPDATE / DELETE des seules lignes concernées."""
+        known = self._rows.setdefault(collection, {})
+        seen = set()
+        inserts = []
+        updates = []
+        for record in records:
+            key = id(record)
+            seen.add(key)
+            entry = known.get(key)
+            snapshot = tuple(record.items())
+            if entry is None:
+                inserts.append(record)
+            elif entry[2] != snapshot:
+                updates.append((json.dumps(record, ensure_ascii=False), entry[1]))
+                known[key] = (record, entry[1], snapshot)
+        deleted = [key for key in known if key not in seen]
+        if deleted:
+            conn.executemany("DELETE FROM records WHERE id = ?", [(known[key][1],) for key in deleted])
+            for key in deleted:
+                del known[key]
+        if updates:
+            conn.executemany("UPDATE records SET body = ? WHERE id = ?", updates)
+        position = self._next_position.get(collection, 0)
+        for record in inserts:
+            cursor = conn.execute("INSERT INTO records (collection, position, body) VALUES (?, ?, ?)",
+                                  (collection, position, json.dumps(record, ensure_ascii=False)))
+            known[id(record)] = (record, cursor.lastrowid, tuple(record.items()))
+            position += 1
+        self._next_position[collection] = position
+        return bool(inserts or updates or deleted)
+
+    # -- Notifications ------------------------------------------------------------
+    def poll_changes(self):
+        """Collections modifiées par les autres instances depuis le dernier appel."""
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT seq, collection, instance FROM changes WHERE seq > ? ORDER BY seq",
+                                (self._last_seq,)).fetchall()
+        if rows:
+            self._last_seq = rows[-1][0]
+        return {collection for _, collection, instance in rows if instance != self.instance}
+
+    def close(self):
+        self.pool.close()
+
+
+def open_storage(url=None):
+    """Ouvre un stockage à partir d'une URL : "json:chemin.json" (défaut), "snapshot:chemin.snap"
+    ou "sqlite:chemin.db".
+
+    Sans URL, la variable d'environnement COMPANY_APP_STORAGE est utilisée.
+    """
+    url = url or os.environ.get("COMPANY_APP_STORAGE") or f"json:{DEFAULT_DATA_FILE}"
+    scheme, _, path = url.partition(":")
+    if scheme == "sqlite":
+        logging.info(f"Stockage partagé SQLite : {path}")
+        return SQLiteStorage(path)
+    if scheme == "json":
+        return JsonStorage(path or DEFAULT_DATA_FILE)
+    if scheme == "snapshot":
+        return SnapshotStorage(path or os.path.splitext(DEFAULT_DATA_FILE)[0] + SNAPSHOT_EXTENSION)
+    raise CompanyError(f"Stockage inconnu : {url}")
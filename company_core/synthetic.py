@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta
+
+from .models import DATE_FORMAT, DEFAULT_CATEGORIES, CompanyData
+
+# -----------------------------------------------------------------------------
+# GÉNÉRATEUR DE DONNÉES SYNTHÉTIQUES (benchmarks, tests de charge)
+# -----------------------------------------------------------------------------
+FIRST_NAMES = ["Alice", "Bruno", "Chloé", "David", "Élodie", "François", "Gaëlle", "Hugo",
+               "Inès", "Julien", "Karim", "Léa", "Mathis", "Noémie", "Océane", "Pierre"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand",
+              "Leroy", "Moreau", "Simon", "Laurent", "Lefèvre", "Michel", "Garcia", "Roux"]
+PRODUCT_WORDS = ["Câble", "Lampe", "Chaise", "Bureau", "Stylo", "Écran", "Clavier", "Sac",
+                 "Montre", "Batterie", "Ballon", "Livre", "Casque", "Tapis", "Boîte", "Carte"]
+EXPENSE_PURPOSES = ["Loyer", "Électricité", "Fournitures", "Transport", "Marketing", "Salaires", "Maintenance"]
+
+
+def _dates(rng, count, start, span_days):
+    span_seconds = span_days * 86400
+    for _ in range(count):
+        yield (start + timedelta(seconds=rng.randrange(span_seconds))).strftime(DATE_FORMAT)
+
+
+def generate_dataset(orders=1000, clients=100, login_events=1000, inventory_items=500,
+                     expenses=None, seed=42, span_days=3 * 365):
+    """Construit un CompanyData reproductible (même graine -> mêmes données)."""
+    rng = random.Random(seed)
+    data = CompanyData()
+    data.prepare()
+    start = datetime(2020, 1, 1)
+
+    categories = DEFAULT_CATEGORIES
+    for i in range(inventory_items):
+        cat = categories[i % len(categories)]
+        name = f"{rng.choice(PRODUCT_WORDS)} {rng.choice(LAST_NAMES)} {i}"
+        data.inventory_data[cat].append({"name": name, "price": round(rng.uniform(1, 2000), 2)})
+
+    client_names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(max(clients, 1))]
+    data.clients_list = [{"name": name, "purchases": round(rng.uniform(0, 50000), 2)}
+                         for name in client_names[:clients]]
+
+    order_dates = sorted(_dates(rng, orders, start, span_days))
+    data.orders = [{"order_id": i + 1, "client": rng.choice(client_names), "total": round(rng.uniform(5, 5000), 2),
+                    "order_date": date} for i, date in enumerate(order_dates)]
+
+    users = [f"{name.lower()}" for name in FIRST_NAMES] + ["admin"]
+    data.login_events = [{"user": rng.choice(users), "time": date, "spent": 0}
+                         for date in sorted(_dates(rng, login_events, start, span_days))]
+
+    expense_count = expenses if expenses is not None else max(orders // 10, 1)
+    data.expenses = [{"purpose": rng.choice(EXPENSE_PURPOSES), "amount": round(rng.uniform(10, 3000), 2), "date": date}
+                     for date in sorted(_dates(rng, expense_count, start, span_days))]
+    return data
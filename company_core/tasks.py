@@ -0,0 +1,129 @@
+import heapq
+import itertools
+from bisect import insort
+from datetime import datetime, timedelta
+
+from .errors import ValidationError
+
+# -----------------------------------------------------------------------------
+# TÂCHES : échéances, statuts et file de notifications
+# -----------------------------------------------------------------------------
+TASK_STATUSES = {
+    "Pending": "En attente",
+    "In Progress": "En cours",
+    "Done": "Terminée",
+    "Cancelled": "Annulée",
+}
+# Statut courant -> statuts autorisés ensuite
+TASK_TRANSITIONS = {
+    "Pending": ("In Progress", "Done", "Cancelled"),
+    "In Progress": ("Pending", "Done", "Cancelled"),
+    "Done": ("In Progress",),
+    "Cancelled": ("Pending",),
+}
+OPEN_STATUSES = ("Pending", "In Progress")
+UPCOMING_WINDOW = timedelta(hours=24)  # rappel « bientôt dû » 24 h avant l'échéance
+
+DUE_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M")
+DUE_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+def parse_due(value):
+    """Échéance en datetime ; une date seule vaut pour toute la journée (23:59:59). Vide -> None."""
+    text = str(value or "").strip()
+    if not text or text == "N/A":
+        return None
+    for fmt in DUE_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    for fmt in DUE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).replace(hour=23, minute=59, second=59)
+        except ValueError:
+            continue
+    raise ValidationError(f"Échéance invalide '{text}' (AAAA-MM-JJ ou AAAA-MM-JJ HH:MM).")
+
+
+def safe_due(task):
+    """Comme parse_due, mais None pour les échéances illisibles saisies avant la validation."""
+    try:
+        return parse_due(task.get("due"))
+    except ValidationError:
+        return None
+
+
+class TaskQueue:
+    """Index des tâches triées par échéance, par assigné, et tas des prochains rappels.
+
+    - by_assignee : {assigné: [(sans échéance, échéance, n°, tâche)]} maintenue triée (bisect) ;
+    - le tas des rappels contient (instant, n°, type, tâche, échéance) ; une entrée dont la tâche
+      a été fermée entre-temps est simplement ignorée quand elle arrive en tête (suppression paresseuse) ;
+    - les rappels échus d'un autre assigné que celui de la session sont mis de côté par assigné,
+      et rendus au tas quand cet assigné (ou un administrateur) les demande.
+    """
+
+    def __init__(self, tasks=(), upcoming=UPCOMING_WINDOW):
+        self.upcoming = upcoming
+        self.by_assignee = {}
+        self._events = []
+        self._held = {}  # {assigné: [entrées échues mises de côté]}
+        self._seq = itertools.count()
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        due = safe_due(task)
+        seq = next(self._seq)
+        insort(self.by_assignee.setdefault(task.get("assignee"), []),
+               (due is None, due or datetime.max, seq, task))
+        self.schedule(task, due)
+
+    def schedule(self, task, due=None):
+        """Programme les rappels d'une tâche ouverte (à l'ajout ou à sa réouverture)."""
+        due = due or safe_due(task)
+        if due is None or task.get("status", "Pending") not in OPEN_STATUSES:
+            return
+        heapq.heappush(self._events, (due - self.upcoming, next(self._seq), "upcoming", task, due))
+        heapq.heappush(self._events, (due, next(self._seq), "overdue", task, due))
+
+    def ordered(self, assignee=None):
+        """Tâches triées par échéance (les tâches sans échéance en dernier)."""
+        if assignee is not None:
+            return [entry[3] for entry in self.by_assignee.get(assignee, [])]
+        return [entry[3] for entry in heapq.merge(*self.by_assignee.values())]
+
+    def _is_current(self, entry):
+        _, _, _, task, due = entry
+        return task.get("status", "Pending") in OPEN_STATUSES and safe_due(task) == due
+
+    def next_event_time(self):
+        while self._events and not self._is_current(self._events[0]):
+            heapq.heappop(self._events)
+        return self._events[0][0] if self._events else None
+
+    def pop_due(self, now, assignee=None):
+        """Rappels arrivés à échéance : [(type, tâche)] ; « bientôt dû » est omis si la tâche est déjà en retard.
+
+        Avec assignee, seuls ses rappels sont retirés ; ceux des autres restent en attente.
+        """
+        held = self._held.pop(assignee, []) if assignee is not None else \
+            [entry for entries in self._held.values() for entry in entries]
+        if assignee is None:
+            self._held.clear()
+        for entry in held:
+            heapq.heappush(self._events, entry)
+        due_events = []
+        while self._events and self._events[0][0] <= now:
+            entry = heapq.heappop(self._events)
+            if not self._is_current(entry):
+                continue
+            kind, task, due = entry[2], entry[3], entry[4]
+            if assignee is not None and task.get("assignee") != assignee:
+                self._held.setdefault(task.get("assignee"), []).append(entry)
+                continue
+            if kind == "upcoming" and due <= now:
+                continue
+            due_events.append((kind, task))
+        return due_events
@@ -0,0 +1,214 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+
+from .errors import CompanyError
+
+# -----------------------------------------------------------------------------
+# SÉRIES TEMPORELLES : chiffre d'affaires, dépenses et commandes par jour, semaine ou mois
+# -----------------------------------------------------------------------------
+# Les montants sont cumulés par jour (ordinal de la date) au fil du flux des modifications ;
+# les semaines et les mois sont agrégés à partir des jours, puis les courbes sont réduites
+# à quelques centaines de points (LTTB) avant d'être tracées.
+GRANULARITIES = {"day": "Jour", "week": "Semaine", "month": "Mois"}
+SERIES_COLLECTIONS = {"orders": ("order_date", "total"), "expenses": ("date", "amount")}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+
+
+def day_ordinal(text):
+    """Jour d'une date saisie ("AAAA-MM-JJ HH:MM:SS", "JJ/MM/AAAA"...) en ordinal, ou None si illisible."""
+    return _day_ordinal(text[:10])  # l'heure écartée, le cache ne garde qu'une entrée par jour
+
+
+@lru_cache(maxsize=65536)
+def _day_ordinal(text):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def bucket_start(ordinal, granularity):
+    """Premier jour (ordinal) de la semaine (lundi) ou du mois qui contient ordinal."""
+    if granularity == "week":
+        return ordinal - date.fromordinal(ordinal).weekday()
+    if granularity == "month":
+        return date.fromordinal(ordinal).replace(day=1).toordinal()
+    return ordinal
+
+
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets : threshold points qui gardent la forme de la courbe.
+
+    Le premier et le dernier point sont conservés ; entre les deux, chaque tranche garde le
+    point qui forme le plus grand triangle avec le point retenu avant elle et la moyenne de
+    la tranche suivante (les pics et les creux survivent, contrairement à une moyenne).
+    """
+    count = len(xs)
+    if threshold >= count or threshold < 3:
+        return list(xs), list(ys)
+    every = (count - 2) / (threshold - 2)
+    out_x, out_y = [xs[0]], [ys[0]]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_start, next_end = end, min(int((bucket + 2) * every) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+        ax, ay = xs[previous], ys[previous]
+        best, best_area = start, -1.0
+        for position in range(start, end):
+            area = abs((ax - avg_x) * (ys[position] - ay) - (ax - xs[position]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = position, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        previous = best
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+class FinanceSeries:
+    """Montants par jour {collection: {ordinal: montant}} et nombre de commandes par jour.
+
+    Tenu à jour par le flux des modifications, comme le grand livre des clients : une commande
+    ou une dépense ajoutée, supprimée ou modifiée ne touche que son jour. Les séries agrégées
+    par semaine ou par mois sont gardées jusqu'à la modification suivante.
+    """
+
+    def __init__(self):
+        self.days = {name: {} for name in SERIES_COLLECTIONS}
+        self.order_counts = {}
+        self.seq = None
+        self._entries = {}  # {id(enregistrement): (collection, jour, montant)}
+        self._cache = {}    # {granularité: (abscisses, séries)}
+
+    # -- Maintenance ---------------------------------------------------------------------
+    def sync(self, data):
+        operations = data.history.changes_since(self.seq)
+        if operations is None or any(op.collection in SERIES_COLLECTIONS and op.kind in ("replace", "rescan")
+                                     for op in operations):
+            self.rebuild(data)
+            return
+        for op in operations:
+            if op.collection not in SERIES_COLLECTIONS:
+                continue
+            if op.kind == "update":
+                self._remove(op.record)
+                self._add(op.collection, op.record)
+            elif op.kind in ("delete", "truncate"):
+                for record in op.records:
+                    self._remove(record)
+            else:
+                for record in op.records:
+                    self._add(op.collection, record)
+            self._cache.clear()
+        self.seq = data.history.seq
+
+    def rebuild(self, data):
+        for days in self.days.values():
+            days.clear()
+        self.order_counts.clear()
+        self._entries.clear()
+        self._cache.clear()
+        for name in SERIES_COLLECTIONS:
+            archived = data.archived(name)
+            for text, (amount, count) in (archived["days"].items() if archived else ()):
+                # Enregistrements archivés : les montants par jour des pieds de segments
+                day = day_ordinal(text)
+                self.days[name][day] = self.days[name].get(day, 0.0) + amount
+                if name == "orders":
+                    self.order_counts[day] = self.order_counts.get(day, 0) + count
+            for record in getattr(data, name):
+                self._add(name, record)
+        self.seq = data.history.seq
+
+    def _add(self, collection, record):
+        if id(record) in self._entries:
+            self._remove(record)
+        date_field, amount_field = SERIES_COLLECTIONS[collection]
+        day = day_ordinal(str(record.get(date_field) or ""))
+        if day is None:
+            return  # sans date lisible : compté dans les totaux, pas dans les courbes
+        amount = record.get(amount_field) or 0.0
+        days = self.days[collection]
+        days[day] = days.get(day, 0.0) + amount
+        if collection == "orders":
+            self.order_counts[day] = self.order_counts.get(day, 0) + 1
+        self._entries[id(record)] = (collection, day, amount)
+
+    def _remove(self, record):
+        entry = self._entries.pop(id(record), None)
+        if entry is None:
+            return
+        collection, day, amount = entry
+        days = self.days[collection]
+        days[day] -= amount
+        if collection == "orders":
+            self.order_counts[day] -= 1
+            if not self.order_counts[day]:
+                del self.order_counts[day]
+                del days[day]
+        elif abs(days[day]) < 1e-9:
+            del days[day]
+
+    # -- Séries ---------------------------------------------------------------------------
+    def series(self, granularity="month", start=None, end=None):
+        """(abscisses, {"revenue", "expenses", "net", "orders": valeurs}) entre deux ordinaux inclus.
+
+        Une abscisse est le premier jour (ordinal) de son intervalle ; les intervalles sans
+        commande ni dépense valent 0 pour que les courbes retombent au lieu de relier les trous.
+        """
+        if granularity not in GRANULARITIES:
+            raise CompanyError(f"Granularité inconnue : {granularity}")
+        cached = self._cache.get(granularity)
+        if cached is None:
+            cached = self._cache[granularity] = self._aggregate(granularity)
+        xs, values = cached
+        if start is None and end is None:
+            return xs, values
+        low = bisect_left(xs, bucket_start(start, granularity)) if start is not None else 0
+        high = bisect_right(xs, end) if end is not None else len(xs)
+        return xs[low:high], {name: serie[low:high] for name, serie in values.items()}
+
+    def _aggregate(self, granularity):
+        revenue, expenses, counts = {}, {}, {}
+        for source, target in ((self.days["orders"], revenue), (self.days["expenses"], expenses),
+                               (self.order_counts, counts)):
+            for day, amount in source.items():
+                bucket = bucket_start(day, granularity)
+                target[bucket] = target.get(bucket, 0) + amount
+        buckets = set(revenue) | set(expenses)
+        if not buckets:
+            return [], {"revenue": [], "expenses": [], "net": [], "orders": []}
+        xs = []
+        bucket = min(buckets)
+        last = max(buckets)
+        while bucket <= last:
+            xs.append(bucket)
+            bucket = self._next_bucket(bucket, granularity)
+        values = {
+            "revenue": [revenue.get(x, 0.0) for x in xs],
+            "expenses": [expenses.get(x, 0.0) for x in xs],
+            "orders": [counts.get(x, 0) for x in xs],
+        }
+        values["net"] = [r - e for r, e in zip(values["revenue"], values["expenses"])]
+        return xs, values
+
+    @staticmethod
+    def _next_bucket(ordinal, granularity):
+        if granularity == "week":
+            return ordinal + 7
+        if granularity == "month":
+            day = date.fromordinal(ordinal)
+            return (date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)).toordinal()
+        return ordinal + 1
+
+    def last_day(self):
+        """Dernier jour avec une commande ou une dépense (ordinal), ou None."""
+        return max((max(days) for days in self.days.values() if days), default=None)
@@ -0,0 +1,15 @@
+import pytest
+
+from company_core import CompanyCore
+from company_core.storage import JsonStorage
+
+
+@pytest.fixture
+def core(tmp_path):
+    """Cœur métier sur un fichier JSON temporaire (archives et sauvegardes à côté)."""
+    return CompanyCore(storage=JsonStorage(str(tmp_path / "company_data.json")))
+
+
+def add_orders(core, *orders):
+    """Commandes (client, total, date AAAA-MM-JJ) ; retourne les enregistrements ajoutés."""
+    return [core.orders.add_order(client, total, order_date=f"{day} 10:00:00") for client, total, day in orders]
@@ -0,0 +1,103 @@
+import shutil
+from datetime import datetime
+
+from company_core import CompanyCore
+from company_core.archive import ArchiveStore, Segment, archivable, write_segment
+from company_core.storage import JsonStorage
+
+from .conftest import add_orders
+
+NOW = datetime(2025, 6, 1)
+
+ORDERS = [
+    {"order_id": 2, "client": "Bob", "total": 5.5, "order_date": "2024-01-20 09:00:00"},
+    {"order_id": 1, "client": "Alice", "total": 10, "order_date": "2024-01-05 09:00:00"},
+    {"order_id": 3, "client": "Alice", "total": 2.25, "order_date": "2024-02-01 09:00:00"},
+]
+
+
+def test_segment_round_trip(tmp_path):
+    path = str(tmp_path / "orders.seg")
+    footer = write_segment(path, "orders", ORDERS)
+    segment = Segment(path, "orders")
+    by_date = sorted(ORDERS, key=lambda order: order["order_date"])
+    assert segment.records() == by_date
+    assert type(segment.records()[0]["total"]) is int  # un entier reste un entier
+    assert segment.column("client") == ["Alice", "Bob", "Alice"]
+    assert segment.records("2024-01-10", "2024-02-01") == [by_date[1]]
+    assert footer["count"] == 3 and footer["first"] == by_date[0]["order_date"]
+    assert footer["groups"]["Alice"] == [12.25, 2, "2024-02-01 09:00:00"]
+    assert footer["max"]["order_id"] == 3
+
+
+def test_empty_segment(tmp_path):
+    path = str(tmp_path / "empty.seg")
+    write_segment(path, "expenses", [])
+    segment = Segment(path, "expenses")
+    assert segment.records() == [] and segment.column("amount") == []
+
+
+def test_archivable():
+    assert archivable("orders", ORDERS[0])
+    assert not archivable("orders", dict(ORDERS[0], note="x"))
+    assert not archivable("orders", dict(ORDERS[0], order_date="20/01/2024"))
+    assert not archivable("orders", {"client": "Bob", "order_id": 2, "total": 5.5,
+                                     "order_date": "2024-01-20 09:00:00"})
+
+
+def test_store_append_and_reopen(tmp_path):
+    store = ArchiveStore(str(tmp_path / "archive"))
+    assert store.append("orders", ORDERS[:2], "2024-03-01 00:00:00") == 2
+    assert store.append("orders", ORDERS[2:], "2024-03-01 00:00:00") == 1
+    reopened = ArchiveStore(str(tmp_path / "archive"))
+    assert reopened.count("orders") == 3
+    assert reopened.generation == store.generation
+    assert reopened.records("orders") == sorted(ORDERS, key=lambda order: order["order_date"])
+    assert reopened.column("orders", "total") == [10, 5.5, 2.25]
+    totals = reopened.totals("orders")
+    assert totals["count"] == 3 and totals["amount"] == 17.75
+    assert totals["groups"]["Bob"][:2] == [5.5, 1]
+    reopened.clear("orders")
+    assert reopened.count("orders") == 0 and reopened.totals("orders")["count"] == 0
+
+
+def old_and_recent(core):
+    add_orders(core, ("Alice", 10, "2024-01-05"), ("Bob", 5, "2024-01-20"), ("Alice", 20, "2025-05-30"))
+    core.data.insert("orders", {"order_id": core.data.next_order_id(), "client": "Eve", "total": 1.0,
+                                "order_date": "2024-01-06 10:00:00", "note": "champ en plus"})
+    core.save()
+
+
+def test_archive_cold_keeps_totals(core):
+    old_and_recent(core)
+    assert core.archive_cold(now=NOW) == {"orders": 2}
+    assert [order["client"] for order in core.data.orders] == ["Alice", "Eve"]  # récente, non archivable
+    assert core.dashboard_stats()["orders_count"] == 4
+    assert core.formulas.evaluate("SUM(orders.total)") == 36.0
+    assert core.formulas.evaluate("COUNT(orders)") == 4
+    result = core.queries.engine.run({"source": "orders", "group_by": ["client"],
+                                      "aggregates": [["sum", "total"]], "sort": [["client", False]]})
+    assert [tuple(row) for row in result.rows] == [("Alice", 30.0), ("Bob", 5.0), ("Eve", 1.0)]
+    assert core.data.next_order_id() == 5
+
+
+def test_reload_after_archiving(core, tmp_path):
+    old_and_recent(core)
+    before = str(tmp_path / "avant archivage.json")
+    shutil.copyfile(core.storage.path, before)
+    core.archive_cold(now=NOW)
+    reloaded = CompanyCore(storage=JsonStorage(core.storage.path))
+    reloaded.load()
+    assert len(reloaded.data.orders) == 2 and reloaded.data.archived_count("orders") == 2
+    # Données enregistrées avant l'archivage (sauvegarde restaurée) : les doublons archivés sont retirés
+    reloaded.load(before)
+    assert [order["client"] for order in reloaded.data.orders] == ["Alice", "Eve"]
+
+
+def test_archived_logins_are_counted(core):
+    for time in ("2024-01-01 08:00:00", "2024-01-02 08:00:00", "2025-05-30 08:00:00"):
+        core.data.insert("login_events", {"user": "admin", "time": time, "spent": 1.0})
+    core.archive_cold(now=NOW)
+    assert len(core.data.login_events) == 1
+    assert core.logins.count_for("admin") == 3
+    assert core.logins.count_for("inconnu") == 0
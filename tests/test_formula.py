@@ -0,0 +1,62 @@
+import pytest
+
+from company_core.errors import ValidationError
+from company_core.formula import compile_formula, format_result
+
+from .conftest import add_orders
+
+
+def test_arithmetic_and_fields(core):
+    assert core.formulas.engine.evaluate("(12.5 + 7.5) * 1.2") == pytest.approx(24.0)
+    assert core.formulas.engine.evaluate("ROUND(price * 1.2, 2)", {"price": 10.0}) == 12.0
+    assert core.formulas.engine.evaluate("ARRONDI(price, 1)", {"price": 2.26}) == 2.3
+
+
+def test_if_with_missing_value(core):
+    formula = "IF(cost, (price - cost) / price * 100, None)"
+    assert core.formulas.engine.evaluate(formula, {"price": 20.0, "cost": 15.0}) == pytest.approx(25.0)
+    assert core.formulas.engine.evaluate(formula, {"price": 20.0, "cost": None}) is None
+    assert format_result(None) == ""
+
+
+def test_compiled_once():
+    assert compile_formula("1 + 2") is compile_formula("1 + 2")
+
+
+@pytest.mark.parametrize("text", [
+    "__import__('os')", "price.__class__", "(lambda: 1)()", "[1][0]", "open('x')", "unknown(1)", "1 +", "",
+])
+def test_rejected(core, text):
+    with pytest.raises(ValidationError):
+        core.formulas.engine.evaluate(text, {"price": 1.0})
+
+
+def test_unknown_field(core):
+    with pytest.raises(ValidationError, match="Nom inconnu"):
+        core.formulas.engine.evaluate("price * 2")
+
+
+@pytest.mark.parametrize("text", [
+    "9 ** 9 ** 9",
+    "ROUND(5, -10000000)",
+    "'x' * 300000000",
+    "'x' % 3",
+    "9 ** 1000 * 9 ** 1000 * 9 ** 1000 * 9 ** 1000 * 9 ** 1000",
+    "1 / 0",
+])
+def test_guards(core, text):
+    with pytest.raises(ValidationError):
+        core.formulas.engine.evaluate(text)
+
+
+def test_large_result_still_allowed(core):
+    value = core.formulas.engine.evaluate("10 ** 1000")
+    assert len(format_result(value)) == 1001
+
+
+def test_aggregates_follow_changes(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"), ("Bob", 30, "2024-01-02"))
+    assert core.formulas.engine.evaluate("SUM(orders.total) / COUNT(orders)") == 20.0
+    add_orders(core, ("Alice", 50, "2024-01-03"))
+    assert core.formulas.engine.evaluate("SOMME(orders.total)") == 90.0
+    assert core.formulas.engine.evaluate("MAX(orders.total)") == 50.0
@@ -0,0 +1,69 @@
+from company_core.history import CommandLog, Operation
+
+from .conftest import add_orders
+
+
+def test_undo_redo_insert(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"))
+    assert core.undo() is not None
+    assert core.data.orders == []
+    core.redo()
+    assert [order["client"] for order in core.data.orders] == ["Alice"]
+    assert core.undo() is not None and core.undo() is None
+
+
+def test_command_groups_operations(core):
+    with core.history.command("Deux commandes"):
+        add_orders(core, ("Alice", 10, "2024-01-01"), ("Bob", 20, "2024-01-02"))
+    assert core.undo() == "Deux commandes"
+    assert core.data.orders == []
+    assert not core.history.can_undo()
+
+
+def test_update_restores_missing_fields(core):
+    [order] = add_orders(core, ("Alice", 10, "2024-01-01"))
+    core.data.update("orders", order, {"total": 15.0, "note": "urgent"})
+    assert order == {"order_id": 1, "client": "Alice", "total": 15.0, "order_date": "2024-01-01 10:00:00",
+                     "note": "urgent"}
+    core.undo()
+    assert order == {"order_id": 1, "client": "Alice", "total": 10.0, "order_date": "2024-01-01 10:00:00"}
+    core.redo()
+    assert order["note"] == "urgent"
+
+
+def test_new_action_clears_redo(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"))
+    core.undo()
+    add_orders(core, ("Bob", 20, "2024-01-02"))
+    assert not core.history.can_redo()
+
+
+def test_rescan_discards_only_its_collection(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"))
+    core.finance.add_expense("Loyer", 900)
+    core.data.touch("orders")
+    assert core.undo() is not None
+    assert core.data.expenses == []
+    assert core.undo() is None
+    assert len(core.data.orders) == 1
+
+
+def test_changes_since():
+    log = CommandLog(feed_size=3)
+    assert log.changes_since(0) == []
+    operations = [Operation("insert", "orders", index=i, record={}) for i in range(5)]
+    for operation in operations:
+        log.record(operation)
+    assert log.seq == 5
+    assert log.changes_since(3) == operations[3:]
+    assert log.changes_since(5) == []
+    assert log.changes_since(1) is None  # sorti du flux : le consommateur relit tout
+    assert log.changes_since(6) is None
+
+
+def test_limits_drop_oldest_commands():
+    log = CommandLog(max_commands=2)
+    for i in range(3):
+        log.record(Operation("insert", "orders", index=i, record={}))
+    assert len(log.undo_stack) == 2
+    assert log.pop_undo().operations[0].index == 2
@@ -0,0 +1,57 @@
+import pytest
+
+from company_core.errors import ValidationError
+
+from .conftest import add_orders
+
+
+def test_group_by_client(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"), ("Bob", 5, "2024-02-01"), ("Alice", 20, "2024-02-03"))
+    result = core.queries.engine.run({"source": "orders", "group_by": ["client"],
+                                      "aggregates": [["sum", "total"], ["count", None]],
+                                      "sort": [["sum(total)", True]]})
+    assert result.columns == ["client", "sum(total)", "count"]
+    assert [tuple(row) for row in result.rows] == [("Alice", 30.0, 2), ("Bob", 5.0, 1)]
+
+
+def test_group_by_month(core):
+    add_orders(core, ("Alice", 10, "2024-01-01"), ("Bob", 5, "2024-02-01"), ("Alice", 20, "2024-02-03"))
+    result = core.queries.engine.run({"source": "orders", "group_by": ["month"],
+                                      "aggregates": [["sum", "total"]], "sort": [["month", False]]})
+    assert [tuple(row) for row in result.rows] == [("2024-01", 10.0), ("2024-02", 25.0)]
+
+
+def test_filters_and_limit(core):
+    add_orders(core, *(("Client", total, "2024-03-01") for total in range(1, 11)))
+    result = core.queries.engine.run({"source": "orders", "filters": [["total", ">=", "7,5"]],
+                                      "fields": ["total"], "sort": [["total", True]], "limit": 2})
+    assert result.matched == 3
+    assert [row[0] for row in result.rows] == [10.0, 9.0]
+
+
+def test_filter_on_column_with_missing_values(core):
+    core.inventory.add_product("Outils", "Marteau", 10.0, cost=4.0)
+    core.inventory.add_product("Outils", "Scie", 20.0)
+    result = core.queries.engine.run({"source": "inventory_data", "filters": [["cost", ">", "1"]],
+                                      "fields": ["name"]})
+    assert [row[0] for row in result.rows] == ["Marteau"]
+
+
+def test_empty_source_keeps_known_fields(core):
+    result = core.queries.engine.run({"source": "orders", "group_by": ["client"], "aggregates": [["count", None]]})
+    assert result.rows == []
+
+
+@pytest.mark.parametrize("query", [
+    {"source": "nope"},
+    {"source": "orders", "filters": [["missing", "=", 1]]},
+    {"source": "orders", "filters": [["total", "~", 1]]},
+    {"source": "orders", "filters": [["total", ">", "abc"]]},
+    {"source": "orders", "aggregates": [["median", "total"]]},
+    {"source": "orders", "sort": [["client", False]], "fields": ["total"]},
+    {"source": "orders", "limit": 0},
+])
+def test_invalid_queries(core, query):
+    add_orders(core, ("Alice", 10, "2024-01-01"))
+    with pytest.raises(ValidationError):
+        core.queries.engine.run(query)
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from company_core.errors import CompanyError
+from company_core.models import CompanyData
+from company_core.persistence import atomic_write, load_data_file, load_json, save_data_file, save_json
+from company_core.snapshot import decode_records, encode_records, is_snapshot, load_snapshot, save_snapshot
+
+
+def sample_data():
+    data = CompanyData()
+    data.prepare()
+    data.inventory_data["Outils"] = [{"name": "Marteau", "price": 10.5, "cost": 4.0},
+                                     {"name": "Scie", "price": 20.0, "cost": None}]
+    data.orders = [{"order_id": i, "client": f"Client {i % 3}", "total": i * 1.5,
+                    "order_date": f"2024-01-{i % 28 + 1:02d} 10:00:00"} for i in range(1, 200)]
+    data.clients_list = [{"name": "Émilie", "purchases": 3}, {"name": "sep\x00arateur", "purchases": 0.5}]
+    data.expenses = [{"purpose": "Loyer", "amount": 900, "date": "2024-01-01 00:00:00", "note": {"a": [1, 2]}}]
+    data.settings["company_name"] = "Société « test »"
+    return data.to_dict()
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_round_trip(tmp_path, compression):
+    path = str(tmp_path / "data.snap")
+    data = sample_data()
+    save_snapshot(data, path, compression)
+    assert is_snapshot(path)
+    assert load_snapshot(path) == data
+
+
+def test_load_sections(tmp_path):
+    path = str(tmp_path / "data.snap")
+    data = sample_data()
+    save_snapshot(data, path, "gzip")
+    assert load_snapshot(path, sections={"orders", "settings"}) == {"orders": data["orders"],
+                                                                       "settings": data["settings"]}
+
+
+def test_records_keep_types_and_key_order():
+    records = [{"a": 1, "b": "x"}, {"b": None, "a": 2.5}, {}, {"a": True, "c": [1]}]
+    decoded, meta = decode_records(encode_records(records, extra={"version": 3}))
+    assert [list(record.items()) for record in decoded] == [list(record.items()) for record in records]
+    assert meta["version"] == 3
+    assert decode_records(encode_records([]))[0] == []
+
+
+def test_data_file_detected_by_content(tmp_path):
+    data = sample_data()
+    snap, json_path = str(tmp_path / "d.snap"), str(tmp_path / "d.json")
+    save_data_file(data, snap)
+    save_data_file(data, json_path)
+    assert not is_snapshot(json_path)
+    assert load_data_file(snap) == load_data_file(json_path) == data
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(CompanyError):
+        save_snapshot(sample_data(), str(tmp_path / "d.snap"), "lz4")
+
+
+def test_corrupted_section(tmp_path):
+    path = str(tmp_path / "d.snap")
+    save_snapshot(sample_data(), path, "none")
+    with open(path, "r+b") as f:
+        f.seek(-10, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-10, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(CompanyError, match="corrompu"):
+        load_snapshot(path)
+
+
+def test_not_a_snapshot(tmp_path):
+    path = str(tmp_path / "d.snap")
+    save_json({"orders": []}, path)
+    with pytest.raises(CompanyError):
+        load_snapshot(path)
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / "d.json")
+    save_json({"orders": [1]}, path)
+    with pytest.raises(TypeError):
+        save_json({"orders": [object()]}, path)
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(tmp_path / "d.snap"), "wb") as f:
+            f.write(b"partiel")
+            raise RuntimeError
+    assert load_json(path) == {"orders": [1]}
+    assert sorted(os.listdir(tmp_path)) == ["d.json"]